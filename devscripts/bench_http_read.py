@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import contextlib
+import socket
+import subprocess
+import tempfile
+import time
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.common import _REQUEST_HANDLERS
+from yt_dlp.utils._utils import _YDLLogger
+
+BLOCK_SIZE = 1024 * 1024
+
+
+@contextlib.contextmanager
+def serve_directory(directory):
+    # The server runs in its own process, so that its CPU time is not counted
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'http.server', '--bind', '127.0.0.1', '--directory', directory, str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port)):
+                break
+            time.sleep(0.1)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def transfer_read(response, out):
+    while data := response.read(BLOCK_SIZE):
+        out.write(data)
+
+
+def transfer_readinto(response, out):
+    buffer = memoryview(bytearray(BLOCK_SIZE))
+    while size := response.readinto(buffer):
+        out.write(buffer[:size])
+
+
+def measure(func, runs, size):
+    wall, cpu = [], []
+    for _ in range(runs):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+    return f'{size / min(wall) / 1024 / 1024:8.1f}MiB/s  cpu {min(cpu):6.2f}s'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the throughput of response reads and HttpFD from a local server')
+    parser.add_argument('--size', type=int, default=1024, help='size of the test file in MiB (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3, help='number of runs per benchmark (default: %(default)s)')
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    handlers = [rh for rh in _REQUEST_HANDLERS.values() if 'http' in (rh._SUPPORTED_URL_SCHEMES or ())]
+    with tempfile.TemporaryDirectory() as tmpdir, serve_directory(tmpdir) as base_url:
+        with open(os.path.join(tmpdir, 'test.bin'), 'wb') as f:
+            chunk = bytes(range(256)) * 4096
+            for _ in range(size // len(chunk)):
+                f.write(chunk)
+            f.write(chunk[:size % len(chunk)])
+        url = f'{base_url}/test.bin'
+
+        for handler in handlers:
+            with handler(logger=_YDLLogger()) as rh:
+                for name, transfer in (('read', transfer_read), ('readinto', transfer_readinto)):
+                    def run():
+                        with open(os.devnull, 'wb') as out:
+                            transfer(rh.send(Request(url)), out)
+                    print(f'{handler.RH_NAME:<10} {name:<10} {measure(run, args.runs, size)}')
+
+        ydl = YoutubeDL({'quiet': True, 'noprogress': True})
+        path = os.path.join(tmpdir, 'download.bin')
+
+        def download():
+            HttpFD(ydl, ydl.params).real_download(path, {'url': url})
+            os.remove(path)
+        print(f'{"HttpFD":<21} {measure(download, args.runs, size)}')
+
+
+if __name__ == '__main__':
+    main()
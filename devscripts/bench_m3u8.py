@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from yt_dlp import YoutubeDL, m3u8
+from yt_dlp.extractor.common import InfoExtractor
+
+
+def generate_media_playlist(count):
+    rng = random.Random(0)
+    lines = ['#EXTM3U', '#EXT-X-VERSION:6', '#EXT-X-TARGETDURATION:6', '#EXT-X-MEDIA-SEQUENCE:0',
+             '#EXT-X-PLAYLIST-TYPE:VOD', '#EXT-X-MAP:URI="init.mp4"']
+    for i in range(count):
+        if i % 500 == 0:
+            lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="https://example.com/key{i}",IV=0x{i:032x}')
+        if rng.random() < 0.01:
+            lines.append('#EXT-X-DISCONTINUITY')
+        if i % 100 == 0:
+            lines.append(f'#EXT-X-PROGRAM-DATE-TIME:2024-01-01T00:{i // 600 % 60:02d}:{i // 10 % 60:02d}.000Z')
+        lines.append(f'#EXTINF:{rng.uniform(4, 6):.3f},')
+        lines.append(f'#EXT-X-BYTERANGE:{rng.randrange(100000, 500000)}')
+        lines.append(f'https://example.com/video/segment{i}.m4s')
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines)
+
+
+def generate_master_playlist(count):
+    lines = ['#EXTM3U', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for lang in ('en', 'de', 'fr', 'es'):
+        lines.append(
+            f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",LANGUAGE="{lang}",NAME="{lang}",URI="audio/{lang}.m3u8"')
+        lines.append(
+            f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",LANGUAGE="{lang}",NAME="{lang}",URI="subs/{lang}.m3u8"')
+    for i in range(count):
+        height = 144 * (i % 8 + 1)
+        lines.append(
+            f'#EXT-X-STREAM-INF:BANDWIDTH={(i + 1) * 100000},RESOLUTION={height * 16 // 9}x{height},'
+            f'CODECS="avc1.64001f,mp4a.40.2",FRAME-RATE=30.000,AUDIO="audio",SUBTITLES="subs"')
+        lines.append(f'video/{i}.m3u8')
+    return '\n'.join(lines)
+
+
+def measure(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), sum(timings) / len(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the speed and memory use of the M3U8 parser')
+    parser.add_argument('--segments', type=int, default=50000, help='number of segments in the media playlist (default: %(default)s)')
+    parser.add_argument('--variants', type=int, default=200, help='number of variants in the master playlist (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs per benchmark (default: %(default)s)')
+    args = parser.parse_args()
+
+    media = generate_media_playlist(args.segments)
+    master = generate_master_playlist(args.variants)
+    ie = InfoExtractor(YoutubeDL({'quiet': True}))
+
+    for name, func in (
+        (f'media playlist, {args.segments} segments', lambda: m3u8.parse_playlist(media)),
+        (f'master playlist, {args.variants} variants', lambda: m3u8.parse_playlist(master)),
+        ('formats from the master playlist', lambda: ie._parse_m3u8_formats_and_subtitles(
+            master, 'https://example.com/master.m3u8', 'mp4', video_id='test')),
+        ('VOD duration', lambda: ie._parse_m3u8_vod_duration(media, 'test')),
+    ):
+        best, mean, peak = measure(func, args.runs)
+        print(f'{name:<40} best {best * 1000:8.1f}ms  mean {mean * 1000:8.1f}ms  '
+              f'peak memory {peak / 1024 / 1024:7.1f}MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import EmbedThumbnailPP, FFmpegMetadataPP
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+
+def generate_video(ffmpeg, path, duration, faststart):
+    subprocess.run([
+        ffmpeg, '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac',
+        *(['-movflags', '+faststart'] if faststart and path.endswith('.mp4') else []), path], check=True)
+
+
+def generate_thumbnail(ffmpeg, path):
+    subprocess.run([
+        ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=1280x720', '-frames:v', '1', path],
+        check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare writing metadata in place with remuxing through ffmpeg')
+    parser.add_argument('--duration', type=int, default=600, help='length of the test videos in seconds (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3, help='number of times to run each method (default: %(default)s)')
+    args = parser.parse_args()
+
+    ffpp = FFmpegPostProcessor()
+    if not ffpp.available:
+        sys.exit('ffmpeg is needed to generate the test files')
+
+    info = {
+        'id': 'test', 'title': 'A test video', 'uploader': 'yt-dlp', 'upload_date': '20240101',
+        'description': 'A description ' * 100, 'language': 'en', 'vcodec': 'avc1', 'acodec': 'mp4a',
+        'chapters': [], '__files_to_move': {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        thumbnail = os.path.join(tmpdir, 'thumbnail.jpg')
+        generate_thumbnail(ffpp.executable, thumbnail)
+
+        for ext, faststart in (('mp4', True), ('mp4', False), ('mkv', False)):
+            source = os.path.join(tmpdir, f'source.{ext}')
+            print(f'Generating a {args.duration}s test video ({ext}{", faststart" if faststart else ""})')
+            generate_video(ffpp.executable, source, args.duration, faststart)
+
+            for name, pp_class, in_place in (
+                ('metadata, remux', FFmpegMetadataPP, False),
+                ('metadata, in place', FFmpegMetadataPP, True),
+                ('thumbnail, remux', EmbedThumbnailPP, False),
+                ('thumbnail, in place', EmbedThumbnailPP, True),
+            ):
+                # Extra ffmpeg arguments disable the in-place editors and the compat option
+                # makes mp4 thumbnails use AtomicParsley (or ffmpeg) as before
+                ydl = YoutubeDL({'quiet': True} if in_place else {
+                    'quiet': True, 'postprocessor_args': {'default': ['-hide_banner']},
+                    'compat_opts': ['embed-thumbnail-atomicparsley'],
+                })
+                pp = FFmpegMetadataPP(ydl) if pp_class is FFmpegMetadataPP else EmbedThumbnailPP(
+                    ydl, already_have_thumbnail=True)
+                timings = []
+                for _ in range(args.runs):
+                    path = os.path.join(tmpdir, f'video.{ext}')
+                    shutil.copyfile(source, path)
+                    start = time.perf_counter()
+                    pp.run({**info, 'ext': ext, 'filepath': path, 'thumbnails': [{'filepath': thumbnail}]})
+                    timings.append(time.perf_counter() - start)
+                print(f'{name:<24} {min(timings):8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import ModifyChaptersPP
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+
+def generate_video(ffmpeg, path, duration):
+    subprocess.run([
+        ffmpeg, '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', '300', '-c:a', 'aac', path], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the ways ModifyChaptersPP can remove sections')
+    parser.add_argument('--duration', type=int, default=1800, help='length of the test video in seconds (default: %(default)s)')
+    parser.add_argument('--cuts', type=int, default=5, help='number of sections to remove (default: %(default)s)')
+    args = parser.parse_args()
+
+    ffpp = FFmpegPostProcessor()
+    if not ffpp.available or not ffpp.probe_available:
+        sys.exit('ffmpeg and ffprobe are needed to run this benchmark')
+
+    step = args.duration / (args.cuts + 1)
+    ranges = [(step * i, step * i + 7.3) for i in range(1, args.cuts + 1)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, 'source.mp4')
+        print(f'Generating a {args.duration}s test video')
+        generate_video(ffpp.executable, source, args.duration)
+
+        for name, kwargs in (
+            ('stream copy', {}),
+            ('smart cut', {'smart_cut': True}),
+            ('force keyframes', {'force_keyframes': True}),
+        ):
+            path = os.path.join(tmpdir, 'video.mp4')
+            shutil.copyfile(source, path)
+            info = {
+                'id': 'test', 'title': 'test', 'filepath': path, 'duration': args.duration,
+                '__real_download': True,
+            }
+            pp = ModifyChaptersPP(YoutubeDL({'quiet': True}), remove_ranges=ranges, **kwargs)
+            start = time.perf_counter()
+            files_to_delete, _ = pp.run(info)
+            print(f'{name:<16} {time.perf_counter() - start:8.1f}s')
+            for file in files_to_delete:
+                os.remove(file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import subprocess
+import tempfile
+import time
+
+from yt_dlp import subtitles
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import timetuple_from_msec
+
+
+def generate_vtt(count):
+    def timecode(msec):
+        return '{:02d}:{:02d}:{:02d}.{:03d}'.format(*timetuple_from_msec(msec))
+
+    cues = (
+        f'{timecode(i * 2000)} --> {timecode(i * 2000 + 1500)}\n'
+        f'Line {i} with <i>some</i> &amp; <c.yellow>styled</c> text\nand a second line\n'
+        for i in range(count))
+    return ('WEBVTT\n\n' + '\n'.join(cues)).encode()
+
+
+def bench_native(path, to_ext):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(f'{path}.native.{to_ext}', 'w', encoding='utf-8') as f:
+        f.writelines(subtitles.convert(data, 'vtt', to_ext))
+
+
+def bench_ffmpeg(path, to_ext):
+    subprocess.run([
+        FFmpegPostProcessor().executable, '-y', '-loglevel', 'error', '-i', path,
+        '-f', to_ext, f'{path}.ffmpeg.{to_ext}'], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare native subtitle conversion against ffmpeg')
+    parser.add_argument('--cues', type=int, default=20000, help='number of cues in the test file (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs per conversion (default: %(default)s)')
+    args = parser.parse_args()
+
+    benchmarks = {'native': bench_native}
+    if FFmpegPostProcessor().available:
+        benchmarks['ffmpeg'] = bench_ffmpeg
+    else:
+        print('ffmpeg not found; only the native converter is measured')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'subtitles.vtt')
+        with open(path, 'wb') as f:
+            f.write(generate_vtt(args.cues))
+
+        for to_ext in ('srt', 'ass'):
+            for name, func in benchmarks.items():
+                timings = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    func(path, to_ext)
+                    timings.append(time.perf_counter() - start)
+                print(f'vtt -> {to_ext:<4} {name:<7} best {min(timings) * 1000:8.1f}ms '
+                      f'mean {sum(timings) / len(timings) * 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import argparse
+import functools
+import time
+
+from yt_dlp.utils import float_or_none, parse_count
+from yt_dlp.utils import traversal
+from yt_dlp.utils.traversal import get_first, traverse_obj
+
+
+def generate_watch_page(formats=40, markers=100):
+    """A reduced YouTube watch page: the player response and the initial data"""
+    player_response = {
+        'playabilityStatus': {'status': 'OK', 'playableInEmbed': True},
+        'videoDetails': {'videoId': 'dQw4w9WgXcQ', 'title': 'A title', 'lengthSeconds': '212', 'isLive': False},
+        'microformat': {'playerMicroformatRenderer': {'uploadDate': '2009-10-24', 'category': 'Music'}},
+        'streamingData': {'adaptiveFormats': [{
+            'itag': 100 + i, 'url': f'https://example.com/videoplayback?itag={100 + i}',
+            'mimeType': 'video/mp4; codecs="avc1.640028"', 'bitrate': 100000 * i, 'height': 144 * (i % 8 + 1),
+        } for i in range(formats)]},
+    }
+    like_button = {'segmentedLikeDislikeButtonViewModel': {'likeButtonViewModel': {'likeButtonViewModel': {
+        'toggleButtonViewModel': {'toggleButtonViewModel': {'defaultButtonViewModel': {'buttonViewModel': {
+            'accessibilityText': 'like this video along with 17,532,345 other people'}}}}}}}}
+    initial_data = {
+        'contents': {'twoColumnWatchNextResults': {'results': {'results': {'contents': [
+            {'videoPrimaryInfoRenderer': {
+                'title': {'runs': [{'text': 'A title'}]},
+                'videoActions': {'menuRenderer': {'topLevelButtons': [{'buttonRenderer': {}}, like_button]}},
+                'viewCount': {'videoViewCountRenderer': {'viewCount': {'simpleText': '1,234,567,890 views'}}},
+            }},
+            {'videoSecondaryInfoRenderer': {'owner': {'videoOwnerRenderer': {
+                'title': {'runs': [{'text': 'Channel'}]}, 'badges': [{'metadataBadgeRenderer': {'style': 'BADGE_STYLE_TYPE_VERIFIED'}}],
+            }}}},
+        ]}}}},
+        'frameworkUpdates': {'entityBatchUpdate': {'mutations': [
+            {'payload': {'other': {}}},
+            {'payload': {'macroMarkersListEntity': {'markersList': {'markerType': 'MARKER_TYPE_HEATMAP', 'markers': [{
+                'startMillis': str(i * 2120), 'durationMillis': '2120', 'intensityScoreNormalized': i / markers,
+            } for i in range(markers)]}}}},
+        ]}},
+    }
+    return player_response, initial_data
+
+
+# Paths used by the YouTube extractor
+PATHS = {
+    'plain keys': (0, ('playabilityStatus', 'status'), {}),
+    'expected_type': (0, ('videoDetails', 'videoId'), {'expected_type': str}),
+    'deep renderer': (1, (
+        'contents', 'twoColumnWatchNextResults', 'results', 'results', 'contents', 0,
+        'videoPrimaryInfoRenderer', 'title', 'runs', 0, 'text'), {}),
+    'branching': (0, ('streamingData', 'adaptiveFormats', ..., 'url'), {}),
+    'filter': (0, ('streamingData', 'adaptiveFormats', lambda _, v: v['height'] >= 720, 'itag'), {}),
+    'like count': (1, (
+        'contents', 'twoColumnWatchNextResults', 'results', 'results', 'contents', 0, 'videoPrimaryInfoRenderer',
+        'videoActions', 'menuRenderer', 'topLevelButtons', ...,
+        'segmentedLikeDislikeButtonViewModel', 'likeButtonViewModel', 'likeButtonViewModel',
+        'toggleButtonViewModel', 'toggleButtonViewModel', 'defaultButtonViewModel',
+        'buttonViewModel', 'accessibilityText', {parse_count}), {'get_all': False}),
+    'heatmap': (1, (
+        'frameworkUpdates', 'entityBatchUpdate', 'mutations',
+        lambda _, v: v['payload']['macroMarkersListEntity']['markersList']['markerType'] == 'MARKER_TYPE_HEATMAP',
+        'payload', 'macroMarkersListEntity', 'markersList', 'markers', ..., {
+            'start_time': ('startMillis', {functools.partial(float_or_none, scale=1000)}),
+            'end_time': {lambda x: (int(x['startMillis']) + int(x['durationMillis'])) / 1000},
+            'value': ('intensityScoreNormalized', {float_or_none}),
+        }), {}),
+    'casesense': (0, ('MICROFORMAT', 'playerMicroformatRenderer', 'UPLOADDATE'), {'casesense': False}),
+    'missing key': (0, ('videoDetails', 'thumbnail', 'thumbnails', -1, 'url'), {}),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure traverse_obj on paths used by the YouTube extractor')
+    parser.add_argument('--calls', type=int, default=100000, help='number of calls per path (default: %(default)s)')
+    args = parser.parse_args()
+
+    objs = generate_watch_page()
+    total_warm = total_cold = 0
+    for name, (obj_index, path, kwargs) in PATHS.items():
+        obj = objs[obj_index]
+        # Without the cache, each call compiles the path again
+        timings = {}
+        for mode in ('warm', 'cold'):
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                if mode == 'cold':
+                    traversal._compile_hashable_path.cache_clear()
+                traverse_obj(obj, path, **kwargs)
+            timings[mode] = time.perf_counter() - start
+        total_warm += timings['warm']
+        total_cold += timings['cold']
+        print(f'{name:<16} {timings["warm"] / args.calls * 1e6:8.2f}us per call '
+              f'({timings["cold"] / args.calls * 1e6:8.2f}us with the path cache cleared)')
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        get_first(objs, ('videoDetails', 'title'))
+    print(f'{"get_first":<16} {(time.perf_counter() - start) / args.calls * 1e6:8.2f}us per call')
+    print(f'{"total":<16} {total_warm:8.2f}s ({total_cold:8.2f}s with the path cache cleared)')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,17 @@
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import gzip
 import http.server
+import tempfile
 import threading
 
 from test.helper import FakeYDL, expect_dict, expect_value, http_server_port
 from yt_dlp.compat import compat_etree_fromstring
 from yt_dlp.extractor import YoutubeIE, get_info_extractor
 from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.networking import Request
+from yt_dlp.networking.impersonate import ImpersonateTarget
 from yt_dlp.utils import (
     ExtractorError,
     RegexNotFoundError,
@@ -24,18 +28,53 @@
 
 TEAPOT_RESPONSE_STATUS = 418
 TEAPOT_RESPONSE_BODY = "<h1>418 I'm a teapot</h1>"
+CACHED_RESPONSE_BODY = '<h1>cached</h1>'
 
 
 class InfoExtractorTestRequestHandler(http.server.BaseHTTPRequestHandler):
+    requests = []
+
     def log_message(self, format, *args):
         pass
 
     def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
         if self.path == '/teapot':
             self.send_response(TEAPOT_RESPONSE_STATUS)
             self.send_header('Content-Type', 'text/html; charset=utf-8')
             self.end_headers()
             self.wfile.write(TEAPOT_RESPONSE_BODY.encode())
+        elif self.path == '/cache/gzip':
+            body = gzip.compress(CACHED_RESPONSE_BODY.encode())
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Cache-Control', 'max-age=3600')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/cache/aged':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            # Stored by another cache for the whole max-age already
+            self.send_header('Cache-Control', 'max-age=3600')
+            self.send_header('Age', '3600')
+            self.send_header('Content-Length', str(len(CACHED_RESPONSE_BODY)))
+            self.end_headers()
+            self.wfile.write(CACHED_RESPONSE_BODY.encode())
+        elif self.path in ('/cache/fresh', '/cache/stale'):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Cache-Control', 'max-age=3600' if self.path == '/cache/fresh' else 'no-cache')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(CACHED_RESPONSE_BODY)))
+            self.end_headers()
+            self.wfile.write(CACHED_RESPONSE_BODY.encode())
         else:
             assert False
 
@@ -618,6 +657,11 @@ def test_extract_jwplayer_data_realworld(self):
                 }],
             })
 
+    def test_parse_m3u8_vod_duration(self):
+        self.assertEqual(self.ie._parse_m3u8_vod_duration(
+            '#EXTM3U\n#EXTINF:10,\na.ts\n#EXTINF:5.5,\nb.ts\n#EXT-X-ENDLIST', 'id'), 15)
+        self.assertIsNone(self.ie._parse_m3u8_vod_duration('#EXTM3U\n#EXTINF:10,\na.ts', 'id'))
+
     def test_parse_m3u8_formats(self):
         _TEST_CASES = [
             (
@@ -1906,6 +1950,80 @@ def test_response_with_expected_status_returns_content(self):
             expected_status=TEAPOT_RESPONSE_STATUS)
         self.assertEqual(content, TEAPOT_RESPONSE_BODY)
 
+    def test_download_webpage_http_cache(self):
+        httpd = http.server.HTTPServer(
+            ('127.0.0.1', 0), InfoExtractorTestRequestHandler)
+        port = http_server_port(httpd)
+        server_thread = threading.Thread(target=httpd.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+
+        with tempfile.TemporaryDirectory() as cachedir:
+            ie = DummyIE(FakeYDL({'cachedir': cachedir, 'http_cache': True}))
+            requests = InfoExtractorTestRequestHandler.requests
+            requests.clear()
+
+            for _ in range(2):
+                content, urlh = ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None)
+                self.assertEqual(content, CACHED_RESPONSE_BODY)
+            self.assertEqual(requests, [('/cache/fresh', None)])
+            self.assertTrue(urlh.extensions.get('http_cache'))
+
+            requests.clear()
+            for _ in range(2):
+                content, urlh = ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/stale', None)
+                self.assertEqual(content, CACHED_RESPONSE_BODY)
+            self.assertEqual(requests, [('/cache/stale', None), ('/cache/stale', '"v1"')])
+            self.assertEqual(urlh.status, 200)
+
+            requests.clear()
+            ie._get_http_cache_max_age = lambda url: 3600
+            content, _ = ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/stale', None)
+            self.assertEqual(content, CACHED_RESPONSE_BODY)
+            self.assertEqual(requests, [])
+            ie._get_http_cache_max_age = lambda url: False
+            content, _ = ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None)
+            self.assertEqual(content, CACHED_RESPONSE_BODY)
+            self.assertEqual(requests, [('/cache/fresh', None)])
+            del ie._get_http_cache_max_age
+
+            # The cached body is decoded already
+            requests.clear()
+            for _ in range(2):
+                content, urlh = ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/gzip', None)
+                self.assertEqual(content, CACHED_RESPONSE_BODY)
+            self.assertEqual(requests, [('/cache/gzip', None)])
+            self.assertIsNone(urlh.headers.get('Content-Encoding'))
+
+            # Responses are not shared between different credentials
+            requests.clear()
+            ie._set_cookie('127.0.0.1', 'session', 'account1')
+            ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None)
+            ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None, headers={'Authorization': 'x'})
+            ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None, headers={'Authorization': 'x'})
+            self.assertEqual(requests, [('/cache/fresh', None)] * 2)
+
+            # nor between different headers or impersonate targets
+            requests.clear()
+            ie._downloader.params['http_headers'] = {**ie._downloader.params['http_headers'], 'Accept-Language': 'de'}
+            ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None)
+            ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/fresh', None)
+            self.assertEqual(requests, [('/cache/fresh', None)])
+            http_cache = ie._downloader.http_cache
+            request = Request(f'http://127.0.0.1:{port}/cache/fresh')
+            self.assertNotEqual(
+                http_cache._cache_key(request),
+                http_cache._cache_key(Request(request.url, extensions={'impersonate': ImpersonateTarget('chrome')})))
+            self.assertEqual(
+                http_cache._cache_key(request),
+                http_cache._cache_key(Request(request.url, headers={'If-None-Match': '"v1"'})))
+
+            # The age of the response counts against its max-age
+            requests.clear()
+            for _ in range(2):
+                ie._download_webpage_handle(f'http://127.0.0.1:{port}/cache/aged', None)
+            self.assertEqual(requests, [('/cache/aged', None)] * 2)
+
     def test_search_nextjs_data(self):
         data = '<script id="__NEXT_DATA__" type="application/json">{"props":{}}</script>'
         self.assertEqual(self.ie._search_nextjs_data(data, None), {'props': {}})
@@ -11,18 +11,27 @@
 
 import contextlib
 import copy
+import functools
+import io
 import json
+import tempfile
+import threading
+import time
 
 from test.helper import FakeYDL, assertRegexpMatches, try_rm
 from yt_dlp import YoutubeDL
 from yt_dlp.compat import compat_os_name
 from yt_dlp.extractor import YoutubeIE
 from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
 from yt_dlp.postprocessor.common import PostProcessor
 from yt_dlp.utils import (
+    DownloadError,
     ExtractorError,
     LazyList,
     OnDemandPagedList,
+    PostProcessingError,
     int_or_none,
     match_filter_func,
 )
@@ -966,6 +975,176 @@ def run(self, info):
         self.assertTrue(os.path.exists(filename), f'{filename} doesn\'t exist')
         os.unlink(filename)
 
+    def test_postprocessor_workers(self):
+        ydl = YoutubeDL({'postprocessor_workers': 2})
+        lock, running, max_running, finished = threading.Lock(), [0], [0], []
+
+        def postprocess(i):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05 * (3 - i % 3))
+            with lock:
+                running[0] -= 1
+            return i
+
+        for i in range(6):
+            ydl._postprocess(functools.partial(postprocess, i), lambda result: finished.append(result()))
+            ydl._after_postprocessing(functools.partial(finished.append, f'after {i}'))
+            self.assertLessEqual(len([f for f, _ in ydl._postprocessing_jobs if f]), 2)
+        ydl._finish_postprocessing()
+        ydl.close()
+
+        self.assertEqual(finished, [x for i in range(6) for x in (i, f'after {i}')])
+        self.assertEqual(max_running[0], 2)
+
+    def test_postprocessor_workers_drained(self):
+        finished = []
+
+        def postprocess(i):
+            time.sleep(0.05)
+            return i
+
+        ydl = YoutubeDL({'postprocessor_workers': 2})
+        for i in range(3):
+            ydl._postprocess(functools.partial(postprocess, i), lambda result: finished.append(result()))
+        ydl.close()
+        self.assertEqual(finished, [0, 1, 2])
+
+        class PostprocessingYDL(YDL):
+            def process_info(self, info_dict):
+                self._postprocess(
+                    functools.partial(postprocess, info_dict['id']), lambda result: finished.append(result()))
+
+        class FooIE(InfoExtractor):
+            _VALID_URL = r'foo:'
+
+            def _real_extract(self, url):
+                return self.url_result('bar:', BarIE)
+
+        class BarIE(InfoExtractor):
+            _VALID_URL = r'bar:'
+
+            def _real_extract(self, url):
+                return _make_result([{'url': TEST_URL}], id='bar')
+
+        finished.clear()
+        ydl = PostprocessingYDL({'postprocessor_workers': 2})
+        ydl.add_info_extractor(FooIE(ydl))
+        ydl.add_info_extractor(BarIE(ydl))
+        ydl.extract_info('foo:')
+        self.assertEqual(finished, ['bar'])
+        ydl.close()
+
+    def test_postprocessor_workers_close(self):
+        closed = []
+
+        class ClosingPP(PostProcessor):
+            def close(self):
+                closed.append(self)
+
+        def fail():
+            raise DownloadError('failed')
+
+        ydl = YoutubeDL({'postprocessor_workers': 2})
+        pps = [ClosingPP(), ClosingPP()]
+        for pp in pps:
+            ydl.add_post_processor(pp)
+        self.assertIsNotNone(ydl._request_director)
+        ydl._postprocess(fail, lambda result: result())
+        self.assertRaises(DownloadError, ydl.close)
+        self.assertEqual(closed, pps)
+        self.assertNotIn('_postprocessor_executor', ydl.__dict__)
+        self.assertNotIn('_request_director', ydl.__dict__)
+
+    def test_postprocessor_workers_error(self):
+        class FailingPP(PostProcessor):
+            def run(self, info):
+                raise PostProcessingError('failed')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.mp4')
+            open(filename, 'wb').close()
+            ydl = YoutubeDL({'postprocessor_workers': 2, 'quiet': True, 'outtmpl': filename})
+            ydl.add_post_processor(FailingPP())
+            ydl.process_info({
+                'id': 'first', 'title': 'first', 'url': TEST_URL, 'ext': 'mp4', 'extractor': 'test',
+                'webpage_url': 'http://example.com/first'})
+            with self.assertRaisesRegex(DownloadError, r'\[first\] Postprocessing: failed'):
+                ydl._finish_postprocessing()
+            ydl.close()
+
+    def test_playlist_prefetch(self):
+        prefetched = []
+
+        class PrefetchPP(PostProcessor):
+            def prefetch(self, entries):
+                prefetched.append([entry['id'] for entry in entries])
+
+        ydl = YDL()
+        ydl.add_post_processor(PrefetchPP(), when='after_filter')
+        ydl.process_ie_result({
+            '_type': 'playlist',
+            'id': 'test',
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+            'entries': [{'id': str(i), 'title': str(i), 'url': TEST_URL} for i in range(3)],
+        })
+        self.assertEqual(prefetched, [['0', '1', '2']])
+        self.assertEqual(len(ydl.downloaded_info_dicts), 3)
+
+    def test_write_thumbnails(self):
+        class FakeResponse(io.BytesIO):
+            def __init__(self, data, delay=0):
+                super().__init__(data)
+                self.delay = delay
+
+            def read(self, *args):
+                time.sleep(self.delay)
+                return super().read(*args)
+
+        barrier = threading.Barrier(3, timeout=10)
+
+        timeouts = []
+
+        def urlopen(req):
+            timeouts.append(req.extensions.get('timeout'))
+            if req.url.endswith('/slow.jpg'):
+                return FakeResponse(b'slow', delay=0.5)
+            elif req.url.endswith('/missing.jpg'):
+                raise HTTPError(Response(io.BytesIO(), req.url, {}, 404))
+            barrier.wait()  # All thumbnails are downloaded at the same time
+            return FakeResponse(req.url.encode())
+
+        def info_dict():
+            return {
+                'id': 'test',
+                'thumbnails': [{'id': str(i), 'url': f'http://example.com/{i}.jpg'} for i in range(3)],
+            }
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.mp4')
+            ydl = YDL({'write_all_thumbnails': True})
+            ydl.urlopen = urlopen
+            info = info_dict()
+            info['thumbnails'].insert(1, {'id': 'missing', 'url': 'http://example.com/missing.jpg'})
+            self.assertEqual(ydl._write_thumbnails('video', info, filename), [
+                (os.path.join(tmpdir, f'test.{i}.jpg'),) * 2 for i in (2, 1, 0)])
+            self.assertEqual([t['id'] for t in info['thumbnails']], ['0', '1', '2'])
+            with open(os.path.join(tmpdir, 'test.1.jpg'), 'rb') as f:
+                self.assertEqual(f.read(), b'http://example.com/1.jpg')
+            self.assertEqual(timeouts, [None] * 4)
+
+            ydl = YDL({'write_all_thumbnails': True, 'thumbnail_timeout': 0.2})
+            ydl.urlopen = urlopen
+            info = info_dict()
+            info['thumbnails'] = [{'id': 'slow', 'url': 'http://example.com/slow.jpg'}]
+            self.assertEqual(ydl._write_thumbnails('video', info, filename), [])
+            self.assertEqual(info['thumbnails'], [])
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'test.jpg')))
+            self.assertTrue(0 < timeouts[-1] <= 0.2)
+
     def test_match_filter(self):
         first = {
             'id': '1',
@@ -8,8 +8,12 @@
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import http.cookiejar
+import random
 import re
 import tempfile
+import time
+import urllib.request
 
 from yt_dlp.cookies import YoutubeDLCookieJar
 
@@ -61,6 +65,54 @@ def test_get_cookies_for_url(self):
         cookies = cookiejar.get_cookies_for_url('https://foobar.foobar/')
         self.assertFalse(cookies)
 
+    @staticmethod
+    def _make_cookie(domain, name, path='/', secure=False, expires=None, port=None):
+        return http.cookiejar.Cookie(
+            0, name, f'{name}_VALUE', port, port is not None, domain, True, domain.startswith('.'),
+            path, True, secure, expires, expires is None, None, None, {})
+
+    def test_cookies_for_request_matches_cookiejar(self):
+        rng = random.Random(0)
+        hosts = ['example.com', 'www.example.com', 'a.b.example.com', 'example.org', 'localhost', '127.0.0.1']
+        now = int(time.time())
+        cookiejar, reference = YoutubeDLCookieJar(), http.cookiejar.MozillaCookieJar()
+        for idx in range(500):
+            cookie = self._make_cookie(
+                rng.choice(['', '.']) + rng.choice([*hosts, 'b.example.com', 'com', 'other.net']),
+                f'cookie{idx}', path=rng.choice(['/', '/a', '/a/b', '/b']), secure=rng.random() < 0.2,
+                expires=rng.choice([None, now - 10, now + 3600]), port=rng.choice([None, None, '8080']))
+            cookiejar.set_cookie(cookie)
+            reference.set_cookie(cookie)
+
+        for _ in range(200):
+            url = '{}://{}{}{}'.format(
+                rng.choice(['http', 'https']), rng.choice(hosts), rng.choice(['', ':8080']),
+                rng.choice(['/', '/a', '/a/b/c', '/b?a=/a', '/c']))
+            # Check twice, as the second result is cached
+            for _ in range(2):
+                request, reference_request = urllib.request.Request(url), urllib.request.Request(url)
+                cookiejar.add_cookie_header(request)
+                reference.add_cookie_header(reference_request)
+                self.assertEqual(request.get_header('Cookie'), reference_request.get_header('Cookie'), url)
+
+    def test_cookies_for_request_cache(self):
+        cookiejar = YoutubeDLCookieJar()
+        cookiejar.set_cookie(self._make_cookie('.example.com', 'a'))
+        self.assertEqual(cookiejar.get_cookie_header('https://www.example.com/'), 'a=a_VALUE')
+
+        # Changes to the jar invalidate cached cookies
+        cookiejar.set_cookie(self._make_cookie('www.example.com', 'b', expires=int(time.time()) + 1))
+        self.assertEqual(cookiejar.get_cookie_header('https://www.example.com/'), 'a=a_VALUE; b=b_VALUE')
+        cookiejar.clear('.example.com')
+        self.assertEqual(cookiejar.get_cookie_header('https://www.example.com/'), 'b=b_VALUE')
+
+        self.assertEqual(cookiejar.get_cookies_for_url('url:'), [])
+
+        # So does the expiry of a cached cookie
+        time.sleep(1.5)
+        self.assertIsNone(cookiejar.get_cookie_header('https://www.example.com/'))
+        self.assertFalse(cookiejar._cookies['www.example.com']['/'])
+
 
 if __name__ == '__main__':
     unittest.main()
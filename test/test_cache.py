@@ -48,10 +48,30 @@ def test_cache(self):
         self.assertEqual(c.load('test_cache', 'k.'), obj)
         self.assertEqual(c.load('test_cache', 'y'), None)
         self.assertEqual(c.load('test_cache2', 'k.'), None)
+        c.store('test_cache', 'k.', b'\x00binary', dtype='bin')
+        self.assertEqual(c.load('test_cache', 'k.', dtype='bin'), b'\x00binary')
+        self.assertEqual(c.load('test_cache', 'k.'), obj)
+        c.prune('test_cache', 0)
+        self.assertEqual(c.load('test_cache', 'k.'), None)
         c.remove()
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_prune(self):
+        c = Cache(FakeYDL({'cachedir': self.test_dir}))
+        for key in ('a', 'b'):
+            c.store('test_cache', key, b'\x00' * 100, dtype='bin')
+            c.store('test_cache', key, key)
+        # 'a' was stored first but used last
+        for key, mtime in (('a', 1000), ('b', 2000)):
+            for dtype in ('bin', 'json'):
+                os.utime(c._get_cache_fn('test_cache', key, dtype), (mtime, mtime))
+        self.assertEqual(c.load('test_cache', 'a'), 'a')
+
+        section_dir = os.path.join(self.test_dir, 'test_cache')
+        c.prune('test_cache', sum(os.path.getsize(os.path.join(section_dir, f)) for f in os.listdir(section_dir)) - 1)
+        self.assertEqual(sorted(os.listdir(section_dir)), ['a.bin', 'a.json'])
+
 
 if __name__ == '__main__':
     unittest.main()
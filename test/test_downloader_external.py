@@ -18,6 +18,7 @@
     HttpieFD,
     WgetFD,
 )
+from yt_dlp.utils.progress import BandwidthLimiter
 
 TEST_COOKIE = {
     'version': 0,
@@ -91,6 +92,26 @@ def test_make_cmd(self):
             self.assertIn('--cookie', downloader._make_cmd('test', TEST_INFO))
             self.assertIn('test=ytdlp', downloader._make_cmd('test', TEST_INFO))
 
+    def test_rate_limit(self):
+        def rate_limit(downloader):
+            cmd = downloader._make_cmd('test', TEST_INFO)
+            return cmd[cmd.index('--limit-rate') + 1]
+
+        audio_info = {**TEST_INFO, 'vcodec': 'none', 'acodec': 'opus'}
+        with FakeYDL() as ydl:
+            downloader = CurlFD(ydl, {'ratelimit': 3000})
+            self.assertEqual(rate_limit(downloader), '3000')
+
+            # The downloader is given its fair share of the rate limit
+            with BandwidthLimiter.get(3000).share().hold():
+                downloader._bandwidth_share = downloader._make_bandwidth_share(audio_info)
+                self.assertEqual(rate_limit(downloader), '1500')
+
+                downloader = CurlFD(ydl, {'ratelimit': 3000, 'prioritize_audio_rate': True})
+                downloader._bandwidth_share = downloader._make_bandwidth_share(audio_info)
+                self.assertEqual(rate_limit(downloader), '2000')
+                self.assertEqual(downloader.params['ratelimit'], 3000)
+
 
 class TestAria2cFD(unittest.TestCase):
     def test_make_cmd(self):
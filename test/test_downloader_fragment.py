@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import collections
+import concurrent.futures
+import http.server
+import random
+import threading
+import time
+
+from test.helper import http_server_port, try_rm
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.fragment import _map_bounded
+from yt_dlp.networking._asyncio import AsyncioRH
+from yt_dlp.utils._utils import _YDLLogger as FakeLogger
+
+FRAGMENT_COUNT = 20
+
+
+class HTTPTestRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = collections.Counter()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.requests[self.path] += 1
+        index = int(self.path.rpartition('/')[2])
+        # The first request for fragment 3 fails, to be retried by the regular downloader
+        if self.path.startswith('/flaky/') and index == 3 and self.requests[self.path] == 1:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content = f'{index:04d}'.encode() * 256
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestMapBounded(unittest.TestCase):
+    def test_order(self):
+        def func(item):
+            time.sleep(random.random() / 100)
+            return item * 2
+
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            self.assertEqual(list(_map_bounded(pool, func, range(20), 8)), [i * 2 for i in range(20)])
+            self.assertEqual(list(_map_bounded(pool, func, [], 8)), [])
+
+    def test_bounded(self):
+        consumed = []
+
+        def items():
+            for item in range(20):
+                consumed.append(item)
+                yield item
+
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            for idx, result in enumerate(_map_bounded(pool, lambda item: item, items(), 3)):
+                self.assertEqual(result, idx)
+                # The iterable is only advanced as results are taken
+                self.assertLessEqual(len(consumed) - idx, 3)
+        self.assertEqual(len(consumed), 20)
+
+    def test_error(self):
+        started = []
+
+        def func(item):
+            started.append(item)
+            if item == 1:
+                raise ValueError(item)
+            return item
+
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            results = _map_bounded(pool, func, range(20), 4)
+            self.assertEqual(next(results), 0)
+            self.assertRaises(ValueError, next, results)
+        # The calls after the bound were never submitted
+        self.assertLessEqual(max(started), 4)
+
+
+class TestFragmentDownload(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), HTTPTestRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.server_thread.start()
+        HTTPTestRequestHandler.requests.clear()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def download(self, path, params):
+        params = {'logger': FakeLogger(), 'noprogress': True, **params}
+        filename = 'testfile.mp4'
+        try_rm(filename)
+        with YoutubeDL(params) as ydl:
+            downloader = DashSegmentsFD(ydl, params)
+            self.assertTrue(downloader.real_download(filename, {
+                'protocol': 'http_dash_segments',
+                'fragments': [
+                    {'url': f'http://127.0.0.1:{self.port}/{path}/{i}'} for i in range(1, FRAGMENT_COUNT + 1)],
+            }))
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(f'{i:04d}'.encode() * 256 for i in range(1, FRAGMENT_COUNT + 1)))
+        try_rm(filename)
+
+    def _count_asend(self):
+        calls = []
+        asend = AsyncioRH.asend
+
+        async def counting_asend(rh, request):
+            calls.append(request.url)
+            return await asend(rh, request)
+
+        AsyncioRH.asend = counting_asend
+        self.addCleanup(setattr, AsyncioRH, 'asend', asend)
+        return calls
+
+    def test_event_loop(self):
+        calls = self._count_asend()
+        self.download('fragments', {'concurrent_fragment_downloads': 4})
+        self.assertEqual(len(calls), FRAGMENT_COUNT)
+        self.assertEqual(sum(HTTPTestRequestHandler.requests.values()), FRAGMENT_COUNT)
+
+    def test_fallback(self):
+        calls = self._count_asend()
+        self.download('flaky', {'concurrent_fragment_downloads': 4, 'fragment_retries': 1})
+        self.assertEqual(len(calls), FRAGMENT_COUNT)
+        # The failed fragment was downloaded again by the regular downloader
+        self.assertEqual(HTTPTestRequestHandler.requests['/flaky/3'], 2)
+
+    def test_threads(self):
+        calls = self._count_asend()
+        # Only the regular downloader implements the rate limit
+        self.download('fragments', {'concurrent_fragment_downloads': 4, 'ratelimit': 10 ** 9})
+        self.download('fragments', {'concurrent_fragment_downloads': 1})
+        self.assertEqual(calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,7 @@
 import http.server
 import re
 import threading
+import time
 
 from test.helper import http_server_port, try_rm
 from yt_dlp import YoutubeDL
@@ -101,6 +102,26 @@ def test_chunked(self):
             'http_chunk_size': 1000,
         })
 
+    def test_slow_down(self):
+        params = {'ratelimit': 100_000, 'logger': FakeLogger()}
+        downloader = HttpFD(YoutubeDL(params), params)
+        start = time.time()
+        downloader.slow_down(start, None, 50_000)
+        # Only the bytes downloaded since the previous call count
+        downloader.slow_down(start, None, 50_000)
+        downloader.slow_down(start, None, 60_000)
+        self.assertAlmostEqual(time.time() - start, 0.6, delta=0.2)
+
+        # The rate limit is shared with the other downloads
+        downloaders = [HttpFD(YoutubeDL(params), params) for _ in range(2)]
+        start = time.time()
+        threads = [threading.Thread(target=d.slow_down, args=(start, None, 50_000)) for d in downloaders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreater(time.time() - start, 0.8)
+
 
 if __name__ == '__main__':
     unittest.main()
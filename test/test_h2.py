@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import functools
+import gzip
+import http.server
+import select
+import socket
+import ssl
+import threading
+import time
+
+from test.helper import http_server_port, validate_and_send
+from yt_dlp.cookies import YoutubeDLCookieJar
+from yt_dlp.dependencies import h2
+from yt_dlp.networking import Request, RequestDirector, RequestHandler
+from yt_dlp.networking._urllib import UrllibRH
+from yt_dlp.networking.exceptions import (
+    HTTPError,
+    IncompleteRead,
+    RequestError,
+    TransportError,
+    UnsupportedRequest,
+)
+from yt_dlp.utils._utils import _YDLLogger as FakeLogger
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+if h2:
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    from yt_dlp.networking._h2 import h2_preference
+
+
+class H2TestServer:
+    """A HTTP/2 server that answers each stream in its own thread"""
+
+    def __init__(self):
+        self._sslctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self._sslctx.load_cert_chain(os.path.join(TEST_DIR, 'testcert.pem'), None)
+        self._sslctx.set_alpn_protocols(['h2'])
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.port = self._server.getsockname()[1]
+        self.connections = 0
+        self.active_streams = self.max_active_streams = 0
+        self.insecure_redirects = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            sock, _ = self._server.accept()
+            threading.Thread(target=self._handle_connection, args=(sock,), daemon=True).start()
+
+    def _handle_connection(self, sock):
+        try:
+            sock = self._sslctx.wrap_socket(sock, server_side=True)
+        except (OSError, ssl.SSLError):
+            return
+        with self._lock:
+            self.connections += 1
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        cond = threading.Condition()
+        requests = {}
+
+        # The SSL socket may not be read from and written to concurrently, so it is only used with cond held
+        def flush():
+            data = memoryview(conn.data_to_send())
+            while data:
+                try:
+                    data = data[sock.send(data):]
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                    select.select([], [sock], [], 1)
+
+        def receive():
+            try:
+                data = sock.recv(65536)
+                while data and sock.pending():
+                    data += sock.recv(sock.pending())
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return True
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    requests[event.stream_id] = dict(event.headers)
+                elif isinstance(event, h2.events.StreamEnded):
+                    threading.Thread(target=self._respond, daemon=True, args=(
+                        conn, cond, flush, event.stream_id, requests.pop(event.stream_id))).start()
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            cond.notify_all()
+            flush()
+            return bool(data)
+
+        sock.setblocking(False)
+        with cond:
+            conn.initiate_connection()
+            flush()
+        try:
+            while True:
+                select.select([sock], [], [])
+                with cond:
+                    if not receive():
+                        break
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+    def _respond(self, conn, cond, flush, stream_id, request):
+        path = request[':path']
+        status, headers, body = 200, [], b''
+        if path == '/headers':
+            body = '\n'.join(f'{k}: {v}' for k, v in request.items()).encode()
+        elif path == '/delay':
+            with self._lock:
+                self.active_streams += 1
+                self.max_active_streams = max(self.active_streams, self.max_active_streams)
+            time.sleep(0.5)
+            with self._lock:
+                self.active_streams -= 1
+            body = b'delayed'
+        elif path == '/large':
+            body = bytes(range(256)) * 16 * 1024
+        elif path == '/gzip':
+            body = gzip.compress(b'<html><video src="/vid.mp4" /></html>')
+            headers.append(('content-encoding', 'gzip'))
+        elif path == '/incomplete':
+            body = b'short'
+            headers.append(('content-length', '10'))
+        elif path == '/redirect':
+            status = 302
+            headers.extend([('location', '/headers'), ('set-cookie', 'test=ytdlp; path=/')])
+        elif path == '/redirect-http':
+            with self._lock:
+                self.insecure_redirects += 1
+            status = 302
+            headers.append(('location', f'http://127.0.0.1:{self.port}/headers'))
+        else:
+            status = 404
+        with cond:
+            conn.send_headers(stream_id, [(':status', str(status)), *headers], end_stream=not body)
+            flush()
+            while body:
+                cond.wait_for(lambda: conn.local_flow_control_window(stream_id) > 0)
+                size = min(len(body), conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                conn.send_data(stream_id, body[:size], end_stream=size == len(body))
+                flush()
+                body = body[size:]
+
+
+@pytest.mark.skipif(not h2, reason='h2 must be installed to test the h2 request handler')
+@pytest.mark.parametrize('handler', ['H2'], indirect=True)
+class TestH2RequestHandler:
+    @classmethod
+    def setup_class(cls):
+        cls.server = H2TestServer()
+        cls.url = f'https://127.0.0.1:{cls.server.port}'
+
+    def test_get(self, handler):
+        with handler(verify=False, headers={'User-Agent': 'test-agent'}) as rh:
+            res = validate_and_send(rh, Request(f'{self.url}/headers', headers={'Connection': 'keep-alive'}))
+            assert res.status == 200
+            assert res.reason == 'OK'
+            body = res.read().decode()
+            assert 'user-agent: test-agent' in body
+            assert f':authority: 127.0.0.1:{self.server.port}' in body
+            assert 'connection' not in body
+            assert res.extensions['trace']['reused_connection'] is False
+
+            res = validate_and_send(rh, Request(f'{self.url}/headers'))
+            res.read()
+            assert res.extensions['trace']['reused_connection'] is True
+
+    def test_multiplexing(self, handler):
+        connections = self.server.connections
+        results = []
+        with handler(verify=False) as rh:
+            def fetch():
+                results.append(validate_and_send(rh, Request(f'{self.url}/delay')).read())
+
+            threads = [threading.Thread(target=fetch) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == [b'delayed'] * 10
+        assert self.server.connections - connections <= rh.MAX_CONNECTIONS_PER_ORIGIN
+        assert self.server.max_active_streams > rh.MAX_CONNECTIONS_PER_ORIGIN
+
+    def test_flow_control(self, handler):
+        # The body is larger than the initial stream window
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.url}/large'))
+            data = bytearray()
+            buffer = bytearray(100_000)
+            while size := res.readinto(buffer):
+                data += buffer[:size]
+            assert data == bytes(range(256)) * 16 * 1024
+
+    def test_gzip(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.url}/gzip'))
+            assert res.headers.get('Content-Encoding') == 'gzip'
+            assert res.read() == b'<html><video src="/vid.mp4" /></html>'
+
+    def test_incomplete_read(self, handler):
+        with handler(verify=False) as rh:
+            res = validate_and_send(rh, Request(f'{self.url}/incomplete'))
+            with pytest.raises(IncompleteRead):
+                res.read()
+
+    def test_redirect_and_cookies(self, handler):
+        cookiejar = YoutubeDLCookieJar()
+        with handler(verify=False, cookiejar=cookiejar) as rh:
+            res = validate_and_send(rh, Request(f'{self.url}/redirect'))
+            assert res.url == f'{self.url}/headers'
+            assert res.extensions['trace']['redirects'] == 1
+            assert 'cookie: test=ytdlp' in res.read().decode()
+        assert cookiejar.get_cookie_header(self.url) == 'test=ytdlp'
+
+    def test_unsupported_redirect(self, handler):
+        sent = []
+
+        class RecordingRH(RequestHandler):
+            _SUPPORTED_URL_SCHEMES = ('https',)
+
+            def _send(self, request):
+                sent.append(request.url)
+                raise TransportError('not sent')
+
+        director = RequestDirector(logger=FakeLogger())
+        director.add_handler(RecordingRH(logger=FakeLogger()))
+        director.add_handler(handler(verify=False))
+        director.preferences.add(h2_preference)
+        try:
+            # The request must not be sent again by another handler
+            with pytest.raises(RequestError) as exc_info:
+                director.send(Request(f'{self.url}/redirect-http', extensions={'fragment': True}))
+            assert not isinstance(exc_info.value, UnsupportedRequest)
+            assert self.server.insecure_redirects == 1
+            assert sent == []
+        finally:
+            director.close()
+
+    def test_http_error(self, handler):
+        with handler(verify=False) as rh:
+            with pytest.raises(HTTPError) as exc_info:
+                validate_and_send(rh, Request(f'{self.url}/missing'))
+            assert exc_info.value.status == 404
+            exc_info.value.response.close()
+
+    def test_http1_origins_bounded(self, handler):
+        with handler() as rh:
+            rh.MAX_HTTP1_ORIGINS = 2
+            for port in range(3):
+                rh._add_http1_origin(('127.0.0.1', port))
+            assert list(rh._http1_origins) == [('127.0.0.1', 1), ('127.0.0.1', 2)]
+            assert rh._is_http1_origin(('127.0.0.1', 2))
+            assert not rh._is_http1_origin(('127.0.0.1', 0))
+
+    def test_http1_fallback(self, handler):
+        httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), functools.partial(http.server.SimpleHTTPRequestHandler, directory=TEST_DIR))
+        sslctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        sslctx.load_cert_chain(os.path.join(TEST_DIR, 'testcert.pem'), None)
+        httpd.socket = sslctx.wrap_socket(httpd.socket, server_side=True)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f'https://127.0.0.1:{http_server_port(httpd)}/testdata/certificate/instructions.md'
+
+        director = RequestDirector(logger=FakeLogger())
+        director.add_handler(UrllibRH(logger=FakeLogger(), verify=False))
+        director.add_handler(handler(verify=False))
+        director.preferences.add(h2_preference)
+        try:
+            request = Request(url, extensions={'fragment': True})
+            assert director._get_handlers(request)[0].RH_KEY == 'H2'
+            assert director._get_handlers(Request(url))[-1].RH_KEY == 'H2'
+
+            res = director.send(request)
+            assert res.status == 200
+            res.close()
+            # The host is known not to support HTTP/2 now
+            rh = director.handlers['H2']
+            with pytest.raises(UnsupportedRequest):
+                rh.validate(request)
+
+            # until it is tried again after HTTP1_ORIGIN_TTL
+            origin = rh._get_origin(url)
+            rh._http1_origins[origin] -= rh.HTTP1_ORIGIN_TTL
+            rh.validate(request)
+            assert origin not in rh._http1_origins
+        finally:
+            director.close()
+            httpd.shutdown()
@@ -246,7 +246,7 @@ def ctx(request):
 
 
 @pytest.mark.parametrize(
-    'handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+    'handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 @pytest.mark.parametrize('ctx', ['http'], indirect=True)  # pure http proxy can only support http
 class TestHTTPProxy:
     def test_http_no_auth(self, handler, ctx):
@@ -283,6 +283,7 @@ def test_http_source_address(self, handler, ctx):
                 assert proxy_info['client_address'][0] == source_address
 
     @pytest.mark.skip_handler('Urllib', 'urllib does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio does not support https proxies')
     def test_https(self, handler, ctx):
         with ctx.http_server(HTTPSProxyHandler) as server_address:
             with handler(verify=False, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -292,6 +293,7 @@ def test_https(self, handler, ctx):
                 assert 'Proxy-Authorization' not in proxy_info['headers']
 
     @pytest.mark.skip_handler('Urllib', 'urllib does not support https proxies')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio does not support https proxies')
     def test_https_verify_failed(self, handler, ctx):
         with ctx.http_server(HTTPSProxyHandler) as server_address:
             with handler(verify=True, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -314,6 +316,7 @@ def test_http_with_idn(self, handler, ctx):
     'handler,ctx', [
         ('Requests', 'https'),
         ('CurlCFFI', 'https'),
+        ('Asyncio', 'https'),
     ], indirect=True)
 class TestHTTPConnectProxy:
     def test_http_connect_no_auth(self, handler, ctx):
@@ -353,6 +356,7 @@ def test_http_connect_source_address(self, handler, ctx):
                 assert proxy_info['client_address'][0] == source_address
 
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio does not support https proxies')
     def test_https_connect_proxy(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler) as server_address:
             with handler(verify=False, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -362,6 +366,7 @@ def test_https_connect_proxy(self, handler, ctx):
                 assert 'Proxy-Authorization' not in proxy_info['headers']
 
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio does not support https proxies')
     def test_https_connect_verify_failed(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler) as server_address:
             with handler(verify=True, proxies={ctx.REQUEST_PROTO: f'https://{server_address}'}) as rh:
@@ -372,6 +377,7 @@ def test_https_connect_verify_failed(self, handler, ctx):
                     ctx.proxy_info_request(rh)
 
     @pytest.mark.skipif(urllib3 is None, reason='requires urllib3 to test')
+    @pytest.mark.skip_handler('Asyncio', 'asyncio does not support https proxies')
     def test_https_connect_proxy_auth(self, handler, ctx):
         with ctx.http_server(HTTPSConnectProxyHandler, username='test', password='test') as server_address:
             with handler(verify=False, proxies={ctx.REQUEST_PROTO: f'https://test:test@{server_address}'}) as rh:
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import random
+
+from yt_dlp.m3u8 import parse_playlist
+
+
+class TestM3U8(unittest.TestCase):
+    def test_master_playlist(self):
+        playlist = parse_playlist('''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+low/index.m3u8
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",LANGUAGE="en",URI="audio/en.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,AUDIO="aac"
+
+  high/index.m3u8
+#EXT-X-SESSION-KEY:METHOD=AES-128,URI="key"
+''')
+        self.assertFalse(playlist.is_media_playlist)
+        self.assertEqual(playlist.variants, [
+            ({'BANDWIDTH': '1280000', 'RESOLUTION': '640x360', 'CODECS': 'avc1.4d401e,mp4a.40.2'}, 'low/index.m3u8'),
+            ({'BANDWIDTH': '2560000', 'AUDIO': 'aac'}, 'high/index.m3u8'),
+        ])
+        self.assertEqual(playlist.media, [
+            {'TYPE': 'AUDIO', 'GROUP-ID': 'aac', 'NAME': 'English', 'LANGUAGE': 'en', 'URI': 'audio/en.m3u8'}])
+        self.assertEqual(playlist.session_keys, [{'METHOD': 'AES-128', 'URI': 'key'}])
+        self.assertEqual(playlist.segments, [])
+
+    def test_media_playlist(self):
+        playlist = parse_playlist('''#EXTM3U
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:5
+#EXT-X-DISCONTINUITY-SEQUENCE:2
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-MAP:URI="init.mp4",BYTERANGE="100@0"
+#EXT-X-KEY:METHOD=AES-128,URI="key1",IV=0x1
+#EXTINF:9.5,first
+#EXT-X-BYTERANGE:1000@100
+media.mp4
+#EXTINF:10,
+#EXT-X-BYTERANGE:500
+media.mp4
+#EXT-X-DISCONTINUITY
+#EXT-X-KEY:METHOD=NONE
+#EXT-X-PROGRAM-DATE-TIME:2024-01-01T00:00:00Z
+#EXTINF:4,
+last.ts
+#EXT-X-ENDLIST
+''')
+        self.assertTrue(playlist.is_media_playlist)
+        self.assertEqual(playlist.target_duration, 10)
+        self.assertEqual(playlist.media_sequence, 5)
+        self.assertEqual(playlist.discontinuity_sequence, 2)
+        self.assertEqual(playlist.playlist_type, 'VOD')
+        self.assertTrue(playlist.endlist)
+        self.assertEqual(playlist.discontinuity_count, 1)
+        self.assertEqual(playlist.duration, 23.5)
+
+        init, first, second, last = playlist.segments
+        self.assertTrue(init.init)
+        self.assertEqual(init.uri, 'init.mp4')
+        self.assertEqual(init.byte_range, {'start': 0, 'end': 100})
+        self.assertIsNone(init.key)
+
+        self.assertEqual((first.uri, first.duration, first.title), ('media.mp4', 9.5, 'first'))
+        self.assertEqual(first.byte_range, {'start': 100, 'end': 1100})
+        # The byte range without an offset continues from the previous one
+        self.assertEqual(second.byte_range, {'start': 1100, 'end': 1600})
+        self.assertIsNone(second.title)
+        self.assertIs(first.key, second.key)
+        self.assertEqual(first.key, {'METHOD': 'AES-128', 'URI': 'key1', 'IV': '0x1'})
+
+        # Byte ranges and dates only apply to the segment that follows them
+        self.assertIsNone(last.byte_range)
+        self.assertIsNone(first.program_date_time)
+        self.assertEqual(last.program_date_time, '2024-01-01T00:00:00Z')
+        self.assertEqual(last.key, {'METHOD': 'NONE'})
+        self.assertEqual([s.discontinuity for s in playlist.segments], [0, 0, 0, 1])
+
+    def test_media_playlist_without_target_duration(self):
+        playlist = parse_playlist('#EXTM3U\n#EXTINF:10,\na.ts\n#EXTINF:5.5,\nb.ts\n#EXT-X-ENDLIST')
+        self.assertTrue(playlist.is_media_playlist)
+        self.assertEqual([s.uri for s in playlist.segments], ['a.ts', 'b.ts'])
+        self.assertEqual(playlist.duration, 15.5)
+        self.assertEqual(playlist.variants, [])
+
+        # The downloader knows it has a media playlist, even without any segment tags
+        playlist = parse_playlist('#EXTM3U\na.ts\nb.ts', media=True)
+        self.assertEqual([(s.uri, s.duration) for s in playlist.segments], [('a.ts', None), ('b.ts', None)])
+        playlist = parse_playlist('#EXTM3U\na.m3u8')
+        self.assertFalse(playlist.is_media_playlist)
+        self.assertEqual(playlist.variants, [({}, 'a.m3u8')])
+
+    def test_ad_segments(self):
+        playlist = parse_playlist('''#EXTM3U
+#EXT-X-TARGETDURATION:10
+#EXTINF:10,
+a.ts
+#UPLYNK-SEGMENT:abc,00000000,ad
+#EXTINF:10,
+ad.ts
+#UPLYNK-SEGMENT:abc,00000001,segment
+#EXTINF:10,
+b.ts
+''')
+        self.assertEqual([s.ad for s in playlist.segments], [False, True, False])
+        self.assertFalse(playlist.endlist)
+
+    def test_random_playlists(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10', f'#EXT-X-MEDIA-SEQUENCE:{rng.randrange(100)}']
+            expected = []
+            key, discontinuity, last_end = None, 0, 0
+            for idx in range(rng.randrange(1, 100)):
+                if rng.random() < 0.1:
+                    key = f'key{idx}'
+                    lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="{key}"')
+                if rng.random() < 0.1:
+                    discontinuity += 1
+                    lines.append('#EXT-X-DISCONTINUITY')
+                duration = rng.randrange(1, 10000) / 1000
+                lines.append(f'#EXTINF:{duration},')
+                byte_range = None
+                if rng.random() < 0.3:
+                    length = rng.randrange(1, 1000)
+                    if rng.random() < 0.5:
+                        lines.append(f'#EXT-X-BYTERANGE:{length}')
+                        start = last_end
+                    else:
+                        start = rng.randrange(1000)
+                        lines.append(f'#EXT-X-BYTERANGE:{length}@{start}')
+                    byte_range = last_end = start + length
+                lines.append(f'segment{idx}.ts')
+                expected.append((f'segment{idx}.ts', duration, key, discontinuity, byte_range))
+            if rng.random() < 0.5:
+                lines.append('#EXT-X-ENDLIST')
+
+            playlist = parse_playlist('\n'.join(lines))
+            self.assertEqual(playlist.endlist, lines[-1] == '#EXT-X-ENDLIST')
+            self.assertEqual(playlist.discontinuity_count, discontinuity)
+            self.assertEqual([(
+                s.uri, s.duration, s.key and s.key['URI'], s.discontinuity, s.byte_range and s.byte_range['end'],
+            ) for s in playlist.segments], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
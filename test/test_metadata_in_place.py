@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import struct
+import tempfile
+from unittest import mock
+
+from yt_dlp import YoutubeDL, matroska, mp4
+from yt_dlp.postprocessor import EmbedThumbnailPP, FFmpegMetadataPP
+
+CHUNKS = (b'first chunk', b'second chunk', b'third chunk')
+CLUSTER = 0x1F43B675
+TRACK_NUMBER = 0xD7
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def make_mp4(faststart=True, ilst=b'', handler=b'soun'):
+    def moov(offsets):
+        mdhd = box(b'mdhd', bytes(20) + b'\x55\xc4' + bytes(2))
+        hdlr = box(b'hdlr', bytes(8) + handler + bytes(13))
+        stco = box(b'stco', bytes(4) + struct.pack(f'>I{len(offsets)}I', len(offsets), *offsets))
+        trak = box(b'trak', box(b'mdia', mdhd + hdlr + box(b'minf', box(b'stbl', stco))))
+        udta = box(b'udta', box(b'meta', bytes(4) + box(b'ilst', ilst))) if ilst else b''
+        return box(b'moov', box(b'mvhd', bytes(100)) + trak + udta)
+
+    ftyp = box(b'ftyp', b'isom\0\0\2\0isomiso2mp41')
+    offset = len(ftyp) + 8 + (len(moov([0] * len(CHUNKS))) if faststart else 0)
+    offsets = [offset + sum(map(len, CHUNKS[:i])) for i in range(len(CHUNKS))]
+    mdat = box(b'mdat', b''.join(CHUNKS))
+    return ftyp + (moov(offsets) + mdat if faststart else mdat + moov(offsets))
+
+
+def read_mp4(path):
+    """Returns the top level boxes, the chunks and the tags of the file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    stco = next(mp4._walk(data, (b'moov', b'trak', b'mdia', b'minf', b'stbl', b'stco')))
+    offsets = struct.unpack_from(f'>{len(CHUNKS)}I', data, stco.offset + stco.header_size + 8)
+    chunks = tuple(data[offset:offset + len(chunk)] for offset, chunk in zip(offsets, CHUNKS))
+    meta = next(mp4._walk(data, (b'moov', b'udta', b'meta')))
+    ilst = next(mp4._walk(data, (b'ilst',), meta.offset + meta.header_size + 4, meta.offset + meta.size))
+    tags = {atom: payload[16:] for atom, payload in mp4._split(data[:ilst.offset + ilst.size], ilst.offset + 8)}
+    mdhd = next(mp4._walk(data, (b'moov', b'trak', b'mdia', b'mdhd')))
+    tags['language'] = data[mdhd.offset + 28:mdhd.offset + 30]
+    return [b.type for b in mp4._read_boxes(data)], chunks, tags
+
+
+def element(element_id, data):
+    return matroska._element(element_id, data)
+
+
+def seek_entry(element_id, position):
+    return element(matroska.SEEK, element(matroska.SEEK_ID, element_id.to_bytes(4, 'big'))
+                   + element(matroska.SEEK_POSITION, position.to_bytes(4, 'big')))
+
+
+def make_mkv(void_size=100):
+    info = element(matroska.INFO, element(matroska.TITLE, b'old title') + bytes([matroska.VOID, 0x8A]) + bytes(10))
+    tracks = element(matroska.TRACKS, element(matroska.TRACK_ENTRY, (
+        matroska._uint(TRACK_NUMBER, 1) + element(matroska.LANGUAGE, b'und'))))
+    cluster = element(CLUSTER, b'\xa3' + b'media' * 100)
+    tags = element(matroska.TAGS, element(matroska.TAG, element(matroska.TARGETS, b'') + element(
+        matroska.SIMPLE_TAG, element(matroska.TAG_NAME, b'ENCODER') + element(matroska.TAG_STRING, b'Lavf'))))
+
+    seek_head_size = len(element(matroska.SEEK_HEAD, seek_entry(matroska.INFO, 0) * 3))
+    positions = [seek_head_size + void_size]
+    for el in (info, tracks + cluster):
+        positions.append(positions[-1] + len(el))
+    seek_head = element(matroska.SEEK_HEAD, b''.join(
+        seek_entry(element_id, position) for element_id, position in zip(
+            (matroska.INFO, matroska.TRACKS, matroska.TAGS), positions)))
+    void = matroska._void(void_size).ljust(void_size, b'\0') if void_size else b''
+    segment = seek_head + void + info + tracks + cluster + tags
+    return (element(matroska.EBML, element(matroska.DOC_TYPE, b'matroska'))
+            + matroska.SEGMENT.to_bytes(4, 'big') + matroska._encode_size(len(segment), 8) + segment)
+
+
+def read_mkv(path):
+    """Returns the top level elements of the file as {id: data}, checking the SeekHead"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    ebml = matroska._parse_header(data[:12], 0)
+    segment = matroska._parse_header(data[ebml.header_size + ebml.size:][:12], 0)
+    start = ebml.header_size + ebml.size + segment.header_size
+    assert start + segment.size == len(data), 'wrong segment size'
+
+    elements, positions, position = {}, {}, 0
+    for element_id, element_data in matroska._split(data[start:]):
+        if element_id != matroska.VOID:
+            assert element_id not in elements, 'duplicate element'
+            elements[element_id] = element_data
+            positions[element_id] = position
+        position += len(element(element_id, element_data))
+    for _, seek in matroska._split(elements[matroska.SEEK_HEAD]):
+        seek = dict(matroska._split(seek))
+        element_id = int.from_bytes(seek[matroska.SEEK_ID], 'big')
+        assert positions[element_id] == int.from_bytes(seek[matroska.SEEK_POSITION], 'big'), 'wrong seek position'
+    return elements
+
+
+def mkv_tags(elements):
+    tag = dict(matroska._split(elements[matroska.TAGS]))[matroska.TAG]
+    return {simple_tag[matroska.TAG_NAME].decode(): simple_tag[matroska.TAG_STRING].decode() for simple_tag in (
+        dict(matroska._split(data)) for element_id, data in matroska._split(tag) if element_id == matroska.SIMPLE_TAG)}
+
+
+def mkv_children(elements, element_id, child_id):
+    return [dict(matroska._split(data)) for i, data in matroska._split(elements[element_id]) if i == child_id]
+
+
+class TestMP4(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'test.mp4')
+
+    def _write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_faststart(self):
+        self._write(make_mp4())
+        # Without padding, the file is copied and the chunk offsets are shifted
+        self.assertFalse(mp4.write_metadata(self.path, {
+            'title': 'Title', 'track': '3/10', 'season_number': '2', 'purl': 'ignored'}, languages=['eng']))
+        boxes, chunks, tags = read_mp4(self.path)
+        self.assertEqual(boxes, [b'ftyp', b'moov', b'free', b'mdat'])
+        self.assertEqual(chunks, CHUNKS)
+        self.assertEqual(tags, {
+            b'\xa9nam': b'Title',
+            b'trkn': b'\0\0\0\x03\0\x0a\0\0',
+            b'tvsn': b'\0\0\0\x02',
+            'language': b'\x15\xc7',
+        })
+
+        # The padding is used by later edits
+        size = os.path.getsize(self.path)
+        self.assertTrue(mp4.write_metadata(self.path, {'title': 'New title'}, cover=(b'\xff\xd8\xff' * 100, 'jpeg')))
+        self.assertEqual(os.path.getsize(self.path), size)
+        _, chunks, tags = read_mp4(self.path)
+        self.assertEqual(chunks, CHUNKS)
+        self.assertEqual(tags[b'\xa9nam'], b'New title')
+        self.assertEqual(tags[b'covr'], b'\xff\xd8\xff' * 100)
+
+    def test_interrupted(self):
+        self._write(make_mp4())
+        mp4.write_metadata(self.path, {'title': 'Title'})
+        snapshots = []
+
+        def sync(f):
+            f.flush()
+            with open(self.path, 'rb') as snapshot:
+                snapshots.append(snapshot.read())
+
+        # Each step leaves a valid file, whose first moov box is either the old or the new one
+        with mock.patch('yt_dlp.mp4._sync', sync):
+            self.assertTrue(mp4.write_metadata(self.path, {'title': 'New title'}))
+        self.assertEqual(len(snapshots), 4)
+        snapshot_path = os.path.join(self.tmpdir.name, 'snapshot.mp4')
+        for data in snapshots:
+            self.assertEqual(sum(b.size for b in mp4._read_boxes(data)), len(data))
+            with open(snapshot_path, 'wb') as f:
+                f.write(data)
+            _, chunks, tags = read_mp4(snapshot_path)
+            self.assertEqual(chunks, CHUNKS)
+            self.assertIn(tags[b'\xa9nam'], (b'Title', b'New title'))
+        self.assertEqual(read_mp4(self.path)[0], [b'ftyp', b'moov', b'free', b'mdat'])
+
+    def test_track_types(self):
+        self._write(make_mp4(handler=b'vide'))
+        self.assertEqual(mp4.track_types(self.path), ['vide'])
+
+    def test_moov_at_end(self):
+        # Like ffmpeg's faststart, the moov box is moved in front of the media data
+        self._write(make_mp4(faststart=False, ilst=box(b'\xa9too', box(b'data', bytes(8) + b'Lavf'))) + box(b'uuid', bytes(16)))
+        self.assertFalse(mp4.write_metadata(self.path, {'artist': 'Artist'}))
+        boxes, chunks, tags = read_mp4(self.path)
+        self.assertEqual(boxes, [b'ftyp', b'moov', b'free', b'mdat', b'uuid'])
+        self.assertEqual(chunks, CHUNKS)
+        self.assertEqual(tags, {b'\xa9too': b'Lavf', b'\xa9ART': b'Artist', 'language': b'\x55\xc4'})
+
+        size = os.path.getsize(self.path)
+        self.assertTrue(mp4.write_metadata(self.path, {'title': 'Title'}))
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(read_mp4(self.path)[1], CHUNKS)
+
+    def test_moov_moved_to_end(self):
+        ftyp = box(b'ftyp', b'isom')
+        self._write(ftyp + box(b'moov', box(b'mvhd', bytes(100))) + box(b'uuid', bytes(16)))
+        self.assertTrue(mp4.write_metadata(self.path, {'title': 'Title'}))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.assertEqual([b.type for b in mp4._read_boxes(data)], [b'ftyp', b'free', b'uuid', b'moov'])
+        self.assertIn(b'Title', data)
+
+    def test_invalid(self):
+        self._write(box(b'ftyp', b'isom') + box(b'mdat', b''))
+        with self.assertRaisesRegex(ValueError, 'moov'):
+            mp4.write_metadata(self.path, {'title': 'Title'})
+        self._write(make_mp4())
+        with self.assertRaisesRegex(ValueError, 'cover'):
+            mp4.write_metadata(self.path, cover=(b'GIF89a', 'gif'))
+
+
+class TestMatroska(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'test.mkv')
+
+    def _write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_write_metadata(self):
+        self._write(make_mkv())
+        matroska.write_metadata(
+            self.path, {'title': 'New title', 'artist': 'Artist', 'track': '2'},
+            chapters=[{'start_time': 0, 'end_time': 1.5, 'title': 'Intro'}, {'start_time': 1.5, 'end_time': 3}],
+            languages=['eng'], attachments=[('cover.jpg', 'image/jpeg', b'jpeg data')])
+        elements = read_mkv(self.path)
+        self.assertIn(b'media' * 100, elements[CLUSTER])
+        # The title fits in the Void of the segment info
+        self.assertEqual(dict(matroska._split(elements[matroska.INFO]))[matroska.TITLE], b'New title')
+        self.assertEqual(mkv_tags(elements), {'ENCODER': 'Lavf', 'ARTIST': 'Artist', 'PART_NUMBER': '2'})
+        self.assertEqual(mkv_children(elements, matroska.TRACKS, matroska.TRACK_ENTRY)[0][matroska.LANGUAGE], b'eng')
+        edition = dict(matroska._split(elements[matroska.CHAPTERS]))[matroska.EDITION_ENTRY]
+        atoms = [dict(matroska._split(data)) for _, data in matroska._split(edition)]
+        self.assertEqual([atom[matroska.CHAPTER_TIME_END] for atom in atoms], [
+            (1500000000).to_bytes(4, 'big'), (3000000000).to_bytes(4, 'big')])
+        self.assertNotIn(matroska.CHAPTER_DISPLAY, atoms[1])
+
+        # An attachment replaces the one of the same type
+        matroska.write_metadata(self.path, {'title': 'A title that does not fit in the segment info'}, attachments=[
+            ('cover.png', 'image/png', b'png data'), ('cover.jpg', 'image/jpeg', b'new jpeg data')])
+        elements = read_mkv(self.path)
+        self.assertEqual(dict(matroska._split(elements[matroska.INFO]))[matroska.TITLE], b'New title')
+        self.assertEqual(mkv_tags(elements)['TITLE'], 'A title that does not fit in the segment info')
+        self.assertEqual([
+            (f[matroska.FILE_NAME], f[matroska.FILE_DATA])
+            for f in mkv_children(elements, matroska.ATTACHMENTS, matroska.ATTACHED_FILE)
+        ], [(b'cover.jpg', b'new jpeg data'), (b'cover.png', b'png data')])
+
+        # Like with ffmpeg, the chapters are replaced
+        matroska.write_metadata(self.path, chapters=[{'start_time': 0, 'end_time': 3, 'title': 'Full'}])
+        edition = dict(matroska._split(read_mkv(self.path)[matroska.CHAPTERS]))[matroska.EDITION_ENTRY]
+        self.assertEqual(len(matroska._split(edition)), 1)
+
+    def test_not_in_place(self):
+        # There is no room for the new SeekHead entries
+        self._write(make_mkv(void_size=0))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with self.assertRaisesRegex(ValueError, 'SeekHead'):
+            matroska.write_metadata(self.path, attachments=[('cover.jpg', 'image/jpeg', b'jpeg data')])
+        # The tracks must stay before the clusters
+        with self.assertRaisesRegex(ValueError, 'in place'):
+            matroska.write_metadata(self.path, languages=['english'])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        matroska.write_metadata(self.path, {'artist': 'Artist'})
+        self.assertEqual(mkv_tags(read_mkv(self.path))['ARTIST'], 'Artist')
+
+
+class TestInPlacePostProcessors(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.ydl = YoutubeDL({'quiet': True})
+
+    def _info(self, ext, data):
+        path = os.path.join(self.tmpdir.name, f'test.{ext}')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return {
+            'id': 'test', 'title': 'Title', 'ext': ext, 'filepath': path, 'uploader': 'Uploader',
+            'language': 'en', 'vcodec': 'none', 'acodec': 'aac', '__files_to_move': {},
+        }
+
+    def test_metadata(self):
+        info = self._info('mkv', make_mkv())
+        FFmpegMetadataPP(self.ydl, add_infojson=True).run(info)
+        elements = read_mkv(info['filepath'])
+        self.assertEqual(mkv_tags(elements), {'ENCODER': 'Lavf', 'ARTIST': 'Uploader'})
+        self.assertEqual(mkv_children(elements, matroska.TRACKS, matroska.TRACK_ENTRY)[0][matroska.LANGUAGE], b'eng')
+        self.assertEqual(
+            mkv_children(elements, matroska.ATTACHMENTS, matroska.ATTACHED_FILE)[0][matroska.FILE_MIME_TYPE],
+            b'application/json')
+
+        info = self._info('m4a', make_mp4())
+        FFmpegMetadataPP(self.ydl).run(info)
+        _, chunks, tags = read_mp4(info['filepath'])
+        self.assertEqual(chunks, CHUNKS)
+        self.assertEqual((tags[b'\xa9nam'], tags[b'\xa9ART'], tags['language']), (b'Title', b'Uploader', b'\x15\xc7'))
+
+        # ffmpeg drops the video streams of m4a files
+        info = self._info('m4a', make_mp4(handler=b'vide'))
+        self.assertFalse(FFmpegMetadataPP(self.ydl)._write_in_place(info))
+        with open(info['filepath'], 'rb') as f:
+            self.assertEqual(f.read(), make_mp4(handler=b'vide'))
+
+    def test_embed_thumbnail(self):
+        thumbnail = os.path.join(self.tmpdir.name, 'test.png')
+        with open(thumbnail, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+        for ext, data in (('mkv', make_mkv()), ('mp4', make_mp4())):
+            info = self._info(ext, data)
+            info['thumbnails'] = [{'filepath': thumbnail}]
+            EmbedThumbnailPP(self.ydl, already_have_thumbnail=True).run(info)
+            if ext == 'mkv':
+                self.assertEqual(mkv_children(read_mkv(info['filepath']), matroska.ATTACHMENTS, matroska.ATTACHED_FILE)[0][
+                    matroska.FILE_NAME], b'cover.png')
+            else:
+                self.assertEqual(read_mp4(info['filepath'])[2][b'covr'], b'\x89PNG\r\n\x1a\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
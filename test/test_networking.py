@@ -6,10 +6,11 @@
 
 import pytest
 
-from yt_dlp.networking.common import Features, DEFAULT_TIMEOUT
+from yt_dlp.networking.common import Features, DEFAULT_TIMEOUT, _REQUEST_HANDLERS, _RH_PREFERENCES
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
 import gzip
 import http.client
 import http.cookiejar
@@ -18,6 +19,7 @@
 import logging
 import pathlib
 import random
+import socket
 import ssl
 import tempfile
 import threading
@@ -45,7 +47,12 @@
     RequestHandler,
     Response,
 )
-from yt_dlp.networking._urllib import UrllibRH
+from yt_dlp.networking._urllib import (
+    ContentDecodingReader,
+    UrllibRH,
+    _DeflateDecoder,
+    _ZlibDecoder,
+)
 from yt_dlp.networking.exceptions import (
     CertificateVerifyError,
     HTTPError,
@@ -62,6 +69,7 @@
     ImpersonateTarget,
 )
 from yt_dlp.utils import YoutubeDLError
+from yt_dlp.utils._legacy import YoutubeDLHandler
 from yt_dlp.utils._utils import _YDLLogger as FakeLogger
 from yt_dlp.utils.networking import HTTPHeaderDict, std_headers
 
@@ -313,7 +321,7 @@ def setup_class(cls):
         cls.https_server_thread.start()
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 class TestHTTPRequestHandler(TestRequestHandlerBase):
 
     def test_verify_cert(self, handler):
@@ -680,6 +688,24 @@ def test_read(self, handler):
             assert res.read().decode().endswith('\n\n')
             assert res.read() == b''
 
+    @pytest.mark.parametrize('encoding', [None, 'gzip'])
+    def test_readinto(self, handler, encoding):
+        with handler() as rh:
+            res = validate_and_send(
+                rh, Request(
+                    f'http://127.0.0.1:{self.http_port}/content-encoding',
+                    headers={'ytdl-encoding': encoding} if encoding else {}))
+            buffer = bytearray(8)
+            assert res.readinto(buffer) == 8
+            assert buffer == b'<html><v'
+            view = memoryview(bytearray(100))
+            size = res.readinto(view)
+            data = bytes(view[:size])
+            while size := res.readinto(view):
+                data += view[:size]
+            assert data == b'ideo src="/vid.mp4" /></html>'
+            assert res.readinto(buffer) == 0
+
     def test_request_disable_proxy(self, handler):
         for proxy_proto in handler._SUPPORTED_PROXY_SCHEMES or ['http']:
             # Given the handler is configured with a proxy
@@ -721,7 +747,7 @@ def test_allproxy(self, handler):
                         f'http://127.0.0.1:{self.http_port}/headers', proxies={'all': 'http://10.255.255.255'})).close()
 
 
-@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI'], indirect=True)
+@pytest.mark.parametrize('handler', ['Urllib', 'Requests', 'CurlCFFI', 'Asyncio'], indirect=True)
 class TestClientCertificate:
     @classmethod
     def setup_class(cls):
@@ -876,6 +902,79 @@ def get_response():
 
         assert get_response().read() == b'<html></html>'
 
+    def test_connection_pool(self, handler):
+        url = f'http://127.0.0.1:{self.http_port}/headers'
+        with handler() as rh:
+            pool = rh._connection_pool
+            for _ in range(3):
+                assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (2, 1)
+
+            # A connection with an unread response body should not be reused
+            res = validate_and_send(rh, Request(url))
+            assert res.read(1)
+            res.close()
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (3, 2)
+
+            # Connections dropped by the server while idle should not be reused
+            for conn, _ in pool._idle[('http', f'127.0.0.1:{self.http_port}', None, None, None)]:
+                conn.sock.shutdown(socket.SHUT_WR)
+            time.sleep(0.1)
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (3, 3)
+
+            def worker():
+                for _ in range(5):
+                    results.append(validate_and_send(rh, Request(url)).read())
+
+            results = []
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(results) == 20 and all(results)
+            assert pool.hits + pool.misses == 26
+            assert len(pool._idle[('http', f'127.0.0.1:{self.http_port}', None, None, None)]) <= 4
+
+    def test_connection_pool_retry(self, handler, monkeypatch):
+        class ResetSocket:
+            def settimeout(self, timeout):
+                pass
+
+            def sendall(self, data):
+                raise ConnectionResetError('Connection reset by peer')
+
+            def close(self):
+                pass
+
+        url = f'http://127.0.0.1:{self.http_port}/headers'
+        pool_key = ('http', f'127.0.0.1:{self.http_port}', None, None, None)
+        monkeypatch.setattr('yt_dlp.networking._urllib._is_connection_dropped', lambda sock: False)
+        with handler() as rh:
+            pool = rh._connection_pool
+            assert validate_and_send(rh, Request(url)).read()
+
+            # Idempotent requests are sent again on a new connection
+            pool._idle[pool_key][0][0].sock = ResetSocket()
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (1, 1)
+
+            # The server may have processed other requests before the connection was reset
+            pool._idle[pool_key][0][0].sock = ResetSocket()
+            with pytest.raises(TransportError):
+                validate_and_send(rh, Request(url, data=b'test'))
+
+    def test_trace(self, handler):
+        with handler() as rh:
+            res = validate_and_send(rh, Request(f'http://127.0.0.1:{self.http_port}/redirect_302'))
+            res.read()
+            trace = res.extensions['trace']
+            assert trace['redirects'] == 1
+            assert trace['reused_connection'] is True
+            assert trace['dns'] >= 0 and trace['connect'] >= 0
+
     def test_verify_cert_error_text(self, handler):
         # Check the output of the error message
         with handler() as rh:
@@ -912,6 +1011,164 @@ def test_httplib_validation_errors(self, handler, req, match, version_check):
                 validate_and_send(rh, req)
             assert not isinstance(exc_info.value, TransportError)
 
+    def test_content_decoding_reader(self, handler):
+        payload = random.Random(0).randbytes(300_000)
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+            f.write(zlib.compress(payload))
+        compressed = buf.getvalue()
+
+        def make_reader(data):
+            return ContentDecodingReader(io.BytesIO(data), [_ZlibDecoder(zlib.MAX_WBITS | 16), _DeflateDecoder()])
+
+        reader = make_reader(compressed + b'trailing garbage')
+        assert reader.read(10) == payload[:10]
+        # Data should be decoded incrementally, not all at once
+        assert len(reader._buffer) < len(payload)
+        chunk = reader.read1()
+        assert chunk == payload[10:10 + len(chunk)]
+        assert reader.read() == payload[10 + len(chunk):]
+
+        reader = make_reader(compressed)
+        assert b''.join(iter(lambda: reader.read(1000), b'')) == payload
+
+        raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        reader = ContentDecodingReader(
+            io.BytesIO(raw_deflate.compress(payload) + raw_deflate.flush()), [_DeflateDecoder()])
+        assert reader.read() == payload
+
+        with pytest.raises(zlib.error):
+            make_reader(compressed[:-100]).read()
+
+        assert make_reader(b'').read() == b''
+
+        # Highly compressed data is not decompressed all at once
+        bomb = gzip.compress(zlib.compress(bytes(50_000_000), 9), 9)
+        reader = make_reader(bomb)
+        assert reader.read(10) == bytes(10)
+        assert len(reader._buffer) <= ContentDecodingReader.CHUNK_SIZE
+        size = len(reader.read1())
+        while chunk := reader.read1():
+            assert len(chunk) <= ContentDecodingReader.CHUNK_SIZE
+            size += len(chunk)
+        assert size == 50_000_000 - 10
+
+    def test_legacy_decoders(self, handler):
+        payload = random.Random(0).randbytes(300_000)
+        assert YoutubeDLHandler.gz(gzip.compress(payload) + b'trailing garbage') == payload
+        assert YoutubeDLHandler.deflate(zlib.compress(payload)) == payload
+        raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        assert YoutubeDLHandler.deflate(raw_deflate.compress(payload) + raw_deflate.flush()) == payload
+        assert YoutubeDLHandler.gz(b'') == b''
+        with pytest.raises(zlib.error):
+            YoutubeDLHandler.gz(gzip.compress(payload)[:-100])
+
+
+@pytest.mark.parametrize('handler', ['Asyncio'], indirect=True)
+class TestAsyncioRequestHandler(TestRequestHandlerBase):
+    def test_asend(self, handler):
+        url = f'http://127.0.0.1:{self.http_port}/headers'
+
+        async def fetch(rh, idx):
+            response = await rh.asend(Request(url, headers={'X-Index': str(idx)}))
+            return await response.aread()
+
+        async def fetch_all(rh):
+            return await asyncio.gather(*(fetch(rh, idx) for idx in range(50)))
+
+        with handler() as rh:
+            results = asyncio.run_coroutine_threadsafe(fetch_all(rh), rh.loop).result()
+            assert [f'X-Index: {idx}' in result.decode() for idx, result in enumerate(results)] == [True] * 50
+
+    def test_asend_errors(self, handler):
+        async def fetch(rh, url):
+            response = await rh.asend(Request(url))
+            return await response.aread()
+
+        with handler() as rh:
+            with pytest.raises(HTTPError) as exc_info:
+                asyncio.run_coroutine_threadsafe(
+                    fetch(rh, f'http://127.0.0.1:{self.http_port}/gen_404'), rh.loop).result()
+            assert exc_info.value.handler is rh
+            assert exc_info.value.response.read() == b'<html></html>'
+
+            with pytest.raises(IncompleteRead):
+                asyncio.run_coroutine_threadsafe(
+                    fetch(rh, f'http://127.0.0.1:{self.http_port}/incompleteread'), rh.loop).result()
+
+    def test_blocking_call_on_loop(self, handler):
+        async def send(rh):
+            return rh.send(Request(f'http://127.0.0.1:{self.http_port}/headers'))
+
+        with handler() as rh:
+            with pytest.raises(RuntimeError, match='asend'):
+                asyncio.run_coroutine_threadsafe(send(rh), rh.loop).result()
+
+    def test_connection_pool(self, handler):
+        url = f'http://127.0.0.1:{self.http_port}/headers'
+        pool_key = ('http', '127.0.0.1', self.http_port, None)
+        with handler() as rh:
+            pool = rh._connection_pool
+            for _ in range(3):
+                res = validate_and_send(rh, Request(url))
+                assert res.read()
+            assert (pool.hits, pool.misses) == (2, 1)
+            assert res.extensions['trace']['reused_connection'] is True
+
+            # A connection with an unread response body should not be reused
+            res = validate_and_send(rh, Request(url))
+            assert res.read(1)
+            res.close()
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (3, 2)
+
+            # Connections dropped by the server while idle should not be reused
+            for key, idle in pool._idle.items():
+                if key[:4] == pool_key:
+                    for conn, _ in idle:
+                        conn.writer.transport.get_extra_info('socket').shutdown(socket.SHUT_WR)
+            time.sleep(0.1)
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (3, 3)
+
+    def test_connection_pool_retry(self, handler, monkeypatch):
+        url = f'http://127.0.0.1:{self.http_port}/headers'
+        monkeypatch.setattr('yt_dlp.networking._asyncio._Connection.dropped', False)
+
+        async def abort_idle_connections(pool):
+            for idle in pool._idle.values():
+                for conn, _ in idle:
+                    conn.writer.transport.abort()
+
+        def close_idle_connections(rh):
+            asyncio.run_coroutine_threadsafe(abort_idle_connections(rh._connection_pool), rh.loop).result()
+
+        with handler() as rh:
+            pool = rh._connection_pool
+            assert validate_and_send(rh, Request(url)).read()
+
+            # Idempotent requests are sent again on a new connection
+            close_idle_connections(rh)
+            assert validate_and_send(rh, Request(url)).read()
+            assert (pool.hits, pool.misses) == (1, 1)
+
+            # The server may have processed other requests before the connection was closed
+            close_idle_connections(rh)
+            with pytest.raises(TransportError):
+                validate_and_send(rh, Request(url, data=b'test'))
+
+    def test_preference(self, handler):
+        with FakeYDL() as ydl:
+            director = ydl.build_request_director(
+                [_REQUEST_HANDLERS['Urllib'], _REQUEST_HANDLERS['Asyncio']], _RH_PREFERENCES)
+            url = f'http://127.0.0.1:{self.http_port}/headers'
+            assert director.get_handler(Request(url)).RH_KEY == 'Urllib'
+            assert director.get_handler(Request(url, extensions={'fragment': True})).RH_KEY == 'Asyncio'
+            # Other handlers are used for what it does not support
+            assert director.get_handler(Request(
+                url, proxies={'all': 'socks5://127.0.0.1'}, extensions={'fragment': True})).RH_KEY == 'Urllib'
+            assert director.get_handler(Request('ftp://127.0.0.1', extensions={'fragment': True})).RH_KEY == 'Urllib'
+
 
 @pytest.mark.parametrize('handler', ['Requests'], indirect=True)
 class TestRequestsRequestHandler(TestRequestHandlerBase):
@@ -1210,6 +1467,12 @@ class HTTPSupportedRH(ValidationRH):
             ('http', False, {}),
             ('https', False, {}),
         ]),
+        ('Asyncio', [
+            ('http', False, {}),
+            ('https', False, {}),
+            ('data', UnsupportedRequest, {}),
+            ('ftp', UnsupportedRequest, {}),
+        ]),
         (NoCheckRH, [('http', False, {})]),
         (ValidationRH, [('http', UnsupportedRequest, {})]),
     ]
@@ -1241,6 +1504,12 @@ class HTTPSupportedRH(ValidationRH):
             ('socks5', False),
             ('socks5h', False),
         ]),
+        ('Asyncio', 'http', [
+            ('http', False),
+            ('https', UnsupportedRequest),
+            ('socks4', UnsupportedRequest),
+            ('socks5h', UnsupportedRequest),
+        ]),
         ('Websockets', 'ws', [
             ('http', UnsupportedRequest),
             ('https', UnsupportedRequest),
@@ -1269,6 +1538,10 @@ class HTTPSupportedRH(ValidationRH):
             ('all', 'http', False),
             ('unrelated', 'http', False),
         ]),
+        ('Asyncio', 'http', [
+            ('all', 'http', False),
+            ('unrelated', 'http', False),
+        ]),
         ('Websockets', 'ws', [
             ('all', 'socks5', False),
             ('unrelated', 'socks5', False),
@@ -1316,6 +1589,16 @@ class HTTPSupportedRH(ValidationRH):
             ({'legacy_ssl': True}, False),
             ({'legacy_ssl': 'notabool'}, AssertionError),
         ]),
+        ('Asyncio', 'http', [
+            ({'cookiejar': 'notacookiejar'}, AssertionError),
+            ({'cookiejar': YoutubeDLCookieJar()}, False),
+            ({'timeout': 1}, False),
+            ({'timeout': 'notatimeout'}, AssertionError),
+            ({'unsupported': 'value'}, UnsupportedRequest),
+            ({'legacy_ssl': False}, False),
+            ({'legacy_ssl': True}, False),
+            ({'legacy_ssl': 'notabool'}, AssertionError),
+        ]),
         (NoCheckRH, 'http', [
             ({'cookiejar': 'notacookiejar'}, False),
             ({'somerandom': 'test'}, False),  # but any extension is allowed through
@@ -1333,6 +1616,7 @@ class HTTPSupportedRH(ValidationRH):
         ('Urllib', False, 'http'),
         ('Requests', False, 'http'),
         ('CurlCFFI', False, 'http'),
+        ('Asyncio', False, 'http'),
         ('Websockets', False, 'ws'),
     ], indirect=['handler'])
     def test_no_proxy(self, handler, fail, scheme):
@@ -1344,6 +1628,7 @@ def test_no_proxy(self, handler, fail, scheme):
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
         ('CurlCFFI', 'http'),
+        ('Asyncio', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
     def test_empty_proxy(self, handler, scheme):
@@ -1356,6 +1641,7 @@ def test_empty_proxy(self, handler, scheme):
         (HTTPSupportedRH, 'http'),
         ('Requests', 'http'),
         ('CurlCFFI', 'http'),
+        ('Asyncio', 'http'),
         ('Websockets', 'ws'),
     ], indirect=['handler'])
     def test_invalid_proxy_url(self, handler, scheme, proxy_url):
@@ -1402,6 +1688,12 @@ def test_invalid_request_type(self):
             with pytest.raises(TypeError, match='Expected an instance of Request'):
                 method('not a request')
 
+    @pytest.mark.parametrize('option', ['dns_cache_ttl', 'happy_eyeballs_delay'])
+    def test_negative_connection_option(self, option):
+        self.ValidationRH(logger=FakeLogger(), **{option: 0})
+        with pytest.raises(ValueError, match=option):
+            self.ValidationRH(logger=FakeLogger(), **{option: -1})
+
 
 class FakeResponse(Response):
     def __init__(self, request):
@@ -1555,6 +1847,143 @@ def mock_close(*args, **kwargs):
         director.close()
         assert called
 
+    def test_trace_hooks(self):
+        class TracedRH(FakeRH):
+            def _send(self, request: Request):
+                if request.url.startswith('ssl://'):
+                    raise SSLError('error')
+                return Response(
+                    fp=io.BytesIO(b'data'), headers={}, url=request.url,
+                    extensions={'trace': {'dns': 1.0, 'reused_connection': False}})
+
+        events = []
+        director = RequestDirector(logger=FakeLogger())
+        director.add_handler(TracedRH(logger=FakeLogger()))
+        director.trace_hooks.append(events.append)
+
+        response = director.send(Request('http://example.com/'))
+        assert not events, 'event should only be emitted once the response is read'
+        assert response.read(2) == b'da'
+        assert response.read() == b'ta'
+        assert len(events) == 1
+        event = events[0]
+        assert event['url'] == event['final_url'] == 'http://example.com/'
+        assert event['handler'] == 'Traced'
+        assert event['method'] == 'GET'
+        assert event['status'] == 200
+        assert event['bytes'] == 4
+        assert event['dns'] == 1.0
+        assert event['reused_connection'] is False
+        assert event['tls'] is None
+        assert event['error'] is None
+        assert event['ttfb'] >= 0 and event['transfer'] >= 0
+        response.close()
+        assert len(events) == 1, 'event should only be emitted once'
+
+        director.send(Request('http://example.com/')).close()
+        assert len(events) == 2 and events[1]['bytes'] == 0
+
+        with pytest.raises(SSLError):
+            director.send(Request('ssl://example.com/'))
+        assert len(events) == 3
+        assert events[2]['error'] == 'SSLError: error'
+        assert events[2]['status'] is None
+
+    def test_coalescing(self):
+        class SlowRH(FakeRH):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.sent = []
+                self.release = threading.Event()
+
+            def _send(self, request: Request):
+                self.sent.append(request.url)
+                self.release.wait(5)
+                if request.url.endswith('/error'):
+                    raise TransportError('error')
+                return Response(fp=io.BytesIO(b'data' * 10), headers={'X-Test': '1'}, url=request.url)
+
+        director = RequestDirector(logger=FakeLogger())
+        handler = SlowRH(logger=FakeLogger())
+        director.add_handler(handler)
+
+        def send_concurrently(*requests):
+            results, responses = [None] * len(requests), [None] * len(requests)
+
+            def send(idx, request):
+                try:
+                    responses[idx] = director.send(request)
+                    results[idx] = responses[idx].read()
+                except TransportError as e:
+                    results[idx] = e
+
+            threads = [threading.Thread(target=send, args=item) for item in enumerate(requests)]
+            threads[0].start()
+            while not handler.sent:
+                time.sleep(0.01)
+            for thread in threads[1:]:
+                thread.start()
+            deadline = time.monotonic() + 5
+            # Every request is either sent or waiting for an identical one
+            while (sum(flight.waiters for flight in director._in_flight.values()) + len(handler.sent) < len(requests)
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+            handler.release.set()
+            for thread in threads:
+                thread.join()
+            handler.release.clear()
+            return results, responses
+
+        def coalesced(url):
+            return Request(url, extensions={'coalesce': True})
+
+        # Identical GET requests are sent once and the response shared
+        results, responses = send_concurrently(*[coalesced('http://example.com/')] * 3)
+        assert results == [b'data' * 10] * 3
+        assert handler.sent == ['http://example.com/']
+
+        # The shared responses are independent of each other
+        del responses[1].headers['X-Test']
+        responses[1].extensions['test'] = True
+        assert [response.get_header('X-Test') for response in responses] == ['1', None, '1']
+        assert 'test' not in responses[2].extensions
+
+        # Requests are only coalesced if they opt in
+        handler.sent.clear()
+        results, _ = send_concurrently(*[Request('http://example.com/')] * 2)
+        assert results == [b'data' * 10] * 2
+        assert handler.sent == ['http://example.com/'] * 2
+
+        # Waiting requests are sent by themselves if the body is too large to share,
+        # or if the request fails
+        handler.sent.clear()
+        director.COALESCE_MAX_SIZE = 10
+        results, _ = send_concurrently(*[coalesced('http://example.com/')] * 2)
+        assert results == [b'data' * 10] * 2
+        assert handler.sent == ['http://example.com/'] * 2
+
+        handler.sent.clear()
+        results, _ = send_concurrently(*[coalesced('http://example.com/error')] * 2)
+        assert all(isinstance(result, TransportError) for result in results)
+        assert len(handler.sent) == 2
+
+        # Equivalent URLs are coalesced
+        key = director._coalesce_key(coalesced('http://example.com/'))
+        assert director._coalesce_key(coalesced('HTTP://Example.COM:80')) == key
+        assert director._coalesce_key(coalesced('http://example.com/#fragment')) == key
+        assert director._coalesce_key(coalesced('https://example.com/')) != key
+        assert director._coalesce_key(coalesced('http://example.com:8080/')) != key
+
+        # Requests that are not identical HTTP GETs are not coalesced
+        assert director._coalesce_key(Request('http://example.com/', data=b'', extensions={'coalesce': True})) is None
+        assert director._coalesce_key(Request('http://example.com/', method='HEAD', extensions={'coalesce': True})) is None
+        assert director._coalesce_key(coalesced('ws://example.com/')) is None
+        assert director._coalesce_key(Request(
+            'http://example.com/', headers={'a': '1'}, extensions={'coalesce': True})) != director._coalesce_key(
+            Request('http://example.com/', headers={'a': '2'}, extensions={'coalesce': True}))
+        assert director._coalesce_key(Request(
+            'http://example.com/', extensions={'coalesce': True, 'timeout': 1})) != key
+
 
 # XXX: do we want to move this to test_YoutubeDL.py?
 class TestYoutubeDLNetworking:
@@ -10,14 +10,21 @@
 
 import io
 import random
+import socket
 import ssl
+import threading
+import time
 
 from yt_dlp.cookies import YoutubeDLCookieJar
 from yt_dlp.dependencies import certifi
 from yt_dlp.networking import Response
+from yt_dlp.networking import _helper
 from yt_dlp.networking._helper import (
     InstanceStoreMixin,
+    _socket_connect,
     add_accept_encoding_header,
+    connection_options,
+    create_connection,
     get_redirect_method,
     make_socks_proxy_opts,
     select_proxy,
@@ -168,6 +175,132 @@ def test_mixin(self):
         assert mixin._get_instance(t=1234) != m
 
 
+class TestCreateConnection:
+
+    @pytest.fixture
+    def server(self):
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen(8)
+            yield server.getsockname()
+
+    @pytest.fixture
+    def getaddrinfo_calls(self, monkeypatch):
+        calls = []
+        real_getaddrinfo = socket.getaddrinfo
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            calls.append((host, port))
+            return real_getaddrinfo(host, port, *args, **kwargs)
+
+        monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+        monkeypatch.setattr(_helper, 'dns_cache', _helper.DNSCache())
+        return calls
+
+    @pytest.mark.parametrize('options,expected_calls', [
+        ({}, 1),
+        ({'dns_cache_ttl': 60}, 1),
+        ({'dns_cache_ttl': 0}, 3),
+    ])
+    def test_dns_cache(self, server, getaddrinfo_calls, options, expected_calls):
+        token = connection_options.set(options)
+        try:
+            for _ in range(3):
+                create_connection(('localhost', server[1]), timeout=5).close()
+        finally:
+            connection_options.reset(token)
+        assert getaddrinfo_calls == [('localhost', server[1])] * expected_calls
+
+    def test_dns_cache_expiry(self, monkeypatch):
+        cache = _helper.DNSCache(max_entries=2)
+        results = iter(range(10))
+        monkeypatch.setattr(socket, 'getaddrinfo', lambda *_: [next(results)])
+        assert cache.getaddrinfo('a', 80, ttl=60) == ([0], False)
+        assert cache.getaddrinfo('a', 80, ttl=60) == ([0], True)
+        assert cache.getaddrinfo('a', 80, ttl=0) == ([1], False)
+        assert cache.getaddrinfo('a', 80, ttl=1e-9) == ([2], False)
+        cache.getaddrinfo('b', 80, ttl=60)
+        cache.getaddrinfo('c', 80, ttl=60)
+        # 'a' is the least recently used entry
+        assert cache.getaddrinfo('a', 80, ttl=60) == ([5], False)
+        assert cache.getaddrinfo('c', 80, ttl=60) == ([4], True)
+        cache.invalidate('c', 80)
+        assert cache.getaddrinfo('c', 80, ttl=60) == ([6], False)
+
+    def test_cached_addresses_invalidated_on_failure(self, getaddrinfo_calls):
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+        # A failure with freshly resolved addresses keeps them cached,
+        # but one with cached addresses makes the next connection resolve again
+        for _ in range(3):
+            with pytest.raises(OSError):
+                create_connection(('127.0.0.1', port), timeout=5)
+        assert len(getaddrinfo_calls) == 2
+
+    @pytest.mark.parametrize('delay,max_duration', [(0.1, 1), (0, None)])
+    def test_happy_eyeballs(self, server, monkeypatch, delay, max_duration):
+        # 127.0.0.2 stands in for an unresponsive address which only fails after a long timeout
+        monkeypatch.setattr(socket, 'getaddrinfo', lambda host, port, *_: [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.2', port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port)),
+        ])
+        monkeypatch.setattr(_helper, 'dns_cache', _helper.DNSCache())
+        attempts = []
+        unresponsive = threading.Event()
+
+        def connect(ip_addr, timeout, source_address):
+            attempts.append(ip_addr[4][0])
+            if ip_addr[4][0] == '127.0.0.2':
+                unresponsive.wait(2)
+                raise TimeoutError('timed out')
+            return _socket_connect(ip_addr, timeout, source_address)
+
+        token = connection_options.set({'happy_eyeballs_delay': delay})
+        start = time.monotonic()
+        try:
+            sock = create_connection(('example.com', server[1]), timeout=5, _create_socket_func=connect)
+        finally:
+            connection_options.reset(token)
+            unresponsive.set()
+        duration = time.monotonic() - start
+        with sock:
+            assert sock.getpeername() == server
+        assert attempts == ['127.0.0.2', '127.0.0.1']
+        if max_duration:
+            assert duration < max_duration
+        else:
+            assert duration >= 2
+
+    @pytest.mark.parametrize('delay', [0.1, 0])
+    def test_staggered_connect_unexpected_error(self, delay):
+        addresses = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (f'127.0.0.{i}', 80)) for i in range(1, 4)]
+        attempts, errors = [], []
+
+        def connect(ip_addr):
+            attempts.append(ip_addr[4][0])
+            raise ValueError('invalid socket option')
+
+        def run():
+            try:
+                _helper._staggered_connect(addresses, connect, delay)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive(), '_staggered_connect did not return'
+        assert [type(e) for e in errors] == [ValueError]
+        assert attempts[0] == '127.0.0.1'
+
+    def test_interleave_address_families(self):
+        v4 = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (f'127.0.0.{i}', 80)) for i in range(3)]
+        v6 = [(socket.AF_INET6, socket.SOCK_STREAM, 6, '', (f'::{i}', 80, 0, 0)) for i in range(2)]
+        assert _helper._interleave_address_families([*v6, *v4]) == [v6[0], v4[0], v6[1], v4[1], v4[2]]
+        assert _helper._interleave_address_families(v4) == v4
+
+
 class TestNetworkingExceptions:
 
     @staticmethod
@@ -3,21 +3,41 @@
 # Allow direct execution
 import os
 import sys
+import tempfile
 import unittest
+import unittest.mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import collections
+import hashlib
+import http.server
+import json
+import shutil
+import struct
+import subprocess
+import threading
+
+from test.helper import http_server_port
 from yt_dlp import YoutubeDL
-from yt_dlp.utils import shell_quote
+from yt_dlp.utils import Popen, PostProcessingError, shell_quote
 from yt_dlp.postprocessor import (
     ExecPP,
+    FFmpegEmbedSubtitlePP,
+    FFmpegFixupStretchedPP,
+    FFmpegFusedPassPP,
+    FFmpegMergerPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
+    FFmpegSplitChaptersPP,
     FFmpegThumbnailsConvertorPP,
     MetadataFromFieldPP,
     MetadataParserPP,
     ModifyChaptersPP,
     SponsorBlockPP,
 )
+from yt_dlp.postprocessor.embedthumbnail import _image_dimensions
 
 
 class TestMetadataFromField(unittest.TestCase):
@@ -60,6 +80,392 @@ def test_escaping(self):
         for _, out in tests:
             os.remove(file.format(out))
 
+    def test_combined_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def run(ydl_opts=None):
+                pp = FFmpegThumbnailsConvertorPP(YoutubeDL({'quiet': True, **(ydl_opts or {})}), 'jpg')
+                pp.basename = 'ffmpeg'  # The command is only built, not run
+                calls = []
+                info = {'thumbnails': [], '__files_to_move': {}}
+                for name in ('a.webp', 'b.gif', 'c.jpg'):
+                    path = os.path.join(tmpdir, name)
+                    with open(path, 'wb'):
+                        pass
+                    info['thumbnails'].append({'filepath': path})
+                    info['__files_to_move'][path] = os.path.join('final', name)
+                with unittest.mock.patch.object(
+                        FFmpegThumbnailsConvertorPP, 'real_run_ffmpeg', lambda _, *args: calls.append(args)), \
+                        unittest.mock.patch.object(FFmpegThumbnailsConvertorPP, 'check_version', lambda _: None):
+                    files_to_delete, info = pp.run(info)
+                self.assertEqual(files_to_delete, [os.path.join(tmpdir, 'a.webp'), os.path.join(tmpdir, 'b.gif')])
+                self.assertEqual([t['filepath'] for t in info['thumbnails']], [
+                    os.path.join(tmpdir, name) for name in ('a.jpg', 'b.jpg', 'c.jpg')])
+                self.assertEqual(info['__files_to_move'][os.path.join(tmpdir, 'b.jpg')], os.path.join('final', 'b.jpg'))
+                return [([(path, list(opts)) for path, opts in inputs], [(path, list(opts)) for path, opts in outputs])
+                        for inputs, outputs in calls]
+
+            self.assertEqual(run(), [(
+                [(os.path.join(tmpdir, 'a.webp'), ['-f', 'image2', '-pattern_type', 'none']),
+                 (os.path.join(tmpdir, 'b.gif'), [])],
+                [(os.path.join(tmpdir, 'a.jpg'), ['-map', '0:v', '-update', '1', '-bsf:v', 'mjpeg2jpeg']),
+                 (os.path.join(tmpdir, 'b.jpg'), ['-map', '1:v', '-update', '1', '-bsf:v', 'mjpeg2jpeg'])],
+            )])
+            # Per-file arguments cannot be applied to a combined command
+            calls = run({'postprocessor_args': {'thumbnailsconvertor+ffmpeg_o1': ['-q:v', '2']}})
+            self.assertEqual([len(inputs) for inputs, _ in calls], [1, 1])
+
+
+class TestEmbedThumbnail(unittest.TestCase):
+    def test_image_dimensions(self):
+        tests = (
+            (b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + struct.pack('>II', 640, 360) + b'\x08\x02', (640, 360)),
+            (b'GIF89a' + struct.pack('<HH', 320, 240) + b'\x00' * 20, (320, 240)),
+            (b'RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f'
+             + (1279 | 719 << 14).to_bytes(4, 'little') + b'\x00', (1280, 720)),
+            (b'RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x10\x00\x00\x00'
+             + (1919).to_bytes(3, 'little') + (1079).to_bytes(3, 'little'), (1920, 1080)),
+            (b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + b'\x00' * 9 + b'\xff\xdb\x00\x04\x00\x00'
+             + b'\xff\xc2\x00\x11\x08' + struct.pack('>HH', 480, 854) + b'\x03' + b'\x00' * 20, (854, 480)),
+            (b'\xff\xd8\xff\xe0\x00\x10JFIF', None),
+            (b'not an image', None),
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'thumbnail')
+            for data, expected in tests:
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self.assertEqual(_image_dimensions(path), expected)
+        self.assertEqual(_image_dimensions('test/testdata/thumbnails/foo %d bar/foo_%d.webp'), (479, 309))
+
+
+class TestFFmpegFusedPass(unittest.TestCase):
+    def setUp(self):
+        self.ydl = YoutubeDL({'quiet': True})
+        self.fused_pass = FFmpegFusedPassPP(self.ydl)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _path(self, name):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w'):
+            pass
+        return path
+
+    def _run(self, pp, info):
+        pp.basename = 'ffmpeg'  # The command is only built, not run
+        info['__ffmpeg_pass'] = self.fused_pass
+        return pp.run(info)
+
+    def test_fused_args(self):
+        video, audio, sub = self._path('test.fvideo.mp4'), self._path('test.faudio.m4a'), self._path('test.en.vtt')
+        info = {
+            'id': 'test', 'title': 'Test', 'ext': 'mp4', 'filepath': os.path.join(self.tmpdir.name, 'test.mp4'),
+            'requested_formats': [
+                {'vcodec': 'avc1', 'acodec': 'none', 'protocol': 'https', 'filepath': video},
+                {'vcodec': 'none', 'acodec': 'mp4a', 'protocol': 'https', 'filepath': audio},
+            ],
+            '__files_to_merge': [video, audio],
+            'stretched_ratio': 2,
+            'requested_subtitles': {'en': {'ext': 'vtt', 'filepath': sub}},
+            'chapters': [{'start_time': 0, 'end_time': 10, 'title': 'Intro'}],
+        }
+        for pp in (FFmpegMergerPP(self.ydl), FFmpegFixupStretchedPP(self.ydl),
+                   FFmpegEmbedSubtitlePP(self.ydl), FFmpegMetadataPP(self.ydl, add_metadata=False)):
+            self.assertEqual(self._run(pp, info), ([], info))
+            self.assertTrue(os.path.exists(video))
+
+        meta = os.path.join(self.tmpdir.name, 'test.meta')
+        self.assertEqual(self.fused_pass._make_args(info['filepath'], self.fused_pass._steps), ([video, audio, sub, meta], [
+            '-c', 'copy', '-map', '0:v:0', '-map', '1:a:0',
+            '-aspect', '2.000000',
+            '-map', '-0:s', '-map', '2:0', '-metadata:s:s:0', 'language=eng', '-c:s', 'mov_text',
+            '-map_metadata', '3',
+        ]))
+        self.assertEqual(self.fused_pass._files_to_delete, [video, audio, sub])
+        self.assertEqual(self.fused_pass._temp_files, [meta])
+
+    def test_add(self):
+        self.assertFalse(self.fused_pass.pending)
+        self.assertTrue(self.fused_pass.add(['-aspect', '2']))
+        self.assertTrue(self.fused_pass.pending)
+        # Merging creates the file, so it can only be the first step
+        self.assertFalse(self.fused_pass.add(['-c', 'copy'], inputs=['a', 'b'], merge=True))
+        self.assertTrue(self.fused_pass.add(lambda i: ['-map', f'{i}:0'], inputs=['c'], final=True))
+        self.assertFalse(self.fused_pass.add(['-f', 'mp4']))
+        self.assertEqual(self.fused_pass._make_args('file', self.fused_pass._steps), (['file', 'c'], [
+            '-map', '0', '-dn', '-ignore_unknown', '-c', 'copy', '-aspect', '2', '-map', '1:0']))
+
+    def test_not_fused_without_pass(self):
+        info = {'id': 'test', 'ext': 'mp4', 'filepath': 'test.mp4', 'stretched_ratio': 2}
+        pp = FFmpegFixupStretchedPP(self.ydl)
+        pp.basename = 'ffmpeg'
+        self.assertFalse(pp._queue_fused(info, ['-aspect', '2']))
+        info['__ffmpeg_pass'] = self.fused_pass
+        self.assertTrue(pp._queue_fused(info, ['-aspect', '2']))
+        # Arguments specific to a postprocessor can not be passed to the fused pass
+        self.ydl.params['postprocessor_args'] = {'fixupstretched+ffmpeg_o': ['-threads', '1']}
+        self.assertFalse(pp._queue_fused(info, ['-aspect', '2']))
+
+
+class TestFFmpegProbeCache(unittest.TestCase):
+    @unittest.skipIf(os.name == 'nt', 'the fake executables need to be runnable without an extension')
+    def test_probe_cache(self):
+        probes = []
+
+        def probe(prog, path):
+            probes.append(prog)
+            return {'version': '6.1', 'features': {'setts': True} if prog == 'ffmpeg' else None}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for prog in ('ffmpeg', 'ffprobe'):
+                with open(os.path.join(tmpdir, prog), 'w') as f:
+                    f.write('#!/bin/sh\n')
+                os.chmod(f.name, 0o755)
+            ydl = YoutubeDL({'cachedir': os.path.join(tmpdir, 'cache'), 'ffmpeg_location': tmpdir})
+
+            def get_versions_and_features():
+                # Start with an empty in-process cache, as in a new process
+                with unittest.mock.patch.multiple(
+                        FFmpegPostProcessor, _version_cache={None: None}, _features_cache={},
+                        _probe_ffmpeg_version=staticmethod(probe)):
+                    return FFmpegPostProcessor.get_versions_and_features(ydl)
+
+            expected = ({'ffmpeg': '6.1', 'ffprobe': '6.1'}, {'setts': True})
+            self.assertEqual(get_versions_and_features(), expected)
+            self.assertEqual(probes, ['ffmpeg', 'ffprobe'])
+            self.assertEqual(get_versions_and_features(), expected)
+            self.assertEqual(probes, ['ffmpeg', 'ffprobe'])
+
+            # A changed executable is probed again
+            with open(os.path.join(tmpdir, 'ffmpeg'), 'a') as f:
+                f.write('exit 0\n')
+            self.assertEqual(get_versions_and_features(), expected)
+            self.assertEqual(probes, ['ffmpeg', 'ffprobe', 'ffmpeg'])
+
+
+class TestFFmpegMetadataCache(unittest.TestCase):
+    def test_metadata_cache(self):
+        pp = FFmpegPostProcessor()
+        pp.basename, pp.probe_basename, pp._version = 'ffmpeg', 'ffprobe', '6.1'
+        commands = []
+
+        def run(cmd, **kwargs):
+            commands.append(cmd)
+            return json.dumps({
+                'format': {'duration': '10.0'},
+                'streams': [{'codec_type': 'video', 'codec_name': 'h264'}, {'codec_type': 'audio', 'codec_name': 'aac'}],
+            }), '', 0
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                unittest.mock.patch.object(Popen, 'run', run), \
+                unittest.mock.patch.object(FFmpegPostProcessor, '_metadata_cache', collections.OrderedDict()):
+            path = os.path.join(tmpdir, 'test.mp4')
+            with open(path, 'wb') as f:
+                f.write(b'video')
+
+            self.assertEqual(pp._get_real_video_duration(path), 10.0)
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(pp.get_stream_number(path, ('codec_type', ), 'audio'), (1, 2))
+            self.assertEqual(len(commands), 1)
+
+            # Postprocessors replace the file with their output
+            with open(os.path.join(tmpdir, 'test.temp.mp4'), 'wb') as f:
+                f.write(b'fixed')
+            os.replace(f.name, path)
+            self.assertEqual(pp.get_audio_codec(path), 'aac')
+            self.assertEqual(len(commands), 2)
+
+            # Modifying a result does not affect the cache
+            pp.get_metadata_object(path)['streams'].clear()
+            self.assertEqual(len(pp.get_metadata_object(path)['streams']), 2)
+            self.assertEqual(len(commands), 2)
+
+    def test_metadata_cache_eviction(self):
+        pp = FFmpegPostProcessor()
+        pp.basename, pp.probe_basename, pp._version = 'ffmpeg', 'ffprobe', '6.1'
+        commands = []
+
+        def run(cmd, **kwargs):
+            commands.append(cmd[-1])
+            return json.dumps({'format': {}, 'streams': []}), '', 0
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                unittest.mock.patch.object(Popen, 'run', run), \
+                unittest.mock.patch.object(FFmpegPostProcessor, '_metadata_cache', collections.OrderedDict()), \
+                unittest.mock.patch.object(FFmpegPostProcessor, '_METADATA_CACHE_SIZE', 2):
+            paths = []
+            for name in ('a', 'b', 'c'):
+                paths.append(os.path.join(tmpdir, f'{name}.mp4'))
+                with open(paths[-1], 'wb') as f:
+                    f.write(b'video')
+            a, b, c = paths
+
+            pp.get_metadata_object(a)
+            pp.get_metadata_object(b)
+            pp.get_metadata_object(a)
+            # The least recently used entry is evicted
+            pp.get_metadata_object(c)
+            pp.get_metadata_object(a)
+            pp.get_metadata_object(b)
+            self.assertEqual([os.path.basename(path) for path in commands], ['a.mp4', 'b.mp4', 'c.mp4', 'b.mp4'])
+
+
+def _chapters(*times):
+    return [{'start_time': s, 'end_time': e} for s, e in zip(times, times[1:])]
+
+
+class TestSplitChapters(unittest.TestCase):
+    def test_chapters_are_contiguous(self):
+        self.assertTrue(FFmpegSplitChaptersPP._chapters_are_contiguous(_chapters(0, 10, 20.5, 30), 30))
+        self.assertTrue(FFmpegSplitChaptersPP._chapters_are_contiguous(_chapters(0, 10), 10))
+        self.assertFalse(FFmpegSplitChaptersPP._chapters_are_contiguous(_chapters(5, 10, 20), 20))
+        self.assertFalse(FFmpegSplitChaptersPP._chapters_are_contiguous([
+            {'start_time': 0, 'end_time': 10}, {'start_time': 12, 'end_time': 20}], 20))
+        self.assertFalse(FFmpegSplitChaptersPP._chapters_are_contiguous(_chapters(0, 10, 20), 30))
+        self.assertFalse(FFmpegSplitChaptersPP._chapters_are_contiguous(_chapters(0, 10, 20), None))
+
+    def _split(self, chapters, duration, force_keyframes):
+        calls = []
+
+        def real_run_ffmpeg(_, input_path_opts, output_path_opts):
+            calls.append((input_path_opts, [(path, list(opts)) for path, opts in output_path_opts]))
+            for path, opts in output_path_opts:
+                if '-segment_times' in opts:
+                    for idx in range(len(chapters)):
+                        open(path.replace('%%', '%') % idx, 'wb').close()
+                else:
+                    open(path, 'wb').close()
+
+        def make_keyframes(_, filename, timestamps):
+            keyframe_file = filename.replace('.mp4', '.keyframes.temp.mp4')
+            open(keyframe_file, 'wb').close()
+            return keyframe_file
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                unittest.mock.patch.object(FFmpegSplitChaptersPP, 'real_run_ffmpeg', real_run_ffmpeg), \
+                unittest.mock.patch.object(FFmpegSplitChaptersPP, 'force_keyframes', make_keyframes):
+            filepath = os.path.join(tmpdir, 'test.mp4')
+            open(filepath, 'wb').close()
+            ydl = YoutubeDL({'quiet': True, 'outtmpl': {'chapter': os.path.join(tmpdir, '%(section_number)d.%(ext)s')}})
+            pp = FFmpegSplitChaptersPP(ydl, force_keyframes=force_keyframes)
+            pp.run({
+                'id': 'test', 'ext': 'mp4', 'filepath': filepath,
+                'duration': duration, 'chapters': chapters})
+            self.assertEqual(
+                sorted(os.listdir(tmpdir)), sorted(['test.mp4', *(f'{i + 1}.mp4' for i in range(len(chapters)))]))
+        return calls, filepath
+
+    def test_split_with_segment_muxer(self):
+        calls, filepath = self._split(_chapters(0, 10, 20.5, 30), 30, force_keyframes=True)
+        keyframe_file = filepath.replace('.mp4', '.keyframes.temp.mp4')
+        self.assertEqual(calls, [([(keyframe_file, [])], [(
+            filepath.replace('.mp4', '.keyframes.temp.chapter%03d.temp.mp4'), [
+                '-map', '0', '-dn', '-ignore_unknown', '-c', 'copy',
+                '-f', 'segment', '-reset_timestamps', '1', '-segment_format', 'mp4',
+                '-segment_times', '10.000000,20.500000'])])])
+
+    def test_split_by_seeking(self):
+        chapters = _chapters(0, 10, 20.5, 30)
+        for duration, force_keyframes in ((30, False), (40, True)):
+            calls, filepath = self._split(chapters, duration, force_keyframes=force_keyframes)
+            in_file = filepath.replace('.mp4', '.keyframes.temp.mp4') if force_keyframes else filepath
+            self.assertCountEqual(calls, [
+                ([(in_file, ['-ss', str(start), '-t', str(end - start)])], [(
+                    os.path.join(os.path.dirname(filepath), f'{idx + 1}.mp4'), ['-map', '0', '-dn', '-ignore_unknown', '-c', 'copy'])])
+                for idx, (start, end) in enumerate([(0, 10), (10, 20.5), (20.5, 30)])])
+
+
+class SponsorBlockHandler(http.server.BaseHTTPRequestHandler):
+    VIDEOS = ('video000022', 'video000354', 'video000001', 'video000002')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        prefix = self.path.split('?')[0].rpartition('/')[2]
+        body = json.dumps([{
+            'videoID': video_id,
+            'segments': [{
+                'segment': [0.5, 10], 'category': 'sponsor', 'actionType': 'skip',
+                'videoDuration': 100, 'description': '',
+            }],
+        } for video_id in self.VIDEOS if hashlib.sha256(video_id.encode()).hexdigest().startswith(prefix)]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestSponsorBlockPP(unittest.TestCase):
+    def setUp(self):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SponsorBlockHandler)
+        self.httpd.requests = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.ydl = YoutubeDL({'cachedir': self.tmpdir.name, 'quiet': True})
+        self.patch = unittest.mock.patch.object(SponsorBlockPP, '_buckets', {})
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmpdir.cleanup()
+
+    def _make_pp(self):
+        return SponsorBlockPP(self.ydl, ['sponsor'], f'http://127.0.0.1:{http_server_port(self.httpd)}')
+
+    def _run(self, pp, video_id):
+        _, info = pp.run({'id': video_id, 'extractor_key': 'Youtube', 'duration': 100})
+        return [(c['start_time'], c['end_time']) for c in info['sponsorblock_chapters']]
+
+    def test_bucket_cache(self):
+        pp = self._make_pp()
+        # Both videos have the same hash prefix
+        self.assertEqual(self._run(pp, 'video000022'), [(0, 10)])
+        self.assertEqual(self._run(pp, 'video000354'), [(0, 10)])
+        self.assertEqual(self._run(pp, 'video000022'), [(0, 10)])
+        self.assertEqual(len(self.httpd.requests), 1)
+        self.assertTrue(self.httpd.requests[0].startswith('/api/skipSegments/0249?'))
+
+        # Responses are also kept in the filesystem cache
+        SponsorBlockPP._buckets.clear()
+        self.assertEqual(self._run(self._make_pp(), 'video000354'), [(0, 10)])
+        self.assertEqual(len(self.httpd.requests), 1)
+
+    def test_prefetch(self):
+        pp = self._make_pp()
+        pp.prefetch([{'id': video_id, 'ie_key': 'Youtube'} for video_id in SponsorBlockHandler.VIDEOS])
+        for _, future in list(SponsorBlockPP._buckets.values()):
+            future.result()
+        self.assertEqual(len(self.httpd.requests), 3)
+        for video_id in SponsorBlockHandler.VIDEOS:
+            self.assertEqual(self._run(pp, video_id), [(0, 10)])
+        self.assertEqual(self._run(pp, 'video000003'), [])
+        self.assertEqual(len(self.httpd.requests), 4)
+
+    def test_expiry(self):
+        pp = self._make_pp()
+        with unittest.mock.patch.object(SponsorBlockPP, 'CACHE_MAX_SIZE', 0):
+            self.assertEqual(self._run(pp, 'video000022'), [(0, 10)])
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir.name, 'sponsorblock')), [])
+
+        (url, (_, future)), = SponsorBlockPP._buckets.items()
+        SponsorBlockPP._buckets[url] = (0, future)
+        self._run(pp, 'video000003')
+        self.assertNotIn(url, SponsorBlockPP._buckets)
+
+    def test_close(self):
+        pp = self._make_pp()
+        self.ydl.add_post_processor(pp)
+        self._run(pp, 'video000022')
+        executor = pp._executor
+        self.ydl.close()
+        self.assertIsNone(pp._executor)
+        self.assertRaises(RuntimeError, executor.submit, print)
+
 
 class TestExec(unittest.TestCase):
     def test_parse_cmd(self):
@@ -596,6 +1002,75 @@ def test_make_concat_opts_NoZeroDurationChunkAtVideoEnd(self):
         opts = self._pp._make_concat_opts(sponsor_chapters, 20)
         self.assertEqual(expected, ''.join(self._pp._concat_spec(['test'] * len(opts), opts)))
 
+    def test_split_at_keyframes(self):
+        sponsor_chapters = [self._chapter(0, 2, 's1'), self._chapter(10, 20, 's2'), self._chapter(25, 27, 's3')]
+        opts = self._pp._make_concat_opts(sponsor_chapters, 60)
+        self.assertEqual(list(self._pp._split_at_keyframes(opts, [0, 4, 12, 20.0005, 24, 30, 36])), [
+            ({'inpoint': '2.000000', 'outpoint': '4.000000'}, True),
+            ({'inpoint': '4.000000', 'outpoint': '10.000000'}, False),
+            ({'inpoint': '20.000000', 'outpoint': '25.000000'}, False),
+            ({'inpoint': '27.000000', 'outpoint': '30.000000'}, True),
+            ({'inpoint': '30.000000'}, False),
+        ])
+        # No keyframe within the section
+        self.assertEqual(list(self._pp._split_at_keyframes(opts, [0, 12, 40])), [
+            ({'inpoint': '2.000000', 'outpoint': '10.000000'}, True),
+            ({'inpoint': '20.000000', 'outpoint': '25.000000'}, True),
+            ({'inpoint': '27.000000', 'outpoint': '40.000000'}, True),
+            ({'inpoint': '40.000000'}, False),
+        ])
+
+    def test_smart_cut_files(self):
+        commands = []
+        metadata = {'format': {'start_time': '0.000000'}, 'streams': [
+            {'index': 0, 'codec_type': 'video', 'codec_name': 'mjpeg', 'disposition': {'attached_pic': 1}},
+            {'index': 1, 'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High', 'level': 31,
+             'pix_fmt': 'yuv420p', 'color_range': 'tv', 'color_space': 'unknown'},
+            {'index': 2, 'codec_type': 'audio', 'codec_name': 'aac'},
+        ]}
+        self._pp.get_metadata_object = lambda path: metadata
+        self._pp.get_keyframes = lambda path, stream, read_intervals: (
+            commands.append((stream, read_intervals)) or [0, 4, 30])
+        self._pp.real_run_ffmpeg = lambda inputs, outputs: commands.append((inputs, outputs))
+
+        opts = self._pp._make_concat_opts([self._chapter(10, 20, 's1'), self._chapter(40, 50, 's2')], 60)
+        in_files, concat_opts, temp_files = self._pp._smart_cut_files('test.mp4', opts)
+        self.assertEqual(in_files, ['test.mp4', 'test.smartcut1.temp.mp4', 'test.mp4', 'test.smartcut3.temp.mp4'])
+        self.assertEqual(concat_opts, [
+            {'outpoint': '10.000000'}, {'duration': '10.000000'}, {'inpoint': '30.000000', 'outpoint': '40.000000'}, {}])
+        self.assertEqual(temp_files, ['test.smartcut1.temp.mp4', 'test.smartcut3.temp.mp4'])
+        encode_opts = [
+            '-map', '0', '-dn', '-ignore_unknown', '-c', 'copy', '-c:s', 'mov_text', '-copypriorss', '0',
+            '-c:1', 'libx264', '-crf:1', '18', '-profile:1', 'high', '-pix_fmt:1', 'yuv420p',
+            '-color_range:1', 'tv', '-level:1', '3.1']
+        self.assertEqual(commands, [
+            (1, '20.000000%+60,50.000000%+60'),
+            ([('test.mp4', ['-seek_timestamp', '1', '-ss', '20.000000'])],
+             [('test.smartcut1.temp.mp4', ['-t', '10.000000', *encode_opts])]),
+            ([('test.mp4', ['-seek_timestamp', '1', '-ss', '50.000000'])], [('test.smartcut3.temp.mp4', encode_opts)]),
+        ])
+
+        # The parameter sets of hevc are put in every keyframe of the copied sections
+        commands.clear()
+        metadata['streams'][1].update({'codec_name': 'hevc', 'profile': 'Main', 'level': 93})
+        metadata['streams'].pop(0)
+        self._pp.get_keyframes = lambda path, stream, read_intervals: [0, 22]
+        in_files, concat_opts, temp_files = self._pp._smart_cut_files('test.mkv', opts[:2])
+        self.assertEqual(in_files, ['test.smartcut.temp.mkv', 'test.smartcut1.temp.mkv', 'test.smartcut.temp.mkv'])
+        self.assertEqual(concat_opts, [{'outpoint': '10.000000'}, {'duration': '2.000000'}, {
+            'inpoint': '22.000000', 'outpoint': '40.000000'}])
+        self.assertEqual(temp_files, ['test.smartcut.temp.mkv', 'test.smartcut1.temp.mkv'])
+        self.assertEqual(commands[0], ([('test.mkv', [])], [('test.smartcut.temp.mkv', [
+            '-map', '0', '-dn', '-ignore_unknown', '-c', 'copy', '-bsf:1', 'hevc_mp4toannexb'])]))
+        self.assertIn('repeat-headers=1:log-level=error:level-idc=3.1', commands[1][1][0][1])
+
+        # Audio can be cut anywhere, but unknown video codecs can not be smart cut
+        metadata['streams'].pop(0)
+        self.assertEqual(self._pp._smart_cut_files('test.m4a', opts), (['test.m4a'] * 3, opts, []))
+        metadata['streams'].append({'index': 1, 'codec_type': 'video', 'codec_name': 'prores'})
+        with self.assertRaisesRegex(PostProcessingError, 'prores'):
+            self._pp._smart_cut_files('test.mov', opts)
+
     def test_quote_for_concat_RunsOfQuotes(self):
         self.assertEqual(
             r"'special '\'' '\'\''characters'\'\'\''galore'",
@@ -610,3 +1085,58 @@ def test_quote_for_concat_QuotesAtEnd(self):
         self.assertEqual(
             r"'special '\'' characters '\'' galore'\'\'\'",
             self._pp._quote_for_ffmpeg("special ' characters ' galore'''"))
+
+
+class TestSmartCut(unittest.TestCase):
+    def test_get_keyframes(self):
+        pp = FFmpegPostProcessor()
+        pp.basename, pp.probe_basename, pp._version = 'ffmpeg', 'ffprobe', '6.1'
+        # The keyframe at 2s is followed by frames that are shown before it
+        packets = '0.000000,K__\n0.066667,___\n0.033333,___\n2.000000,K__\n1.966667,___\n2.033333,___\n4.000000,K__\nN/A,K__\n'
+        with unittest.mock.patch.object(Popen, 'run', lambda cmd, **kwargs: (packets, '', 0)):
+            self.assertEqual(pp.get_keyframes('test.mp4', 0), [0.0, 4.0])
+
+    def _frames(self, pp, path):
+        stdout, stderr, _ = Popen.run([
+            pp.executable, '-loglevel', 'error', '-i', path, '-map', '0:v', '-fps_mode', 'passthrough', '-f', 'framemd5', '-'],
+            text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.assertNotRegex(stderr, r'\[h264 @')
+        return [line.rpartition(',')[2].strip() for line in stdout.splitlines() if not line.startswith('#')]
+
+    def test_smart_cut(self):
+        pp = FFmpegPostProcessor()
+        if not pp.available or not pp.probe_available:
+            self.skipTest('ffmpeg not found')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source, path, sub_path = (os.path.join(tmpdir, name) for name in ('source.mp4', 'test.mp4', 'test.en.srt'))
+            _, stderr, returncode = Popen.run([
+                pp.executable, '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=160x90:rate=30:duration=10',
+                '-f', 'lavfi', '-i', 'sine=duration=10', '-c:v', 'libx264', '-profile:v', 'main',
+                '-x264-params', 'keyint=60:min-keyint=60:scenecut=0:cabac=0', '-c:a', 'aac', source],
+                text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if returncode:
+                self.skipTest(f'Unable to encode h264 video: {stderr.strip()}')
+            shutil.copyfile(source, path)
+            with open(sub_path, 'w', encoding='utf-8') as f:
+                f.write('1\n00:00:01,000 --> 00:00:02,000\nBefore\n\n2\n00:00:08,000 --> 00:00:09,000\nAfter\n')
+
+            # The cut ends at 5.7s, in the middle of the GOP of the keyframe at 4s
+            files_to_delete, _ = ModifyChaptersPP(
+                YoutubeDL({'quiet': True}), remove_ranges=[(3.3, 5.7)], smart_cut=True,
+            ).run({
+                'id': 'test', 'title': 'test', 'filepath': path, 'duration': 10, '__real_download': True,
+                'requested_subtitles': {'en': {'ext': 'srt', 'filepath': sub_path}},
+            })
+            for file in files_to_delete:
+                os.remove(file)
+            self.assertCountEqual(os.listdir(tmpdir), ['source.mp4', 'test.mp4', 'test.en.srt'])
+
+            # Only the frames from the cut to the next keyframe are re-encoded
+            source_frames, frames = self._frames(pp, source), self._frames(pp, path)
+            self.assertEqual(frames[:99], source_frames[:99])
+            self.assertEqual(frames[-120:], source_frames[180:])
+            self.assertEqual(len([frame for frame in frames if frame not in source_frames]), 9)
+            self.assertAlmostEqual(pp._get_real_video_duration(path), 7.6, delta=0.1)
+            with open(sub_path, encoding='utf-8') as f:
+                self.assertIn('00:00:05,600 --> 00:00:06,600', f.read())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Allow direct execution
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import json
+
+from yt_dlp.subtitles import can_convert, convert
+
+VTT = b'''\xef\xbb\xbfWEBVTT
+
+00:00:01.000 --> 00:00:02.500
+Hello <i>world</i> &amp; <c.red>red</c>
+
+00:01:02.000 --> 00:01:04.000 align:start
+Line one
+<b>Line {two}</b>
+'''
+
+SRT = b'''1
+00:00:01,000 --> 00:00:02,500
+Hello <i>world</i> & <font color="#FF0000">red</font>
+
+2
+00:01:02,000 --> 00:01:04,000
+Line one
+<b>Line {two}</b>
+'''
+
+
+def _convert(data, from_ext, to_ext):
+    return ''.join(convert(data, from_ext, to_ext))
+
+
+class TestSubtitlesConversion(unittest.TestCase):
+    def test_can_convert(self):
+        self.assertTrue(can_convert('vtt', 'srt'))
+        self.assertTrue(can_convert('json3', 'ass'))
+        self.assertFalse(can_convert('ass', 'srt'))
+        self.assertFalse(can_convert('vtt', 'json3'))
+        with self.assertRaises(ValueError):
+            convert(b'', 'ass', 'srt')
+
+    def test_vtt_to_srt(self):
+        self.assertEqual(_convert(VTT, 'vtt', 'srt'), '''1
+00:00:01,000 --> 00:00:02,500
+Hello <i>world</i> & <font color="#ff0000">red</font>
+
+2
+00:01:02,000 --> 00:01:04,000
+Line one
+<b>Line {two}</b>
+
+''')
+
+    def test_srt_to_vtt(self):
+        self.assertEqual(_convert(SRT.replace(b'& ', b'&<'), 'srt', 'vtt'), '''WEBVTT
+
+00:00:01.000 --> 00:00:02.500
+Hello <i>world</i> &amp;&lt;<c.red>red</c>
+
+00:01:02.000 --> 00:01:04.000
+Line one
+<b>Line {two}</b>
+
+''')
+
+    def test_to_ass(self):
+        ass = _convert(VTT, 'vtt', 'ass')
+        self.assertTrue(ass.startswith('[Script Info]\n'))
+        self.assertIn('\n[Events]\n', ass)
+        self.assertEqual(ass.splitlines()[-2:], [
+            r'Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,Hello {\i1}world{\r} & {\c&H0000FF&}red{\r}',
+            r'Dialogue: 0,0:01:02.00,0:01:04.00,Default,,0,0,0,,Line one\N{\b1}Line \{two\}{\r}',
+        ])
+        self.assertEqual(ass, _convert(SRT, 'srt', 'ass'))
+
+    def test_to_lrc(self):
+        self.assertEqual(_convert(VTT, 'vtt', 'lrc'), '''[00:01.00]Hello world & red
+[01:02.00]Line one
+[01:02.00]Line {two}
+''')
+
+    def test_json3(self):
+        data = json.dumps({
+            'pens': [{}, {'iAttr': 1, 'fcForeColor': 0x00FF00}],
+            'events': [
+                {'tStartMs': 500, 'dDurationMs': 1000, 'segs': [{'utf8': 'hi '}, {'utf8': 'there', 'pPenId': 1}]},
+                {'tStartMs': 900, 'dDurationMs': 10, 'segs': [{'utf8': '\n'}]},
+                {'tStartMs': 2000, 'dDurationMs': 500, 'segs': [{'utf8': 'a\n\nb'}]},
+            ],
+        }).encode()
+        self.assertEqual(_convert(data, 'json3', 'srt'), '''1
+00:00:00,500 --> 00:00:01,500
+hi <font color="#00ff00"><i>there</i></font>
+
+2
+00:00:02,000 --> 00:00:02,500
+a
+b
+
+''')
+
+    def test_ttml(self):
+        data = b'''<tt xmlns="http://www.w3.org/ns/ttml"><body><div>
+            <p begin="00:00:01.000" end="00:00:02.000">Hi<br/>there</p>
+        </div></body></tt>'''
+        self.assertEqual(_convert(data, 'ttml', 'vtt'), 'WEBVTT\n\n00:00:01.000 --> 00:00:02.000\nHi\nthere\n\n')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            _convert(b'garbage', 'vtt', 'srt')
+        with self.assertRaises(ValueError):
+            _convert(b'<tt>', 'ttml', 'srt')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import collections
 import http.cookies
 import re
 import xml.etree.ElementTree
@@ -420,6 +421,33 @@ def test_traversal_morsel(self):
         assert traverse_obj(morsel, [(None,), any]) == morsel, \
             'Morsel should not be implicitly changed to dict on usage'
 
+    def test_traversal_simple_path(self):
+        # Paths of only `str`/`int` keys take a shortcut and should match the generic behaviour
+        assert traverse_obj(_TEST_DATA, ('urls', -1, 'index')) == 1, \
+            'negative list index should work'
+        assert traverse_obj(_TEST_DATA, ('data', 1, 'index')) == 3, \
+            'tuple index should work'
+        assert traverse_obj(_TEST_DATA, ('urls', 5, 'index')) is None, \
+            'out of range index should return `None`'
+        assert traverse_obj(_TEST_DATA, ('str', 0)) is None, \
+            'strings should not be indexed'
+        assert traverse_obj(_TEST_DATA, ('urls', 'index')) is None, \
+            'lists should not be indexed by strings'
+        assert traverse_obj(_TEST_DATA, ('None', 'a', 0)) is None, \
+            'traversal through `None` should return `None`'
+        assert traverse_obj(_TEST_DATA, ('dict',), default='default') == 'default', \
+            'empty dict should be discarded'
+        assert traverse_obj(_TEST_DATA, ('urls', 0, 'index'), expected_type=str) is None, \
+            'expected_type should be applied'
+        assert traverse_obj(re.match(r'(?P<a>a)', 'a'), 'a') == 'a', \
+            'non-container objects should be traversed'
+        assert traverse_obj({'a': collections.OrderedDict(b='c')}, ('a', 'b')) == 'c', \
+            'Mapping subclasses should be traversed'
+        assert traverse_obj({'A': 'b'}, 'a', casesense=False) == 'b', \
+            'casesense should be respected'
+        assert traverse_obj(_TEST_DATA, (k for k in ('urls', ..., 'index'))) == [0, 1], \
+            'generator paths should only be consumed once'
+
 
 class TestDictGet:
     def test_dict_get(self):
@@ -15,6 +15,8 @@
 import itertools
 import json
 import subprocess
+import threading
+import time
 import xml.etree.ElementTree
 
 from yt_dlp.compat import (
@@ -28,6 +30,7 @@
     ExtractorError,
     InAdvancePagedList,
     LazyList,
+    LazySequence,
     NO_DEFAULT,
     OnDemandPagedList,
     Popen,
@@ -137,6 +140,7 @@
     normalize_url,
     remove_dot_segments,
 )
+from yt_dlp.utils.progress import BandwidthLimiter
 
 
 class TestUtil(unittest.TestCase):
@@ -1938,6 +1942,32 @@ def test(ll, idx, val, cache):
         ll = reversed(ll)
         test(ll, -15, 14, range(15))
 
+    def test_LazySequence(self):
+        calls = []
+
+        def getter(idx):
+            calls.append(idx)
+            return idx * 2
+
+        ls = LazySequence(5, getter)
+        self.assertEqual(calls, [])
+        self.assertEqual(len(ls), 5)
+        self.assertEqual(ls[1], 2)
+        self.assertEqual(ls[-1], 8)
+        self.assertEqual(ls[1:4], [2, 4, 6])
+        self.assertEqual(ls[::-2], [8, 4, 0])
+        self.assertRaises(IndexError, lambda: ls[5])
+        self.assertEqual(calls, [1, 4, 1, 2, 3, 4, 2, 0])
+        self.assertEqual(list(ls), [0, 2, 4, 6, 8])
+        self.assertEqual(ls, [0, 2, 4, 6, 8])
+        self.assertNotEqual(ls, [0, 2, 4])
+
+        ls = [-1] + ls + LazySequence(2, lambda i: i + 10) + []  # noqa: RUF005
+        self.assertIsInstance(ls, LazySequence)
+        self.assertEqual(len(ls._parts), 4)
+        self.assertEqual(list(ls), [-1, 0, 2, 4, 6, 8, 10, 11])
+        self.assertEqual(ls[6], 10)
+
     def test_format_bytes(self):
         self.assertEqual(format_bytes(0), '0.00B')
         self.assertEqual(format_bytes(1000), '1000.00B')
@@ -2142,6 +2172,39 @@ def run_shell(args):
             assert run_shell(args) == expected
             assert run_shell(shell_quote(args, shell=True)) == expected
 
+    def test_bandwidth_limiter(self):
+        limiter = BandwidthLimiter(200_000)
+        self.assertIs(BandwidthLimiter.get(1000), BandwidthLimiter.get(1000))
+        video, audio = limiter.share(), limiter.share(priority=2)
+        # Inactive shares do not take any of the rate
+        self.assertEqual(video.rate, 200_000)
+        with audio.hold():
+            self.assertAlmostEqual(video.rate, 200_000 / 3)
+            self.assertEqual(audio.rate, 200_000)
+            with video.hold():
+                self.assertAlmostEqual(audio.rate, 200_000 * 2 / 3)
+        self.assertEqual(video.rate, 200_000)
+
+        downloaded = {video: 0, audio: 0}
+        deadline = time.monotonic() + 1
+
+        def download(share):
+            while time.monotonic() < deadline:
+                share.consume(2000)
+                downloaded[share] += 2000
+
+        # Several threads per share, as with concurrent fragment downloads
+        threads = [threading.Thread(target=download, args=(share,)) for share in (video, video, video, audio)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rate = sum(downloaded.values()) / (time.monotonic() - start)
+        self.assertLess(rate, 200_000 * 1.2)
+        self.assertGreater(rate, 200_000 * 0.6)
+        self.assertAlmostEqual(downloaded[audio] / downloaded[video], 2, delta=0.5)
+
 
 if __name__ == '__main__':
     unittest.main()
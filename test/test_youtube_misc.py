@@ -4,10 +4,16 @@
 import os
 import sys
 import unittest
+import unittest.mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import tempfile
+import threading
+import time
+
+from test.helper import FakeYDL
 from yt_dlp.extractor import YoutubeIE
 
 
@@ -21,6 +27,52 @@ def test_youtube_extract(self):
         assertExtractId('http://www.youtube.com/watch?v=BaW_jenozKcsharePLED17F32AD9753930', 'BaW_jenozKc')
         assertExtractId('BaW_jenozKc', 'BaW_jenozKc')
 
+    def test_load_player_cache(self):
+        player_url = 'https://www.youtube.com/s/player/0123abcd/player_ias.vflset/en_US/base.js'
+        downloads = []
+
+        def download_webpage(url, *args, **kwargs):
+            downloads.append(url)
+            time.sleep(0.1)
+            return 'var player;'
+
+        with tempfile.TemporaryDirectory() as cachedir:
+            ie = YoutubeIE(FakeYDL({'cachedir': cachedir}))
+            ie._download_webpage = download_webpage
+            # The player is not stored a second time by the HTTP cache
+            self.assertIs(ie._get_http_cache_max_age(player_url), False)
+            try:
+                threads = [threading.Thread(target=ie._load_player, args=('id', player_url)) for _ in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(downloads, [player_url])
+
+                YoutubeIE._code_cache.pop('0123abcd')
+                ie = YoutubeIE(FakeYDL({'cachedir': cachedir}))
+                ie._download_webpage = download_webpage
+                self.assertEqual(ie._load_player('id', player_url), 'var player;')
+                self.assertEqual(len(downloads), 1)
+
+                YoutubeIE._code_cache.pop('0123abcd')
+                with open(os.path.join(cachedir, 'youtube-player', '0123abcd.bin'), 'wb') as f:
+                    f.write(b'corrupt')
+                ie.report_warning = lambda *args, **kwargs: None
+                self.assertEqual(ie._load_player('id', player_url), 'var player;')
+                self.assertEqual(len(downloads), 2)
+                self.assertEqual(YoutubeIE._player_js_locks, {})
+
+                # Only the most recently used players are kept in memory
+                other_url = player_url.replace('0123abcd', '4567cdef')
+                with unittest.mock.patch.object(YoutubeIE, '_CODE_CACHE_SIZE', 1):
+                    ie._load_player('id', other_url)
+                self.assertNotIn('0123abcd', YoutubeIE._code_cache)
+                self.assertIn('4567cdef', YoutubeIE._code_cache)
+            finally:
+                YoutubeIE._code_cache.pop('0123abcd', None)
+                YoutubeIE._code_cache.pop('4567cdef', None)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 import contextlib
 import copy
 import datetime as dt
@@ -19,12 +20,13 @@
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import tokenize
 import traceback
 import unicodedata
 
-from .cache import Cache
+from .cache import Cache, HTTPCache
 from .compat import urllib  # isort: split
 from .compat import compat_os_name, urllib_req_to_req
 from .cookies import CookieLoadError, LenientSimpleCookie, load_cookies
@@ -35,7 +37,7 @@
 from .extractor.openload import PhantomJSwrapper
 from .minicurses import format_text
 from .networking import HEADRequest, Request, RequestDirector
-from .networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES
+from .networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES, DEFAULT_TIMEOUT
 from .networking.exceptions import (
     HTTPError,
     NoSupportingHandlers,
@@ -54,6 +56,7 @@
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
     FFmpegFixupTimestampPP,
+    FFmpegFusedPassPP,
     FFmpegMergerPP,
     FFmpegPostProcessor,
     FFmpegVideoConvertorPP,
@@ -90,6 +93,7 @@
     GeoRestrictedError,
     ISO3166Utils,
     LazyList,
+    LazySequence,
     MaxDownloadsReached,
     Namespace,
     PagedList,
@@ -296,6 +300,8 @@ class YoutubeDL:
     allow_playlist_files: Whether to write playlists' description, infojson etc
                        also to disk when using the 'write*' options
     write_all_thumbnails:  Write all thumbnail formats to files
+    thumbnail_timeout: Time limit in seconds for downloading the thumbnails
+                       of each video. The remaining thumbnails are skipped
     writelink:         Write an internet shortcut file, depending on the
                        current platform (.url/.webloc/.desktop)
     writeurllink:      Write a Windows internet shortcut file (.url)
@@ -314,6 +320,8 @@ class YoutubeDL:
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    http_cache:        Cache webpages downloaded by the extractors in the
+                       filesystem cache, honouring their HTTP caching headers
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -355,6 +363,9 @@ class YoutubeDL:
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
+    request_trace_file: Append timing information of every network request
+                       to this file as JSON lines.
+                       See RequestDirector for the recorded fields
     default_search:    Prepend this string if an input url is not valid.
                        'auto' for elaborate guessing
     encoding:          Use this encoding instead of the system-specified.
@@ -409,6 +420,15 @@ class YoutubeDL:
 
                        Progress hooks are guaranteed to be called at least twice
                        (with status "started" and "finished") if the processing is successful.
+    postprocessor_workers: Number of videos that can be postprocessed in background
+                       threads while the next ones are downloaded. The "after_move"
+                       postprocessors, post_hooks and the download archive are
+                       still handled in order in the main thread. The postprocessing
+                       is finished when download() or the top-level extract_info()
+                       returns. The "post_process" postprocessors, their
+                       postprocessor_hooks and the progress_hooks of the downloaders
+                       they start may then be called from the worker threads, with
+                       several videos being processed at once, so they must be thread-safe
     merge_output_format: "/" separated list of extensions to use when merging formats.
     final_ext:         Expected final extension; used to detect when the file was
                        already downloaded and converted
@@ -419,6 +439,11 @@ class YoutubeDL:
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
     source_address:    Client-side IP address to bind to.
+    dns_cache_ttl:     Time to reuse resolved host addresses for, in seconds.
+                       0 disables the DNS cache
+    happy_eyeballs_delay: Time to wait for a connection attempt before also
+                       trying the next address of a host, in seconds.
+                       0 tries the addresses one after another
     impersonate:       Client to impersonate for requests.
                        An ImpersonateTarget (from yt_dlp.networking.impersonate)
     sleep_interval_requests: Number of seconds to sleep between requests
@@ -494,9 +519,9 @@ class YoutubeDL:
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see yt_dlp/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, throttledratelimit, min_filesize,
-    max_filesize, test, noresizebuffer, retries, file_access_retries, fragment_retries,
-    continuedl, xattr_set_filesize, hls_use_mpegts, http_chunk_size,
+    nopart, updatetime, buffersize, ratelimit, prioritize_audio_rate, throttledratelimit,
+    min_filesize, max_filesize, test, noresizebuffer, retries, file_access_retries,
+    fragment_retries, continuedl, xattr_set_filesize, hls_use_mpegts, http_chunk_size,
     external_downloader_args, concurrent_fragment_downloads, progress_delta.
 
     The following options are used by the post processors:
@@ -634,10 +659,15 @@ def __init__(self, params=None, auto_init=True):
         self._download_retcode = 0
         self._num_downloads = 0
         self._num_videos = 0
+        self._postprocessing_jobs = collections.deque()
+        self._extraction_depth = 0
         self._playlist_level = 0
         self._playlist_urls = set()
         self.cache = Cache(self)
+        self.http_cache = HTTPCache(self)
         self.__header_cookies = []
+        self._request_trace_file = None
+        self._request_trace_lock = threading.Lock()
 
         stdout = sys.stderr if self.params.get('logtostderr') else sys.stdout
         self._out_files = Namespace(
@@ -992,10 +1022,37 @@ def __exit__(self, *args):
         self.close()
 
     def close(self):
-        self.save_cookies()
-        if '_request_director' in self.__dict__:
-            self._request_director.close()
-            del self._request_director
+        def close_postprocessing():
+            if '_postprocessor_executor' in self.__dict__:
+                try:
+                    self._finish_postprocessing()
+                finally:
+                    self._postprocessor_executor.shutdown()
+                    del self._postprocessor_executor
+
+        def close_request_director():
+            if '_request_director' in self.__dict__:
+                self._request_director.close()
+                del self._request_director
+
+        def close_request_trace():
+            with self._request_trace_lock:
+                if self._request_trace_file:
+                    self._request_trace_file.close()
+                    self._request_trace_file = None
+
+        # Every step is run even if an earlier one fails, and the first error is raised afterwards
+        errors = []
+        for cleanup in (
+                self.save_cookies, close_postprocessing,
+                *(pp.close for pp in itertools.chain.from_iterable(self._pps.values())),
+                close_request_director, close_request_trace):
+            try:
+                cleanup()
+            except BaseException as err:
+                errors.append(err)
+        if errors:
+            raise errors[0]
 
     def trouble(self, message=None, tb=None, is_error=True):
         """Determine action to take when a download problem appears.
@@ -1612,7 +1669,14 @@ def extract_info(self, url, download=True, ie_key=None, extra_info=None,
                 if self.params.get('break_on_existing', False):
                     raise ExistingVideoReached
                 break
-            return self.__extract_info(url, self.get_info_extractor(key), download, extra_info, process)
+            self._extraction_depth += 1
+            try:
+                info = self.__extract_info(url, self.get_info_extractor(key), download, extra_info, process)
+            finally:
+                self._extraction_depth -= 1
+            if not self._extraction_depth:
+                self._finish_postprocessing()
+            return info
         else:
             extractors_restricted = self.params.get('allowed_extractors') not in (None, ['default'])
             self.report_error(f'No suitable extractor{format_field(ie_key, None, " (%s)")} found for URL {url}',
@@ -2021,6 +2085,11 @@ def __process_playlist(self, ie_result, download):
         self.to_screen(f'[{ie_result["extractor"]}] Playlist {title}: Downloading {n_entries} items'
                        f'{format_field(ie_result, "playlist_count", " of %s")}')
 
+        if not lazy:
+            upcoming = [entry for _, entry in entries if entry]
+            for pp in itertools.chain.from_iterable(self._pps.values()):
+                pp.prefetch(upcoming)
+
         keep_resolved_entries = self.params.get('extract_flat') != 'discard'
         if self.params.get('extract_flat') == 'discard_in_playlist':
             keep_resolved_entries = ie_result['_type'] != 'playlist'
@@ -2068,6 +2137,9 @@ def __process_playlist(self, ie_result, download):
             if keep_resolved_entries:
                 resolved_entries[i] = (playlist_index, entry_result)
 
+        # The entries are only final once their postprocessing is done
+        self._finish_postprocessing()
+
         # Update with processed data
         ie_result['entries'] = [e for _, e in resolved_entries if e is not NO_DEFAULT]
         ie_result['requested_entries'] = [i for i, e in resolved_entries if e is not NO_DEFAULT]
@@ -3023,13 +3095,17 @@ def to_screen(*msg):
                 if max_downloads_reached:
                     break
 
-            write_archive = {f.get('__write_download_archive', False) for f in downloaded_formats}
-            assert write_archive.issubset({True, False, 'ignore'})
-            if True in write_archive and False not in write_archive:
-                self.record_download_archive(info_dict)
-
             info_dict['requested_downloads'] = downloaded_formats
-            info_dict = self.run_all_pps('after_video', info_dict)
+
+            def finish_video():
+                nonlocal info_dict
+                write_archive = {f.get('__write_download_archive', False) for f in downloaded_formats}
+                assert write_archive.issubset({True, False, 'ignore'})
+                if True in write_archive and False not in write_archive:
+                    self.record_download_archive(info_dict)
+                info_dict = self.run_all_pps('after_video', info_dict)
+
+            self._after_postprocessing(finish_video)
             if max_downloads_reached:
                 raise MaxDownloadsReached
 
@@ -3557,18 +3633,30 @@ def ffmpeg_fixup(cndn, msg, cls):
                     ffmpeg_fixup(downloader == 'web_socket_fragment', 'Malformed duration detected', FFmpegFixupDurationPP)
 
                 fixup()
-                try:
-                    replace_info_dict(self.post_process(dl_filename, info_dict, files_to_move))
-                except PostProcessingError as err:
-                    self.report_error(f'Postprocessing: {err}')
-                    return
-                try:
-                    for ph in self._post_hooks:
-                        ph(info_dict['filepath'])
-                except Exception as err:
-                    self.report_error(f'post hooks: {err}')
+
+                # Background postprocessing finishes while later videos are being processed
+                error_prefix = f'[{info_dict["id"]}] ' if self.params.get('postprocessor_workers') else ''
+
+                def finish_postprocessing(post_process):
+                    try:
+                        replace_info_dict(self.run_all_pps('after_move', post_process()))
+                    except PostProcessingError as err:
+                        self.report_error(f'{error_prefix}Postprocessing: {err}')
+                        return False
+                    try:
+                        for ph in self._post_hooks:
+                            ph(info_dict['filepath'])
+                    except Exception as err:
+                        self.report_error(f'{error_prefix}post hooks: {err}')
+                        return False
+                    info_dict['__write_download_archive'] = True
+
+                # info_dict can be modified by the caller while postprocessing in the background
+                if self._postprocess(functools.partial(
+                        self._post_process_and_move, dl_filename,
+                        dict(info_dict) if self.params.get('postprocessor_workers') else info_dict,
+                        files_to_move), finish_postprocessing) is False:
                     return
-                info_dict['__write_download_archive'] = True
 
         assert info_dict is original_infodict  # Make sure the info_dict was modified in-place
         if self.params.get('force_write_download_archive'):
@@ -3585,12 +3673,14 @@ def wrapper(*args, **kwargs):
             except UnavailableVideoError as e:
                 self.report_error(e)
             except DownloadCancelled as e:
+                self._finish_postprocessing()
                 self.to_screen(f'[info] {e}')
                 if not self.params.get('break_per_url'):
                     raise
                 self._num_downloads = 0
             else:
                 if self.params.get('dump_single_json', False):
+                    self._finish_postprocessing()
                     self.post_extract(res)
                     self.to_stdout(json.dumps(self.sanitize_info(res)))
         return wrapper
@@ -3609,6 +3699,7 @@ def download(self, url_list):
             self.__download_wrapper(self.extract_info)(
                 url, force_generic_extractor=self.params.get('force_generic_extractor', False))
 
+        self._finish_postprocessing()
         return self._download_retcode
 
     def download_with_info_file(self, info_filename):
@@ -3631,6 +3722,7 @@ def download_with_info_file(self, info_filename):
                 self.download([webpage_url])
             except ExtractorError as e:
                 self.report_error(e)
+        self._finish_postprocessing()
         return self._download_retcode
 
     @staticmethod
@@ -3659,7 +3751,7 @@ def sanitize_info(info_dict, remove_private_keys=False):
         def filter_fn(obj):
             if isinstance(obj, dict):
                 return {k: filter_fn(v) for k, v in obj.items() if not reject(k, v)}
-            elif isinstance(obj, (list, tuple, set, LazyList)):
+            elif isinstance(obj, (list, tuple, set, LazyList, LazySequence)):
                 return list(map(filter_fn, obj))
             elif obj is None or isinstance(obj, (str, int, float, bool)):
                 return obj
@@ -3723,8 +3815,13 @@ def run_pp(self, pp, infodict):
     def run_all_pps(self, key, info, *, additional_pps=None):
         if key != 'video':
             self._forceprint(key, info)
+        fused_pass = info.get('__ffmpeg_pass')
         for pp in (additional_pps or []) + self._pps[key]:
+            if fused_pass and fused_pass.pending and not getattr(pp, '_FUSABLE', False):
+                info = self.run_pp(fused_pass, info)
             info = self.run_pp(pp, info)
+        if fused_pass and fused_pass.pending:
+            info = self.run_pp(fused_pass, info)
         return info
 
     def pre_process(self, ie_info, key='pre_process', files_to_move=None):
@@ -3738,14 +3835,54 @@ def pre_process(self, ie_info, key='pre_process', files_to_move=None):
             self.report_error(msg, is_error=False)
         return info, info.pop('__files_to_move', None)
 
+    def _postprocess(self, func, callback):
+        """
+        Call callback with a function that returns the result of func()
+
+        With postprocessor_workers, func is run in a background thread. The callbacks
+        are then called in the main thread, in the order their functions were queued
+        """
+        workers = self.params.get('postprocessor_workers')
+        if not workers:
+            return callback(func)
+        self._finish_postprocessing(workers - 1)
+        self._postprocessing_jobs.append((self._postprocessor_executor.submit(func), callback))
+
+    def _after_postprocessing(self, callback):
+        """Call callback once the postprocessing queued so far is finished"""
+        if not self._postprocessing_jobs:
+            return callback()
+        self._postprocessing_jobs.append((None, callback))
+
+    def _finish_postprocessing(self, max_pending=0):
+        """Wait for the queued postprocessing, until at most max_pending functions are running"""
+        jobs = self._postprocessing_jobs
+        while jobs:
+            future, callback = jobs[0]
+            if future and not future.done() and sum(bool(f) for f, _ in jobs) <= max_pending:
+                break
+            jobs.popleft()
+            callback(future.result) if future else callback()
+
+    @functools.cached_property
+    def _postprocessor_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(
+            self.params['postprocessor_workers'], thread_name_prefix='postprocessor')
+
     def post_process(self, filename, info, files_to_move=None):
         """Run all the postprocessors on the given file."""
+        return self.run_all_pps('after_move', self._post_process_and_move(filename, info, files_to_move))
+
+    def _post_process_and_move(self, filename, info, files_to_move=None):
         info['filepath'] = filename
         info['__files_to_move'] = files_to_move or {}
+        if 'no-ffmpeg-fusion' not in self.params['compat_opts']:
+            info['__ffmpeg_pass'] = FFmpegFusedPassPP(self)
         info = self.run_all_pps('post_process', info, additional_pps=info.get('__postprocessors'))
+        info.pop('__ffmpeg_pass', None)
         info = self.run_pp(MoveFilesAfterDownloadPP(self), info)
         del info['__files_to_move']
-        return self.run_all_pps('after_move', info)
+        return info
 
     def _make_archive_id(self, info_dict):
         video_id = info_dict.get('id')
@@ -4148,6 +4285,18 @@ def _impersonate_target_available(self, target):
             for rh in self._request_director.handlers.values()
             if isinstance(rh, ImpersonateRequestHandler))
 
+    def _prepare_request(self, req):
+        """Apply the compat handling of urlopen() to a request, for sending it with a request handler directly"""
+        # compat: Assume user:pass url params are basic auth
+        url, basic_auth_header = extract_basic_auth(req.url)
+        if basic_auth_header:
+            req.headers['Authorization'] = basic_auth_header
+        req.url = sanitize_url(url)
+
+        clean_proxies(proxies=req.proxies, headers=req.headers)
+        clean_headers(req.headers)
+        return req
+
     def urlopen(self, req):
         """ Start an HTTP download """
         if isinstance(req, str):
@@ -4159,15 +4308,7 @@ def urlopen(self, req):
             req = urllib_req_to_req(req)
         assert isinstance(req, Request)
 
-        # compat: Assume user:pass url params are basic auth
-        url, basic_auth_header = extract_basic_auth(req.url)
-        if basic_auth_header:
-            req.headers['Authorization'] = basic_auth_header
-        req.url = sanitize_url(url)
-
-        clean_proxies(proxies=req.proxies, headers=req.headers)
-        clean_headers(req.headers)
-
+        req = self._prepare_request(req)
         try:
             return self._request_director.send(req)
         except NoSupportingHandlers as e:
@@ -4231,6 +4372,8 @@ def build_request_director(self, handlers, preferences=None):
                 **traverse_obj(self.params, {
                     'verbose': 'debug_printtraffic',
                     'source_address': 'source_address',
+                    'dns_cache_ttl': 'dns_cache_ttl',
+                    'happy_eyeballs_delay': 'happy_eyeballs_delay',
                     'timeout': 'socket_timeout',
                     'legacy_ssl_support': 'legacyserverconnect',
                     'enable_file_urls': 'enable_file_urls',
@@ -4243,10 +4386,21 @@ def build_request_director(self, handlers, preferences=None):
                 }),
             ))
         director.preferences.update(preferences or [])
+        if self.params.get('request_trace_file'):
+            director.trace_hooks.append(self._write_request_trace)
         if 'prefer-legacy-http-handler' in self.params['compat_opts']:
             director.preferences.add(lambda rh, _: 500 if rh.RH_KEY == 'Urllib' else 0)
         return director
 
+    def _write_request_trace(self, event):
+        line = json.dumps(event) + '\n'
+        with self._request_trace_lock:
+            if not self._request_trace_file:
+                self._request_trace_file = open(
+                    expand_path(self.params['request_trace_file']), 'a', encoding='utf-8')
+            self._request_trace_file.write(line)
+            self._request_trace_file.flush()
+
     @functools.cached_property
     def _request_director(self):
         return self.build_request_director(_REQUEST_HANDLERS.values(), _RH_PREFERENCES)
@@ -4390,6 +4544,42 @@ def _write_thumbnails(self, label, info_dict, filename, thumb_filename_base=None
         if thumbnails and not self._ensure_dir_exists(filename):
             return None
 
+        timeout = self.params.get('thumbnail_timeout')
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def download_thumbnail(t, thumb_display_id, thumb_filename):
+            extensions = {}
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.report_warning(f'Skipping {thumb_display_id} since the thumbnail timeout was reached')
+                    return False
+                # Connecting and every read must also finish within the time limit
+                extensions['timeout'] = min(remaining, self.params.get('socket_timeout') or DEFAULT_TIMEOUT)
+            self.to_screen(f'[info] Downloading {thumb_display_id} ...')
+            try:
+                with self.urlopen(Request(t['url'], headers=t.get('http_headers', {}), extensions=extensions)) as uf:
+                    self.to_screen(f'[info] Writing {thumb_display_id} to: {thumb_filename}')
+                    with open(encodeFilename(thumb_filename), 'wb') as thumbf:
+                        for chunk in iter(functools.partial(uf.read, 1 << 16), b''):
+                            if deadline is not None and time.monotonic() >= deadline:
+                                break
+                            thumbf.write(chunk)
+                        else:
+                            t['filepath'] = thumb_filename
+                            return True
+            except network_exceptions as err:
+                if isinstance(err, HTTPError) and err.status == 404:
+                    self.to_screen(f'[info] {thumb_display_id.title()} does not exist')
+                else:
+                    self.report_warning(f'Unable to download {thumb_display_id}: {err}')
+                return False
+            self.report_warning(f'Unable to download {thumb_display_id}: the thumbnail timeout was reached')
+            self._delete_downloaded_files(thumb_filename, msg=None)
+            return False
+
+        # Thumbnails to download, as {idx: (download arguments, thumb_filename_final)}
+        results, downloads = {}, {}
         for idx, t in list(enumerate(thumbnails))[::-1]:
             thumb_ext = (f'{t["id"]}.' if multiple else '') + determine_ext(t['url'], 'jpg')
             thumb_display_id = f'{label} thumbnail {t["id"]}'
@@ -4401,22 +4591,24 @@ def _write_thumbnails(self, label, info_dict, filename, thumb_filename_base=None
                 self.to_screen('[info] {} is already present'.format((
                     thumb_display_id if multiple else f'{label} thumbnail').capitalize()))
                 t['filepath'] = existing_thumb
-                ret.append((existing_thumb, thumb_filename_final))
+                results[idx] = (existing_thumb, thumb_filename_final)
+            elif write_all:
+                downloads[idx] = ((t, thumb_display_id, thumb_filename), thumb_filename_final)
+            elif download_thumbnail(t, thumb_display_id, thumb_filename):
+                results[idx] = (thumb_filename, thumb_filename_final)
             else:
-                self.to_screen(f'[info] Downloading {thumb_display_id} ...')
-                try:
-                    uf = self.urlopen(Request(t['url'], headers=t.get('http_headers', {})))
-                    self.to_screen(f'[info] Writing {thumb_display_id} to: {thumb_filename}')
-                    with open(encodeFilename(thumb_filename), 'wb') as thumbf:
-                        shutil.copyfileobj(uf, thumbf)
-                    ret.append((thumb_filename, thumb_filename_final))
-                    t['filepath'] = thumb_filename
-                except network_exceptions as err:
-                    if isinstance(err, HTTPError) and err.status == 404:
-                        self.to_screen(f'[info] {thumb_display_id.title()} does not exist')
-                    else:
-                        self.report_warning(f'Unable to download {thumb_display_id}: {err}')
-                    thumbnails.pop(idx)
-            if ret and not write_all:
+                thumbnails.pop(idx)
+            if results and not write_all:
                 break
-        return ret
+
+        if downloads:
+            with concurrent.futures.ThreadPoolExecutor(
+                    min(len(downloads), 8), thread_name_prefix='thumbnail') as executor:
+                futures = {
+                    idx: executor.submit(download_thumbnail, *args) for idx, (args, _) in downloads.items()}
+            for idx, (args, thumb_filename_final) in downloads.items():
+                if futures[idx].result():
+                    results[idx] = (args[2], thumb_filename_final)
+                else:
+                    thumbnails.pop(idx)
+        return [results[idx] for idx in sorted(results, reverse=True)]
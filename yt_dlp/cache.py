@@ -1,12 +1,19 @@
 import contextlib
+import email.message
+import email.utils
+import hashlib
+import io
 import json
 import os
 import re
 import shutil
+import time
 import traceback
 import urllib.parse
 
-from .utils import expand_path, traverse_obj, version_tuple, write_json_file
+from .networking.common import Response
+from .utils import expand_path, int_or_none, traverse_obj, version_tuple, write_json_file
+from .utils.networking import HTTPHeaderDict
 from .version import __version__
 
 
@@ -31,7 +38,7 @@ def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
     def store(self, section, key, data, dtype='json'):
-        assert dtype in ('json',)
+        assert dtype in ('json', 'bin')
 
         if not self.enabled:
             return
@@ -40,7 +47,11 @@ def store(self, section, key, data, dtype='json'):
         try:
             os.makedirs(os.path.dirname(fn), exist_ok=True)
             self._ydl.write_debug(f'Saving {section}.{key} to cache')
-            write_json_file({'yt-dlp_version': __version__, 'data': data}, fn)
+            if dtype == 'bin':
+                with open(fn, 'wb') as f:
+                    f.write(data)
+            else:
+                write_json_file({'yt-dlp_version': __version__, 'data': data}, fn)
         except Exception:
             tb = traceback.format_exc()
             self._ydl.report_warning(f'Writing cache to {fn!r} failed: {tb}')
@@ -54,17 +65,25 @@ def _validate(self, data, min_ver):
         self._ydl.write_debug(f'Discarding old cache from version {version} (needs {min_ver})')
 
     def load(self, section, key, dtype='json', default=None, *, min_ver=None):
-        assert dtype in ('json',)
+        assert dtype in ('json', 'bin')
 
         if not self.enabled:
             return default
 
         cache_fn = self._get_cache_fn(section, key, dtype)
         with contextlib.suppress(OSError):
+            if dtype == 'bin':
+                with open(cache_fn, 'rb') as cachef:
+                    self._ydl.write_debug(f'Loading {section}.{key} from cache')
+                    data = cachef.read()
+                self._touch(cache_fn)
+                return data
             try:
                 with open(cache_fn, encoding='utf-8') as cachef:
                     self._ydl.write_debug(f'Loading {section}.{key} from cache')
-                    return self._validate(json.load(cachef), min_ver)
+                    data = self._validate(json.load(cachef), min_ver)
+                self._touch(cache_fn)
+                return data
             except (ValueError, KeyError):
                 try:
                     file_size = os.path.getsize(cache_fn)
@@ -74,6 +93,37 @@ def load(self, section, key, dtype='json', default=None, *, min_ver=None):
 
         return default
 
+    @staticmethod
+    def _touch(fn):
+        # The modification time records the last access, which prune() evicts by;
+        # access times are not reliably updated by the filesystem
+        with contextlib.suppress(OSError):
+            os.utime(fn)
+
+    def prune(self, section, max_size):
+        """Delete the least recently used entries of a section until it takes up at most max_size bytes"""
+        if not self.enabled:
+            return
+
+        section_dir = os.path.dirname(self._get_cache_fn(section, 'x', 'json'))
+        with contextlib.suppress(OSError):
+            # The json and bin files of a key are evicted together
+            entries = {}
+            for entry in os.scandir(section_dir):
+                if entry.is_file():
+                    stat = entry.stat()
+                    key = os.path.splitext(entry.name)[0]
+                    last_used, size, paths = entries.get(key, (0, 0, []))
+                    entries[key] = (max(last_used, stat.st_mtime), size + stat.st_size, [*paths, entry.path])
+            total_size = sum(size for _, size, _ in entries.values())
+            for key, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+                if total_size <= max_size:
+                    break
+                self._ydl.write_debug(f'Evicting {key} from {section} cache')
+                for path in paths:
+                    os.remove(path)
+                total_size -= size
+
     def remove(self):
         if not self.enabled:
             self._ydl.to_screen('Cache is disabled (Did you combine --no-cache-dir and --rm-cache-dir?)')
@@ -89,3 +139,215 @@ def remove(self):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
         self._ydl.to_screen('.')
+
+
+class HTTPCache:
+    """Conditional cache for HTTP responses, stored in the filesystem cache
+
+    Only successful responses to GET requests are stored. Freshness is
+    determined from the Cache-Control, Expires and Last-Modified headers
+    (RFC 9111). Stale entries carrying a validator are revalidated by
+    sending If-None-Match/If-Modified-Since with the request.
+
+    The freshness lifetime can be overridden per request with `max_age`,
+    in which case the response is cached regardless of its headers.
+
+    Entries are keyed on all headers sent with the request, including
+    credentials, and on the impersonate target. Responses are therefore
+    never shared between accounts, cookie sets, languages or clients.
+    """
+
+    _SECTION = 'http'
+    MAX_SIZE = 256 * 1024 * 1024
+    # The body is stored decoded, so these headers no longer apply to it
+    _DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+    # Added to the request when an entry is revalidated
+    _VALIDATOR_HEADERS = ('if-none-match', 'if-modified-since')
+
+    def __init__(self, ydl):
+        self._ydl = ydl
+
+    @property
+    def enabled(self):
+        return bool(self._ydl.params.get('http_cache')) and self._ydl.cache.enabled
+
+    def _request_headers(self, request):
+        """The headers sent with the request, as merged by the request handlers"""
+        headers = HTTPHeaderDict(self._ydl.params.get('http_headers'), request.headers)
+        if 'Cookie' not in headers:
+            cookie_header = self._ydl.cookiejar.get_cookie_header(request.url)
+            if cookie_header:
+                headers['Cookie'] = cookie_header
+        return headers
+
+    def _cache_key(self, request):
+        headers = sorted(
+            f'{name.lower()}: {value}' for name, value in self._request_headers(request).items()
+            if name.lower() not in self._VALIDATOR_HEADERS)
+        impersonate = request.extensions.get('impersonate')
+        key = '\n'.join([request.method, request.url, str(impersonate or ''), *headers])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def _parse_cache_control(headers):
+        directives = {}
+        for directive in ','.join(headers.get_all('Cache-Control') or []).split(','):
+            name, _, value = directive.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"')
+        return directives
+
+    @staticmethod
+    def _parse_http_date(value):
+        with contextlib.suppress(TypeError, ValueError, IndexError):
+            return email.utils.parsedate_to_datetime(value).timestamp()
+
+    def _freshness_lifetime(self, headers, now):
+        lifetime = self._stated_freshness_lifetime(headers, now)
+        if not lifetime:
+            return lifetime
+        # The response may have been stored by another cache already (RFC 9111, section 4.2.3)
+        age = int_or_none(headers.get('Age')) or 0
+        return max(0, lifetime - age)
+
+    def _stated_freshness_lifetime(self, headers, now):
+        cache_control = self._parse_cache_control(headers)
+        if 'no-store' in cache_control:
+            return None
+        if 'no-cache' in cache_control:
+            return 0
+        with contextlib.suppress(ValueError):
+            return int(cache_control['max-age'])
+        date = self._parse_http_date(headers.get('Date')) or now
+        expires = self._parse_http_date(headers.get('Expires'))
+        if expires is not None:
+            return max(0, expires - date)
+        last_modified = self._parse_http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            # Heuristic freshness: https://www.rfc-editor.org/rfc/rfc9111#section-4.2.2
+            return max(0, (date - last_modified) // 10)
+        return 0
+
+    def cacheable(self, request):
+        return (
+            self.enabled and request.method == 'GET' and request.data is None
+            and 'Range' not in request.headers)
+
+    def load(self, request):
+        """Return the cache entry for the request, or None if there is no usable entry"""
+        key = self._cache_key(request)
+        entry = self._ydl.cache.load(self._SECTION, key)
+        if not entry or entry.get('url') != request.url:
+            return None
+        headers = self._request_headers(request)
+        for name, value in entry['vary'].items():
+            if headers.get(name) != value:
+                return None
+        body = self._ydl.cache.load(self._SECTION, key, dtype='bin')
+        if body is None or hashlib.sha256(body).hexdigest() != entry['sha256']:
+            self._ydl.write_debug(f'Discarding corrupt HTTP cache entry for {request.url}')
+            return None
+        entry['body'] = body
+        return entry
+
+    @staticmethod
+    def is_fresh(entry, max_age=None):
+        lifetime = entry['lifetime'] if max_age is None else max_age
+        return time.time() - entry['time'] < lifetime
+
+    @staticmethod
+    def validators(entry):
+        headers = {}
+        etag = traverse_obj(entry, ('headers', lambda _, v: v[0].lower() == 'etag', 1), get_all=False)
+        last_modified = traverse_obj(
+            entry, ('headers', lambda _, v: v[0].lower() == 'last-modified', 1), get_all=False)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    @classmethod
+    def _stored_headers(cls, headers):
+        return [(name, value) for name, value in headers.items() if name.lower() not in cls._DROPPED_HEADERS]
+
+    @staticmethod
+    def make_response(entry):
+        return Response(
+            io.BytesIO(entry['body']), entry['response_url'], _make_headers(entry['headers']),
+            status=entry['status'], extensions={'http_cache': True})
+
+    def _store(self, request, entry, body=None):
+        key = self._cache_key(request)
+        if body is not None:
+            entry['sha256'] = hashlib.sha256(body).hexdigest()
+            self._ydl.cache.store(self._SECTION, key, body, dtype='bin')
+        self._ydl.cache.store(self._SECTION, key, {k: v for k, v in entry.items() if k != 'body'})
+        if body is not None:
+            self._ydl.cache.prune(self._SECTION, self.MAX_SIZE)
+
+    def revalidated(self, request, entry, response):
+        """Refresh a cache entry from a 304 response and return the cached response"""
+        stale_headers = {name.lower() for name, _ in response.headers.items()}
+        entry['headers'] = [
+            (name, value) for name, value in entry['headers'] if name.lower() not in stale_headers
+        ] + self._stored_headers(response.headers)
+        now = time.time()
+        entry['time'] = now
+        entry['lifetime'] = self._freshness_lifetime(_make_headers(entry['headers']), now) or 0
+        self._store(request, entry)
+        response.close()
+        return self.make_response(entry)
+
+    def wrap(self, request, response, max_age=None):
+        """Return a response that is stored in the cache once its body has been read"""
+        if response.status != 200:
+            return response
+        now = time.time()
+        lifetime = self._freshness_lifetime(response.headers, now)
+        if max_age is None and (
+            lifetime is None or response.headers.get('Set-Cookie')
+            or not (lifetime or response.headers.get('ETag') or response.headers.get('Last-Modified'))
+        ):
+            return response
+        headers = self._request_headers(request)
+        vary = {
+            name.strip(): headers.get(name.strip())
+            for name in ','.join(response.headers.get_all('Vary') or []).split(',') if name.strip()}
+        if '*' in vary:
+            return response
+        entry = {
+            'url': request.url,
+            'response_url': response.url,
+            'status': response.status,
+            'headers': self._stored_headers(response.headers),
+            'vary': vary,
+            'time': now,
+            'lifetime': lifetime or 0,
+        }
+        return _CachingResponse(response, lambda body: self._store(request, entry, body))
+
+
+def _make_headers(pairs):
+    headers = email.message.Message()
+    for name, value in pairs:
+        headers.add_header(name, value)
+    return headers
+
+
+class _CachingResponse(Response):
+    def __init__(self, response, callback):
+        super().__init__(
+            response, response.url, response.headers, status=response.status,
+            reason=response.reason, extensions=response.extensions)
+        self._buffer = bytearray()
+        self._callback = callback
+
+    def read(self, amt=None):
+        data = self.fp.read(amt)
+        if self._buffer is not None:
+            self._buffer += data
+            if amt is None or amt < 0 or not data:
+                body, self._buffer = bytes(self._buffer), None
+                self._callback(body)
+        return data
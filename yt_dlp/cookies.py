@@ -8,7 +8,9 @@
 import http.cookiejar
 import http.cookies
 import io
+import itertools
 import json
+import math
 import os
 import re
 import shutil
@@ -1233,12 +1235,85 @@ class YoutubeDLCookieJar(http.cookiejar.MozillaCookieJar):
     _CookieFileEntry = collections.namedtuple(
         'CookieFileEntry',
         ('domain_name', 'include_subdomains', 'path', 'https_only', 'expires_at', 'name', 'value'))
+    _MAX_CACHED_REQUESTS = 1024
 
     def __init__(self, filename=None, *args, **kwargs):
         super().__init__(None, *args, **kwargs)
         if is_path_like(filename):
             filename = os.fspath(filename)
         self.filename = filename
+        # The cookies for a request only depend on its host, port, path and scheme.
+        # They are cached until the jar is modified or one of them expires
+        self._request_cache = {}
+        self._domain_order = {}
+        self._domain_counter = itertools.count()
+        self._next_expiry = math.inf
+
+    def set_cookie(self, cookie):
+        with self._cookies_lock:
+            if cookie.domain not in self._cookies:
+                self._domain_order[cookie.domain] = next(self._domain_counter)
+            if cookie.expires is not None:
+                self._next_expiry = min(self._next_expiry, cookie.expires)
+            self._request_cache.clear()
+            super().set_cookie(cookie)
+
+    def set_policy(self, policy):
+        with self._cookies_lock:
+            self._request_cache.clear()
+            super().set_policy(policy)
+
+    def clear(self, *args, **kwargs):
+        with self._cookies_lock, contextlib.suppress(KeyError):
+            self._request_cache.clear()
+            return super().clear(*args, **kwargs)
+
+    def clear_expired_cookies(self):
+        # This is called for every request, so only look through the jar once a cookie has expired
+        with self._cookies_lock:
+            if time.time() < self._next_expiry:
+                return
+            super().clear_expired_cookies()
+            self._next_expiry = min((cookie.expires for cookie in self if cookie.expires is not None), default=math.inf)
+
+    @staticmethod
+    def _domain_candidates(*hosts):
+        """All cookie domains that DefaultCookiePolicy.domain_return_ok can accept for hosts"""
+        candidates = {''}
+        for host in hosts:
+            host = f'.{host}'
+            for index, char in enumerate(host):
+                if char == '.':
+                    candidates.update((host[index:], host[index + 1:]))
+        return candidates
+
+    def _cookies_for_request(self, request):
+        policy = self._policy
+        if type(policy) is not http.cookiejar.DefaultCookiePolicy:
+            return super()._cookies_for_request(request)
+
+        with self._cookies_lock:
+            req_host, erhn = http.cookiejar.eff_request_host(request)
+            key = (
+                req_host, erhn, request.host, http.cookiejar.request_path(request),
+                request.type, request.unverifiable, request.origin_req_host,
+                policy.blocked_domains(), policy.allowed_domains())
+            cached = self._request_cache.get(key)
+            if cached and time.time() < cached[1]:
+                return list(cached[0])
+
+            # Only look at the domains that can match instead of all of them,
+            # but keep the order of the jar, which is that of the Cookie header
+            domains = [domain for domain in self._domain_candidates(req_host, erhn) if domain in self._cookies]
+            cookies = []
+            for domain in sorted(domains, key=lambda d: self._domain_order.get(d, -1)):
+                cookies.extend(self._cookies_for_domain(domain, request))
+
+            if len(self._request_cache) >= self._MAX_CACHED_REQUESTS:
+                self._request_cache.clear()
+            self._request_cache[key] = (
+                cookies, min((cookie.expires for cookie in cookies if cookie.expires is not None), default=math.inf))
+            return list(cookies)
 
     @staticmethod
     def _true_or_false(cndn):
@@ -1360,6 +1435,3 @@ def get_cookies_for_url(self, url):
         self._policy._now = self._now = int(time.time())
         return self._cookies_for_request(urllib.request.Request(normalize_url(sanitize_url(url))))
 
-    def clear(self, *args, **kwargs):
-        with contextlib.suppress(KeyError):
-            return super().clear(*args, **kwargs)
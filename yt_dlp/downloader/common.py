@@ -33,6 +33,7 @@
     timetuple_from_msec,
     try_call,
 )
+from ..utils.progress import BandwidthLimiter
 
 
 class FileDownloader:
@@ -49,7 +50,10 @@ class FileDownloader:
 
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
-    ratelimit:          Download speed limit, in bytes/sec.
+    ratelimit:          Download speed limit, in bytes/sec. The limit applies to
+                        all the downloads of the process together
+    prioritize_audio_rate: Give audio-only formats twice the share of the rate
+                        limit of other downloads
     throttledratelimit: Assume the download is being throttled below this speed (bytes/sec)
     retries:            Number of times to retry for expected network errors.
                         Default is 0 for API, but 10 for CLI
@@ -82,6 +86,8 @@ class FileDownloader:
 
     _TEST_FILE_SIZE = 10241
     params = None
+    _bandwidth_share = None
+    _slow_down_progress = None
 
     def __init__(self, ydl, params):
         """Create a FileDownloader object with the given options."""
@@ -200,21 +206,28 @@ def parse_bytes(bytestr):
                             'may be removed in the future. Use yt_dlp.utils.parse_bytes instead')
         return parse_bytes(bytestr)
 
+    def _make_bandwidth_share(self, info_dict):
+        rate_limit = self.params.get('ratelimit')
+        if not rate_limit:
+            return None
+        # Audio formats are smaller; finishing them first lets merging start sooner
+        is_audio = (self.params.get('prioritize_audio_rate') and info_dict.get('vcodec') == 'none'
+                    and info_dict.get('acodec') not in (None, 'none'))
+        return BandwidthLimiter.get(rate_limit).share(priority=2 if is_audio else 1)
+
     def slow_down(self, start_time, now, byte_counter):
         """Sleep if the download speed is over the rate limit."""
-        rate_limit = self.params.get('ratelimit')
-        if rate_limit is None or byte_counter == 0:
-            return
-        if now is None:
-            now = time.time()
-        elapsed = now - start_time
-        if elapsed <= 0.0:
+        # Kept for subclasses; the bytes are accounted to the bandwidth share of the download
+        if self._bandwidth_share is None:
+            self._bandwidth_share = self._make_bandwidth_share({})
+        if not self._bandwidth_share:
             return
-        speed = float(byte_counter) / elapsed
-        if speed > rate_limit:
-            sleep_time = float(byte_counter) / rate_limit - elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+        # byte_counter counts from start_time, so only the bytes since the previous call are new
+        last_start_time, last_byte_counter = self._slow_down_progress or (None, 0)
+        if last_start_time != start_time:
+            last_byte_counter = 0
+        self._slow_down_progress = start_time, byte_counter
+        self._bandwidth_share.consume(max(byte_counter - last_byte_counter, 0))
 
     def temp_name(self, filename):
         """Returns a temporary filename for the given filename."""
@@ -463,6 +476,8 @@ def download(self, filename, info_dict, subtitle=False):
             self.to_screen(f'[download] Sleeping {sleep_interval:.2f} seconds ...')
             time.sleep(sleep_interval)
 
+        if self._bandwidth_share is None:
+            self._bandwidth_share = self._make_bandwidth_share(info_dict)
         ret = self.real_download(filename, info_dict)
         self._finish_multiline_status()
         return ret, True
@@ -1,6 +1,8 @@
+import contextlib
 import enum
 import functools
 import json
+import math
 import os
 import re
 import subprocess
@@ -45,9 +47,13 @@ def real_download(self, filename, info_dict):
         tmpfilename = self.temp_name(filename)
         self._cookies_tempfile = None
 
+        if self._bandwidth_share is None:
+            self._bandwidth_share = self._make_bandwidth_share(info_dict)
+        share = self._bandwidth_share
         try:
             started = time.time()
-            retval = self._call_downloader(tmpfilename, info_dict)
+            with share.hold() if share else contextlib.nullcontext():
+                retval = self._call_downloader(tmpfilename, info_dict)
         except KeyboardInterrupt:
             if not info_dict.get('is_live'):
                 raise
@@ -125,6 +131,12 @@ def _bool_option(self, command_option, param, true_value='true', false_value='fa
     def _valueless_option(self, command_option, param, expected_value=True):
         return cli_valueless_option(self.params, command_option, param, expected_value)
 
+    def _rate_limit_option(self, command_option):
+        # The downloader is given its current fair share of the rate limit
+        share = self._bandwidth_share
+        rate_limit = math.ceil(share.rate) if share else self.params.get('ratelimit')
+        return cli_option({'ratelimit': rate_limit}, command_option, 'ratelimit')
+
     def _configuration_args(self, keys=None, *args, **kwargs):
         return _configuration_args(
             self.get_basename(), self.params.get('external_downloader_args'), self.EXE_NAME,
@@ -209,7 +221,7 @@ def _make_cmd(self, tmpfilename, info_dict):
         cmd += self._bool_option('--continue-at', 'continuedl', '-', '0')
         cmd += self._valueless_option('--silent', 'noprogress')
         cmd += self._valueless_option('--verbose', 'verbose')
-        cmd += self._option('--limit-rate', 'ratelimit')
+        cmd += self._rate_limit_option('--limit-rate')
         retry = self._option('--retry', 'retries')
         if len(retry) == 2:
             if retry[1] in ('inf', 'infinite'):
@@ -250,7 +262,7 @@ def _make_cmd(self, tmpfilename, info_dict):
         if info_dict.get('http_headers') is not None:
             for key, val in info_dict['http_headers'].items():
                 cmd += ['--header', f'{key}: {val}']
-        cmd += self._option('--limit-rate', 'ratelimit')
+        cmd += self._rate_limit_option('--limit-rate')
         retry = self._option('--tries', 'retries')
         if len(retry) == 2:
             if retry[1] in ('inf', 'infinite'):
@@ -307,7 +319,7 @@ def _make_cmd(self, tmpfilename, info_dict):
         if info_dict.get('http_headers') is not None:
             for key, val in info_dict['http_headers'].items():
                 cmd += ['--header', f'{key}: {val}']
-        cmd += self._option('--max-overall-download-limit', 'ratelimit')
+        cmd += self._rate_limit_option('--max-overall-download-limit')
         cmd += self._option('--interface', 'source_address')
         cmd += self._option('--all-proxy', 'proxy')
         cmd += self._bool_option('--check-certificate', 'nocheckcertificate', 'false', 'true', '=')
@@ -1,5 +1,8 @@
+import asyncio
+import collections
 import concurrent.futures
 import contextlib
+import itertools
 import json
 import math
 import os
@@ -11,13 +14,43 @@
 from ..aes import aes_cbc_decrypt_bytes, unpad_pkcs7
 from ..compat import compat_os_name
 from ..networking import Request
-from ..networking.exceptions import HTTPError, IncompleteRead
-from ..utils import DownloadError, RetryManager, encodeFilename, traverse_obj
+from ..networking.exceptions import HTTPError, IncompleteRead, RequestError, UnsupportedRequest
+from ..utils import DownloadError, RetryManager, encodeFilename, timeconvert, traverse_obj
 from ..utils.networking import HTTPHeaderDict
 from ..utils.progress import ProgressCalculator
 
 
+def _map_bounded(pool, func, iterable, max_pending):
+    """
+    Like Executor.map, but only consumes `iterable` as results are yielded,
+    so that at most `max_pending` calls are submitted at any time
+    """
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _LoopExecutor:
+    """Has the interface of Executor.submit, but runs the coroutine returned by func(*args) on an event loop"""
+
+    def __init__(self, loop):
+        self._loop = loop
+
+    def submit(self, func, *args):
+        return asyncio.run_coroutine_threadsafe(func(*args), self._loop)
+
+
 class HttpQuietDownloader(HttpFD):
+    _FRAGMENT_REQUESTS = True
+
     def to_screen(self, *args, **kargs):
         pass
 
@@ -36,7 +69,9 @@ class FragmentFD(FileDownloader):
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
                         finished
-    concurrent_fragment_downloads:  The number of threads to use for native hls and dash downloads
+    concurrent_fragment_downloads:  The number of fragments to download at once for native hls and dash downloads.
+                        Where the request handler supports it, they are downloaded on
+                        an event loop (see AsyncioRH) instead of a thread each
     _no_ytdl_file:      Don't use .ytdl file
 
     For each incomplete fragment download yt-dlp keeps on disk a special
@@ -75,6 +110,8 @@ def _prepare_url(self, info_dict, url):
 
     def _prepare_and_start_frag_download(self, ctx, info_dict):
         self._prepare_frag_download(ctx)
+        # All the fragment threads of a format draw from the same share of the rate limit
+        ctx['dl']._bandwidth_share = self._make_bandwidth_share(info_dict)
         self._start_frag_download(ctx, info_dict)
 
     def __do_ytdl_file(self, ctx):
@@ -130,6 +167,64 @@ def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_dat
         ctx['fragment_filename_sanitized'] = fragment_filename
         return True
 
+    def _fragment_request(self, info_dict, fragment):
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+        byte_range = fragment.get('byte_range')
+        if byte_range:
+            headers['Range'] = f'bytes={byte_range["start"]}-{byte_range["end"] - 1}'
+        return self.ydl._prepare_request(Request(fragment['url'], headers=headers, extensions={'fragment': True}))
+
+    def _get_async_handler(self, info_dict, fragment):
+        """The request handler with which to download fragments like this one on its event loop, if any"""
+        # The rate limit and chunked downloads are only implemented by HttpFD
+        if (self.params.get('ratelimit') or self.params.get('throttledratelimit')
+                or self.params.get('http_chunk_size')
+                or traverse_obj(info_dict, ('downloader_options', 'http_chunk_size'))
+                or info_dict.get('request_data') is not None):
+            return None
+        handler = self.ydl._request_director.get_handler(self._fragment_request(info_dict, fragment))
+        return handler if callable(getattr(handler, 'asend', None)) else None
+
+    async def _fetch_fragment(self, handler, fragment, request):
+        """
+        Download a fragment on the event loop of the handler.
+        Returns None instead of the content, if the fragment is to be downloaded by ctx['dl'],
+        which retries it as configured
+        """
+        if request is None:
+            return fragment, None
+        start = time.time()
+        try:
+            response = await handler.asend(request)
+        except RequestError:
+            return fragment, None
+        try:
+            if 'Range' in request.headers and response.status != 206:
+                return fragment, None
+            return fragment, (await response.aread(), response.headers.get('Last-Modified'), time.time() - start)
+        except RequestError:
+            return fragment, None
+        finally:
+            response.close()
+
+    def _fragment_fetched(self, ctx, info_dict, fragment, content, last_modified, elapsed):
+        """Do for a fragment downloaded on the event loop what ctx['dl'] does for the others"""
+        fragment_filename = f'{ctx["tmpfilename"]}-Frag{fragment["frag_index"]}'
+        if self.params.get('keep_fragments', False):
+            with open(encodeFilename(fragment_filename), 'wb') as frag_stream:
+                frag_stream.write(content)
+            ctx['fragment_filename_sanitized'] = fragment_filename
+        if self.params.get('updatetime', True) and last_modified:
+            ctx['fragment_filetime'] = timeconvert(last_modified) or ctx.get('fragment_filetime')
+        ctx['dl']._hook_progress({
+            'downloaded_bytes': len(content),
+            'total_bytes': len(content),
+            'filename': fragment_filename,
+            'status': 'finished',
+            'elapsed': elapsed,
+            'ctx_id': ctx.get('ctx_id'),
+        }, {'url': fragment['url'], 'ctx_id': ctx.get('ctx_id')})
+
     def _read_fragment(self, ctx):
         if not ctx.get('fragment_filename_sanitized'):
             return None
@@ -151,9 +246,10 @@ def _append_fragment(self, ctx, frag_content):
         finally:
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                self.try_remove(encodeFilename(ctx['fragment_filename_sanitized']))
-            del ctx['fragment_filename_sanitized']
+            # Fragments downloaded on an event loop are only written to disk to be kept
+            fragment_filename = ctx.pop('fragment_filename_sanitized', None)
+            if fragment_filename and not self.params.get('keep_fragments', False):
+                self.try_remove(encodeFilename(fragment_filename))
 
     def _prepare_frag_download(self, ctx):
         if not ctx.setdefault('live', False):
@@ -485,7 +581,50 @@ def append_fragment(frag_content, frag_index, ctx):
 
         max_workers = math.ceil(
             self.params.get('concurrent_fragment_downloads', 1) / ctx.get('max_progress', 1))
+        async_handler = None
         if max_workers > 1:
+            fragments = iter(fragments)
+            first_fragment = next(fragments, None)
+            if first_fragment is not None:
+                fragments = itertools.chain([first_fragment], fragments)
+                async_handler = self._get_async_handler(info_dict, first_fragment)
+
+        if async_handler:
+            def fetch_fragment(fragment):
+                request = None
+                frag_filename = f'{ctx["tmpfilename"]}-Frag{fragment["frag_index"]}'
+                # Partly downloaded fragments are resumed by ctx['dl']
+                if not (self.params.get('continuedl', True)
+                        and self.filesize_or_none(self.temp_name(frag_filename))):
+                    request = self._fragment_request(info_dict, fragment)
+                    try:
+                        async_handler.validate(request)
+                    except UnsupportedRequest:
+                        request = None
+                return self._fetch_fragment(async_handler, fragment, request)
+
+            try:
+                # Up to max_workers fragments are in flight on the loop, with only this thread waiting on them
+                for fragment, result in _map_bounded(
+                        _LoopExecutor(async_handler.loop), fetch_fragment, fragments, max_workers):
+                    if not interrupt_trigger[0]:
+                        break
+                    frag_index = fragment['frag_index']
+                    if result is None:
+                        download_fragment(fragment, ctx)
+                        frag_content = self._read_fragment(ctx)
+                    else:
+                        ctx['fragment_count'] = fragment.get('fragment_count')
+                        self._fragment_fetched(ctx, info_dict, fragment, *result)
+                        frag_content = result[0]
+                    ctx['fragment_index'] = frag_index
+                    if not append_fragment(decrypt_fragment(fragment, frag_content), frag_index, ctx):
+                        return False
+            except KeyboardInterrupt:
+                self._finish_multiline_status()
+                self.report_error('Interrupted by user', is_error=False, tb=False)
+                raise
+        elif max_workers > 1:
             def _download_fragment(fragment):
                 ctx_copy = ctx.copy()
                 download_fragment(fragment, ctx_copy)
@@ -493,7 +632,8 @@ def _download_fragment(fragment):
 
             with tpe or concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
                 try:
-                    for fragment, frag_index, frag_filename in pool.map(_download_fragment, fragments):
+                    for fragment, frag_index, frag_filename in _map_bounded(
+                            pool, _download_fragment, fragments, 2 * max_workers):
                         ctx.update({
                             'fragment_filename_sanitized': frag_filename,
                             'fragment_index': frag_index,
@@ -6,11 +6,10 @@
 from . import get_suitable_downloader
 from .external import FFmpegFD
 from .fragment import FragmentFD
-from .. import webvtt
+from .. import m3u8, webvtt
 from ..dependencies import Cryptodome
 from ..utils import (
     bug_reports_message,
-    parse_m3u8_attributes,
     remove_start,
     traverse_obj,
     update_url_query,
@@ -118,37 +117,12 @@ def real_download(self, filename, info_dict):
         if real_downloader:
             self.to_screen(f'[{self.FD_NAME}] Fragment downloads will be delegated to {real_downloader.get_basename()}')
 
-        def is_ad_fragment_start(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',ad'))
-
-        def is_ad_fragment_end(s):
-            return (s.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in s
-                    or s.startswith('#UPLYNK-SEGMENT') and s.endswith(',segment'))
-
-        fragments = []
-
-        media_frags = 0
-        ad_frags = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#'):
-                if is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
-                continue
-            if ad_frag_next:
-                ad_frags += 1
-                continue
-            media_frags += 1
+        playlist = m3u8.parse_playlist(s, media=True)
+        ad_frags = sum(1 for segment in playlist.segments if segment.ad and not segment.init)
 
         ctx = {
             'filename': filename,
-            'total_frags': media_frags,
+            'total_frags': sum(1 for segment in playlist.segments if not segment.init) - ad_frags,
             'ad_frags': ad_frags,
         }
 
@@ -166,9 +140,6 @@ def is_ad_fragment_end(s):
         extra_key_query = None
         if extra_param_to_key_url := info_dict.get('extra_param_to_key_url'):
             extra_key_query = urllib.parse.parse_qs(extra_param_to_key_url)
-        i = 0
-        media_sequence = 0
-        decrypt_info = {'METHOD': 'NONE'}
         external_aes_key = traverse_obj(info_dict, ('hls_aes', 'key'))
         if external_aes_key:
             external_aes_key = binascii.unhexlify(remove_start(external_aes_key, '0x'))
@@ -176,99 +147,60 @@ def is_ad_fragment_end(s):
         external_aes_iv = traverse_obj(info_dict, ('hls_aes', 'iv'))
         if external_aes_iv:
             external_aes_iv = binascii.unhexlify(remove_start(external_aes_iv, '0x').zfill(32))
-        byte_range = {}
-        discontinuity_count = 0
+
+        no_decrypt_info = {'METHOD': 'NONE'}
+        decrypt_infos = {}
+
+        def get_decrypt_info(key):
+            if key is None:
+                return no_decrypt_info
+            # Segments share the attributes of their key, so the decrypt info is built once per key
+            if id(key) in decrypt_infos:
+                return decrypt_infos[id(key)]
+            decrypt_info = decrypt_infos[id(key)] = key.copy()
+            if decrypt_info['METHOD'] == 'AES-128':
+                if external_aes_iv:
+                    decrypt_info['IV'] = external_aes_iv
+                elif 'IV' in decrypt_info:
+                    decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
+                if external_aes_key:
+                    decrypt_info['KEY'] = external_aes_key
+                else:
+                    decrypt_info['URI'] = urljoin(man_url, decrypt_info['URI'])
+                    if extra_key_query or extra_segment_query:
+                        # Fall back to extra_segment_query to key for backwards compat
+                        decrypt_info['URI'] = update_url_query(
+                            decrypt_info['URI'], extra_key_query or extra_segment_query)
+            return decrypt_info
+
+        fragments = []
+        media_sequence = playlist.media_sequence
         frag_index = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if line:
-                if not line.startswith('#'):
-                    if format_index and discontinuity_count != format_index:
-                        continue
-                    if ad_frag_next:
-                        continue
-                    frag_index += 1
-                    if frag_index <= ctx['fragment_index']:
-                        continue
-                    frag_url = urljoin(man_url, line)
-                    if extra_segment_query:
-                        frag_url = update_url_query(frag_url, extra_segment_query)
-
-                    fragments.append({
-                        'frag_index': frag_index,
-                        'url': frag_url,
-                        'decrypt_info': decrypt_info,
-                        'byte_range': byte_range,
-                        'media_sequence': media_sequence,
-                    })
-                    media_sequence += 1
-
-                elif line.startswith('#EXT-X-MAP'):
-                    if format_index and discontinuity_count != format_index:
-                        continue
-                    if frag_index > 0:
-                        self.report_error(
-                            'Initialization fragment found after media fragments, unable to download')
-                        return False
-                    frag_index += 1
-                    map_info = parse_m3u8_attributes(line[11:])
-                    frag_url = urljoin(man_url, map_info.get('URI'))
-                    if extra_segment_query:
-                        frag_url = update_url_query(frag_url, extra_segment_query)
-
-                    if map_info.get('BYTERANGE'):
-                        splitted_byte_range = map_info.get('BYTERANGE').split('@')
-                        sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range['end']
-                        byte_range = {
-                            'start': sub_range_start,
-                            'end': sub_range_start + int(splitted_byte_range[0]),
-                        }
-
-                    fragments.append({
-                        'frag_index': frag_index,
-                        'url': frag_url,
-                        'decrypt_info': decrypt_info,
-                        'byte_range': byte_range,
-                        'media_sequence': media_sequence,
-                    })
-                    media_sequence += 1
-
-                elif line.startswith('#EXT-X-KEY'):
-                    decrypt_url = decrypt_info.get('URI')
-                    decrypt_info = parse_m3u8_attributes(line[11:])
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        if external_aes_iv:
-                            decrypt_info['IV'] = external_aes_iv
-                        elif 'IV' in decrypt_info:
-                            decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:].zfill(32))
-                        if external_aes_key:
-                            decrypt_info['KEY'] = external_aes_key
-                        else:
-                            decrypt_info['URI'] = urljoin(man_url, decrypt_info['URI'])
-                            if extra_key_query or extra_segment_query:
-                                # Fall back to extra_segment_query to key for backwards compat
-                                decrypt_info['URI'] = update_url_query(
-                                    decrypt_info['URI'], extra_key_query or extra_segment_query)
-                            if decrypt_url != decrypt_info['URI']:
-                                decrypt_info['KEY'] = None
-
-                elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
-                    media_sequence = int(line[22:])
-                elif line.startswith('#EXT-X-BYTERANGE'):
-                    splitted_byte_range = line[17:].split('@')
-                    sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range['end']
-                    byte_range = {
-                        'start': sub_range_start,
-                        'end': sub_range_start + int(splitted_byte_range[0]),
-                    }
-                elif is_ad_fragment_start(line):
-                    ad_frag_next = True
-                elif is_ad_fragment_end(line):
-                    ad_frag_next = False
-                elif line.startswith('#EXT-X-DISCONTINUITY'):
-                    discontinuity_count += 1
-                i += 1
+        for segment in playlist.segments:
+            if format_index and segment.discontinuity != format_index:
+                continue
+            if segment.init:
+                if frag_index > 0:
+                    self.report_error(
+                        'Initialization fragment found after media fragments, unable to download')
+                    return False
+            elif segment.ad:
+                continue
+            frag_index += 1
+            if not segment.init and frag_index <= ctx['fragment_index']:
+                continue
+            frag_url = urljoin(man_url, segment.uri)
+            if extra_segment_query:
+                frag_url = update_url_query(frag_url, extra_segment_query)
+
+            fragments.append({
+                'frag_index': frag_index,
+                'url': frag_url,
+                'decrypt_info': get_decrypt_info(segment.key),
+                'byte_range': segment.byte_range,
+                'media_sequence': media_sequence,
+            })
+            media_sequence += 1
 
         # We only download the first fragment during the test
         if self.params.get('test', False):
@@ -25,9 +25,13 @@
 
 
 class HttpFD(FileDownloader):
+    # Whether requests are made for fragments of a download; see the `fragment` request extension
+    _FRAGMENT_REQUESTS = False
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
         request_data = info_dict.get('request_data', None)
+        request_extensions = {'fragment': True} if self._FRAGMENT_REQUESTS else None
 
         class DownloadContext(dict):
             __getattr__ = dict.get
@@ -111,7 +115,7 @@ def establish_connection():
             if try_call(lambda: range_end >= ctx.content_len):
                 range_end = ctx.content_len - 1
 
-            request = Request(url, request_data, headers)
+            request = Request(url, request_data, headers, extensions=request_extensions)
             has_range = range_start is not None
             if has_range:
                 request.headers['Range'] = f'bytes={int(range_start)}-{int_or_none(range_end) or ""}'
@@ -152,7 +156,7 @@ def establish_connection():
                     try:
                         # Open the connection again without the range header
                         ctx.data = self.ydl.urlopen(
-                            Request(url, request_data, headers))
+                            Request(url, request_data, headers, extensions=request_extensions))
                         content_length = ctx.data.headers['Content-Length']
                     except HTTPError as err:
                         if err.status < 500 or err.status >= 600:
@@ -231,8 +235,7 @@ def download():
             block_size = ctx.block_size
             start = time.time()
 
-            # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
-            now = None  # needed for slow_down() in the first loop run
+            # measure time over whole while-loop, so rate limiting and best_block_size() work together properly
             before = start  # start measuring
 
             def retry(e):
@@ -246,10 +249,16 @@ def retry(e):
                         ctx.resume_len = 0
                 raise RetryDownload(e)
 
+            # Blocks are read into a reused buffer, which is only reallocated when the block size outgrows it
+            buffer = bytearray(block_size)
             while True:
+                read_size = block_size if not is_test else min(block_size, data_len - byte_counter)
+                if read_size > len(buffer):
+                    buffer = bytearray(read_size)
+                data_block = memoryview(buffer)[:read_size]
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+                    data_block = data_block[:ctx.data.readinto(data_block)]
                 except TransportError as err:
                     retry(err)
 
@@ -285,7 +294,8 @@ def retry(e):
                     return False
 
                 # Apply rate limit
-                self.slow_down(start, now, byte_counter - ctx.resume_len)
+                if self._bandwidth_share:
+                    self._bandwidth_share.consume(len(data_block))
 
                 # end measuring of one loop run
                 now = time.time()
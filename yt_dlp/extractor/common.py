@@ -1,4 +1,5 @@
 import base64
+import bisect
 import collections
 import functools
 import getpass
@@ -22,6 +23,7 @@
 import urllib.request
 import xml.etree.ElementTree
 
+from .. import m3u8
 from ..compat import (
     compat_etree_fromstring,
     compat_expanduser,
@@ -47,6 +49,7 @@
     FormatSorter,
     GeoRestrictedError,
     GeoUtils,
+    LazySequence,
     LenientJSONDecoder,
     Popen,
     RegexNotFoundError,
@@ -76,7 +79,6 @@
     parse_codecs,
     parse_duration,
     parse_iso8601,
-    parse_m3u8_attributes,
     parse_resolution,
     sanitize_filename,
     sanitize_url,
@@ -817,14 +819,13 @@ def IE_NAME(cls):
         return cls.__name__[:-2]
 
     @staticmethod
-    def __can_accept_status_code(err, expected_status):
-        assert isinstance(err, HTTPError)
+    def __can_accept_status_code(status, expected_status):
         if expected_status is None:
             return False
         elif callable(expected_status):
-            return expected_status(err.status) is True
+            return expected_status(status) is True
         else:
-            return err.status in variadic(expected_status)
+            return status in variadic(expected_status)
 
     def _create_request(self, url_or_request, data=None, headers=None, query=None, extensions=None):
         if isinstance(url_or_request, urllib.request.Request):
@@ -861,6 +862,28 @@ def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fa
             else:
                 self.to_screen(f'{video_id}: {note}')
 
+        headers, extensions = self._prepare_request_options(headers, impersonate, require_impersonation)
+        try:
+            return self._downloader.urlopen(self._create_request(url_or_request, data, headers, query, extensions))
+        except network_exceptions as err:
+            if isinstance(err, HTTPError):
+                if self.__can_accept_status_code(err.status, expected_status):
+                    return err.response
+
+            if errnote is False:
+                return False
+            if errnote is None:
+                errnote = 'Unable to download webpage'
+
+            errmsg = f'{errnote}: {err}'
+            if fatal:
+                raise ExtractorError(errmsg, cause=err)
+            else:
+                self.report_warning(errmsg)
+                return False
+
+    def _prepare_request_options(self, headers, impersonate, require_impersonation):
+        """Return the headers and extensions to add to a request"""
         # Some sites check X-Forwarded-For HTTP header in order to figure out
         # the origin of the client behind proxy. This allows bypassing geo
         # restriction by faking this header's value to IP that belongs to some
@@ -892,25 +915,7 @@ def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fa
             if require_impersonation:
                 raise ExtractorError(f'{message}; {info_msg}', expected=True)
             self.report_warning(f'{message}; if you encounter errors, then {info_msg}', only_once=True)
-
-        try:
-            return self._downloader.urlopen(self._create_request(url_or_request, data, headers, query, extensions))
-        except network_exceptions as err:
-            if isinstance(err, HTTPError):
-                if self.__can_accept_status_code(err, expected_status):
-                    return err.response
-
-            if errnote is False:
-                return False
-            if errnote is None:
-                errnote = 'Unable to download webpage'
-
-            errmsg = f'{errnote}: {err}'
-            if fatal:
-                raise ExtractorError(errmsg, cause=err)
-            else:
-                self.report_warning(errmsg)
-                return False
+        return headers, extensions
 
     def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=None, fatal=True,
                                  encoding=None, data=None, headers={}, query={}, expected_status=None,
@@ -958,12 +963,44 @@ def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=
         if isinstance(url_or_request, str):
             url_or_request = url_or_request.partition('#')[0]
 
-        urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data,
-                                     headers=headers, query=query, expected_status=expected_status,
-                                     impersonate=impersonate, require_impersonation=require_impersonation)
-        if urlh is False:
-            assert not fatal
-            return False
+        # The request is fully prepared here, so that the HTTP cache sees the headers and impersonate target sent
+        headers, extensions = self._prepare_request_options(headers, impersonate, require_impersonation)
+        # The page is read to the end at once, so the response can be shared with identical requests in flight
+        url_or_request = self._create_request(
+            url_or_request.copy() if isinstance(url_or_request, Request) else url_or_request,
+            data, headers, query, extensions={**extensions, 'coalesce': True})
+        data, headers, query, impersonate = None, {}, {}, None
+
+        http_cache, cache_entry, max_age = self._downloader.http_cache, None, None
+        use_http_cache = http_cache.cacheable(url_or_request)
+        if use_http_cache:
+            max_age = self._get_http_cache_max_age(url_or_request.url)
+            use_http_cache = max_age is not False
+        if use_http_cache:
+            cache_entry = http_cache.load(url_or_request)
+
+        if cache_entry and http_cache.is_fresh(cache_entry, max_age):
+            self.write_debug(f'{video_id}: Using cached response for {url_or_request.url}')
+            urlh = http_cache.make_response(cache_entry)
+        else:
+            if cache_entry:
+                url_or_request.headers.update(http_cache.validators(cache_entry))
+                accept_status = expected_status
+
+                def expected_status(status):
+                    return status == 304 or self.__can_accept_status_code(status, accept_status)
+
+            urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data,
+                                         headers=headers, query=query, expected_status=expected_status,
+                                         impersonate=impersonate, require_impersonation=require_impersonation)
+            if urlh is False:
+                assert not fatal
+                return False
+            if cache_entry and urlh.status == 304:
+                urlh = http_cache.revalidated(url_or_request, cache_entry, urlh)
+            elif use_http_cache:
+                urlh = http_cache.wrap(url_or_request, urlh, max_age)
+
         content = self._webpage_read_content(urlh, url_or_request, video_id, note, errnote, fatal,
                                              encoding=encoding, data=data)
         if content is False:
@@ -971,6 +1008,14 @@ def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=
             return False
         return (content, urlh)
 
+    def _get_http_cache_max_age(self, url):
+        """
+        Return the time in seconds a cached response for this url stays fresh,
+        None to honour the HTTP caching headers of the response (default),
+        or False to never cache it. Only used when the HTTP cache is enabled.
+        """
+        return None
+
     @staticmethod
     def _guess_encoding_from_content(content_type, webpage_bytes):
         m = re.match(r'[a-zA-Z0-9_.-]+/[a-zA-Z0-9_.-]+\s*;\s*charset=(.+)', content_type)
@@ -2075,13 +2120,14 @@ def _parse_m3u8_formats_and_subtitles(
             video_id=None):
         formats, subtitles = [], {}
         has_drm = HlsFD._has_drm(m3u8_doc)
+        playlist = m3u8.parse_playlist(m3u8_doc)
 
         def format_url(url):
             return url if re.match(r'https?://', url) else urllib.parse.urljoin(m3u8_url, url)
 
         if self.get_param('hls_split_discontinuity', False):
-            def _extract_m3u8_playlist_indices(manifest_url=None, m3u8_doc=None):
-                if not m3u8_doc:
+            def _extract_m3u8_playlist_indices(manifest_url=None, playlist=None):
+                if not playlist:
                     if not manifest_url:
                         return []
                     m3u8_doc = self._download_webpage(
@@ -2089,7 +2135,8 @@ def _extract_m3u8_playlist_indices(manifest_url=None, m3u8_doc=None):
                         note=False, errnote='Failed to download m3u8 playlist information')
                     if m3u8_doc is False:
                         return []
-                return range(1 + sum(line.startswith('#EXT-X-DISCONTINUITY') for line in m3u8_doc.splitlines()))
+                    playlist = m3u8.parse_playlist(m3u8_doc)
+                return range(1 + playlist.discontinuity_count)
 
         else:
             def _extract_m3u8_playlist_indices(*args, **kwargs):
@@ -2109,9 +2156,10 @@ def _extract_m3u8_playlist_indices(*args, **kwargs):
         # master playlist tags MUST NOT appear in a media playlist and vice versa.
         # As of [1, 4.3.3.1] #EXT-X-TARGETDURATION tag is REQUIRED for every
         # media playlist and MUST NOT appear in master playlist thus we can
-        # clearly detect media playlist with this criterion.
+        # clearly detect media playlist with this criterion. Media playlists
+        # lacking it are detected by their #EXTINF tags.
 
-        if '#EXT-X-TARGETDURATION' in m3u8_doc:  # media playlist, return as is
+        if playlist.is_media_playlist:  # return as is
             formats = [{
                 'format_id': join_nonempty(m3u8_id, idx),
                 'format_index': idx,
@@ -2121,15 +2169,13 @@ def _extract_m3u8_playlist_indices(*args, **kwargs):
                 'preference': preference,
                 'quality': quality,
                 'has_drm': has_drm,
-            } for idx in _extract_m3u8_playlist_indices(m3u8_doc=m3u8_doc)]
+            } for idx in _extract_m3u8_playlist_indices(playlist=playlist)]
 
             return formats, subtitles
 
         groups = {}
-        last_stream_inf = {}
 
-        def extract_media(x_media_line):
-            media = parse_m3u8_attributes(x_media_line)
+        def extract_media(media):
             # As per [1, 4.3.4.1] TYPE, GROUP-ID and NAME are REQUIRED
             media_type, group_id, name = media.get('TYPE'), media.get('GROUP-ID'), media.get('NAME')
             if not (media_type and group_id and name):
@@ -2195,101 +2241,93 @@ def build_stream_name():
             rendition = stream_group[0]
             return rendition.get('NAME') or stream_group_id
 
-        # parse EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have the
+        # process EXT-X-MEDIA tags before EXT-X-STREAM-INF in order to have the
         # chance to detect video only formats when EXT-X-STREAM-INF tags
         # precede EXT-X-MEDIA tags in HLS manifest such as [3].
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-MEDIA:'):
-                extract_media(line)
-
-        for line in m3u8_doc.splitlines():
-            if line.startswith('#EXT-X-STREAM-INF:'):
-                last_stream_inf = parse_m3u8_attributes(line)
-            elif line.startswith('#') or not line.strip():
-                continue
-            else:
-                tbr = float_or_none(
-                    last_stream_inf.get('AVERAGE-BANDWIDTH')
-                    or last_stream_inf.get('BANDWIDTH'), scale=1000)
-                manifest_url = format_url(line.strip())
-
-                for idx in _extract_m3u8_playlist_indices(manifest_url):
-                    format_id = [m3u8_id, None, idx]
-                    # Bandwidth of live streams may differ over time thus making
-                    # format_id unpredictable. So it's better to keep provided
-                    # format_id intact.
-                    if not live:
-                        stream_name = build_stream_name()
-                        format_id[1] = stream_name or '%d' % (tbr or len(formats))
-                    f = {
-                        'format_id': join_nonempty(*format_id),
-                        'format_index': idx,
-                        'url': manifest_url,
-                        'manifest_url': m3u8_url,
-                        'tbr': tbr,
-                        'ext': ext,
-                        'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
-                        'protocol': entry_protocol,
-                        'preference': preference,
-                        'quality': quality,
-                        'has_drm': has_drm,
-                    }
+        for media in playlist.media:
+            extract_media(media)
+
+        for last_stream_inf, variant_url in playlist.variants:
+            tbr = float_or_none(
+                last_stream_inf.get('AVERAGE-BANDWIDTH')
+                or last_stream_inf.get('BANDWIDTH'), scale=1000)
+            manifest_url = format_url(variant_url)
+
+            for idx in _extract_m3u8_playlist_indices(manifest_url):
+                format_id = [m3u8_id, None, idx]
+                # Bandwidth of live streams may differ over time thus making
+                # format_id unpredictable. So it's better to keep provided
+                # format_id intact.
+                if not live:
+                    stream_name = build_stream_name()
+                    format_id[1] = stream_name or '%d' % (tbr or len(formats))
+                f = {
+                    'format_id': join_nonempty(*format_id),
+                    'format_index': idx,
+                    'url': manifest_url,
+                    'manifest_url': m3u8_url,
+                    'tbr': tbr,
+                    'ext': ext,
+                    'fps': float_or_none(last_stream_inf.get('FRAME-RATE')),
+                    'protocol': entry_protocol,
+                    'preference': preference,
+                    'quality': quality,
+                    'has_drm': has_drm,
+                }
 
-                    # YouTube-specific
-                    if yt_audio_content_id := last_stream_inf.get('YT-EXT-AUDIO-CONTENT-ID'):
-                        f['language'] = yt_audio_content_id.split('.')[0]
-
-                    resolution = last_stream_inf.get('RESOLUTION')
-                    if resolution:
-                        mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
-                        if mobj:
-                            f['width'] = int(mobj.group('width'))
-                            f['height'] = int(mobj.group('height'))
-                    # Unified Streaming Platform
-                    mobj = re.search(
-                        r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
-                    if mobj:
-                        abr, vbr = mobj.groups()
-                        abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
-                        f.update({
-                            'vbr': vbr,
-                            'abr': abr,
-                        })
-                    codecs = parse_codecs(last_stream_inf.get('CODECS'))
-                    f.update(codecs)
-                    audio_group_id = last_stream_inf.get('AUDIO')
-                    # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
-                    # references a rendition group MUST have a CODECS attribute.
-                    # However, this is not always respected. E.g. [2]
-                    # contains EXT-X-STREAM-INF tag which references AUDIO
-                    # rendition group but does not have CODECS and despite
-                    # referencing an audio group it represents a complete
-                    # (with audio and video) format. So, for such cases we will
-                    # ignore references to rendition groups and treat them
-                    # as complete formats.
-                    if audio_group_id and codecs and f.get('vcodec') != 'none':
-                        audio_group = groups.get(audio_group_id)
-                        if audio_group and audio_group[0].get('URI'):
-                            # TODO: update acodec for audio only formats with
-                            # the same GROUP-ID
-                            f['acodec'] = 'none'
-                    if not f.get('ext'):
-                        f['ext'] = 'm4a' if f.get('vcodec') == 'none' else 'mp4'
-                    formats.append(f)
-
-                    # for DailyMotion
-                    progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
-                    if progressive_uri:
-                        http_f = f.copy()
-                        del http_f['manifest_url']
-                        http_f.update({
-                            'format_id': f['format_id'].replace('hls-', 'http-'),
-                            'protocol': 'http',
-                            'url': progressive_uri,
-                        })
-                        formats.append(http_f)
+                # YouTube-specific
+                if yt_audio_content_id := last_stream_inf.get('YT-EXT-AUDIO-CONTENT-ID'):
+                    f['language'] = yt_audio_content_id.split('.')[0]
 
-                last_stream_inf = {}
+                resolution = last_stream_inf.get('RESOLUTION')
+                if resolution:
+                    mobj = re.search(r'(?P<width>\d+)[xX](?P<height>\d+)', resolution)
+                    if mobj:
+                        f['width'] = int(mobj.group('width'))
+                        f['height'] = int(mobj.group('height'))
+                # Unified Streaming Platform
+                mobj = re.search(
+                    r'audio.*?(?:%3D|=)(\d+)(?:-video.*?(?:%3D|=)(\d+))?', f['url'])
+                if mobj:
+                    abr, vbr = mobj.groups()
+                    abr, vbr = float_or_none(abr, 1000), float_or_none(vbr, 1000)
+                    f.update({
+                        'vbr': vbr,
+                        'abr': abr,
+                    })
+                codecs = parse_codecs(last_stream_inf.get('CODECS'))
+                f.update(codecs)
+                audio_group_id = last_stream_inf.get('AUDIO')
+                # As per [1, 4.3.4.1.1] any EXT-X-STREAM-INF tag which
+                # references a rendition group MUST have a CODECS attribute.
+                # However, this is not always respected. E.g. [2]
+                # contains EXT-X-STREAM-INF tag which references AUDIO
+                # rendition group but does not have CODECS and despite
+                # referencing an audio group it represents a complete
+                # (with audio and video) format. So, for such cases we will
+                # ignore references to rendition groups and treat them
+                # as complete formats.
+                if audio_group_id and codecs and f.get('vcodec') != 'none':
+                    audio_group = groups.get(audio_group_id)
+                    if audio_group and audio_group[0].get('URI'):
+                        # TODO: update acodec for audio only formats with
+                        # the same GROUP-ID
+                        f['acodec'] = 'none'
+                if not f.get('ext'):
+                    f['ext'] = 'm4a' if f.get('vcodec') == 'none' else 'mp4'
+                formats.append(f)
+
+                # for DailyMotion
+                progressive_uri = last_stream_inf.get('PROGRESSIVE-URI')
+                if progressive_uri:
+                    http_f = f.copy()
+                    del http_f['manifest_url']
+                    http_f.update({
+                        'format_id': f['format_id'].replace('hls-', 'http-'),
+                        'protocol': 'http',
+                        'url': progressive_uri,
+                    })
+                    formats.append(http_f)
         return formats, subtitles
 
     def _extract_m3u8_vod_duration(
@@ -2304,12 +2342,11 @@ def _extract_m3u8_vod_duration(
         return self._parse_m3u8_vod_duration(m3u8_vod or '', video_id)
 
     def _parse_m3u8_vod_duration(self, m3u8_vod, video_id):
-        if '#EXT-X-ENDLIST' not in m3u8_vod:
+        playlist = m3u8.parse_playlist(m3u8_vod, media=True)
+        if not playlist.endlist:
             return None
 
-        return int(sum(
-            float(line[len('#EXTINF:'):].split(',')[0])
-            for line in m3u8_vod.splitlines() if line.startswith('#EXTINF:'))) or None
+        return int(playlist.duration) or None
 
     def _extract_mpd_vod_duration(
             self, mpd_url, video_id, note=None, errnote=None, data=None, headers={}, query={}):
@@ -2673,7 +2710,11 @@ def _merge_mpd_periods(self, periods):
                 if format_key not in formats:
                     formats[format_key] = f
                 elif 'fragments' in f:
-                    formats[format_key].setdefault('fragments', []).extend(f['fragments'])
+                    fragments = formats[format_key].setdefault('fragments', [])
+                    if isinstance(fragments, list) and isinstance(f['fragments'], list):
+                        fragments.extend(f['fragments'])
+                    else:
+                        formats[format_key]['fragments'] = LazySequence.concat(fragments, f['fragments'])
 
             if subtitles and period['subtitles']:
                 self.report_warning(bug_reports_message(
@@ -2686,6 +2727,29 @@ def _merge_mpd_periods(self, periods):
 
         return list(formats.values()), subtitles
 
+    @staticmethod
+    def _mpd_template_fragment(location_key, media_template, bandwidth, start_number, duration, idx):
+        return {
+            location_key: media_template % {
+                'Number': start_number + idx,
+                'Bandwidth': bandwidth,
+            },
+            'duration': duration,
+        }
+
+    @staticmethod
+    def _mpd_timeline_fragment(location_key, media_template, bandwidth, start_number, timescale, run_starts, runs, idx):
+        run = bisect.bisect_right(run_starts, idx) - 1
+        start_time, duration = runs[run]
+        return {
+            location_key: media_template % {
+                'Time': start_time + (idx - run_starts[run]) * duration,
+                'Bandwidth': bandwidth,
+                'Number': start_number + idx,
+            },
+            'duration': float_or_none(duration, timescale),
+        }
+
     def _parse_mpd_periods(self, mpd_doc, mpd_id=None, mpd_base_url='', mpd_url=None):
         """
         Parse formats from MPD manifest.
@@ -2921,45 +2985,31 @@ def location_key(location):
                                 segment_duration = float_or_none(representation_ms_info['segment_duration'], representation_ms_info['timescale'])
                                 representation_ms_info['total_number'] = int(math.ceil(
                                     float_or_none(period_duration, segment_duration, default=0)))
-                            representation_ms_info['fragments'] = [{
-                                media_location_key: media_template % {
-                                    'Number': segment_number,
-                                    'Bandwidth': bandwidth,
-                                },
-                                'duration': segment_duration,
-                            } for segment_number in range(
-                                representation_ms_info['start_number'],
-                                representation_ms_info['total_number'] + representation_ms_info['start_number'])]
+                            # Fragments are generated on access, since only few formats are ever downloaded
+                            representation_ms_info['fragments'] = LazySequence(
+                                max(representation_ms_info['total_number'], 0), functools.partial(
+                                    self._mpd_template_fragment, media_location_key, media_template, bandwidth,
+                                    representation_ms_info['start_number'], segment_duration))
                         else:
                             # $Number*$ or $Time$ in media template with S list available
                             # Example $Number*$: http://www.svtplay.se/klipp/9023742/stopptid-om-bjorn-borg
                             # Example $Time$: https://play.arkena.com/embed/avp/v2/player/media/b41dda37-d8e7-4d3f-b1b5-9a9db578bdfe/1/129411
-                            representation_ms_info['fragments'] = []
+                            # The timeline is kept as runs of (first index, start time, duration)
+                            # from which the fragments are generated on access
+                            run_starts, runs = [], []
                             segment_time = 0
-                            segment_d = None
-                            segment_number = representation_ms_info['start_number']
-
-                            def add_segment_url():
-                                segment_url = media_template % {
-                                    'Time': segment_time,
-                                    'Bandwidth': bandwidth,
-                                    'Number': segment_number,
-                                }
-                                representation_ms_info['fragments'].append({
-                                    media_location_key: segment_url,
-                                    'duration': float_or_none(segment_d, representation_ms_info['timescale']),
-                                })
-
+                            segment_index = 0
                             for s in representation_ms_info['s']:
                                 segment_time = s.get('t') or segment_time
-                                segment_d = s['d']
-                                add_segment_url()
-                                segment_number += 1
-                                for _ in range(s.get('r', 0)):
-                                    segment_time += segment_d
-                                    add_segment_url()
-                                    segment_number += 1
-                                segment_time += segment_d
+                                run_starts.append(segment_index)
+                                runs.append((segment_time, s['d']))
+                                segment_index += s.get('r', 0) + 1
+                                segment_time += (s.get('r', 0) + 1) * s['d']
+                            representation_ms_info['fragments'] = LazySequence(
+                                segment_index, functools.partial(
+                                    self._mpd_timeline_fragment, media_location_key, media_template, bandwidth,
+                                    representation_ms_info['start_number'], representation_ms_info['timescale'],
+                                    run_starts, runs))
                     elif 'segment_urls' in representation_ms_info and 's' in representation_ms_info:
                         # No media template,
                         # e.g. https://www.youtube.com/watch?v=iXZV5uAYMJI
@@ -3002,15 +3052,14 @@ def add_segment_url():
                             # NB: mpd_url may be empty when MPD manifest is parsed from a string
                             'url': mpd_url or base_url,
                             'fragment_base_url': base_url,
-                            'fragments': [],
+                            'fragments': representation_ms_info['fragments'],
                             'protocol': 'http_dash_segments' if mime_type != 'image/jpeg' else 'mhtml',
                         })
                         if 'initialization_url' in representation_ms_info:
                             initialization_url = representation_ms_info['initialization_url']
                             if not f.get('url'):
                                 f['url'] = initialization_url
-                            f['fragments'].append({location_key(initialization_url): initialization_url})
-                        f['fragments'].extend(representation_ms_info['fragments'])
+                            f['fragments'] = [{location_key(initialization_url): initialization_url}] + f['fragments']
                         if not period_duration:
                             period_duration = try_get(
                                 representation_ms_info,
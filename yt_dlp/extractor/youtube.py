@@ -1242,6 +1242,13 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
     ]
     _RETURN_TYPE = 'video'  # XXX: How to handle multifeed?
 
+    # Player JS is shared by all instances, and persisted in the filesystem cache
+    _code_cache = collections.OrderedDict()
+    _CODE_CACHE_SIZE = 8
+    _PLAYER_JS_CACHE_SIZE = 64 * 1024 * 1024
+    # Locks of the players being loaded, and the lock guarding both dicts
+    _player_js_locks, _code_cache_lock = {}, threading.Lock()
+
     _PLAYER_INFO_RE = (
         r'/s/player/(?P<id>[a-zA-Z0-9_-]{8,})/player',
         r'/(?P<id>[a-zA-Z0-9_-]{8,})/player(?:_ias\.vflset(?:/[a-zA-Z]{2,3}_[a-zA-Z]{2,3})?|-plasma-ias-(?:phone|tablet)-[a-z]{2}_[A-Z]{2}\.vflset)/base\.js$',
@@ -2847,7 +2854,6 @@ def suitable(cls, url):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._code_cache = {}
         self._player_cache = {}
 
     def _prepare_live_from_start_formats(self, formats, video_id, live_start_time, url, webpage_url, smuggled_data, is_live):
@@ -3041,16 +3047,67 @@ def _extract_player_info(cls, player_url):
             raise ExtractorError(f'Cannot identify player {player_url!r}')
         return id_m.group('id')
 
+    def _get_http_cache_max_age(self, url):
+        # Player JS is already stored in its own cache section
+        if any(re.search(player_re, url) for player_re in self._PLAYER_INFO_RE):
+            return False
+        return super()._get_http_cache_max_age(url)
+
+    def _load_cached_player(self, player_id):
+        checksum = self.cache.load('youtube-player', player_id)
+        if not checksum:
+            return None
+        code = self.cache.load('youtube-player', player_id, dtype='bin')
+        if code is None or hashlib.sha256(code).hexdigest() != checksum:
+            self.report_warning(f'Discarding corrupt cached player {player_id}', only_once=True)
+            return None
+        return code.decode()
+
+    def _store_cached_player(self, player_id, code):
+        code = code.encode()
+        self.cache.store('youtube-player', player_id, code, dtype='bin')
+        self.cache.store('youtube-player', player_id, hashlib.sha256(code).hexdigest())
+        self.cache.prune('youtube-player', self._PLAYER_JS_CACHE_SIZE)
+
+    def _get_cached_code(self, player_id):
+        with self._code_cache_lock:
+            code = self._code_cache.get(player_id)
+            if code:
+                self._code_cache.move_to_end(player_id)
+            return code
+
     def _load_player(self, video_id, player_url, fatal=True):
         player_id = self._extract_player_info(player_url)
-        if player_id not in self._code_cache:
-            code = self._download_webpage(
-                player_url, video_id, fatal=fatal,
-                note='Downloading player ' + player_id,
-                errnote=f'Download of {player_url} failed')
-            if code:
-                self._code_cache[player_id] = code
-        return self._code_cache.get(player_id)
+        code = self._get_cached_code(player_id)
+        if code:
+            return code
+
+        # Concurrent extractions of the same player wait for a single download
+        with self._code_cache_lock:
+            lock = self._player_js_locks.setdefault(player_id, threading.Lock())
+        try:
+            with lock:
+                code = self._get_cached_code(player_id)
+                if code:
+                    return code
+                code = self._load_cached_player(player_id)
+                if not code:
+                    code = self._download_webpage(
+                        player_url, video_id, fatal=fatal,
+                        note='Downloading player ' + player_id,
+                        errnote=f'Download of {player_url} failed')
+                    if code:
+                        self._store_cached_player(player_id, code)
+                if code:
+                    with self._code_cache_lock:
+                        self._code_cache[player_id] = code
+                        while len(self._code_cache) > self._CODE_CACHE_SIZE:
+                            self._code_cache.popitem(last=False)
+                return code
+        finally:
+            with self._code_cache_lock:
+                if self._player_js_locks.get(player_id) is lock:
+                    del self._player_js_locks[player_id]
 
     def _extract_signature_function(self, video_id, player_url, example_sig):
         player_id = self._extract_player_info(player_url)
@@ -0,0 +1,151 @@
+"""
+A single-pass parser for HLS playlists, as specified in RFC 8216
+<https://datatracker.ietf.org/doc/html/rfc8216>.
+
+Both master and media playlists are handled. Tags that are not needed by
+yt-dlp are skipped without being parsed. Media segments are returned as
+compact records which share the attribute dict of the key that applies to
+them, so that large playlists can be parsed with few allocations.
+"""
+
+import collections
+
+from .utils import float_or_none, int_or_none, parse_m3u8_attributes
+
+Segment = collections.namedtuple('Segment', (
+    'uri',                  # URI of the segment, as given in the playlist
+    'duration',             # Duration from EXTINF, in seconds
+    'title',                # Title from EXTINF
+    'byte_range',           # {'start': int, 'end': int} or None
+    'key',                  # Attributes of the EXT-X-KEY tag that applies to the segment, or None
+    'discontinuity',        # Number of EXT-X-DISCONTINUITY tags before the segment
+    'program_date_time',    # Value of the EXT-X-PROGRAM-DATE-TIME tag preceding the segment
+    'ad',                   # Whether the segment is marked as an ad (Anvato, Uplynk)
+    'init',                 # Whether this is an initialization section (EXT-X-MAP)
+))
+
+
+class Playlist:
+    """
+    A parsed HLS playlist
+
+    For master playlists, `variants` holds (EXT-X-STREAM-INF attributes, URI) tuples
+    and `media` the attributes of the EXT-X-MEDIA tags.
+    For media playlists, `segments` holds Segment records in playlist order,
+    with initialization sections (EXT-X-MAP) included where they appear.
+    """
+
+    def __init__(self):
+        self.is_media_playlist = False
+        self.target_duration = None
+        self.media_sequence = 0
+        self.discontinuity_sequence = 0
+        self.playlist_type = None
+        self.endlist = False
+        self.variants = []
+        self.media = []
+        self.session_keys = []
+        self.date_ranges = []
+        self.segments = []
+
+    @property
+    def discontinuity_count(self):
+        """Number of EXT-X-DISCONTINUITY tags in the playlist"""
+        return self.segments[-1].discontinuity if self.segments else 0
+
+    @property
+    def duration(self):
+        return sum(segment.duration or 0 for segment in self.segments if not segment.init)
+
+
+def _is_ad_start(line):
+    return ((line.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in line)
+            or (line.startswith('#UPLYNK-SEGMENT') and line.endswith(',ad')))
+
+
+def _is_ad_end(line):
+    return ((line.startswith('#ANVATO-SEGMENT-INFO') and 'type=master' in line)
+            or (line.startswith('#UPLYNK-SEGMENT') and line.endswith(',segment')))
+
+
+def _parse_byte_range(value, last_end):
+    length, _, offset = value.partition('@')
+    start = int(offset) if offset else last_end
+    return {'start': start, 'end': start + int(length)}
+
+
+def parse_playlist(manifest, media=None):
+    """
+    Parse the text of a master or media playlist into a Playlist
+
+    @param media    Whether this is a media playlist. By default, it is detected from the tags
+    """
+    playlist = Playlist()
+    segments = playlist.segments
+    # As of RFC 8216 4.3.3.1, EXT-X-TARGETDURATION is REQUIRED in media playlists
+    # and MUST NOT appear in master playlists. Some media playlists lack it nonetheless,
+    # but EXTINF is REQUIRED for each of their segments (4.3.2.1)
+    playlist.is_media_playlist = (
+        '#EXT-X-TARGETDURATION' in manifest or '#EXTINF:' in manifest) if media is None else media
+    key = program_date_time = stream_inf = None
+    duration = title = byte_range = None
+    last_range_end = 0
+    discontinuity = 0
+    ad = False
+
+    for line in manifest.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != '#':
+            if not playlist.is_media_playlist:
+                playlist.variants.append((stream_inf or {}, line))
+                stream_inf = None
+                continue
+            segments.append(Segment(
+                line, duration, title, byte_range, key, discontinuity, program_date_time, ad, False))
+            duration = title = byte_range = program_date_time = None
+        elif line.startswith('#EXTINF:'):
+            duration, _, title = line[8:].partition(',')
+            duration, title = float_or_none(duration), title or None
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byte_range = _parse_byte_range(line[17:], last_range_end)
+            last_range_end = byte_range['end']
+        elif line.startswith('#EXT-X-KEY:'):
+            key = parse_m3u8_attributes(line[11:])
+        elif line.startswith('#EXT-X-MAP:'):
+            map_info = parse_m3u8_attributes(line[11:])
+            map_range = None
+            if map_info.get('BYTERANGE'):
+                map_range = _parse_byte_range(map_info['BYTERANGE'], last_range_end)
+                last_range_end = map_range['end']
+            segments.append(Segment(
+                map_info.get('URI'), None, None, map_range, key, discontinuity, program_date_time, ad, True))
+        elif line.startswith('#EXT-X-DISCONTINUITY-SEQUENCE:'):
+            playlist.discontinuity_sequence = int_or_none(line[30:]) or 0
+        elif line.startswith('#EXT-X-DISCONTINUITY'):
+            discontinuity += 1
+        elif line.startswith('#EXT-X-PROGRAM-DATE-TIME:'):
+            program_date_time = line[25:]
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            playlist.media_sequence = int(line[22:])
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            playlist.target_duration = int_or_none(line[22:])
+        elif line.startswith('#EXT-X-PLAYLIST-TYPE:'):
+            playlist.playlist_type = line[21:]
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist.endlist = True
+        elif line.startswith('#EXT-X-DATERANGE:'):
+            playlist.date_ranges.append(parse_m3u8_attributes(line[17:]))
+        elif line.startswith('#EXT-X-STREAM-INF:'):
+            stream_inf = parse_m3u8_attributes(line[18:])
+        elif line.startswith('#EXT-X-MEDIA:'):
+            playlist.media.append(parse_m3u8_attributes(line[13:]))
+        elif line.startswith('#EXT-X-SESSION-KEY:'):
+            playlist.session_keys.append(parse_m3u8_attributes(line[19:]))
+        elif _is_ad_start(line):
+            ad = True
+        elif _is_ad_end(line):
+            ad = False
+
+    return playlist
@@ -0,0 +1,378 @@
+"""
+In-place editing of the tags, chapters and attachments of Matroska/WebM files
+
+Only the top level elements that change are rewritten. An element is written
+where it is when it fits there, together with the Void elements that follow
+it; otherwise it is moved to the end of the segment, the old one is turned
+into a Void element and the SeekHead is updated. The clusters, which hold the
+media data, are never moved.
+"""
+
+import collections
+import hashlib
+import os
+import zlib
+
+EBML = 0x1A45DFA3
+DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TITLE = 0x7BA9
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+LANGUAGE = 0x22B59C
+LANGUAGE_BCP47 = 0x22B59D
+CHAPTERS = 0x1043A770
+EDITION_ENTRY = 0x45B9
+CHAPTER_ATOM = 0xB6
+CHAPTER_UID = 0x73C4
+CHAPTER_TIME_START = 0x91
+CHAPTER_TIME_END = 0x92
+CHAPTER_DISPLAY = 0x80
+CHAP_STRING = 0x85
+CHAP_LANGUAGE = 0x437C
+ATTACHMENTS = 0x1941A469
+ATTACHED_FILE = 0x61A7
+FILE_NAME = 0x466E
+FILE_MIME_TYPE = 0x4660
+FILE_DATA = 0x465C
+FILE_UID = 0x46AE
+TAGS = 0x1254C367
+TAG = 0x7373
+TARGETS = 0x63C0
+TARGET_UIDS = (0x63C5, 0x63C9, 0x63C4, 0x63C6)  # TagTrackUID, TagEditionUID, TagChapterUID, TagAttachmentUID
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+CRC32 = 0xBF
+VOID = 0xEC
+
+# ffmpeg metadata names that are not written as tags by ffmpeg's matroska muxer
+_SKIPPED_TAGS = ('title', 'stereo_mode', 'creation_time', 'encoding_tool', 'duration', 'mimetype', 'filename')
+# Tag names that ffmpeg converts, see ff_mkv_metadata_conv
+_TAG_NAMES = {'track': 'PART_NUMBER', 'performer': 'LEAD_PERFORMER'}
+# Elements that must stay before the clusters, and so can only be rewritten in place
+_FIXED_ELEMENTS = (INFO, TRACKS)
+_UNKNOWN_SIZE = object()
+
+Element = collections.namedtuple('Element', ('id', 'offset', 'header_size', 'size'))
+
+
+def _read_vint(data, pos):
+    """Read a variable size integer, returning (value, length, with the length marker kept)"""
+    if pos >= len(data) or not data[pos]:
+        raise ValueError(f'Invalid EBML variable size integer at {pos}')
+    length = 9 - data[pos].bit_length()
+    if pos + length > len(data):
+        raise ValueError(f'Truncated EBML variable size integer at {pos}')
+    value = int.from_bytes(data[pos:pos + length], 'big')
+    return value & ((1 << (7 * length)) - 1), length, value
+
+
+def _parse_header(header, offset):
+    _, id_length, element_id = _read_vint(header, 0)
+    size, size_length, _ = _read_vint(header, id_length)
+    if size == (1 << (7 * size_length)) - 1:
+        size = _UNKNOWN_SIZE
+    return Element(element_id, offset, id_length + size_length, size)
+
+
+def _encode_size(size, length=None):
+    if length is None:
+        length = next(i for i in range(1, 9) if size < (1 << (7 * i)) - 1)
+    elif size >= (1 << (7 * length)) - 1:
+        raise ValueError(f'{size} does not fit in a {length} bytes size')
+    return ((1 << (7 * length)) | size).to_bytes(length, 'big')
+
+
+def _element(element_id, data):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + _encode_size(len(data)) + data
+
+
+def _uint(element_id, value):
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+def _string(element_id, value):
+    return _element(element_id, value.encode())
+
+
+def _void(size):
+    """Header of a Void element of the given total size"""
+    if size < 2:
+        raise ValueError('A Void element can not be smaller than 2 bytes')
+    return bytes([VOID]) + (_encode_size(size - 2, 1) if size <= 128 else _encode_size(size - 9, 8))
+
+
+def _split(data):
+    """Split the data of a master element into a list of (id, data)"""
+    children, pos = [], 0
+    while pos < len(data):
+        element = _parse_header(data[pos:pos + 12], pos)
+        start = pos + element.header_size
+        if element.size is _UNKNOWN_SIZE or start + element.size > len(data):
+            raise ValueError(f'Invalid size of element {element.id:#x}')
+        children.append((element.id, data[start:start + element.size]))
+        pos = start + element.size
+    return children
+
+
+def _master(element_id, children):
+    """Build a master element from (id, data). A leading CRC-32 element is recomputed"""
+    data = b''.join(_element(*child) for child in children if child[0] != CRC32)
+    if children and children[0][0] == CRC32:
+        data = _element(CRC32, zlib.crc32(data).to_bytes(4, 'little')) + data
+    return _element(element_id, data)
+
+
+def _find(children, element_id):
+    return next((data for child_id, data in children if child_id == element_id), None)
+
+
+def _is_global_tag(tag):
+    targets = _find(_split(tag), TARGETS)
+    return not targets or not any(child_id in TARGET_UIDS for child_id, _ in _split(targets))
+
+
+def _update_tags(data, tags, remove=()):
+    names = {_TAG_NAMES.get(name, name).upper(): value for name, value in tags.items()}
+    removed = {*names, *remove}
+    children = _split(data) if data is not None else []
+    idx = next((i for i, (child_id, tag) in enumerate(children) if child_id == TAG and _is_global_tag(tag)), None)
+    if idx is None:
+        children.append((TAG, _element(TARGETS, b'')))
+        idx = len(children) - 1
+
+    tag = [(child_id, child) for child_id, child in _split(children[idx][1])
+           if child_id != SIMPLE_TAG or (_find(_split(child), TAG_NAME) or b'').decode(errors='replace').upper() not in removed]
+    tag.extend((SIMPLE_TAG, _string(TAG_NAME, name) + _string(TAG_STRING, value)) for name, value in names.items())
+    children[idx] = (TAG, b''.join(_element(*child) for child in tag))
+    return _master(TAGS, children)
+
+
+def _update_info(data, title):
+    children = [child for child in _split(data) if child[0] != TITLE]
+    children.append((TITLE, title.encode()))
+    return _master(INFO, children)
+
+
+def _update_tracks(data, languages):
+    children, changed = _split(data), False
+    entries = [i for i, (child_id, _) in enumerate(children) if child_id == TRACK_ENTRY]
+    for idx, language in zip(entries, languages):
+        entry = _split(children[idx][1])
+        if not language or (_find(entry, LANGUAGE) == language.encode() and _find(entry, LANGUAGE_BCP47) is None):
+            continue
+        # LanguageBCP47 would take precedence over Language
+        entry = [child for child in entry if child[0] not in (LANGUAGE, LANGUAGE_BCP47)]
+        entry.append((LANGUAGE, language.encode()))
+        children[idx] = (TRACK_ENTRY, b''.join(_element(*child) for child in entry))
+        changed = True
+    return _master(TRACKS, children) if changed else None
+
+
+def _make_chapters(chapters):
+    atoms = []
+    for uid, chapter in enumerate(chapters, 1):
+        atom = (_uint(CHAPTER_UID, uid)
+                + _uint(CHAPTER_TIME_START, round(chapter['start_time'] * 1000) * 1000000)
+                + _uint(CHAPTER_TIME_END, round(chapter['end_time'] * 1000) * 1000000))
+        if chapter.get('title'):
+            atom += _element(CHAPTER_DISPLAY, _string(CHAP_STRING, chapter['title']) + _string(CHAP_LANGUAGE, 'und'))
+        atoms.append(_element(CHAPTER_ATOM, atom))
+    return _element(CHAPTERS, _element(EDITION_ENTRY, b''.join(atoms)))
+
+
+def _update_attachments(data, attachments):
+    children = _split(data) if data is not None else []
+    for name, mimetype, file_data in attachments:
+        # Like the ffmpeg path, replace the first attachment of the same type
+        idx = next((i for i, (child_id, child) in enumerate(children) if child_id == ATTACHED_FILE
+                    and _find(_split(child), FILE_MIME_TYPE) == mimetype.encode()), None)
+        uid = int.from_bytes(hashlib.sha256(file_data).digest()[:8], 'big') or 1
+        attached_file = (ATTACHED_FILE, _string(FILE_NAME, name) + _string(FILE_MIME_TYPE, mimetype)
+                         + _element(FILE_DATA, file_data) + _uint(FILE_UID, uid))
+        if idx is None:
+            children.append(attached_file)
+        else:
+            children[idx] = attached_file
+    return _master(ATTACHMENTS, children)
+
+
+def _update_seek_head(data, positions):
+    """Update the SeekPositions of the elements in positions. Returns the children and the updated ids"""
+    children, found = _split(data), set()
+    for i, (child_id, seek) in enumerate(children):
+        seek_id = _find(_split(seek), SEEK_ID) if child_id == SEEK else None
+        element_id = seek_id and int.from_bytes(seek_id, 'big')
+        if element_id in positions:
+            children[i] = (SEEK, _element(SEEK_ID, seek_id) + _uint(SEEK_POSITION, positions[element_id]))
+            found.add(element_id)
+    return children, found
+
+
+def _available_space(elements, idx, end_idx=None):
+    """Size of elements[idx] and of the Voids that follow it, up to elements[end_idx]"""
+    end_idx, next_idx = len(elements) if end_idx is None else end_idx, idx + 1
+    while next_idx < end_idx and elements[next_idx].id == VOID:
+        next_idx += 1
+    last = elements[next_idx - 1]
+    return last.offset + last.header_size + last.size - elements[idx].offset
+
+
+def _fits(data, space):
+    # The remaining space must be large enough for a Void element
+    return len(data) == space or len(data) <= space - 2
+
+
+def _read_elements(f, start, end):
+    elements, offset = [], start
+    while offset < end:
+        f.seek(offset)
+        element = _parse_header(f.read(12), offset)
+        if element.size is _UNKNOWN_SIZE:
+            raise ValueError(f'Element {element.id:#x} at {offset} has an unknown size')
+        elements.append(element)
+        offset += element.header_size + element.size
+    if offset != end:
+        raise ValueError('The last element exceeds the segment')
+    return elements
+
+
+def write_metadata(path, tags=None, *, chapters=None, languages=None, attachments=None):
+    """
+    Write tags, chapters, track languages and attachments to a Matroska or WebM file
+
+    @param tags         {name: value}, using the metadata names of ffmpeg. The title
+                        is written to the segment info, like ffmpeg does
+    @param chapters     [{'start_time', 'end_time', 'title'}], to replace the chapters of the file
+    @param languages    Languages of the tracks, in order. None leaves a track unchanged
+    @param attachments  [(filename, mimetype, data)]. An attachment replaces the first one of the same mimetype
+    @raises             ValueError if the file can not be edited
+    """
+    with open(path, 'r+b') as f:
+        file_size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        header = _parse_header(f.read(12), 0)
+        if header.id != EBML or header.size is _UNKNOWN_SIZE:
+            raise ValueError('Not a Matroska file')
+        f.seek(header.header_size)
+        if _find(_split(f.read(header.size)), DOC_TYPE) not in (b'matroska', b'webm'):
+            raise ValueError('Not a Matroska file')
+
+        segment_offset = header.header_size + header.size
+        f.seek(segment_offset)
+        segment_header = f.read(12)
+        segment = _parse_header(segment_header, segment_offset)
+        if segment.id != SEGMENT:
+            raise ValueError('The file does not start with a segment')
+        start = segment.offset + segment.header_size
+        if segment.size is not _UNKNOWN_SIZE and start + segment.size != file_size:
+            raise ValueError('The segment does not end at the end of the file')
+        elements = _read_elements(f, start, file_size)
+
+        def read(element):
+            f.seek(element.offset + element.header_size)
+            return f.read(element.size)
+
+        def single(element_id):
+            found = [element for element in elements if element.id == element_id]
+            if len(found) > 1:
+                raise ValueError(f'The file has several elements {element_id:#x}')
+            return found[0] if found else None
+
+        changes, removed_tags = {}, []
+        tags = {k: str(v) for k, v in (tags or {}).items()}
+        title = tags.get('title')
+        tags = {k: v for k, v in tags.items() if k not in _SKIPPED_TAGS}
+        if title is not None:
+            info = single(INFO)
+            data = info and _update_info(read(info), title)
+            if data and _fits(data, _available_space(elements, elements.index(info))):
+                changes[INFO] = data
+                removed_tags.append('TITLE')
+            else:
+                # ffmpeg gives precedence to the tag over the title of the segment info
+                tags['title'] = title
+        if tags:
+            element = single(TAGS)
+            changes[TAGS] = _update_tags(element and read(element), tags, removed_tags)
+        if languages:
+            element = single(TRACKS)
+            data = element and _update_tracks(read(element), languages)
+            if data:
+                changes[TRACKS] = data
+        if chapters:
+            single(CHAPTERS)
+            changes[CHAPTERS] = _make_chapters(chapters)
+        if attachments:
+            element = single(ATTACHMENTS)
+            changes[ATTACHMENTS] = _update_attachments(element and read(element), attachments)
+        if not changes:
+            return
+
+        # The changed elements and Voids at the end of the segment are rewritten together
+        tail_idx = len(elements)
+        while tail_idx and elements[tail_idx - 1].id in (VOID, *changes):
+            tail_idx -= 1
+        tail_start = elements[tail_idx].offset if tail_idx < len(elements) else file_size
+        writes, tail, positions = [], [], {}
+        existing = {element.id: i for i, element in enumerate(elements[:tail_idx]) if element.id in changes}
+
+        def write_in_place(idx, data):
+            space = _available_space(elements, idx, tail_idx)
+            offset = elements[idx].offset
+            if not _fits(data, space):
+                writes.append((offset, _void(space)))
+                return False
+            writes.append((offset, data))
+            if space != len(data):
+                writes.append((offset + len(data), _void(space - len(data))))
+            return True
+
+        for element_id, data in changes.items():
+            idx = existing.get(element_id)
+            if idx is None or not write_in_place(idx, data):
+                if idx is not None and element_id in _FIXED_ELEMENTS:
+                    raise ValueError(f'Element {element_id:#x} does not fit in place')
+                tail.append((element_id, data))
+
+        offset = tail_start
+        for element_id, data in tail:
+            positions[element_id] = offset - start
+            offset += len(data)
+        new_size = offset - start
+
+        if positions:
+            seek_heads = [i for i, element in enumerate(elements[:tail_idx]) if element.id == SEEK_HEAD]
+            if not seek_heads:
+                raise ValueError('The file has no SeekHead')
+            updated, found = [], set()
+            for idx in seek_heads:
+                children, ids = _update_seek_head(read(elements[idx]), positions)
+                updated.append((idx, children))
+                found.update(ids)
+            # Entries for the new elements are added to the first SeekHead
+            updated[0][1].extend(
+                (SEEK, _element(SEEK_ID, element_id.to_bytes(4, 'big')) + _uint(SEEK_POSITION, position))
+                for element_id, position in positions.items() if element_id not in found)
+            for idx, children in updated:
+                if not write_in_place(idx, _master(SEEK_HEAD, children)):
+                    raise ValueError('The SeekHead can not be updated in place')
+
+        if segment.size is not _UNKNOWN_SIZE and new_size != segment.size:
+            size_length = segment.header_size - _read_vint(segment_header, 0)[1]
+            writes.append((segment.offset + segment.header_size - size_length, _encode_size(new_size, size_length)))
+
+        # The new elements are written before anything refers to them
+        f.seek(tail_start)
+        for _, data in tail:
+            f.write(data)
+        f.truncate()
+        for offset, data in writes:
+            f.seek(offset)
+            f.write(data)
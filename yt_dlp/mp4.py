@@ -0,0 +1,375 @@
+"""
+In-place editing of the metadata of MP4 (ISO BMFF) files
+
+iTunes-style tags and cover art live in the moov box, which is small compared
+to the media data. The moov box is rewritten where it is, using the padding
+that follows it, or moved to the end of the file when nothing refers to data
+after it. The file is copied, with the chunk offsets shifted, when the media
+data follows the moov box and there is not enough padding, or when the moov
+box follows the media data: like ffmpeg's "-movflags +faststart", the moov box
+is then moved in front of the media data. Padding is left for later edits.
+
+A file that is edited in place stays valid if the editing is interrupted, and
+a copied file only replaces the original once it is complete.
+"""
+
+import collections
+import os
+import re
+import struct
+
+from .utils import prepend_extension
+
+# The iTunes atoms that ffmpeg's mp4 muxer writes for its metadata names
+STRING_TAGS = {
+    'title': b'\xa9nam',
+    'artist': b'\xa9ART',
+    'album_artist': b'aART',
+    'composer': b'\xa9wrt',
+    'album': b'\xa9alb',
+    'date': b'\xa9day',
+    'encoding_tool': b'\xa9too',
+    'comment': b'\xa9cmt',
+    'genre': b'\xa9gen',
+    'copyright': b'cprt',
+    'grouping': b'\xa9grp',
+    'lyrics': b'\xa9lyr',
+    'description': b'desc',
+    'synopsis': b'ldes',
+    'show': b'tvsh',
+    'episode_id': b'tven',
+    'network': b'tvnn',
+    'keywords': b'keyw',
+}
+# name: (atom, size in bytes)
+INTEGER_TAGS = {
+    'episode_sort': (b'tves', 4),
+    'season_number': (b'tvsn', 4),
+    'media_type': (b'stik', 1),
+    'hd_video': (b'hdvd', 1),
+    'gapless_playback': (b'pgap', 1),
+    'compilation': (b'cpil', 1),
+}
+# name: (atom, whether the atom has a trailing reserved field)
+NUMBER_PAIR_TAGS = {
+    'track': (b'trkn', True),
+    'disc': (b'disk', False),
+}
+COVER_FORMATS = {'jpeg': 13, 'png': 14}
+
+_DATA_UTF8, _DATA_SIGNED_INT = 1, 21
+_FREE_BOXES = (b'free', b'skip')
+# Boxes holding absolute file offsets that are not updated when the media data is moved
+_UNSUPPORTED_OFFSET_BOXES = (b'saio', b'iloc')
+
+Box = collections.namedtuple('Box', ('type', 'offset', 'header_size', 'size'))
+
+
+def _box(box_type, payload):
+    size = 8 + len(payload)
+    if size > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, box_type, size + 8) + payload
+    return struct.pack('>I4s', size, box_type) + payload
+
+
+def _free_box(size):
+    return _box(b'free', bytes(size - 8))
+
+
+def _parse_header(header, offset, end):
+    if len(header) < 8:
+        raise ValueError(f'Truncated box header at {offset}')
+    size, box_type = struct.unpack_from('>I4s', header)
+    header_size = 8
+    if size == 1:
+        if len(header) < 16:
+            raise ValueError(f'Truncated box header at {offset}')
+        size, header_size = struct.unpack_from('>Q', header, 8)[0], 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size or offset + size > end:
+        raise ValueError(f'Invalid size of {box_type.decode("latin-1")!r} box at {offset}')
+    return Box(box_type, offset, header_size, size)
+
+
+def _read_boxes(data, start=0, end=None):
+    end = len(data) if end is None else end
+    while start < end:
+        box = _parse_header(data[start:start + 16], start, end)
+        yield box
+        start += box.size
+
+
+def _read_file_boxes(f, end):
+    offset = 0
+    while offset < end:
+        f.seek(offset)
+        box = _parse_header(f.read(16), offset, end)
+        yield box
+        offset += box.size
+
+
+def _split(data, start=0):
+    """Split the boxes in data[start:] into a list of (type, payload)"""
+    return [(box.type, data[box.offset + box.header_size:box.offset + box.size])
+            for box in _read_boxes(data, start)]
+
+
+def _join(boxes):
+    return b''.join(_box(box_type, payload) for box_type, payload in boxes)
+
+
+def _find(boxes, box_type):
+    return next((i for i, (t, _) in enumerate(boxes) if t == box_type), None)
+
+
+def _walk(data, path, start=0, end=None):
+    """Yield the boxes in data that are found at path, e.g. (b'trak', b'mdia', b'mdhd')"""
+    for box in _read_boxes(data, start, end):
+        if box.type != path[0]:
+            continue
+        elif len(path) == 1:
+            yield box
+        else:
+            yield from _walk(data, path[1:], box.offset + box.header_size, box.offset + box.size)
+
+
+def _leading_int(value):
+    mobj = re.match(r'\s*([+-]?\d+)', value)
+    return int(mobj.group(1)) if mobj else 0
+
+
+def _data_atom(atom, data_type, payload):
+    return atom, _box(b'data', struct.pack('>II', data_type, 0) + payload)
+
+
+def _make_items(tags, cover):
+    items = []
+    for name, value in (tags or {}).items():
+        value = str(value)
+        if name in STRING_TAGS:
+            items.append(_data_atom(STRING_TAGS[name], _DATA_UTF8, value.encode()))
+        elif name in INTEGER_TAGS:
+            atom, size = INTEGER_TAGS[name]
+            number = _leading_int(value) % (1 << (8 * size))
+            items.append(_data_atom(atom, _DATA_SIGNED_INT, number.to_bytes(size, 'big')))
+        elif name in NUMBER_PAIR_TAGS:
+            atom, reserved = NUMBER_PAIR_TAGS[name]
+            number, _, total = value.partition('/')
+            number, total = _leading_int(number), _leading_int(total)
+            if number > 0:
+                items.append(_data_atom(atom, 0, struct.pack(
+                    '>HHH', 0, number & 0xFFFF, total & 0xFFFF) + (b'\0\0' if reserved else b'')))
+    if cover:
+        data, image_format = cover
+        if image_format not in COVER_FORMATS:
+            raise ValueError(f'Incompatible cover image format: {image_format}')
+        items.append(_data_atom(b'covr', COVER_FORMATS[image_format], data))
+    return items
+
+
+def _update_ilst(moov, new_items):
+    """Return the payload of moov with new_items set in moov.udta.meta.ilst"""
+    children = _split(moov)
+    idx = _find(children, b'udta')
+    udta = _split(children[idx][1]) if idx is not None else []
+
+    meta_idx = _find(udta, b'meta')
+    meta = udta[meta_idx][1] if meta_idx is not None else bytes(4)
+    # QuickTime meta boxes do not have the version and flags of an ISO full box
+    prefix = b'' if meta[4:8] == b'hdlr' else meta[:4]
+    meta_children = [(t, p) for t, p in _split(meta, len(prefix)) if t not in _FREE_BOXES]
+    if _find(meta_children, b'hdlr') is None:
+        meta_children.insert(0, (b'hdlr', bytes(8) + b'mdirappl' + bytes(9)))
+
+    ilst_idx = _find(meta_children, b'ilst')
+    items = _split(meta_children[ilst_idx][1]) if ilst_idx is not None else []
+    # Replaced atoms keep their position. Duplicates of them are removed
+    replaced, pending = {atom for atom, _ in new_items}, dict(new_items)
+    items = [(atom, pending.pop(atom)) if atom in pending else (atom, payload)
+             for atom, payload in items if atom not in replaced or atom in pending]
+    items.extend(pending.items())
+
+    ilst = (b'ilst', _join(items))
+    if ilst_idx is None:
+        meta_children.append(ilst)
+    else:
+        meta_children[ilst_idx] = ilst
+    meta = (b'meta', prefix + _join(meta_children))
+    if meta_idx is None:
+        udta.append(meta)
+    else:
+        udta[meta_idx] = meta
+    if idx is None:
+        children.append((b'udta', _join(udta)))
+    else:
+        children[idx] = (b'udta', _join(udta))
+    return _join(children)
+
+
+def _set_languages(moov, languages):
+    moov = bytearray(moov)
+    for language, box in zip(languages, _walk(moov, (b'trak', b'mdia', b'mdhd'))):
+        # Like ffmpeg, only ISO 639-2 codes are written
+        if not re.fullmatch(r'[a-z]{3}', language or ''):
+            continue
+        payload = box.offset + box.header_size
+        # The creation and modification times and the duration are 64-bit in version 1
+        offset = payload + (32 if moov[payload] == 1 else 20)
+        code = 0
+        for char in language:
+            code = code << 5 | (ord(char) - 0x60)
+        moov[offset:offset + 2] = code.to_bytes(2, 'big')
+    return bytes(moov)
+
+
+def _shift_chunk_offsets(moov, shifts):
+    """Shift the chunk offsets in moov. shifts is a list of (start, end, delta) ranges of offsets"""
+    moov = bytearray(moov)
+    header_size = _parse_header(moov[:16], 0, len(moov)).header_size
+    for box_type, fmt in ((b'stco', '>I'), (b'co64', '>Q')):
+        for box in _walk(moov, (b'trak', b'mdia', b'minf', b'stbl', box_type), header_size):
+            start = box.offset + box.header_size
+            count = struct.unpack_from('>I', moov, start + 4)[0]
+            size = struct.calcsize(fmt)
+            if 8 + count * size > box.size - box.header_size:
+                raise ValueError(f'Invalid {box_type.decode()} box')
+            offsets = struct.unpack_from(f'>{count}{fmt[1]}', moov, start + 8)
+            offsets = [offset + next((delta for start, end, delta in shifts if start <= offset < end), 0)
+                       for offset in offsets]
+            if fmt == '>I' and offsets and max(offsets) > 0xFFFFFFFF:
+                raise ValueError('The chunk offsets do not fit in 32 bits')
+            struct.pack_into(f'>{count}{fmt[1]}', moov, start + 8, *offsets)
+    return bytes(moov)
+
+
+def _padding(file_size):
+    return max(4096, min(file_size // 100, 1 << 20))
+
+
+def _copy(src, dst, length):
+    while length > 0:
+        chunk = src.read(min(length, 1 << 20))
+        if not chunk:
+            raise ValueError('Unexpected end of file')
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _read_moov(f):
+    file_size = f.seek(0, os.SEEK_END)
+    boxes = list(_read_file_boxes(f, file_size))
+    moov_idx = [i for i, box in enumerate(boxes) if box.type == b'moov']
+    if len(moov_idx) != 1:
+        raise ValueError('Expected a single moov box')
+    moov_box = boxes[moov_idx[0]]
+    f.seek(moov_box.offset)
+    return file_size, boxes, moov_idx[0], f.read(moov_box.size)[moov_box.header_size:]
+
+
+def track_types(path):
+    """
+    Return the handler types of the tracks of an MP4 file, e.g. ['vide', 'soun']
+
+    @raises ValueError if the file can not be parsed
+    """
+    with open(path, 'rb') as f:
+        moov = _read_moov(f)[3]
+    return [moov[box.offset + box.header_size + 8:box.offset + box.header_size + 12].decode('latin-1')
+            for box in _walk(moov, (b'trak', b'mdia', b'hdlr'))]
+
+
+def write_metadata(path, tags=None, *, cover=None, languages=None):
+    """
+    Write iTunes-style tags, cover art and track languages to an MP4 file
+
+    @param tags       {name: value}, using the metadata names of ffmpeg (title, artist, ...).
+                      Names that ffmpeg does not write to MP4 files are ignored
+    @param cover      (image data, 'jpeg' or 'png'), to replace the cover art
+    @param languages  ISO 639-2 languages of the tracks, in order. Other values leave a track unchanged
+    @returns          Whether the file was edited in place. Otherwise, it was copied
+    @raises           ValueError if the file can not be edited
+    """
+    new_items = _make_items(tags, cover)
+
+    with open(path, 'r+b') as f:
+        file_size, boxes, moov_idx, moov = _read_moov(f)
+        moov_box = boxes[moov_idx]
+        if any(next(_walk(moov, (b'trak', b'mdia', b'minf', b'stbl', box_type)), None)
+               for box_type in _UNSUPPORTED_OFFSET_BOXES):
+            raise ValueError('The file has auxiliary information offsets')
+
+        if languages:
+            moov = _set_languages(moov, languages)
+        if new_items:
+            moov = _update_ilst(moov, new_items)
+        new_moov = _box(b'moov', moov)
+
+        # The moov box can grow into the padding after it
+        following = boxes[moov_idx + 1:]
+        free_count = next((i for i, box in enumerate(following) if box.type not in _FREE_BOXES), len(following))
+        end = following[free_count - 1].offset + following[free_count - 1].size if free_count else (
+            moov_box.offset + moov_box.size)
+        following = following[free_count:]
+        available, spare = end - moov_box.offset, end - moov_box.offset - len(new_moov)
+        # Like ffmpeg's faststart, a moov box that follows the media data is moved in front of it
+        insert_offset = next((box.offset for box in boxes[:moov_idx] if box.type == b'mdat'), moov_box.offset)
+
+        # The file is kept valid at every step, in case the editing is interrupted:
+        # a copy of the new moov box is written at the end of the file before the old
+        # one is turned into a free box, and box headers are only changed once what
+        # they refer to has been written
+        if insert_offset == moov_box.offset:
+            if spare == 0 or spare >= 8:
+                f.seek(file_size)
+                f.write(new_moov)
+                _sync(f)
+                f.seek(moov_box.offset)
+                f.write(struct.pack('>I4s', available, b'free'))
+                _sync(f)
+                f.seek(moov_box.offset + 8)
+                f.write(new_moov[8:])
+                if spare:
+                    f.write(_free_box(spare))
+                _sync(f)
+                f.seek(moov_box.offset)
+                f.write(new_moov[:8])
+                _sync(f)
+                f.truncate(file_size if following else moov_box.offset + len(new_moov))
+                return True
+
+            if not any(box.type in (b'mdat', b'moof') for box in following):
+                # Nothing refers to the data after the moov box by its offset
+                f.seek(file_size)
+                f.write(new_moov)
+                _sync(f)
+                f.seek(moov_box.offset)
+                f.write(struct.pack('>I4s', available, b'free'))
+                return True
+
+        if any(box.type == b'moof' for box in boxes) or next(_walk(moov, (b'mvex', )), None):
+            raise ValueError('Fragmented files can not be resized')
+        padding = _padding(file_size)
+        growth = len(new_moov) + padding
+        new_moov = _shift_chunk_offsets(new_moov, [
+            (insert_offset, moov_box.offset, growth), (end, file_size, growth - available)])
+        temp_path = prepend_extension(path, 'temp')
+        try:
+            with open(temp_path, 'wb') as out:
+                f.seek(0)
+                _copy(f, out, insert_offset)
+                out.write(new_moov)
+                out.write(_free_box(padding))
+                _copy(f, out, moov_box.offset - insert_offset)
+                f.seek(end)
+                _copy(f, out, file_size - end)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    os.replace(temp_path, path)
+    return False
@@ -35,3 +35,17 @@
     pass
 except Exception as e:
     warnings.warn(f'Failed to import "curl_cffi" request handler: {e}' + bug_reports_message())
+
+try:
+    from . import _h2
+except ImportError:
+    pass
+except Exception as e:
+    warnings.warn(f'Failed to import "h2" request handler: {e}' + bug_reports_message())
+
+try:
+    from . import _asyncio
+except ImportError:
+    pass
+except Exception as e:
+    warnings.warn(f'Failed to import "asyncio" request handler: {e}' + bug_reports_message())
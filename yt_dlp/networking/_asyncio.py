@@ -0,0 +1,616 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import functools
+import http.client
+import io
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from ._helper import (
+    InstanceStoreMixin,
+    add_accept_encoding_header,
+    get_redirect_method,
+    select_proxy,
+)
+from ._urllib import (
+    CONTENT_DECODE_ERRORS,
+    SUPPORTED_ENCODINGS,
+    ContentDecodingReader,
+    _decode_all,
+    make_content_decoders,
+)
+from .common import (
+    Features,
+    Request,
+    RequestHandler,
+    Response,
+    register_preference,
+    register_rh,
+)
+from .exceptions import (
+    CertificateVerifyError,
+    HTTPError,
+    IncompleteRead,
+    ProxyError,
+    RequestError,
+    SSLError,
+    TransportError,
+    UnsupportedRequest,
+)
+from ..utils.networking import HTTPHeaderDict, normalize_url
+
+_loop = _loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """The event loop on which the requests of all AsyncioRH instances are made, running in a background thread"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='asyncio-rh', daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+def _in_loop_thread():
+    return _loop_thread is not None and threading.current_thread() is _loop_thread
+
+
+def _run(coro):
+    """Run a coroutine on the event loop and wait for its result"""
+    if _in_loop_thread():
+        coro.close()
+        raise RuntimeError('Blocking calls can not be made on the event loop; use AsyncioRH.asend instead')
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def _call_soon(func, *args):
+    if _in_loop_thread():
+        func(*args)
+    else:
+        get_event_loop().call_soon_threadsafe(func, *args)
+
+
+def _map_error(e):
+    """Get the RequestError for an exception raised by a connection, or the exception itself if it is unexpected"""
+    if isinstance(e, RequestError):
+        return e
+    elif isinstance(e, asyncio.TimeoutError):
+        return TransportError(cause=TimeoutError('The operation timed out'))
+    elif isinstance(e, ssl.SSLCertVerificationError):
+        return CertificateVerifyError(cause=e)
+    elif isinstance(e, ssl.SSLError):
+        return SSLError(cause=e)
+    elif isinstance(e, (OSError, EOFError, http.client.HTTPException)):
+        return TransportError(cause=e)
+    return e
+
+
+async def _wait(awaitable, timeout):
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+async def _readline(reader, timeout):
+    try:
+        return await _wait(reader.readline(), timeout)
+    except ValueError as e:
+        # The line is longer than the limit of the reader
+        raise http.client.LineTooLong('header line') from e
+
+
+def _iter_body(data, chunk_size=64 * 1024):
+    if hasattr(data, 'read'):
+        yield from iter(lambda: data.read(chunk_size), b'')
+    else:
+        yield from data
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def dropped(self):
+        # An idle connection should have nothing to read;
+        # if it has been closed by the server, the reader has been fed the EOF
+        return self.writer.is_closing() or self.reader.at_eof() or self.reader.exception() is not None
+
+    def close(self):
+        self.writer.close()
+
+
+class _ConnectionPool:
+    """
+    Pool of idle keep-alive connections, only used on the event loop
+
+    Connections are keyed by (scheme, host, port, proxy, ssl context).
+    A connection is taken out of the pool for the duration of a request and
+    is put back once its response has been read to the end.
+    """
+
+    MAX_IDLE_PER_KEY = 10
+    IDLE_TIMEOUT = 60
+
+    def __init__(self):
+        self._idle = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            conn, released = idle.pop()
+            if time.monotonic() - released < self.IDLE_TIMEOUT and not conn.dropped:
+                self.hits += 1
+                return conn
+            conn.close()
+        self.misses += 1
+        return None
+
+    def put(self, key, conn):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.MAX_IDLE_PER_KEY and not conn.dropped:
+            idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+
+    def close(self):
+        for idle in self._idle.values():
+            for conn, _ in idle:
+                conn.close()
+        self._idle.clear()
+
+
+class _ResponseBody:
+    """
+    The body of a HTTP/1.1 response, read from the connection on the event loop
+
+    `on_done` is called with the connection once the body has been read to the end,
+    if the connection can be reused. Otherwise, the connection is closed.
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, conn, timeout, length=None, chunked=False, on_done=None):
+        self._conn = conn
+        self._timeout = timeout
+        self._remaining = length  # None if the body ends when the connection is closed
+        self._chunked = chunked
+        self._chunk_left = 0
+        self._on_done = on_done
+        self._received = 0
+        self._done = False
+        if not chunked and length == 0:
+            self._finish()
+
+    def _finish(self):
+        self._done = True
+        conn, self._conn = self._conn, None
+        if self._on_done and (self._chunked or self._remaining is not None):
+            self._on_done(conn)
+        else:
+            conn.close()
+
+    def _abort(self):
+        if not self._done:
+            self._done = True
+            conn, self._conn = self._conn, None
+            conn.close()
+
+    async def read(self, amt=-1):
+        if amt is None or amt < 0:
+            chunks = []
+            while data := await self.read(self.READ_SIZE):
+                chunks.append(data)
+            return b''.join(chunks)
+        if self._done or not amt:
+            return b''
+        try:
+            if self._chunked:
+                data = await self._read_chunk(amt)
+            else:
+                data = await _wait(self._conn.reader.read(
+                    amt if self._remaining is None else min(amt, self._remaining)), self._timeout)
+                if self._remaining is not None:
+                    if not data:
+                        raise IncompleteRead(partial=self._received, expected=self._remaining)
+                    self._remaining -= len(data)
+        except BaseException as e:
+            self._abort()
+            error = _map_error(e)
+            if error is e:
+                raise
+            raise error from e
+        self._received += len(data)
+        if not self._done and (not data or self._remaining == 0):
+            self._finish()
+        return data
+
+    async def _read_chunk(self, amt):
+        reader = self._conn.reader
+        if not self._chunk_left:
+            line = await _readline(reader, self._timeout)
+            if not line:
+                raise IncompleteRead(partial=self._received)
+            try:
+                self._chunk_left = int(line.split(b';', 1)[0], 16)
+            except ValueError:
+                raise TransportError(f'Invalid chunk size: {line!r}')
+            if not self._chunk_left:
+                # Skip the trailers
+                while await _readline(reader, self._timeout) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''
+        data = await _wait(reader.read(min(amt, self._chunk_left)), self._timeout)
+        if not data:
+            raise IncompleteRead(partial=self._received)
+        self._chunk_left -= len(data)
+        if not self._chunk_left:
+            await _wait(reader.readexactly(2), self._timeout)
+        return data
+
+    def close(self):
+        _call_soon(self._abort)
+
+
+class _SyncBodyReader(io.RawIOBase):
+    """File-like object for reading a response body from outside of the event loop"""
+
+    def __init__(self, body):
+        self._body = body
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return _run(self._body.read(-1 if size is None else size))
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        memoryview(buffer).cast('B')[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._body.close()
+        super().close()
+
+
+class AsyncioResponseAdapter(Response):
+    def __init__(self, body, url, headers, status, reason):
+        self._body = body
+        fp = _SyncBodyReader(body)
+        decoders = make_content_decoders(headers.get('Content-Encoding', ''))
+        if decoders:
+            fp = ContentDecodingReader(fp, decoders)
+        super().__init__(fp, url, headers, status, reason)
+
+    def read(self, amt=None):
+        try:
+            return self.fp.read(amt)
+        except tuple(CONTENT_DECODE_ERRORS) as e:
+            raise TransportError(cause=e) from e
+
+    def readinto(self, buffer):
+        try:
+            return self.fp.readinto(buffer)
+        except tuple(CONTENT_DECODE_ERRORS) as e:
+            raise TransportError(cause=e) from e
+
+    async def aread(self):
+        """Read the whole body on the event loop. Use this instead of read() in coroutines"""
+        data = await self._body.read()
+        try:
+            for decoder in make_content_decoders(self.headers.get('Content-Encoding', '')):
+                data = _decode_all(decoder, data)
+        except tuple(CONTENT_DECODE_ERRORS) as e:
+            raise TransportError(cause=e) from e
+        return data
+
+
+class _CookieResponse:
+    """The interface of an urllib response that CookieJar.extract_cookies needs"""
+
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+@register_rh
+class AsyncioRH(RequestHandler, InstanceStoreMixin):
+    """
+    HTTP/1.1 request handler on an asyncio event loop
+
+    The requests of all instances are made on a single event loop, running in a background thread,
+    so that any number of them can be in flight without a thread each.
+    Coroutines on that loop (see `loop`) send requests with `asend` and read the responses with `aread`;
+    `send` and the responses' `read` block the calling thread until the loop has done so.
+    Since this only saves threads when many requests are made at once,
+    the handler is only preferred for fragment downloads (see the `fragment` extension).
+    """
+    RH_NAME = 'asyncio'
+    _SUPPORTED_URL_SCHEMES = ('http', 'https')
+    _SUPPORTED_PROXY_SCHEMES = ('http',)
+    _SUPPORTED_FEATURES = (Features.NO_PROXY, Features.ALL_PROXY)
+
+    MAX_REDIRECTS = 10
+    MAX_HEADERS = 100
+    # Methods that can be sent again after a failure, see RFC 9110, section 9.2.2
+    _IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._connection_pool = _ConnectionPool()
+
+    @property
+    def loop(self):
+        return get_event_loop()
+
+    def close(self):
+        self._clear_instances()
+        if _loop is not None:
+            _call_soon(self._connection_pool.close)
+        pool = self._connection_pool
+        if self.verbose and pool.hits + pool.misses:
+            self._logger.debug(
+                f'asyncio: reused {pool.hits} of {pool.hits + pool.misses} connections '
+                f'({pool.hits / (pool.hits + pool.misses):.0%} connection pool hit ratio)')
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        extensions.pop('legacy_ssl', None)
+
+    def _validate(self, request):
+        super()._validate(request)
+        # StreamWriter.start_tls was added in Python 3.11
+        if (not hasattr(asyncio.StreamWriter, 'start_tls')
+                and urllib.parse.urlparse(request.url).scheme.lower() == 'https'
+                and select_proxy(request.url, self._get_proxies(request))):
+            raise UnsupportedRequest('Tunneling through a proxy requires Python 3.11+')
+
+    def _create_instance(self, legacy_ssl_support):
+        return self._make_sslcontext(legacy_ssl_support=legacy_ssl_support)
+
+    def _send(self, request):
+        return _run(self._asend(request))
+
+    async def asend(self, request: Request) -> AsyncioResponseAdapter:
+        """Send a request from a coroutine running on `loop`, without blocking it"""
+        if not isinstance(request, Request):
+            raise TypeError('Expected an instance of Request')
+        try:
+            return await self._asend(request)
+        except RequestError as e:
+            if e.handler is None:
+                e.handler = self
+            raise
+
+    async def _asend(self, request):
+        headers = self._merge_headers(request.headers)
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+        cookiejar = self._get_cookiejar(request)
+        proxies = self._get_proxies(request)
+        ssl_context = self._get_instance(legacy_ssl_support=request.extensions.get('legacy_ssl'))
+        timeout = self._calculate_timeout(request)
+        url, method, data = normalize_url(request.url), request.method, request.data
+
+        for redirects in range(self.MAX_REDIRECTS + 1):
+            response = await self._request(url, method, headers, data, cookiejar, proxies, ssl_context, timeout)
+            location = response.headers.get('Location')
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                break
+            if redirects == self.MAX_REDIRECTS:
+                raise HTTPError(response, redirect_loop=True)
+            # Read the body so that the connection can be reused
+            with contextlib.suppress(RequestError):
+                await response._body.read()
+            response.close()
+            url = normalize_url(urllib.parse.urljoin(url, location.encode('latin-1').decode()))
+            if urllib.parse.urlparse(url).scheme not in self._SUPPORTED_URL_SCHEMES:
+                # Another handler would send the request again and repeat the redirects followed so far
+                raise RequestError(f'Unable to follow the redirect to {url}: unsupported url scheme')
+            new_method = get_redirect_method(method, response.status)
+            # Cookie header may be for another host; cookies from the jar are added per request
+            headers.pop('Cookie', None)
+            if new_method != method:
+                method, data = new_method, None
+                headers.pop('Content-Length', None)
+                headers.pop('Content-Type', None)
+
+        response.extensions['trace'] = {**response.extensions['trace'], 'redirects': redirects}
+        if not 200 <= response.status < 300:
+            raise HTTPError(response, redirect_loop=False)
+        return response
+
+    @staticmethod
+    def _proxy_authorization(proxy):
+        _, user, password, _ = urllib.request._parse_proxy(proxy)
+        if user is None or password is None:
+            return None
+        credentials = f'{urllib.parse.unquote(user)}:{urllib.parse.unquote(password)}'
+        return 'Basic ' + base64.b64encode(credentials.encode()).decode('ascii')
+
+    async def _request(self, url, method, headers, data, cookiejar, proxies, ssl_context, timeout):
+        parsed = urllib.parse.urlparse(url)
+        scheme = parsed.scheme.lower()
+        host, port = parsed.hostname, parsed.port or (443 if scheme == 'https' else 80)
+        netloc = parsed.netloc.rpartition('@')[2]
+        target = urllib.parse.urlunparse(('', '', parsed.path or '/', parsed.params, parsed.query, ''))
+        headers = HTTPHeaderDict({'Host': netloc}, headers)
+        if 'Cookie' not in headers:
+            cookie_header = cookiejar.get_cookie_header(url)
+            if cookie_header:
+                headers['Cookie'] = cookie_header
+
+        proxy = select_proxy(url, proxies)
+        tunnel_headers = {}
+        if proxy:
+            proxy_authorization = self._proxy_authorization(proxy)
+            if scheme == 'http':
+                target = urllib.parse.urlunparse((scheme, netloc, *parsed[2:5], ''))
+                if proxy_authorization:
+                    headers['Proxy-Authorization'] = proxy_authorization
+            else:
+                # Proxy-Authorization should not be sent to origin server
+                proxy_authorization = headers.pop('Proxy-Authorization', None) or proxy_authorization
+                if proxy_authorization:
+                    tunnel_headers['Proxy-Authorization'] = proxy_authorization
+
+        if isinstance(data, (bytes, bytearray)):
+            headers.setdefault('Content-Length', str(len(data)))
+        elif data is not None:
+            if 'Content-Length' not in headers:
+                headers['Transfer-Encoding'] = 'chunked'
+        elif method in ('POST', 'PUT', 'PATCH'):
+            headers.setdefault('Content-Length', '0')
+
+        lines = [f'{method} {target} HTTP/1.1', *(f'{name}: {value}' for name, value in headers.items())]
+        if any(c in line for line in lines for c in '\0\r\n'):
+            raise RequestError('Invalid characters in the request line or headers')
+        try:
+            head = ''.join(f'{line}\r\n' for line in lines).encode('latin-1') + b'\r\n'
+        except UnicodeEncodeError as e:
+            raise RequestError(cause=e) from e
+
+        pool_key = (scheme, host, port, proxy, ssl_context)
+        conn = self._connection_pool.get(pool_key)
+        reused = conn is not None
+        try:
+            if reused:
+                try:
+                    version, status, reason, response_headers = await self._exchange(
+                        conn, method, head, data, headers, timeout)
+                except ConnectionError:
+                    # The server may have closed the idle connection while the request was being sent.
+                    # Retry once on a new connection if the request is idempotent and its body can be sent again,
+                    # since the server may also have processed the request before closing the connection
+                    if method not in self._IDEMPOTENT_METHODS or not isinstance(data, (bytes, type(None))):
+                        raise
+                    conn.close()
+                    conn, reused = None, False
+            if not reused:
+                conn = await self._connect(scheme, host, port, proxy, tunnel_headers, ssl_context, timeout)
+                version, status, reason, response_headers = await self._exchange(
+                    conn, method, head, data, headers, timeout)
+        except BaseException as e:
+            if conn is not None:
+                conn.close()
+            error = _map_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+        cookiejar.extract_cookies(_CookieResponse(response_headers), urllib.request.Request(url))
+
+        length, chunked = None, False
+        if method == 'HEAD' or status in (204, 304):
+            length = 0
+        elif 'chunked' in response_headers.get('Transfer-Encoding', '').lower():
+            chunked = True
+        else:
+            try:
+                length = int(response_headers.get('Content-Length'))
+                if length < 0:
+                    length = None
+            except (TypeError, ValueError):
+                pass
+        reusable = version == 'HTTP/1.1' and 'close' not in response_headers.get('Connection', '').lower()
+        body = _ResponseBody(
+            conn, timeout, length=length, chunked=chunked,
+            on_done=functools.partial(self._connection_pool.put, pool_key) if reusable else None)
+        response = AsyncioResponseAdapter(body, url, response_headers, status, reason)
+        response.extensions['trace'] = {'reused_connection': reused}
+        return response
+
+    async def _connect(self, scheme, host, port, proxy, tunnel_headers, ssl_context, timeout):
+        kwargs = {'local_addr': (self.source_address, 0)} if self.source_address else {}
+        if self.happy_eyeballs_delay:
+            kwargs['happy_eyeballs_delay'] = self.happy_eyeballs_delay
+        if not proxy:
+            if scheme == 'https':
+                kwargs.update(ssl=ssl_context, server_hostname=host)
+            return _Connection(*await _wait(asyncio.open_connection(host, port, **kwargs), timeout))
+
+        proxy_parsed = urllib.parse.urlsplit('//' + urllib.request._parse_proxy(proxy)[3])
+        conn = _Connection(*await _wait(
+            asyncio.open_connection(proxy_parsed.hostname, proxy_parsed.port or 80, **kwargs), timeout))
+        if scheme == 'http':
+            return conn
+        try:
+            authority = f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+            conn.writer.write(''.join((
+                f'CONNECT {authority} HTTP/1.1\r\nHost: {authority}\r\n',
+                *(f'{name}: {value}\r\n' for name, value in tunnel_headers.items()),
+                '\r\n')).encode('latin-1'))
+            _, status, reason, _ = await self._read_response_head(conn.reader, timeout)
+            if status != 200:
+                raise ProxyError(f'Tunnel connection failed: {status} {reason}')
+            await _wait(conn.writer.start_tls(ssl_context, server_hostname=host), timeout)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def _exchange(self, conn, method, head, data, headers, timeout):
+        conn.writer.write(head)
+        if isinstance(data, (bytes, bytearray)):
+            conn.writer.write(data)
+        elif data is not None:
+            chunked = 'Transfer-Encoding' in headers
+            for chunk in _iter_body(data):
+                if chunked:
+                    conn.writer.write(f'{len(chunk):X}\r\n'.encode() + chunk + b'\r\n')
+                else:
+                    conn.writer.write(chunk)
+                await _wait(conn.writer.drain(), timeout)
+            if chunked:
+                conn.writer.write(b'0\r\n\r\n')
+        await _wait(conn.writer.drain(), timeout)
+        return await self._read_response_head(conn.reader, timeout)
+
+    async def _read_response_head(self, reader, timeout):
+        """Read the status line and headers of the final response, skipping any informational responses"""
+        while True:
+            line = await _readline(reader, timeout)
+            if not line:
+                raise ConnectionResetError('Remote end closed connection without response')
+            try:
+                version, status, *reason = line.decode('latin-1').rstrip('\r\n').split(None, 2)
+                status = int(status)
+            except ValueError:
+                raise http.client.BadStatusLine(line)
+            if not version.startswith('HTTP/') or not 100 <= status <= 999:
+                raise http.client.BadStatusLine(line)
+            lines = []
+            while (line := await _readline(reader, timeout)) not in (b'\r\n', b'\n', b''):
+                lines.append(line)
+                if len(lines) > self.MAX_HEADERS:
+                    raise http.client.HTTPException(f'got more than {self.MAX_HEADERS} headers')
+            if status >= 200:
+                headers = http.client.parse_headers(io.BytesIO(b''.join(lines) + b'\r\n'))
+                return version, status, reason[0].strip() if reason else '', headers
+
+
+@register_preference(AsyncioRH)
+def asyncio_preference(rh, request):
+    if request.extensions.get('fragment'):
+        return 150
+    return -150
@@ -36,7 +36,7 @@
     raise ImportError('Only curl_cffi versions 0.5.10, 0.7.0 and 0.7.1 are supported')
 
 import curl_cffi.requests
-from curl_cffi.const import CurlECode, CurlOpt
+from curl_cffi.const import CurlECode, CurlInfo, CurlOpt
 
 
 class CurlCFFIResponseReader(io.IOBase):
@@ -49,32 +49,61 @@ def __init__(self, response: curl_cffi.requests.Response):
     def readable(self):
         return True
 
+    def _fill(self, size):
+        while self._iterator and (size is None or len(self._buffer) < size):
+            chunk = next(self._iterator, None)
+            if chunk is None:
+                self._iterator = None
+                break
+            self._buffer += chunk
+            self.bytes_read += len(chunk)
+
+    def _release_if_done(self):
+        # "free" the curl instance if the response is fully read.
+        # curl_cffi doesn't do this automatically and only allows one open response per thread
+        if not self._iterator and not self._buffer:
+            self.close()
+
     def read(self, size=None):
         exception_raised = True
         try:
-            while self._iterator and (size is None or len(self._buffer) < size):
-                chunk = next(self._iterator, None)
-                if chunk is None:
-                    self._iterator = None
-                    break
-                self._buffer += chunk
-                self.bytes_read += len(chunk)
-
+            self._fill(size)
             if size is None:
                 size = len(self._buffer)
             data = self._buffer[:size]
             self._buffer = self._buffer[size:]
-
-            # "free" the curl instance if the response is fully read.
-            # curl_cffi doesn't do this automatically and only allows one open response per thread
-            if not self._iterator and not self._buffer:
-                self.close()
+            self._release_if_done()
             exception_raised = False
             return data
         finally:
             if exception_raised:
                 self.close()
 
+    def readinto(self, buffer):
+        buffer = memoryview(buffer).cast('B')
+        exception_raised = True
+        try:
+            # Copy the chunks straight into the buffer, rather than joining them first
+            size = 0
+            while size < len(buffer):
+                if not self._buffer:
+                    chunk = next(self._iterator, None) if self._iterator else None
+                    if chunk is None:
+                        self._iterator = None
+                        break
+                    self._buffer = chunk
+                    self.bytes_read += len(chunk)
+                taken = min(len(self._buffer), len(buffer) - size)
+                buffer[size:size + taken] = self._buffer[:taken]
+                self._buffer = self._buffer[taken:]
+                size += taken
+            self._release_if_done()
+            exception_raised = False
+            return size
+        finally:
+            if exception_raised:
+                self.close()
+
     def close(self):
         if not self.closed:
             self._response.close()
@@ -96,13 +125,22 @@ def read(self, amt=None):
         try:
             return self.fp.read(amt)
         except curl_cffi.requests.errors.RequestsError as e:
-            if e.code == CurlECode.PARTIAL_FILE:
-                content_length = int_or_none(e.response.headers.get('Content-Length'))
-                raise IncompleteRead(
-                    partial=self.fp.bytes_read,
-                    expected=content_length - self.fp.bytes_read if content_length is not None else None,
-                    cause=e) from e
-            raise TransportError(cause=e) from e
+            self._raise_read_error(e)
+
+    def readinto(self, buffer):
+        try:
+            return self.fp.readinto(buffer)
+        except curl_cffi.requests.errors.RequestsError as e:
+            self._raise_read_error(e)
+
+    def _raise_read_error(self, e):
+        if e.code == CurlECode.PARTIAL_FILE:
+            content_length = int_or_none(e.response.headers.get('Content-Length'))
+            raise IncompleteRead(
+                partial=self.fp.bytes_read,
+                expected=content_length - self.fp.bytes_read if content_length is not None else None,
+                cause=e) from e
+        raise TransportError(cause=e) from e
 
 
 @register_rh
@@ -202,6 +240,12 @@ def _send(self, request: Request):
             if client_certificate_password:
                 session.curl.setopt(CurlOpt.KEYPASSWD, client_certificate_password)
 
+        # curl keeps its own DNS cache and does happy eyeballs itself
+        if self.dns_cache_ttl is not None:
+            session.curl.setopt(CurlOpt.DNS_CACHE_TIMEOUT, math.ceil(self.dns_cache_ttl))
+        if self.happy_eyeballs_delay is not None:
+            session.curl.setopt(CurlOpt.HAPPY_EYEBALLS_TIMEOUT_MS, int(self.happy_eyeballs_delay * 1000))
+
         timeout = self._calculate_timeout(request)
 
         # set CURLOPT_LOW_SPEED_LIMIT and CURLOPT_LOW_SPEED_TIME to act as a read timeout. [1]
@@ -247,12 +291,28 @@ def _send(self, request: Request):
                 raise TransportError(cause=e) from e
 
         response = CurlCFFIResponseAdapter(curl_response)
+        response.extensions['trace'] = self._get_trace(curl_response)
 
         if not 200 <= response.status < 300:
             raise HTTPError(response, redirect_loop=max_redirects_exceeded)
 
         return response
 
+    @staticmethod
+    def _get_trace(curl_response):
+        # curl reports times elapsed since the start of the transfer
+        getinfo = curl_response.curl.getinfo
+        namelookup = getinfo(CurlInfo.NAMELOOKUP_TIME)
+        connect = getinfo(CurlInfo.CONNECT_TIME)
+        appconnect = getinfo(CurlInfo.APPCONNECT_TIME)
+        return {
+            'dns': namelookup,
+            'connect': max(connect - namelookup, 0),
+            'tls': max(appconnect - connect, 0) if appconnect else None,
+            'reused_connection': getinfo(CurlInfo.NUM_CONNECTS) == 0,
+            'redirects': getinfo(CurlInfo.REDIRECT_COUNT),
+        }
+
 
 @register_preference(CurlCFFIRH)
 def curl_cffi_preference(rh, request):
@@ -0,0 +1,610 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import http.client
+import io
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from ._helper import (
+    InstanceStoreMixin,
+    add_accept_encoding_header,
+    connection_timings,
+    create_connection,
+    get_redirect_method,
+)
+from ._urllib import (
+    CONTENT_DECODE_ERRORS,
+    SUPPORTED_ENCODINGS,
+    ContentDecodingReader,
+    make_content_decoders,
+)
+from .common import (
+    RequestHandler,
+    Response,
+    register_preference,
+    register_rh,
+)
+from .exceptions import (
+    CertificateVerifyError,
+    HTTPError,
+    IncompleteRead,
+    RequestError,
+    SSLError,
+    TransportError,
+    UnsupportedRequest,
+)
+from ..dependencies import h2
+from ..utils.networking import normalize_url
+
+if h2 is None:
+    raise ImportError('h2 module is not installed')
+
+import h2.config
+import h2.connection
+import h2.errors
+import h2.events
+import h2.exceptions
+import h2.settings
+
+# Headers that are connection-specific and must not be sent over HTTP/2 (RFC 9113 8.2.2)
+_CONNECTION_HEADERS = frozenset(('connection', 'host', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'))
+
+
+class _H2Stream:
+    """The state of a request on a H2Connection. All attributes are guarded by the connection lock"""
+
+    def __init__(self, connection, stream_id):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.condition = threading.Condition(connection.lock)
+        self.headers = None
+        self.content_length = None
+        self.chunks = collections.deque()  # [data, flow controlled length] of received DATA frames
+        self.received = 0
+        self.ended = False
+        self.closed = False
+        self.error = None
+
+
+class H2Connection:
+    """
+    A HTTP/2 client connection, on which requests are multiplexed as streams
+
+    A reader thread receives the frames of all streams and dispatches them.
+    Received data is only acknowledged to the server as it is read by the
+    consumer, so that flow control applies back pressure per stream.
+
+    An SSL socket must not be read from and written to at the same time,
+    so the socket is non-blocking and all I/O on it is done with the lock held.
+    The reader thread only waits for the socket to be readable without it.
+    """
+
+    MAX_STREAMS = 100
+    INITIAL_WINDOW_SIZE = 1024 * 1024
+    CONNECTION_WINDOW_SIZE = 16 * 1024 * 1024
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, sock, timeout, on_release=None):
+        self.sock = sock
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.active = 0  # Streams reserved by the handler; guarded by the handler's pool lock
+        self.closed = False
+        self._on_release = on_release
+        self._conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=True, header_encoding=None))
+        self.sock.setblocking(False)
+        with self.lock:
+            self._conn.initiate_connection()
+            self._conn.update_settings({
+                h2.settings.SettingCodes.ENABLE_PUSH: 0,
+                h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: self.INITIAL_WINDOW_SIZE,
+            })
+            self._conn.increment_flow_control_window(
+                self.CONNECTION_WINDOW_SIZE - self._conn.inbound_flow_control_window)
+            self._flush()
+        self._reader = threading.Thread(target=self._read_loop, name='h2-reader', daemon=True)
+        self._reader.start()
+
+    @property
+    def max_streams(self):
+        return min(self._conn.remote_settings.max_concurrent_streams, self.MAX_STREAMS)
+
+    def _flush(self):
+        # Must be called with the lock held
+        while data := memoryview(self._conn.data_to_send()):
+            while data:
+                try:
+                    data = data[self.sock.send(data):]
+                    continue
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                    pass
+                # Keep receiving while the socket is not writable, in case the peer
+                # does not read until it has sent what it is sending
+                readable, writable, _ = select.select([self.sock], [self.sock], [], self.timeout)
+                if not readable and not writable:
+                    raise TransportError(cause=TimeoutError('The write operation timed out'))
+                if readable:
+                    self._receive()
+
+    def _receive(self):
+        # Must be called with the lock held
+        try:
+            data = self.sock.recv(self.READ_SIZE)
+            # Decrypted data buffered by the SSL object does not make the socket readable
+            while data and self.sock.pending():
+                data += self.sock.recv(self.sock.pending())
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+            return
+        if not data:
+            raise TransportError('Connection closed by remote host')
+        for event in self._conn.receive_data(data):
+            self._handle_event(event)
+
+    def _read_loop(self):
+        try:
+            while True:
+                select.select([self.sock], [], [])
+                with self.lock:
+                    self._receive()
+                    self._flush()
+        except Exception as e:
+            with self.lock:
+                self._fail(e)
+        if self._on_release:
+            self._on_release(self)
+
+    def _handle_event(self, event):
+        stream = self.streams.get(getattr(event, 'stream_id', None))
+        if isinstance(event, h2.events.ResponseReceived) and stream:
+            stream.headers = event.headers
+            stream.content_length = next((
+                value for name, value in event.headers if name == b'content-length'), None)
+        elif isinstance(event, h2.events.DataReceived):
+            if stream:
+                stream.chunks.append([event.data, event.flow_controlled_length])
+                stream.received += len(event.data)
+            else:
+                self._conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded) and stream:
+            stream.ended = True
+        elif isinstance(event, h2.events.StreamReset) and stream:
+            stream.error = TransportError(f'Stream reset by remote host (error code {event.error_code})')
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            # No new streams may be opened; those not processed by the server are aborted
+            self.closed = True
+            for stream_id, stream in self.streams.items():
+                if event.last_stream_id is None or stream_id > event.last_stream_id:
+                    stream.error = TransportError(
+                        f'Connection terminated by remote host (error code {event.error_code})')
+            self.close_if_idle()
+        elif isinstance(event, h2.events.WindowUpdated):
+            stream = None
+            for waiting in self.streams.values():
+                waiting.condition.notify_all()
+        if stream:
+            stream.condition.notify_all()
+
+    def _fail(self, cause):
+        self.closed = True
+        error = cause if isinstance(cause, TransportError) else TransportError(cause=cause)
+        for stream in self.streams.values():
+            if stream.ended or stream.error:
+                pass
+            elif (isinstance(cause, h2.exceptions.InvalidBodyLengthError)
+                    and stream.content_length == str(cause.expected_length).encode()):
+                # h2 validates the body length against Content-Length as a connection error
+                stream.error = IncompleteRead(
+                    partial=cause.actual_length, expected=cause.expected_length - cause.actual_length, cause=cause)
+            else:
+                stream.error = error
+            stream.condition.notify_all()
+        self._shutdown()
+
+    def _shutdown(self):
+        # Closing alone would not wake up the reader thread, if it is blocked in recv()
+        with contextlib.suppress(OSError):
+            socket.socket.shutdown(self.sock, socket.SHUT_RDWR)
+        self.sock.close()
+
+    def close_if_idle(self):
+        # Must be called with the lock held
+        if self.closed and not self.streams:
+            self._shutdown()
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self._conn.close_connection()
+                with contextlib.suppress(h2.exceptions.ProtocolError, OSError, TransportError):
+                    self._flush()
+            for stream in self.streams.values():
+                stream.error = stream.error or TransportError('Connection closed')
+                stream.condition.notify_all()
+            self._shutdown()
+
+    def send_request(self, headers, body, timeout):
+        with self.lock:
+            if self.closed:
+                raise TransportError('Connection closed')
+            stream = _H2Stream(self, self._conn.get_next_available_stream_id())
+            self.streams[stream.stream_id] = stream
+            self._conn.send_headers(stream.stream_id, headers, end_stream=body is None)
+            self._flush()
+            if body is not None:
+                for chunk in body:
+                    self._send_data(stream, memoryview(chunk), timeout)
+                self._conn.end_stream(stream.stream_id)
+                self._flush()
+        return stream
+
+    def _send_data(self, stream, data, timeout):
+        while data:
+            self._wait(stream, lambda: self._conn.local_flow_control_window(stream.stream_id) > 0, timeout)
+            size = min(
+                len(data), self._conn.local_flow_control_window(stream.stream_id), self._conn.max_outbound_frame_size)
+            self._conn.send_data(stream.stream_id, data[:size].tobytes())
+            self._flush()
+            data = data[size:]
+
+    def _wait(self, stream, predicate, timeout):
+        if not stream.condition.wait_for(lambda: stream.error or predicate(), timeout):
+            self._reset(stream)
+            raise TransportError(cause=TimeoutError('The read operation timed out'))
+        if stream.error:
+            raise stream.error
+
+    def get_headers(self, stream, timeout):
+        with self.lock:
+            self._wait(stream, lambda: stream.headers is not None, timeout)
+            return stream.headers
+
+    def readinto(self, stream, buffer, timeout):
+        buffer = memoryview(buffer).cast('B')
+        with self.lock:
+            self._wait(stream, lambda: stream.chunks or stream.ended, timeout)
+            size = acknowledged = 0
+            while stream.chunks and size < len(buffer):
+                chunk = stream.chunks[0]
+                data = chunk[0]
+                taken = min(len(data), len(buffer) - size)
+                buffer[size:size + taken] = data[:taken]
+                size += taken
+                if taken < len(data):
+                    chunk[0] = data[taken:]
+                    break
+                stream.chunks.popleft()
+                acknowledged += chunk[1]
+            self._acknowledge(stream, acknowledged)
+            done = stream.ended and not stream.chunks
+        if done:
+            self.release(stream)
+        return size
+
+    def _acknowledge(self, stream, size):
+        # Unread data of a released stream still counts against the connection window
+        if size and not self.closed:
+            with contextlib.suppress(h2.exceptions.ProtocolError, OSError, TransportError):
+                self._conn.acknowledge_received_data(size, stream.stream_id)
+                self._flush()
+
+    def _reset(self, stream):
+        if not stream.ended and not self.closed:
+            with contextlib.suppress(h2.exceptions.ProtocolError, OSError, TransportError):
+                self._conn.reset_stream(stream.stream_id, h2.errors.ErrorCodes.CANCEL)
+                self._flush()
+
+    def release(self, stream):
+        with self.lock:
+            if stream.closed:
+                return
+            stream.closed = True
+            self._reset(stream)
+            self._acknowledge(stream, sum(flow_length for _, flow_length in stream.chunks))
+            stream.chunks.clear()
+            self.streams.pop(stream.stream_id, None)
+            self.close_if_idle()
+        if self._on_release:
+            self._on_release(self, stream)
+
+
+class H2StreamReader(io.RawIOBase):
+    """File-like object for the body of a HTTP/2 response"""
+
+    def __init__(self, stream, timeout):
+        self._stream = stream
+        self._timeout = timeout
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return super().read(-1 if size is None else size)
+
+    def readinto(self, buffer):
+        return self._stream.connection.readinto(self._stream, buffer, self._timeout)
+
+    def close(self):
+        if not self.closed:
+            self._stream.connection.release(self._stream)
+        super().close()
+
+
+class H2ResponseAdapter(Response):
+    def read(self, amt=None):
+        try:
+            return self.fp.read(amt)
+        except tuple(CONTENT_DECODE_ERRORS) as e:
+            raise TransportError(cause=e) from e
+
+    def readinto(self, buffer):
+        try:
+            return self.fp.readinto(buffer)
+        except tuple(CONTENT_DECODE_ERRORS) as e:
+            raise TransportError(cause=e) from e
+
+
+class _CookieResponse:
+    """The interface of an urllib response that CookieJar.extract_cookies needs"""
+
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+def _iter_body(data, chunk_size=64 * 1024):
+    if data is None or isinstance(data, (bytes, bytearray)):
+        yield from filter(None, [data])
+    elif hasattr(data, 'read'):
+        yield from iter(lambda: data.read(chunk_size), b'')
+    else:
+        yield from data
+
+
+@register_rh
+class H2RH(RequestHandler, InstanceStoreMixin):
+    """
+    HTTP/2 request handler, using the h2 protocol state machine
+
+    Requests to the same host are multiplexed as streams over at most
+    MAX_CONNECTIONS_PER_ORIGIN connections. HTTP/2 is negotiated with ALPN;
+    hosts which do not support it are left to the other handlers for HTTP1_ORIGIN_TTL seconds.
+    Since HTTP/1.1 handlers reuse connections just as well for sequential requests,
+    this handler is only preferred for fragment downloads (see the `fragment` extension).
+    """
+    RH_NAME = 'h2'
+    _SUPPORTED_URL_SCHEMES = ('https',)
+    _SUPPORTED_PROXY_SCHEMES = ()
+    _SUPPORTED_FEATURES = ()
+
+    MAX_CONNECTIONS_PER_ORIGIN = 2
+    MAX_REDIRECTS = 10
+    # Seconds for which a host that did not negotiate HTTP/2 is not tried again,
+    # and the number of such hosts that are remembered
+    HTTP1_ORIGIN_TTL = 3600
+    MAX_HTTP1_ORIGINS = 1024
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pool_lock = threading.Condition()
+        self._connections = collections.defaultdict(list)
+        self._connecting = collections.Counter()
+        self._http1_origins = collections.OrderedDict()  # origin -> time it failed to negotiate HTTP/2
+
+    def close(self):
+        self._clear_instances()
+        with self._pool_lock:
+            connections = [conn for conns in self._connections.values() for conn in conns]
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+    def _check_extensions(self, extensions):
+        super()._check_extensions(extensions)
+        extensions.pop('cookiejar', None)
+        extensions.pop('timeout', None)
+        extensions.pop('legacy_ssl', None)
+
+    def _validate(self, request):
+        super()._validate(request)
+        if self._is_http1_origin(self._get_origin(request.url)):
+            raise UnsupportedRequest('Host does not support HTTP/2')
+
+    def _is_http1_origin(self, origin):
+        with self._pool_lock:
+            failed = self._http1_origins.get(origin)
+            if failed is None:
+                return False
+            if time.monotonic() - failed < self.HTTP1_ORIGIN_TTL:
+                return True
+            del self._http1_origins[origin]
+            return False
+
+    def _add_http1_origin(self, origin):
+        with self._pool_lock:
+            self._http1_origins.pop(origin, None)
+            self._http1_origins[origin] = time.monotonic()
+            while len(self._http1_origins) > self.MAX_HTTP1_ORIGINS:
+                self._http1_origins.popitem(last=False)
+
+    def _create_instance(self, legacy_ssl_support):
+        context = self._make_sslcontext(legacy_ssl_support=legacy_ssl_support)
+        context.set_alpn_protocols(['h2'])
+        return context
+
+    @staticmethod
+    def _get_origin(url):
+        parsed = urllib.parse.urlparse(url)
+        return parsed.hostname, parsed.port or 443
+
+    def _release(self, connection, stream=None):
+        # Called once a stream is done with, or when the connection is closed
+        with self._pool_lock:
+            if stream:
+                connection.active -= 1
+            self._pool_lock.notify_all()
+
+    def _connect(self, origin, ssl_context, timeout):
+        timings = connection_timings.get()
+        start = time.perf_counter()
+        sock = create_connection(
+            origin, timeout=timeout,
+            source_address=(self.source_address, 0) if self.source_address else None)
+        try:
+            sock = ssl_context.wrap_socket(sock, server_hostname=origin[0])
+        except ssl.SSLCertVerificationError as e:
+            sock.close()
+            raise CertificateVerifyError(cause=e) from e
+        except ssl.SSLError as e:
+            sock.close()
+            raise SSLError(cause=e) from e
+        except BaseException:
+            sock.close()
+            raise
+        if timings is not None:
+            timings['tls'] = max(
+                time.perf_counter() - start - timings.get('dns', 0) - timings.get('connect', 0), 0)
+        if sock.selected_alpn_protocol() != 'h2':
+            sock.close()
+            self._add_http1_origin(origin)
+            raise UnsupportedRequest('Host does not support HTTP/2')
+        return H2Connection(sock, timeout, on_release=self._release)
+
+    def _get_connection(self, origin, ssl_context, timeout):
+        """Reserve a stream on a connection to origin, connecting if all are busy"""
+        deadline = time.monotonic() + timeout
+        with self._pool_lock:
+            while True:
+                connections = self._connections[origin] = [
+                    conn for conn in self._connections[origin] if not conn.closed]
+                conn = min(connections, key=lambda c: c.active, default=None)
+                if conn and conn.active < conn.max_streams:
+                    conn.active += 1
+                    return conn, True
+                if len(connections) + self._connecting[origin] < self.MAX_CONNECTIONS_PER_ORIGIN:
+                    self._connecting[origin] += 1
+                    break
+                if not self._pool_lock.wait(deadline - time.monotonic()) and time.monotonic() >= deadline:
+                    raise TransportError(cause=TimeoutError('Timed out waiting for a free HTTP/2 stream'))
+        try:
+            conn = self._connect(origin, ssl_context, timeout)
+        finally:
+            with self._pool_lock:
+                self._connecting[origin] -= 1
+                self._pool_lock.notify_all()
+        with self._pool_lock:
+            conn.active += 1
+            self._connections[origin].append(conn)
+        return conn, False
+
+    def _request(self, url, method, headers, data, cookiejar, ssl_context, timeout):
+        parsed = urllib.parse.urlparse(url)
+        origin = self._get_origin(url)
+        authority = parsed.netloc.rpartition('@')[2]
+        h2_headers = [
+            (':method', method),
+            (':authority', authority),
+            (':scheme', 'https'),
+            (':path', urllib.parse.urlunparse(('', '', parsed.path or '/', parsed.params, parsed.query, ''))),
+        ]
+        h2_headers.extend(
+            (name.lower(), value) for name, value in headers.items() if name.lower() not in _CONNECTION_HEADERS)
+        if 'cookie' not in (name for name, _ in h2_headers):
+            cookie_header = cookiejar.get_cookie_header(url)
+            if cookie_header:
+                h2_headers.append(('cookie', cookie_header))
+
+        conn, reused = self._get_connection(origin, ssl_context, timeout)
+        stream = None
+        try:
+            stream = conn.send_request(
+                [(name.encode(), value.encode('latin-1')) for name, value in h2_headers],
+                _iter_body(data) if data is not None else None, timeout)
+            raw_headers = conn.get_headers(stream, timeout)
+        except BaseException as e:
+            if stream is not None:
+                conn.release(stream)
+            else:
+                self._release(conn, stream=True)
+            if isinstance(e, (h2.exceptions.ProtocolError, OSError)):
+                raise TransportError(cause=e) from e
+            raise
+
+        status = 0
+        headers = http.client.HTTPMessage()
+        for name, value in raw_headers:
+            name, value = name.decode('latin-1'), value.decode('latin-1')
+            if name == ':status':
+                status = int(value)
+            elif not name.startswith(':'):
+                headers[name] = value
+        cookiejar.extract_cookies(_CookieResponse(headers), urllib.request.Request(url))
+
+        fp = H2StreamReader(stream, timeout)
+        decoders = make_content_decoders(headers.get('Content-Encoding', ''))
+        if decoders:
+            fp = ContentDecodingReader(fp, decoders)
+        response = H2ResponseAdapter(fp, url, headers, status)
+        response.extensions['trace'] = {'reused_connection': reused}
+        return response
+
+    def _send(self, request):
+        headers = self._merge_headers(request.headers)
+        add_accept_encoding_header(headers, SUPPORTED_ENCODINGS)
+        cookiejar = self._get_cookiejar(request)
+        ssl_context = self._get_instance(legacy_ssl_support=request.extensions.get('legacy_ssl'))
+        timeout = self._calculate_timeout(request)
+        url, method, data = normalize_url(request.url), request.method, request.data
+
+        timings = {}
+        timings_token = connection_timings.set(timings)
+        sent = False
+        try:
+            for redirects in range(self.MAX_REDIRECTS + 1):
+                response = self._request(url, method, headers, data, cookiejar, ssl_context, timeout)
+                sent = True
+                location = response.headers.get('Location')
+                if response.status not in (301, 302, 303, 307, 308) or not location:
+                    break
+                if redirects == self.MAX_REDIRECTS:
+                    raise HTTPError(response, redirect_loop=True)
+                response.close()
+                url = normalize_url(urllib.parse.urljoin(url, location.encode('latin-1').decode()))
+                if urllib.parse.urlparse(url).scheme != 'https':
+                    raise UnsupportedRequest('Redirected to a non-https url')
+                new_method = get_redirect_method(method, response.status)
+                # Cookie header may be for another host; cookies from the jar are added per request
+                headers.pop('Cookie', None)
+                if new_method != method:
+                    method, data = new_method, None
+                    headers.pop('Content-Length', None)
+                    headers.pop('Content-Type', None)
+        except UnsupportedRequest as e:
+            if not sent:
+                raise
+            # Another handler would send the request again and repeat the redirects followed so far
+            raise RequestError(f'Unable to follow the redirect to {url}: {e.msg}') from e
+        finally:
+            connection_timings.reset(timings_token)
+
+        response.extensions['trace'] = {**timings, **response.extensions['trace'], 'redirects': redirects}
+        if not 200 <= response.status < 300:
+            raise HTTPError(response, redirect_loop=False)
+        return response
+
+
+@register_preference(H2RH)
+def h2_preference(rh, request):
+    if request.extensions.get('fragment'):
+        return 200
+    return -200
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import collections
 import contextlib
+import contextvars
 import functools
 import os
+import queue
 import socket
 import ssl
 import sys
+import threading
+import time
 import typing
 import urllib.parse
 import urllib.request
@@ -246,6 +251,141 @@ def create_socks_proxy_socket(dest_addr, proxy_args, proxy_ip_addr, timeout, sou
         raise
 
 
+# Request handlers may set this to a dict for create_connection to record
+# the `dns` and `connect` durations of new connections into, for request tracing
+connection_timings = contextvars.ContextVar('connection_timings', default=None)
+
+# RequestHandler.send sets this to a dict with the `dns_cache_ttl` and `happy_eyeballs_delay`
+# of the handler. None values (and missing keys) fall back to the defaults below
+connection_options = contextvars.ContextVar('connection_options', default=None)
+
+DNS_CACHE_TTL = 300
+HAPPY_EYEBALLS_DELAY = 0.25
+
+
+class DNSCache:
+    """
+    A thread-safe cache of getaddrinfo() results
+
+    getaddrinfo() does not expose the TTL of the DNS records, so entries are
+    reused for the TTL given on lookup instead; a TTL of 0 bypasses the cache.
+    The least recently used entries are evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def getaddrinfo(self, host, port, ttl=DNS_CACHE_TTL):
+        """@returns (addresses, whether they were served from the cache)"""
+        if not ttl:
+            return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM), False
+
+        key = (host, port)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < ttl:
+                self._entries.move_to_end(key)
+                return entry[1], True
+
+        ip_addrs = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        if ip_addrs:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), ip_addrs)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return ip_addrs, False
+
+    def invalidate(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by all request handlers of the process
+dns_cache = DNSCache()
+
+
+def _interleave_address_families(ip_addrs):
+    """Reorder addresses to alternate between address families, as in RFC 8305 section 4"""
+    by_family = collections.defaultdict(collections.deque)
+    for ip_addr in ip_addrs:
+        by_family[ip_addr[0]].append(ip_addr)
+    families = list(by_family.values())
+    interleaved = []
+    while families:
+        for addrs in families:
+            interleaved.append(addrs.popleft())
+        families = [addrs for addrs in families if addrs]
+    return interleaved
+
+
+def _staggered_connect(ip_addrs, connect, delay):
+    """
+    Connect to the first reachable address, as in RFC 8305 section 5 ("Happy Eyeballs")
+
+    An attempt is started for the next address when the previous one has failed,
+    or has not succeeded within `delay` seconds. The first socket to connect is
+    returned and any that connect later are closed.
+    """
+    results = queue.Queue()
+    lock = threading.Lock()
+    done = False
+
+    def attempt(ip_addr):
+        nonlocal done
+        try:
+            sock = connect(ip_addr)
+        except Exception as e:
+            # Always report back, or the main loop would wait forever
+            results.put(e)
+            return
+        with lock:
+            if not done:
+                done = True
+                results.put(sock)
+                return
+        sock.close()
+
+    pending = collections.deque(ip_addrs)
+    running = 0
+    err = None
+    try:
+        while pending or running:
+            if pending:
+                threading.Thread(target=attempt, args=(pending.popleft(),), daemon=True).start()
+                running += 1
+            try:
+                result = results.get(timeout=delay if pending else None)
+            except queue.Empty:
+                continue
+            while True:
+                running -= 1
+                if isinstance(result, socket.socket):
+                    return result
+                if not isinstance(result, OSError):
+                    # As in the sequential case, only connection failures move on to the next address
+                    raise result
+                err = result
+                # Any further failures received meanwhile do not each warrant a new attempt
+                try:
+                    result = results.get_nowait()
+                except queue.Empty:
+                    break
+        raise err
+    finally:
+        with lock:
+            done = True
+        # Explicitly break __traceback__ reference cycle
+        # https://bugs.python.org/issue36820
+        err = None
+
+
 def create_connection(
     address,
     timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
@@ -257,7 +397,15 @@ def create_connection(
     # This filters the addresses based on the given source_address.
     # Based on: https://github.com/python/cpython/blob/main/Lib/socket.py#L810
     host, port = address
-    ip_addrs = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    options = connection_options.get() or {}
+    dns_cache_ttl = options.get('dns_cache_ttl')
+    happy_eyeballs_delay = options.get('happy_eyeballs_delay')
+    timings = connection_timings.get()
+    start = time.perf_counter()
+    ip_addrs, cached = dns_cache.getaddrinfo(
+        host, port, DNS_CACHE_TTL if dns_cache_ttl is None else dns_cache_ttl)
+    if timings is not None:
+        timings['dns'] = time.perf_counter() - start
     if not ip_addrs:
         raise OSError('getaddrinfo returns an empty list')
     if source_address is not None:
@@ -268,10 +416,32 @@ def create_connection(
                 f'No remote IPv{4 if af == socket.AF_INET else 6} addresses available for connect. '
                 f'Can\'t use "{source_address[0]}" as source address')
 
+    if happy_eyeballs_delay is None:
+        happy_eyeballs_delay = HAPPY_EYEBALLS_DELAY
+    start = time.perf_counter()
+    try:
+        if happy_eyeballs_delay and len(ip_addrs) > 1:
+            sock = _staggered_connect(
+                _interleave_address_families(ip_addrs),
+                lambda ip_addr: _create_socket_func(ip_addr, timeout, source_address),
+                happy_eyeballs_delay)
+        else:
+            sock = _sequential_connect(ip_addrs, timeout, source_address, _create_socket_func)
+    except OSError:
+        # The host may have moved; resolve it again on the next connection
+        if cached:
+            dns_cache.invalidate(host, port)
+        raise
+    if timings is not None:
+        timings['connect'] = time.perf_counter() - start
+    return sock
+
+
+def _sequential_connect(ip_addrs, timeout, source_address, create_socket_func):
     err = None
     for ip_addr in ip_addrs:
         try:
-            sock = _create_socket_func(ip_addr, timeout, source_address)
+            sock = create_socket_func(ip_addr, timeout, source_address)
             # Explicitly break __traceback__ reference cycle
             # https://bugs.python.org/issue36820
             err = None
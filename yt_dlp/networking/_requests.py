@@ -35,6 +35,7 @@
 from ._helper import (
     InstanceStoreMixin,
     add_accept_encoding_header,
+    connection_timings,
     create_connection,
     create_socks_proxy_socket,
     get_redirect_method,
@@ -324,6 +325,9 @@ def _send(self, request):
             legacy_ssl_support=request.extensions.get('legacy_ssl'),
         )
 
+        # Only connections through SOCKS proxies are made with our create_connection
+        timings = {}
+        timings_token = connection_timings.set(timings)
         try:
             requests_res = session.request(
                 method=request.method,
@@ -359,7 +363,11 @@ def _send(self, request):
             # Miscellaneous Requests exceptions. May not necessary be network related e.g. InvalidURL
             raise RequestError(cause=e) from e
 
+        finally:
+            connection_timings.reset(timings_token)
+
         res = RequestsResponseAdapter(requests_res)
+        res.extensions['trace'] = {**timings, 'redirects': len(requests_res.history)}
 
         if not 200 <= res.status < 300:
             raise HTTPError(res, redirect_loop=max_redirects_exceeded)
@@ -3,7 +3,10 @@
 import functools
 import http.client
 import io
+import select
 import ssl
+import threading
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -22,6 +25,7 @@
 from ._helper import (
     InstanceStoreMixin,
     add_accept_encoding_header,
+    connection_timings,
     create_connection,
     create_socks_proxy_socket,
     get_redirect_method,
@@ -63,6 +67,245 @@ def _create_http_connection(http_class, source_address, *args, **kwargs):
     return hc
 
 
+class _ZlibDecoder:
+    def __init__(self, wbits):
+        self._decompressor = zlib.decompressobj(wbits)
+        self._started = False
+        # Whether there may be more output without more input
+        self.pending = False
+
+    def decompress(self, data, max_length):
+        # Anything after the end of the compressed stream is discarded
+        if self._decompressor.eof:
+            self.pending = False
+            return b''
+        self._started = self._started or bool(data)
+        data = self._decompressor.decompress(self._decompressor.unconsumed_tail + data, max_length)
+        self.pending = bool(self._decompressor.unconsumed_tail) or len(data) == max_length
+        return data
+
+    def flush(self):
+        if self._started and not self._decompressor.eof:
+            raise zlib.error('incomplete or truncated stream')
+        return b''
+
+
+class _DeflateDecoder(_ZlibDecoder):
+    def __init__(self):
+        # Some servers send raw deflate data instead of a zlib stream
+        super().__init__(-zlib.MAX_WBITS)
+
+    def decompress(self, data, max_length):
+        if self._started or not data:
+            return super().decompress(data, max_length)
+        try:
+            return super().decompress(data, max_length)
+        except zlib.error:
+            self._decompressor = zlib.decompressobj()
+            return super().decompress(data, max_length)
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+        self._started = False
+        self.pending = False
+        # The output can only be limited since Brotli 1.2.0
+        self._limited = hasattr(self._decompressor, 'can_accept_more_data')
+
+    def decompress(self, data, max_length):
+        self._started = self._started or bool(data)
+        if not self._limited:
+            return self._decompressor.process(data)
+        data = self._decompressor.process(data, output_buffer_limit=max_length)
+        self.pending = not self._decompressor.can_accept_more_data()
+        return data
+
+    def flush(self):
+        is_finished = getattr(self._decompressor, 'is_finished', None)
+        if self._started and is_finished and not is_finished():
+            raise brotli.error('incomplete or truncated stream')
+        return b''
+
+
+def _decode_all(decoder, data):
+    if not data:
+        return data
+    chunks = [decoder.decompress(data, ContentDecodingReader.CHUNK_SIZE)]
+    while decoder.pending:
+        chunks.append(decoder.decompress(b'', ContentDecodingReader.CHUNK_SIZE))
+    chunks.append(decoder.flush())
+    return b''.join(chunks)
+
+
+def make_content_decoders(content_encoding):
+    """Get the decoders for the value of a Content-Encoding header, in the order they are to be applied"""
+    # Content-Encoding header lists the encodings in order that they were applied [1].
+    # To decompress, we simply do the reverse.
+    # [1]: https://datatracker.ietf.org/doc/html/rfc9110#name-content-encoding
+    decoders = []
+    for encoding in (e.strip() for e in reversed(content_encoding.split(','))):
+        if encoding == 'gzip':
+            # There may be junk added the end of the file
+            # We ignore it by only ever decoding a single gzip payload
+            decoders.append(_ZlibDecoder(zlib.MAX_WBITS | 16))
+        elif encoding == 'deflate':
+            decoders.append(_DeflateDecoder())
+        elif encoding == 'br' and brotli:
+            decoders.append(_BrotliDecoder())
+    return decoders
+
+
+class ContentDecodingReader(io.BufferedIOBase):
+    """
+    File-like object that decodes a Content-Encoding'd response as it is read
+
+    The body is read from the underlying response in chunks of CHUNK_SIZE,
+    so that the full compressed and decompressed data is never held at once.
+    Each decoder outputs at most CHUNK_SIZE bytes at a time, and is only given
+    more input once it has output everything it can from the previous input
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fp, decoders):
+        self._fp = fp
+        self._decoders = decoders
+        self._buffer = bytearray()
+        self._fp_eof = False
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _exhausted(self, count):
+        """Whether the first count decoders have output all of their data"""
+        return self._fp_eof and not any(decoder.pending for decoder in self._decoders[:count])
+
+    def _decode(self, count):
+        """Return the next data output by the first count decoders"""
+        if not count:
+            data = self._fp.read(self.CHUNK_SIZE)
+            self._fp_eof = not data
+            return data
+        decoder = self._decoders[count - 1]
+        data = decoder.decompress(b'' if decoder.pending else self._decode(count - 1), self.CHUNK_SIZE)
+        if self._exhausted(count):
+            data += decoder.flush()
+        return data
+
+    def _fill(self):
+        self._buffer += self._decode(len(self._decoders))
+        self._eof = self._exhausted(len(self._decoders))
+
+    def _take(self, amt):
+        data = bytes(self._buffer[:amt])
+        del self._buffer[:amt]
+        return data
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            while not self._eof:
+                self._fill()
+            return self._take(len(self._buffer))
+        while len(self._buffer) < amt and not self._eof:
+            self._fill()
+        return self._take(amt)
+
+    def read1(self, amt=-1):
+        while not self._buffer and not self._eof:
+            self._fill()
+        return self._take(len(self._buffer) if amt is None or amt < 0 else amt)
+
+    def readinto(self, buffer):
+        buffer = memoryview(buffer).cast('B')
+        while len(self._buffer) < len(buffer) and not self._eof:
+            self._fill()
+        size = min(len(self._buffer), len(buffer))
+        buffer[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        return size
+
+    def close(self):
+        try:
+            self._fp.close()
+        finally:
+            super().close()
+
+
+def _is_connection_dropped(sock):
+    # An idle connection should have nothing to read;
+    # if it is readable, the server has closed it or sent unexpected data
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+class _PooledHTTPResponse(http.client.HTTPResponse):
+    _release_conn = None
+
+    def _close_conn(self):
+        super()._close_conn()
+        release, self._release_conn = self._release_conn, None
+        if release:
+            release()
+
+    def close(self):
+        # The connection can only be reused if the body has been read to the end
+        if self.fp is not None and (self.chunked or self.length != 0):
+            self._release_conn = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool of idle keep-alive http.client connections
+
+    Connections are keyed by (scheme, host, tunnel host, proxy, ssl context).
+    A connection is taken out of the pool for the duration of a request and
+    is put back once its response has been read to the end.
+    """
+
+    MAX_IDLE_PER_KEY = 10
+    IDLE_TIMEOUT = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, released = idle.pop()
+                if time.monotonic() - released < self.IDLE_TIMEOUT and not _is_connection_dropped(conn.sock):
+                    self.hits += 1
+                    return conn
+                conn.close()
+            self.misses += 1
+            return None
+
+    def put(self, key, conn):
+        if conn.sock is None:
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.MAX_IDLE_PER_KEY:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+
 class HTTPHandler(urllib.request.AbstractHTTPHandler):
     """Handler for HTTP requests and responses.
 
@@ -78,10 +321,14 @@ class HTTPHandler(urllib.request.AbstractHTTPHandler):
     public domain.
     """
 
-    def __init__(self, context=None, source_address=None, *args, **kwargs):
+    # Methods that can be sent again after a failure, see RFC 9110, section 9.2.2
+    _IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+    def __init__(self, context=None, source_address=None, connection_pool=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._source_address = source_address
         self._context = context
+        self._connection_pool = connection_pool
 
     @staticmethod
     def _make_conn_class(base, req):
@@ -91,40 +338,108 @@ def _make_conn_class(base, req):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
         return conn_class
 
+    @staticmethod
+    def _make_pool_key(req, context=None):
+        return (req.type, req.host, req._tunnel_host, req.headers.get('Ytdl-socks-proxy'), context)
+
     def http_open(self, req):
+        pool_key = self._make_pool_key(req)
         conn_class = self._make_conn_class(http.client.HTTPConnection, req)
         return self.do_open(functools.partial(
-            _create_http_connection, conn_class, self._source_address), req)
+            _create_http_connection, conn_class, self._source_address), req, pool_key=pool_key)
 
     def https_open(self, req):
+        pool_key = self._make_pool_key(req, self._context)
         conn_class = self._make_conn_class(http.client.HTTPSConnection, req)
         return self.do_open(
             functools.partial(
                 _create_http_connection, conn_class, self._source_address),
-            req, context=self._context)
+            req, pool_key=pool_key, context=self._context)
 
+    # Kept for compatibility with the legacy YoutubeDLHandler
     @staticmethod
     def deflate(data):
-        if not data:
-            return data
-        try:
-            return zlib.decompress(data, -zlib.MAX_WBITS)
-        except zlib.error:
-            return zlib.decompress(data)
+        return _decode_all(_DeflateDecoder(), data)
 
     @staticmethod
     def brotli(data):
-        if not data:
-            return data
-        return brotli.decompress(data)
+        return _decode_all(_BrotliDecoder(), data)
 
     @staticmethod
     def gz(data):
-        # There may be junk added the end of the file
-        # We ignore it by only ever decoding a single gzip payload
-        if not data:
-            return data
-        return zlib.decompress(data, wbits=zlib.MAX_WBITS | 16)
+        return _decode_all(_ZlibDecoder(zlib.MAX_WBITS | 16), data)
+
+    def do_open(self, http_class, req, pool_key=None, **http_conn_args):
+        """Based on AbstractHTTPHandler.do_open, but keeps connections alive in the connection pool"""
+        pool = self._connection_pool
+        if pool is None or pool_key is None:
+            return super().do_open(http_class, req, **http_conn_args)
+
+        host = req.host
+        if not host:
+            raise urllib.error.URLError('no host given')
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update({k: v for k, v in req.headers.items() if k not in headers})
+        headers = {name.title(): val for name, val in headers.items()}
+        tunnel_headers = {}
+        if req._tunnel_host and 'Proxy-Authorization' in headers:
+            # Proxy-Authorization should not be sent to origin server
+            tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+
+        def new_connection():
+            conn = http_class(host, timeout=req.timeout, **http_conn_args)
+            conn.response_class = _PooledHTTPResponse
+            if req._tunnel_host:
+                conn.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+            return conn
+
+        timings = connection_timings.get()
+
+        def send(conn):
+            conn.set_debuglevel(self._debuglevel)
+            try:
+                try:
+                    if timings is not None:
+                        timings['reused_connection'] = conn.sock is not None
+                        if conn.sock is None and isinstance(conn, http.client.HTTPSConnection):
+                            start = time.perf_counter()
+                            conn.connect()
+                            timings['tls'] = max(
+                                time.perf_counter() - start - timings.get('dns', 0) - timings.get('connect', 0), 0)
+                    conn.request(req.get_method(), req.selector, req.data, headers,
+                                 encode_chunked=req.has_header('Transfer-encoding'))
+                except OSError as err:  # timeout error
+                    raise urllib.error.URLError(err)
+                return conn.getresponse()
+            except BaseException:
+                conn.close()
+                raise
+
+        conn = pool.get(pool_key)
+        if conn is None:
+            conn = new_connection()
+            res = send(conn)
+        else:
+            conn.timeout = req.timeout
+            conn.sock.settimeout(req.timeout)
+            try:
+                res = send(conn)
+            except (urllib.error.URLError, ConnectionError) as e:
+                # The server may have closed the idle connection while the request was being sent.
+                # Retry once on a new connection if the request is idempotent and its body can be sent again,
+                # since the server may also have processed the request before closing the connection
+                cause = e.reason if isinstance(e, urllib.error.URLError) else e
+                if (not isinstance(cause, ConnectionError) or req.get_method() not in self._IDEMPOTENT_METHODS
+                        or not isinstance(req.data, (bytes, type(None)))):
+                    raise
+                conn = new_connection()
+                res = send(conn)
+
+        res._release_conn = functools.partial(pool.put, pool_key, conn)
+        res.url = req.get_full_url()
+        res.msg = res.reason
+        return res
 
     def http_request(self, req):
         # According to RFC 3986, URLs can not contain non-ASCII characters, however this is not
@@ -147,20 +462,10 @@ def http_request(self, req):
     def http_response(self, req, resp):
         old_resp = resp
 
-        # Content-Encoding header lists the encodings in order that they were applied [1].
-        # To decompress, we simply do the reverse.
-        # [1]: https://datatracker.ietf.org/doc/html/rfc9110#name-content-encoding
-        decoded_response = None
-        for encoding in (e.strip() for e in reversed(resp.headers.get('Content-encoding', '').split(','))):
-            if encoding == 'gzip':
-                decoded_response = self.gz(decoded_response or resp.read())
-            elif encoding == 'deflate':
-                decoded_response = self.deflate(decoded_response or resp.read())
-            elif encoding == 'br' and brotli:
-                decoded_response = self.brotli(decoded_response or resp.read())
-
-        if decoded_response is not None:
-            resp = urllib.request.addinfourl(io.BytesIO(decoded_response), old_resp.headers, old_resp.url, old_resp.code)
+        decoders = make_content_decoders(resp.headers.get('Content-encoding', ''))
+        if decoders:
+            resp = urllib.request.addinfourl(
+                ContentDecodingReader(old_resp, decoders), old_resp.headers, old_resp.url, old_resp.code)
             resp.msg = old_resp.msg
         # Percent-encode redirect URL of Location HTTP header to satisfy RFC 3986 (see
         # https://github.com/ytdl-org/youtube-dl/issues/6457).
@@ -312,6 +617,13 @@ def read(self, amt=None):
             handle_response_read_exceptions(e)
             raise e
 
+    def readinto(self, buffer):
+        try:
+            return self.fp.readinto(buffer)
+        except Exception as e:
+            handle_response_read_exceptions(e)
+            raise e
+
 
 def handle_sslerror(e: ssl.SSLError):
     if not isinstance(e, ssl.SSLError):
@@ -343,6 +655,16 @@ def __init__(self, *, enable_file_urls: bool = False, **kwargs):
         self.enable_file_urls = enable_file_urls
         if self.enable_file_urls:
             self._SUPPORTED_URL_SCHEMES = (*self._SUPPORTED_URL_SCHEMES, 'file')
+        self._connection_pool = ConnectionPool()
+
+    def close(self):
+        self._clear_instances()
+        self._connection_pool.close()
+        pool = self._connection_pool
+        if self.verbose and pool.hits + pool.misses:
+            self._logger.debug(
+                f'urllib: reused {pool.hits} of {pool.hits + pool.misses} connections '
+                f'({pool.hits / (pool.hits + pool.misses):.0%} connection pool hit ratio)')
 
     def _check_extensions(self, extensions):
         super()._check_extensions(extensions)
@@ -357,7 +679,8 @@ def _create_instance(self, proxies, cookiejar, legacy_ssl_support=None):
             HTTPHandler(
                 debuglevel=int(bool(self.verbose)),
                 context=self._make_sslcontext(legacy_ssl_support=legacy_ssl_support),
-                source_address=self.source_address),
+                source_address=self.source_address,
+                connection_pool=self._connection_pool),
             HTTPCookieProcessor(cookiejar),
             DataHandler(),
             UnknownHandler(),
@@ -394,13 +717,17 @@ def _send(self, request):
             cookiejar=self._get_cookiejar(request),
             legacy_ssl_support=request.extensions.get('legacy_ssl'),
         )
+        timings = {}
+        timings_token = connection_timings.set(timings)
         try:
             res = opener.open(urllib_req, timeout=self._calculate_timeout(request))
         except urllib.error.HTTPError as e:
             if isinstance(e.fp, (http.client.HTTPResponse, urllib.response.addinfourl)):
                 # Prevent file object from being closed when urllib.error.HTTPError is destroyed.
                 e._closer.close_called = True
-                raise HTTPError(UrllibResponseAdapter(e.fp), redirect_loop='redirect error' in str(e)) from e
+                response = UrllibResponseAdapter(e.fp)
+                response.extensions['trace'] = self._make_trace(urllib_req, timings)
+                raise HTTPError(response, redirect_loop='redirect error' in str(e)) from e
             raise  # unexpected
         except urllib.error.URLError as e:
             cause = e.reason  # NOTE: cause may be a string
@@ -420,5 +747,13 @@ def _send(self, request):
         except Exception as e:
             handle_response_read_exceptions(e)
             raise  # unexpected
+        finally:
+            connection_timings.reset(timings_token)
+
+        response = UrllibResponseAdapter(res)
+        response.extensions['trace'] = self._make_trace(urllib_req, timings)
+        return response
 
-        return UrllibResponseAdapter(res)
+    @staticmethod
+    def _make_trace(urllib_req, timings):
+        return {**timings, 'redirects': sum(getattr(urllib_req, 'redirect_dict', {}).values())}
@@ -5,6 +5,8 @@
 import enum
 import functools
 import io
+import threading
+import time
 import typing
 import urllib.parse
 import urllib.request
@@ -13,7 +15,7 @@
 from email.message import Message
 from http import HTTPStatus
 
-from ._helper import make_ssl_context, wrap_request_errors
+from ._helper import connection_options, make_ssl_context, wrap_request_errors
 from .exceptions import (
     NoSupportingHandlers,
     RequestError,
@@ -57,15 +59,43 @@ class RequestDirector:
     can be registered into the `preferences` set. These are used to sort handlers
     in order of preference.
 
+    Trace hooks in the form of func(event) can be added to the `trace_hooks` list.
+    They are called once for every request sent, when the response has been read
+    to the end or closed, or when the request failed. `event` is a dict with:
+    - `url`, `method`: of the request
+    - `handler`: RH_NAME of the handler that sent the request
+    - `start`: timestamp at which the request was sent
+    - `status`, `final_url`: of the response, if any
+    - `redirects`: number of redirects followed
+    - `reused_connection`: whether the connection was reused from a pool
+    - `dns`, `connect`, `tls`: durations of the connection setup
+    - `ttfb`: duration until the response headers were received
+    - `transfer`: duration of reading the response body
+    - `bytes`: size of the (decoded) response body read
+    - `error`: error message, if the request or the reading of the response failed
+    All durations are in seconds. Values the handler does not provide are None.
+
+    HTTP GET requests with the `coalesce` extension that are identical to one already
+    in flight (same url, headers, proxies and extensions) are not sent again. Instead,
+    they wait for the response to the first one, and its body is buffered and shared
+    between all of them, provided it is no larger than COALESCE_MAX_SIZE bytes.
+    Otherwise, and if the request fails, the waiting requests are sent by themselves.
+    Set COALESCE_MAX_SIZE to 0 to disable this.
+
     @param logger: Logger instance.
     @param verbose: Print debug request information to stdout.
     """
 
+    COALESCE_MAX_SIZE = 2 * 1024 * 1024
+
     def __init__(self, logger, verbose=False):
         self.handlers: dict[str, RequestHandler] = {}
         self.preferences: set[Preference] = set()
+        self.trace_hooks: list[TraceHook] = []
         self.logger = logger  # TODO(Grub4k): default logger
         self.verbose = verbose
+        self._in_flight: dict[typing.Hashable, _InFlightRequest] = {}
+        self._in_flight_lock = threading.Lock()
 
     def close(self):
         for handler in self.handlers.values():
@@ -87,10 +117,88 @@ def _get_handlers(self, request: Request) -> list[RequestHandler]:
             f'{rh.RH_NAME}={pref}' for rh, pref in preferences.items())))
         return sorted(self.handlers.values(), key=preferences.get, reverse=True)
 
+    def get_handler(self, request: Request) -> RequestHandler | None:
+        """Get the handler that send() would send a request with first, or None if no handler supports it"""
+        for handler in self._get_handlers(request):
+            try:
+                handler.validate(request)
+            except UnsupportedRequest:
+                continue
+            return handler
+        return None
+
     def _print_verbose(self, msg):
         if self.verbose:
             self.logger.stdout(f'director: {msg}')
 
+    def _emit_trace(self, event):
+        for hook in self.trace_hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                self.logger.warning(f'Request trace hook failed: {error_to_str(e)}')
+
+    def _trace(self, request, handler, start, response=None, error=None):
+        headers_received = time.perf_counter()
+        event = {
+            'url': request.url,
+            'method': request.method,
+            'handler': handler.RH_NAME,
+            'start': time.time() - (headers_received - start),
+            'status': None,
+            'final_url': None,
+            'redirects': None,
+            'reused_connection': None,
+            'dns': None,
+            'connect': None,
+            'tls': None,
+            'ttfb': headers_received - start,
+            'transfer': None,
+            'bytes': None,
+            'error': None,
+        }
+        if response is not None:
+            event.update(response.extensions.get('trace') or {})
+            event.update(status=response.status, final_url=response.url)
+        if response is None or error is not None:
+            event['error'] = error_to_str(error)
+            self._emit_trace(event)
+            return
+
+        def finish(num_bytes, read_error):
+            event.update(
+                transfer=time.perf_counter() - headers_received, bytes=num_bytes,
+                error=read_error and error_to_str(read_error))
+            self._emit_trace(event)
+
+        response.fp = _TracingReader(response.fp, finish)
+
+    @staticmethod
+    def _coalesce_key(request):
+        if not request.extensions.get('coalesce') or request.method != 'GET' or request.data is not None:
+            return None
+        url = urllib.parse.urlsplit(request.url)
+        scheme = url.scheme.lower()
+        # Other schemes, such as websockets, do not have a response body to share
+        if scheme not in ('http', 'https'):
+            return None
+        try:
+            port = url.port or {'http': 80, 'https': 443}[scheme]
+        except ValueError:
+            return None
+        key = (
+            # The fragment is not sent
+            (scheme, url.netloc.rpartition('@')[0], url.hostname, port, url.path or '/', url.query),
+            frozenset((name.lower(), value) for name, value in request.headers.items()),
+            frozenset(request.proxies.items()),
+            frozenset(request.extensions.items()),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
     def send(self, request: Request) -> Response:
         """
         Passes a request onto a suitable RequestHandler
@@ -100,6 +208,42 @@ def send(self, request: Request) -> Response:
 
         assert isinstance(request, Request)
 
+        key = self.COALESCE_MAX_SIZE and self._coalesce_key(request)
+        if not key:
+            return self._send(request)
+
+        flight = _InFlightRequest()
+        with self._in_flight_lock:
+            leader = self._in_flight.get(key)
+            if leader:
+                leader.waiters += 1
+            else:
+                self._in_flight[key] = flight
+
+        if leader:
+            leader.done.wait()
+            if leader.body is None:
+                return self._send(request)
+            self._print_verbose(f'Sharing the response of an identical request that was in flight for {request.url}')
+            return leader.make_response()
+
+        try:
+            response = self._send(request)
+        except BaseException:
+            flight.done.set()
+            raise
+        finally:
+            # Identical requests made from now on will be sent by themselves
+            with self._in_flight_lock:
+                del self._in_flight[key]
+        try:
+            if flight.waiters:
+                response = flight.buffer(response, self.COALESCE_MAX_SIZE)
+        finally:
+            flight.done.set()
+        return response
+
+    def _send(self, request: Request) -> Response:
         unexpected_errors = []
         unsupported_errors = []
         for handler in self._get_handlers(request):
@@ -113,9 +257,20 @@ def send(self, request: Request) -> Response:
                 continue
 
             self._print_verbose(f'Sending request via "{handler.RH_NAME}"')
+            start = time.perf_counter()
             try:
                 response = handler.send(request)
-            except RequestError:
+            except UnsupportedRequest as e:
+                # Some handlers only find out whether they can handle the request when connecting.
+                # They must only raise UnsupportedRequest before anything was sent,
+                # since the request is passed on to the next handler
+                self._print_verbose(
+                    f'"{handler.RH_NAME}" cannot handle this request (reason: {error_to_str(e)})')
+                unsupported_errors.append(e)
+                continue
+            except RequestError as e:
+                if self.trace_hooks:
+                    self._trace(request, handler, start, getattr(e, 'response', None), e)
                 raise
             except Exception as e:
                 self.logger.error(
@@ -125,11 +280,89 @@ def send(self, request: Request) -> Response:
                 continue
 
             assert isinstance(response, Response)
+            if self.trace_hooks:
+                self._trace(request, handler, start, response)
             return response
 
         raise NoSupportingHandlers(unsupported_errors, unexpected_errors)
 
 
+class _TracingReader:
+    """Wraps the file object of a Response to report once it has been read to the end or closed"""
+
+    def __init__(self, fp, callback):
+        self._fp = fp
+        self._callback = callback
+        self._bytes_read = 0
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+    def _finish(self, error=None):
+        callback, self._callback = self._callback, None
+        if callback:
+            callback(self._bytes_read, error)
+
+    def read(self, amt=None, *args, **kwargs):
+        try:
+            data = self._fp.read(amt, *args, **kwargs)
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._bytes_read += len(data)
+        if not data or amt is None or amt < 0:
+            self._finish()
+        return data
+
+    def readinto(self, buffer):
+        try:
+            size = self._fp.readinto(buffer)
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._bytes_read += size
+        if not size and len(buffer):
+            self._finish()
+        return size
+
+    def close(self):
+        self._finish()
+        return self._fp.close()
+
+
+class _InFlightRequest:
+    def __init__(self):
+        self.waiters = 0
+        self.done = threading.Event()
+        self.response = None
+        self.body = None
+
+    def buffer(self, response, max_size):
+        """
+        Read the body of the response for the waiting requests to share, if it is small enough.
+        Returns the response to use in place of the given one.
+        """
+        body = b''
+        while len(body) <= max_size:
+            data = response.read(max_size + 1 - len(body))
+            if not data:
+                break
+            body += data
+        else:
+            return _BufferedResponse(body, response)
+
+        response.close()
+        self.response, self.body = response, body
+        return self.make_response()
+
+    def make_response(self):
+        # Every response gets its own copy of the headers and extensions
+        response = self.response
+        return Response(
+            fp=io.BytesIO(self.body), url=response.url, headers=copy.deepcopy(response.headers),
+            status=response.status, reason=response.reason, extensions=copy.copy(response.extensions))
+
+
 _REQUEST_HANDLERS = {}
 
 
@@ -191,6 +424,9 @@ class RequestHandler(abc.ABC):
             dict with {client_certificate, client_certificate_key, client_certificate_password}
     @param verify: Verify SSL certificates
     @param legacy_ssl_support: Enable legacy SSL options such as legacy server connect and older cipher support.
+    @param dns_cache_ttl: Seconds to reuse resolved host addresses for. 0 disables the DNS cache.
+    @param happy_eyeballs_delay: Seconds to wait for a connection attempt before trying the next
+            address of a host in parallel (RFC 8305). 0 tries the addresses one after another.
 
     Some configuration options may be available for individual Requests too. In this case,
     either the Request configuration option takes precedence or they are merged.
@@ -208,6 +444,13 @@ class RequestHandler(abc.ABC):
     - `legacy_ssl`: Enable legacy SSL options for this request. See legacy_ssl_support.
     To enable these, add extensions.pop('<extension>', None) to _check_extensions
 
+    The `fragment` extension (bool) marks requests for fragments of a download.
+    It is only a hint for handler preferences, and is accepted by all handlers.
+
+    The `coalesce` extension (bool) lets RequestDirector share the response with
+    identical requests that are in flight at the same time. It must only be set for
+    requests whose response is read to the end, and is accepted by all handlers.
+
     Apart from the url protocol, proxies dict may contain the following keys:
     - `all`: proxy to use for all protocols. Used as a fallback if no proxy is set for a specific protocol.
     - `no`: comma seperated list of hostnames (optionally with port) to not use a proxy for.
@@ -232,6 +475,8 @@ def __init__(
         client_cert: dict[str, str | None] | None = None,
         verify: bool = True,
         legacy_ssl_support: bool = False,
+        dns_cache_ttl: float | None = None,
+        happy_eyeballs_delay: float | None = None,
         **_,
     ):
 
@@ -246,6 +491,11 @@ def __init__(
         self._client_cert = client_cert or {}
         self.verify = verify
         self.legacy_ssl_support = legacy_ssl_support
+        for name, value in (('dns_cache_ttl', dns_cache_ttl), ('happy_eyeballs_delay', happy_eyeballs_delay)):
+            if value is not None and value < 0:
+                raise ValueError(f'{name} must be positive or 0, not {value}')
+        self.dns_cache_ttl = dns_cache_ttl
+        self.happy_eyeballs_delay = happy_eyeballs_delay
         super().__init__()
 
     def _make_sslcontext(self, legacy_ssl_support=None):
@@ -317,6 +567,10 @@ def _check_extensions(self, extensions):
         assert isinstance(extensions.get('cookiejar'), (YoutubeDLCookieJar, NoneType))
         assert isinstance(extensions.get('timeout'), (float, int, NoneType))
         assert isinstance(extensions.get('legacy_ssl'), (bool, NoneType))
+        assert isinstance(extensions.get('fragment'), (bool, NoneType))
+        assert isinstance(extensions.get('coalesce'), (bool, NoneType))
+        extensions.pop('fragment', None)
+        extensions.pop('coalesce', None)
 
     def _validate(self, request):
         self._check_url_scheme(request)
@@ -337,7 +591,14 @@ def validate(self, request: Request):
     def send(self, request: Request) -> Response:
         if not isinstance(request, Request):
             raise TypeError('Expected an instance of Request')
-        return self._send(request)
+        options_token = connection_options.set({
+            'dns_cache_ttl': self.dns_cache_ttl,
+            'happy_eyeballs_delay': self.happy_eyeballs_delay,
+        })
+        try:
+            return self._send(request)
+        finally:
+            connection_options.reset(options_token)
 
     @abc.abstractmethod
     def _send(self, request: Request):
@@ -538,6 +799,19 @@ def read(self, amt: int | None = None) -> bytes:
         except Exception as e:
             raise TransportError(cause=e) from e
 
+    def readinto(self, buffer) -> int:
+        """
+        Read up to len(buffer) bytes into the writable buffer, returning the number of bytes read.
+        0 is returned at the end of the response.
+
+        This copies the result of read(); subclasses should redefine this method
+        to read into the buffer directly where the underlying response allows it.
+        """
+        data = self.read(len(buffer))
+        size = len(data)
+        memoryview(buffer)[:size] = data
+        return size
+
     def close(self):
         self.fp.close()
         return super().close()
@@ -577,8 +851,29 @@ def getheader(self, name, default=None):
         return self.get_header(name, default)
 
 
+class _BufferedResponse(Response):
+    """A response whose body has been partly read into memory. The rest is read from `rest`"""
+
+    def __init__(self, body: bytes, rest: Response):
+        super().__init__(
+            fp=io.BytesIO(body), url=rest.url, headers=rest.headers,
+            status=rest.status, reason=rest.reason, extensions=rest.extensions)
+        self._rest = rest
+
+    def read(self, amt=None):
+        data = self.fp.read(amt)
+        if amt is None or amt < 0 or len(data) < amt:
+            data += self._rest.read(None if amt is None or amt < 0 else amt - len(data))
+        return data
+
+    def close(self):
+        self._rest.close()
+        return super().close()
+
+
 if typing.TYPE_CHECKING:
     RequestData = bytes | Iterable[bytes] | typing.IO | None
     Preference = typing.Callable[[RequestHandler, Request], int]
+    TraceHook = typing.Callable[[dict], None]
 
 _RH_PREFERENCES: set[Preference] = set()
@@ -475,7 +475,7 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
                 'no-attach-info-json', 'embed-thumbnail-atomicparsley', 'no-external-downloader-progress',
                 'embed-metadata', 'seperate-video-versions', 'no-clean-infojson', 'no-keep-subs', 'no-certifi',
                 'no-youtube-channel-redirect', 'no-youtube-unavailable-videos', 'no-youtube-prefer-utc-upload-date',
-                'prefer-legacy-http-handler', 'manifest-filesize-approx', 'allow-unsafe-ext',
+                'prefer-legacy-http-handler', 'manifest-filesize-approx', 'allow-unsafe-ext', 'no-ffmpeg-fusion',
             }, 'aliases': {
                 'youtube-dl': ['all', '-multistreams', '-playlist-match-filter', '-manifest-filesize-approx', '-allow-unsafe-ext'],
                 'youtube-dlc': ['all', '-no-youtube-channel-redirect', '-no-live-chat', '-playlist-match-filter', '-manifest-filesize-approx', '-allow-unsafe-ext'],
@@ -516,6 +516,16 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         metavar='IP', dest='source_address', default=None,
         help='Client-side IP address to bind to',
     )
+    network.add_option(
+        '--dns-cache-ttl',
+        dest='dns_cache_ttl', type=float, default=None, metavar='SECONDS',
+        help='Time to reuse resolved host addresses for, in seconds. Use 0 to resolve hosts for every connection (default: 300)')
+    network.add_option(
+        '--happy-eyeballs-delay',
+        dest='happy_eyeballs_delay', type=float, default=None, metavar='SECONDS',
+        help=(
+            'Time to wait for a connection attempt before also trying the next address of a host, in seconds. '
+            'Use 0 to try the addresses one after another (default: 0.25)'))
     network.add_option(
         '--impersonate',
         metavar='CLIENT[:OS]', dest='impersonate', default=None,
@@ -918,6 +928,16 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
         help='Maximum download rate in bytes per second, e.g. 50K or 4.2M')
+    downloader.add_option(
+        '--prioritize-audio-rate',
+        action='store_true', dest='prioritize_audio_rate', default=False,
+        help=(
+            'Give audio-only formats twice the share of --limit-rate, '
+            'so that they finish first and merging can start sooner'))
+    downloader.add_option(
+        '--no-prioritize-audio-rate',
+        action='store_false', dest='prioritize_audio_rate',
+        help='Share --limit-rate equally between all downloads (default)')
     downloader.add_option(
         '--throttled-rate',
         dest='throttledratelimit', metavar='RATE',
@@ -1288,6 +1308,10 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--print-traffic', '--dump-headers',
         dest='debug_printtraffic', action='store_true', default=False,
         help='Display sent and read HTTP traffic')
+    verbosity.add_option(
+        '--trace-requests',
+        metavar='FILE', dest='request_trace_file', default=None,
+        help='Append timing information of every network request to FILE as JSON lines')
     verbosity.add_option(
         '-C', '--call-home',
         dest='call_home', action='store_true', default=False,
@@ -1499,6 +1523,17 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
         help='Delete all filesystem cache files')
+    filesystem.add_option(
+        '--http-cache',
+        action='store_true', dest='http_cache', default=False,
+        help=(
+            'Store webpages downloaded during extraction in the cache directory and reuse them '
+            'while they are fresh according to their HTTP caching headers. '
+            'Stale pages are revalidated with the server'))
+    filesystem.add_option(
+        '--no-http-cache',
+        action='store_false', dest='http_cache',
+        help='Do not cache downloaded webpages (default)')
 
     thumbnail = optparse.OptionGroup(parser, 'Thumbnail Options')
     thumbnail.add_option(
@@ -1520,6 +1555,12 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--list-thumbnails',
         action='store_true', dest='list_thumbnails', default=False,
         help='List available thumbnails of each video. Simulate unless --no-simulate is used')
+    thumbnail.add_option(
+        '--thumbnail-timeout',
+        metavar='SECONDS', dest='thumbnail_timeout', type=float, default=None,
+        help=(
+            'Time limit for downloading the thumbnails of each video. '
+            'Thumbnails that are not downloaded in time are skipped (default: no limit)'))
 
     link = optparse.OptionGroup(parser, 'Internet Shortcut Options')
     link.add_option(
@@ -1700,6 +1741,12 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--ffmpeg-location', '--avconv-location', metavar='PATH',
         dest='ffmpeg_location',
         help='Location of the ffmpeg binary; either the path to the binary or its containing directory')
+    postproc.add_option(
+        '--postprocessor-workers',
+        metavar='N', dest='postprocessor_workers', default=None, type=int,
+        help=(
+            'Number of videos that can be postprocessed in the background '
+            'while the next ones are downloaded (default is 0: postprocess each video before continuing)'))
     postproc.add_option(
         '--exec',
         metavar='[WHEN:]CMD', dest='exec_cmd', **when_prefix('after_move'),
@@ -1766,6 +1813,17 @@ def _alias_callback(option, opt_str, value, parser, opts, nargs):
         '--no-force-keyframes-at-cuts',
         action='store_false', dest='force_keyframes_at_cuts',
         help='Do not force keyframes around the chapters when cutting/splitting (default)')
+    postproc.add_option(
+        '--smart-cuts',
+        action='store_true', dest='smart_cuts', default=False,
+        help=(
+            'When removing sections, re-encode only the video from each cut to the next keyframe '
+            'and stream copy the rest. This is much faster than --force-keyframes-at-cuts for long videos. '
+            'Only h264, hevc, vp9 and av1 videos can be smart cut; other videos are re-encoded in full (Experimental)'))
+    postproc.add_option(
+        '--no-smart-cuts',
+        action='store_false', dest='smart_cuts',
+        help='Do not smart cut when removing sections (default)')
     _postprocessor_opts_parser = lambda key, val='': (
         *(item.split('=', 1) for item in (val.split(';') if val else [])),
         ('key', remove_end(key, 'PP')))
@@ -14,6 +14,7 @@
     FFmpegFixupM4aPP,
     FFmpegFixupStretchedPP,
     FFmpegFixupTimestampPP,
+    FFmpegFusedPassPP,
     FFmpegMergerPP,
     FFmpegMetadataPP,
     FFmpegPostProcessor,
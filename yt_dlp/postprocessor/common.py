@@ -149,6 +149,18 @@ def run(self, information):
         """
         return [], information  # by default, keep file and do nothing
 
+    def prefetch(self, entries):
+        """Called with the entries of a playlist before they are processed.
+
+        PostProcessors that need remote data for each video can start
+        fetching it here. The entries may not be fully extracted yet.
+        """
+        pass
+
+    def close(self):
+        """Called when the downloader is closed, to release any resources held by the PP"""
+        pass
+
     def try_utime(self, path, atime, mtime, errnote='Cannot update utime of file'):
         try:
             os.utime(encodeFilename(path), (atime, mtime))
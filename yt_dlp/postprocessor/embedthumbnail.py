@@ -1,10 +1,12 @@
 import base64
 import os
 import re
+import struct
 import subprocess
 
 from .common import PostProcessor
 from .ffmpeg import FFmpegPostProcessor, FFmpegThumbnailsConvertorPP
+from .. import matroska, mp4
 from ..compat import imghdr
 from ..dependencies import mutagen
 from ..utils import (
@@ -28,6 +30,44 @@ class EmbedThumbnailPPError(PostProcessingError):
     pass
 
 
+def _image_dimensions(filename):
+    """Read the (width, height) of a png/gif/webp/jpeg image from its header; None if unknown"""
+    with open(encodeFilename(filename), 'rb') as f:
+        h = f.read(30)
+        kind = imghdr.what(h=h)
+        if kind == 'png' and h[12:16] == b'IHDR':
+            return struct.unpack('>II', h[16:24])
+        elif kind == 'gif' and len(h) >= 10:
+            return struct.unpack('<HH', h[6:10])
+        elif kind == 'webp':
+            chunk = h[12:16]
+            if chunk == b'VP8L' and h[20:21] == b'\x2f' and len(h) >= 25:
+                bits = int.from_bytes(h[21:25], 'little')
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            elif len(h) < 30:
+                return None
+            elif chunk == b'VP8 ' and h[23:26] == b'\x9d\x01\x2a':
+                width, height = struct.unpack('<HH', h[26:30])
+                return width & 0x3fff, height & 0x3fff
+            elif chunk == b'VP8X':
+                return int.from_bytes(h[24:27], 'little') + 1, int.from_bytes(h[27:30], 'little') + 1
+        elif kind == 'jpeg':
+            f.seek(2)
+            while True:
+                marker = f.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF:
+                    return None
+                # Start Of Frame markers, excluding DHT, JPG and DAC
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    frame = f.read(5)
+                    if len(frame) < 5:
+                        return None
+                    height, width = struct.unpack('>HH', frame[1:5])
+                    return width, height
+                f.seek(struct.unpack('>H', marker[2:4])[0] - 2, os.SEEK_CUR)
+    return None
+
+
 class EmbedThumbnailPP(FFmpegPostProcessor):
 
     def __init__(self, downloader=None, already_have_thumbnail=False):
@@ -40,6 +80,13 @@ def guess():
             if width and height:
                 return width, height
 
+        try:
+            size = _image_dimensions(filename)
+        except (OSError, struct.error):
+            size = None
+        if size and all(size):
+            return size
+
         try:
             size_regex = r',\s*(?P<w>\d+)x(?P<h>\d+)\s*[,\[]'
             size_result = self.run_ffmpeg(filename, None, ['-hide_banner'], expected_retcodes=(1,))
@@ -97,28 +144,54 @@ def run(self, info):
             self.run_ffmpeg_multiple_files([filename, thumbnail_filename], temp_filename, options)
 
         elif info['ext'] in ['mkv', 'mka']:
-            options = list(self.stream_copy_opts())
-
             mimetype = f'image/{thumbnail_ext.replace("jpg", "jpeg")}'
-            old_stream, new_stream = self.get_stream_number(
-                filename, ('tags', 'mimetype'), mimetype)
-            if old_stream is not None:
-                options.extend(['-map', f'-0:{old_stream}'])
-                new_stream -= 1
-            options.extend([
-                '-attach', self._ffmpeg_filename_argument(thumbnail_filename),
-                f'-metadata:s:{new_stream}', f'mimetype={mimetype}',
-                f'-metadata:s:{new_stream}', f'filename=cover.{thumbnail_ext}'])
-
-            self._report_run('ffmpeg', filename)
-            self.run_ffmpeg(filename, temp_filename, options)
+            try:
+                # Arguments given for ffmpeg would be ignored
+                if self._configuration_args(self.basename or 'ffmpeg', ['_i1', '_i', '_o1', '_o', '']):
+                    raise ValueError('ffmpeg arguments were given')
+                self.to_screen(f'Adding thumbnail to "{filename}"')
+                with open(thumbnail_filename, 'rb') as thumbfile:
+                    thumb_data = thumbfile.read()
+                matroska.write_metadata(filename, attachments=[(f'cover.{thumbnail_ext}', mimetype, thumb_data)])
+                temp_filename = filename
+            except ValueError as err:
+                self.write_debug(f'Not embedding the thumbnail in place ({err}); falling back to ffmpeg')
+                options = list(self.stream_copy_opts())
+                old_stream, new_stream = self.get_stream_number(
+                    filename, ('tags', 'mimetype'), mimetype)
+                if old_stream is not None:
+                    options.extend(['-map', f'-0:{old_stream}'])
+                    new_stream -= 1
+                options.extend([
+                    '-attach', self._ffmpeg_filename_argument(thumbnail_filename),
+                    f'-metadata:s:{new_stream}', f'mimetype={mimetype}',
+                    f'-metadata:s:{new_stream}', f'filename=cover.{thumbnail_ext}'])
+
+                self._report_run('ffmpeg', filename)
+                self.run_ffmpeg(filename, temp_filename, options)
 
         elif info['ext'] in ['m4a', 'mp4', 'm4v', 'mov']:
             prefer_atomicparsley = 'embed-thumbnail-atomicparsley' in self.get_param('compat_opts', [])
-            # Method 1: Use mutagen
-            if not mutagen or prefer_atomicparsley:
-                success = False
-            else:
+            # Method 1: Edit the moov box in place
+            success = False
+            if not prefer_atomicparsley:
+                self.to_screen(f'Adding thumbnail to "{filename}"')
+                try:
+                    # Arguments given for ffmpeg would be ignored
+                    if self._configuration_args(self.basename or 'ffmpeg', ['_i1', '_i', '_o1', '_o', '']):
+                        raise ValueError('ffmpeg arguments were given')
+                    with open(thumbnail_filename, 'rb') as thumbfile:
+                        thumb_data = thumbfile.read()
+                    if not mp4.write_metadata(filename, cover=(thumb_data, imghdr.what(h=thumb_data))):
+                        self.write_debug('The file was copied to make room for the thumbnail')
+                    temp_filename = filename
+                    success = True
+                except ValueError as err:
+                    self.write_debug(f'Unable to embed the thumbnail in place ({err})')
+
+            # Method 2: Use mutagen
+            if not success and mutagen and not prefer_atomicparsley:
+                success = True
                 self._report_run('mutagen', filename)
                 f = {'jpeg': MP4Cover.FORMAT_JPEG, 'png': MP4Cover.FORMAT_PNG}
                 try:
@@ -141,7 +214,7 @@ def run(self, info):
                     self.report_warning(f'unable to embed using mutagen; {err}')
                     success = False
 
-            # Method 2: Use AtomicParsley
+            # Method 3: Use AtomicParsley
             if not success:
                 success = True
                 atomicparsley = next((
@@ -174,7 +247,7 @@ def run(self, info):
                         self.report_warning('The file format doesn\'t support embedding a thumbnail')
                         success = False
 
-            # Method 3: Use ffmpeg+ffprobe
+            # Method 4: Use ffmpeg+ffprobe
             # Thumbnails attached using this method doesn't show up as cover in some cases
             # See https://github.com/yt-dlp/yt-dlp/issues/2125, https://github.com/yt-dlp/yt-dlp/issues/411
             if not success:
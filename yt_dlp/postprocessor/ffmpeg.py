@@ -1,14 +1,21 @@
 import collections
+import concurrent.futures
+import contextlib
 import contextvars
+import copy
 import functools
+import hashlib
 import itertools
 import json
 import os
 import re
+import shutil
 import subprocess
+import threading
 import time
 
 from .common import PostProcessor
+from .. import matroska, mp4, subtitles
 from ..compat import imghdr
 from ..utils import (
     MEDIA_EXTENSIONS,
@@ -24,6 +31,7 @@
     encodeFilename,
     filter_dict,
     float_or_none,
+    format_bytes,
     is_outdated_version,
     orderedSet,
     prepend_extension,
@@ -33,6 +41,7 @@
     variadic,
     write_json_file,
 )
+from ..version import __version__
 
 EXT_TO_OUT_FORMATS = {
     'aac': 'adts',
@@ -135,10 +144,39 @@ def _determine_executables(self):
 
     _version_cache, _features_cache = {None: None}, {}
 
+    @staticmethod
+    def _probe_cache_key(path):
+        """Identify an executable by its location, mtime and size, or None if it can not be found"""
+        path = path and shutil.which(path)
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return hashlib.sha256(
+            f'{os.path.realpath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}'.encode()).hexdigest()
+
     def _get_ffmpeg_version(self, prog):
         path = self._paths.get(prog)
         if path in self._version_cache:
             return self._version_cache[path], self._features_cache.get(path, {})
+        # Probing means running the executable, so the results are also kept
+        # in the filesystem cache for the next process to use
+        cache = getattr(self._downloader, 'cache', None)
+        cache_key = cache and self._probe_cache_key(path)
+        probe = cache_key and cache.load('ffmpeg-probe', cache_key, min_ver=__version__)
+        if not probe:
+            probe = self._probe_ffmpeg_version(prog, path)
+            if cache_key and probe['version']:
+                cache.store('ffmpeg-probe', cache_key, probe)
+        self._version_cache[path] = probe['version']
+        if probe['features'] is not None:
+            self._features_cache[path] = probe['features']
+        return probe['version'], probe['features'] or {}
+
+    @staticmethod
+    def _probe_ffmpeg_version(prog, path):
         out = _get_exe_version_output(path, ['-bsfs'])
         ver = detect_exe_version(out) if out else False
         if ver:
@@ -151,18 +189,16 @@ def _get_ffmpeg_version(self, prog):
                 mobj = re.match(regex, ver)
                 if mobj:
                     ver = mobj.group(1)
-        self._version_cache[path] = ver
         if prog != 'ffmpeg' or not out:
-            return ver, {}
+            return {'version': ver, 'features': None}
 
         mobj = re.search(r'(?m)^\s+libavformat\s+(?:[0-9. ]+)\s+/\s+(?P<runtime>[0-9. ]+)', out)
         lavf_runtime_version = mobj.group('runtime').replace(' ', '') if mobj else None
-        self._features_cache[path] = features = {
+        return {'version': ver, 'features': {
             'fdk': '--enable-libfdk-aac' in out,
             'setts': 'setts' in out.splitlines(),
             'needs_adtstoasc': is_outdated_version(lavf_runtime_version, '57.56.100', False),
-        }
-        return ver, features
+        }}
 
     @property
     def _versions(self):
@@ -238,6 +274,10 @@ def check_version(self):
                                 f'to version {required_version} or newer if you encounter any errors')
 
     def get_audio_codec(self, path):
+        if self.probe_basename == 'ffprobe':
+            with contextlib.suppress(PostProcessingError, ValueError):
+                return traverse_obj(self.get_metadata_object(path), (
+                    'streams', lambda _, v: v['codec_type'] == 'audio', 'codec_name', {str}), get_all=False)
         if not self.probe_available and not self.available:
             raise PostProcessingError('ffprobe and ffmpeg not found. Please install or provide the path using --ffmpeg-location')
         try:
@@ -274,6 +314,20 @@ def get_audio_codec(self, path):
                 return mobj.group(1)
         return None
 
+    # Results of get_metadata_object, shared by all postprocessors in the process
+    _metadata_cache = collections.OrderedDict()
+    _metadata_cache_lock = threading.Lock()
+    _METADATA_CACHE_SIZE = 64
+
+    @staticmethod
+    def _metadata_cache_key(path):
+        """Identify a version of a file. Rewriting a file also replaces its inode and changes its ctime"""
+        try:
+            stat = os.stat(encodeFilename(path))
+        except OSError:
+            return None
+        return os.path.abspath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns
+
     def get_metadata_object(self, path, opts=[]):
         if self.probe_basename != 'ffprobe':
             if self.probe_available:
@@ -281,6 +335,16 @@ def get_metadata_object(self, path, opts=[]):
             raise PostProcessingError('ffprobe not found. Please install or provide the path using --ffmpeg-location')
         self.check_version()
 
+        cache_key = None if opts else self._metadata_cache_key(path)
+        with self._metadata_cache_lock:
+            metadata = self._metadata_cache.get(cache_key)
+            if metadata is not None:
+                self._metadata_cache.move_to_end(cache_key)
+        if metadata is not None:
+            self.write_debug(f'Using cached ffprobe result for "{path}"')
+            # Callers are free to modify the result
+            return copy.deepcopy(metadata)
+
         cmd = [
             encodeFilename(self.probe_executable, True),
             encodeArgument('-hide_banner'),
@@ -294,7 +358,13 @@ def get_metadata_object(self, path, opts=[]):
         cmd.append(self._ffmpeg_filename_argument(path))
         self.write_debug(f'ffprobe command line: {shell_quote(cmd)}')
         stdout, _, _ = Popen.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-        return json.loads(stdout)
+        metadata = json.loads(stdout)
+        if cache_key and 'format' in metadata:
+            with self._metadata_cache_lock:
+                self._metadata_cache[cache_key] = copy.deepcopy(metadata)
+                while len(self._metadata_cache) > self._METADATA_CACHE_SIZE:
+                    self._metadata_cache.popitem(last=False)
+        return metadata
 
     def get_stream_number(self, path, keys, value):
         streams = self.get_metadata_object(path)['streams']
@@ -303,6 +373,47 @@ def get_stream_number(self, path, keys, value):
             None)
         return num, len(streams)
 
+    def get_keyframes(self, path, stream, read_intervals=None):
+        """
+        Get the timestamps of the keyframes that decoding can start from
+
+        Keyframes that are followed in decoding order by frames shown before them (open GOPs)
+        are left out, since those frames refer to the frames before the keyframe
+
+        @param stream           The index of the stream
+        @param read_intervals   Only read around these timestamps; See ffprobe's -read_intervals
+        """
+        self.check_version()
+        cmd = [
+            encodeFilename(self.probe_executable, True),
+            encodeArgument('-hide_banner'),
+            encodeArgument('-loglevel'), encodeArgument('error'),
+            encodeArgument('-select_streams'), encodeArgument(str(stream)),
+            encodeArgument('-show_entries'), encodeArgument('packet=pts_time,flags'),
+            encodeArgument('-print_format'), encodeArgument('csv=print_section=0'),
+        ]
+        if read_intervals:
+            cmd += [encodeArgument('-read_intervals'), encodeArgument(read_intervals)]
+        cmd.append(self._ffmpeg_filename_argument(path))
+        self.write_debug(f'ffprobe command line: {shell_quote(cmd)}')
+        stdout, stderr, returncode = Popen.run(
+            cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        if returncode:
+            raise FFmpegPostProcessorError(f'Unable to get keyframes: {stderr.strip()}')
+
+        keyframes, keyframe = set(), None
+        for line in stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            pts_time = float_or_none(pts_time)
+            if pts_time is None:
+                continue
+            elif 'K' in flags:
+                keyframe = pts_time
+                keyframes.add(keyframe)
+            elif keyframe is not None and pts_time < keyframe:
+                keyframes.discard(keyframe)
+        return sorted(keyframes)
+
     def _fixup_chapters(self, info):
         last_chapter = traverse_obj(info, ('chapters', -1))
         if last_chapter and not last_chapter.get('end_time'):
@@ -367,13 +478,42 @@ def make_args(file, args, name, number):
             self.write_debug(stderr)
             raise FFmpegPostProcessorError(stderr.strip().splitlines()[-1])
         for out_path, _ in output_path_opts:
-            if out_path:
+            # The output of the segment muxer is a pattern
+            if out_path and os.path.exists(encodeFilename(out_path)):
                 self.try_utime(out_path, oldest_mtime, oldest_mtime)
         return stderr
 
     def run_ffmpeg(self, path, out_path, opts, **kwargs):
         return self.run_ffmpeg_multiple_files([path], out_path, opts, **kwargs)
 
+    # Whether run() queues its stream copy into the fused pass (see FFmpegFusedPassPP)
+    _FUSABLE = False
+
+    def _queue_fused(self, info, args, **kwargs):
+        """
+        Queue a stream copy of info['filepath'] into the pending fused ffmpeg pass
+        See FFmpegFusedPassPP.add for the arguments
+
+        @returns    Whether the step was queued. If not, it must be run right away
+        """
+        fused_pass = info.get('__ffmpeg_pass')
+        if not fused_pass or not self.available:
+            return False
+        # Arguments given specifically to this postprocessor would not be passed to the fused pass
+        if any(self._configuration_args(self.basename, keys) != fused_pass._configuration_args(self.basename, keys)
+               for keys in (['_i1', '_i'], ['_o1', '_o', ''])):
+            return False
+        if not fused_pass.add(args, **kwargs):
+            self._flush_fused_pass(info)
+            return fused_pass.add(args, **kwargs)
+        return True
+
+    def _flush_fused_pass(self, info):
+        """Run the pending fused pass so that info['filepath'] is up to date, e.g. before probing it"""
+        fused_pass = info.get('__ffmpeg_pass')
+        if fused_pass and fused_pass.pending:
+            self._downloader.run_pp(fused_pass, info)
+
     @staticmethod
     def _ffmpeg_filename_argument(fn):
         # Always use 'file:' because the filename may contain ':' (ffmpeg
@@ -588,6 +728,7 @@ def _options(target_ext):
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
     SUPPORTED_EXTS = ('mp4', 'mov', 'm4a', 'webm', 'mkv', 'mka')
+    _FUSABLE = True
 
     def __init__(self, downloader=None, already_have_subtitle=False):
         super().__init__(downloader)
@@ -642,32 +783,35 @@ def run(self, info):
         if not sub_langs:
             return [], info
 
-        input_files = [filename, *sub_filenames]
-
-        opts = [
-            *self.stream_copy_opts(ext=info['ext']),
+        def subtitle_opts(first_input):
             # Don't copy the existing subtitles, we may be running the
             # postprocessor a second time
-            '-map', '-0:s',
-        ]
-        for i, (lang, name) in enumerate(zip(sub_langs, sub_names)):
-            opts.extend(['-map', f'{i + 1}:0'])
-            lang_code = ISO639Utils.short2long(lang) or lang
-            opts.extend([f'-metadata:s:s:{i}', f'language={lang_code}'])
-            if name:
-                opts.extend([f'-metadata:s:s:{i}', f'handler_name={name}',
-                             f'-metadata:s:s:{i}', f'title={name}'])
+            yield from ('-map', '-0:s')
+            for i, (lang, name) in enumerate(zip(sub_langs, sub_names)):
+                yield from ('-map', f'{first_input + i}:0')
+                lang_code = ISO639Utils.short2long(lang) or lang
+                yield from (f'-metadata:s:s:{i}', f'language={lang_code}')
+                if name:
+                    yield from (f'-metadata:s:s:{i}', f'handler_name={name}',
+                                f'-metadata:s:s:{i}', f'title={name}')
+            if ext in ('mp4', 'mov', 'm4a'):
+                yield from ('-c:s', 'mov_text')
 
-        temp_filename = prepend_extension(filename, 'temp')
+        files_to_delete = [] if self._already_have_subtitle else sub_filenames
         self.to_screen(f'Embedding subtitles in "{filename}"')
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.replace(temp_filename, filename)
+        if self._queue_fused(info, subtitle_opts, inputs=sub_filenames, files_to_delete=files_to_delete):
+            return [], info
 
-        files_to_delete = [] if self._already_have_subtitle else sub_filenames
+        temp_filename = prepend_extension(filename, 'temp')
+        self.run_ffmpeg_multiple_files(
+            [filename, *sub_filenames], temp_filename,
+            [*self.stream_copy_opts(), *subtitle_opts(1)])
+        os.replace(temp_filename, filename)
         return files_to_delete, info
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
+    _FUSABLE = True
 
     def __init__(self, downloader, add_metadata=True, add_chapters=True, add_infojson='if_exists'):
         FFmpegPostProcessor.__init__(self, downloader)
@@ -684,7 +828,15 @@ def _options(target_ext):
 
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
+        attach_infojson = self._add_infojson and info['ext'] in ('mkv', 'mka') and (
+            self._add_infojson is True or os.path.exists(info.get('infojson_filename') or ''))
+        if attach_infojson or not traverse_obj(info, ('chapters', -1, 'end_time'), default=True):
+            # The file is probed for its duration or existing attachments
+            self._flush_fused_pass(info)
         self._fixup_chapters(info)
+        if self._write_in_place(info):
+            return [], info
+
         filename, metadata_filename = info['filepath'], None
         files_to_delete, options = [], []
         if self._add_chapters and info.get('chapters'):
@@ -707,8 +859,21 @@ def run(self, info):
             self.to_screen('There isn\'t any metadata to add')
             return [], info
 
-        temp_filename = prepend_extension(filename, 'temp')
+        def metadata_opts(first_input):
+            if info['ext'] == 'm4a':
+                yield '-vn'
+            for opts in options:
+                if opts[0] == '-map_metadata':  # The metadata file is the only input
+                    opts = ('-map_metadata', str(first_input))
+                yield from opts
+
         self.to_screen(f'Adding metadata to "{filename}"')
+        # The attachment's stream index is only known when no other stream can be added after it
+        if self._queue_fused(info, metadata_opts, inputs=filter(None, [metadata_filename]),
+                             temp_files=files_to_delete, final=attach_infojson):
+            return [], info
+
+        temp_filename = prepend_extension(filename, 'temp')
         self.run_ffmpeg_multiple_files(
             (filename, metadata_filename), temp_filename,
             itertools.chain(self._options(info['ext']), *options))
@@ -716,6 +881,60 @@ def run(self, info):
         os.replace(temp_filename, filename)
         return [], info
 
+    def _write_in_place(self, info):
+        """Edit the metadata of mp4/mkv files without rewriting them. Returns whether it was done"""
+        ext, filename = info['ext'], info['filepath']
+        fused_pass = info.get('__ffmpeg_pass')
+        # The file is rewritten by the fused pass anyway
+        if ext not in ('mp4', 'm4a', 'm4v', 'mkv', 'mka', 'webm') or (fused_pass and fused_pass.pending):
+            return False
+        # Arguments given for ffmpeg would be ignored
+        elif self._configuration_args(self.basename or 'ffmpeg', ['_i1', '_i', '_o1', '_o', '']):
+            return False
+        is_mp4 = ext in ('mp4', 'm4a', 'm4v')
+        chapters = self._add_chapters and info.get('chapters')
+        # ffmpeg writes the chapters of mp4 files as a text track
+        if is_mp4 and chapters:
+            return False
+        # ffmpeg drops the video streams of m4a files
+        elif ext == 'm4a':
+            try:
+                if 'vide' in mp4.track_types(filename):
+                    return False
+            except ValueError:
+                return False
+
+        tags, streams = self._get_metadata(info) if self._add_metadata else ({}, {})
+        if any(name != 'language' for stream in streams.values() for name in stream):
+            return False
+        languages = [streams[i].get('language') for i in sorted(streams)]
+
+        attachments = []
+        if self._add_infojson and ext in ('mkv', 'mka'):
+            infojson_filename = info.get('infojson_filename')
+            if infojson_filename and os.path.exists(infojson_filename):
+                with open(infojson_filename, 'rb') as f:
+                    attachments.append(('info.json', 'application/json', f.read()))
+            elif self._add_infojson is True:
+                attachments.append(('info.json', 'application/json', json.dumps(
+                    self._downloader.sanitize_info(info, self.get_param('clean_infojson', True)),
+                    ensure_ascii=False).encode()))
+        if not (tags or chapters or attachments or any(languages)):
+            return False
+
+        self.to_screen(f'Adding metadata to "{filename}"')
+        try:
+            if is_mp4:
+                if not mp4.write_metadata(filename, tags, languages=languages):
+                    self.write_debug('The file was copied to make room for the metadata')
+            else:
+                matroska.write_metadata(
+                    filename, tags, chapters=chapters, languages=languages, attachments=attachments)
+        except ValueError as err:
+            self.write_debug(f'Unable to edit the metadata in place ({err}); falling back to ffmpeg')
+            return False
+        return True
+
     @staticmethod
     def _get_chapter_opts(chapters, metadata_filename):
         with open(metadata_filename, 'w', encoding='utf-8') as f:
@@ -733,7 +952,8 @@ def ffmpeg_escape(text):
             f.write(metadata_file_content)
         yield ('-map_metadata', '1')
 
-    def _get_metadata_opts(self, info):
+    def _get_metadata(self, info):
+        """Returns the metadata of the file, and that of each stream as {index: metadata}"""
         meta_prefix = 'meta'
         metadata = collections.defaultdict(dict)
 
@@ -776,22 +996,28 @@ def add(meta_list, info_list=None):
             if value is not None and mobj:
                 metadata[mobj.group('i') or 'common'][mobj.group('key')] = value.replace('\0', '')
 
-        # Write id3v1 metadata also since Windows Explorer can't handle id3v2 tags
-        yield ('-write_id3v1', '1')
-
-        for name, value in metadata['common'].items():
-            yield ('-metadata', f'{name}={value}')
-
-        stream_idx = 0
+        streams, stream_idx = {}, 0
         for fmt in info.get('requested_formats') or [info]:
             stream_count = 2 if 'none' not in (fmt.get('vcodec'), fmt.get('acodec')) else 1
             lang = ISO639Utils.short2long(fmt.get('language') or '') or fmt.get('language')
             for i in range(stream_idx, stream_idx + stream_count):
                 if lang:
                     metadata[str(i)].setdefault('language', lang)
-                for name, value in metadata[str(i)].items():
-                    yield (f'-metadata:s:{i}', f'{name}={value}')
+                streams[i] = metadata[str(i)]
             stream_idx += stream_count
+        return metadata['common'], streams
+
+    def _get_metadata_opts(self, info):
+        metadata, streams = self._get_metadata(info)
+        # Write id3v1 metadata also since Windows Explorer can't handle id3v2 tags
+        yield ('-write_id3v1', '1')
+
+        for name, value in metadata.items():
+            yield ('-metadata', f'{name}={value}')
+
+        for i, stream_metadata in streams.items():
+            for name, value in stream_metadata.items():
+                yield (f'-metadata:s:{i}', f'{name}={value}')
 
     def _get_infojson_opts(self, info, infofn):
         if not infofn or not os.path.exists(infofn):
@@ -818,13 +1044,97 @@ def _get_infojson_opts(self, info, infofn):
         )
 
 
+class FFmpegFusedPassPP(FFmpegPostProcessor):
+    """
+    Runs the stream copies queued by other postprocessors as a single ffmpeg command
+
+    Merging the formats, the fixups, embedding subtitles and adding metadata each
+    rewrite the whole file. While postprocessing a video, these postprocessors queue
+    their output args here instead, and the file is written once when a postprocessor
+    that needs the file on disk is reached, or at the end of the postprocessing
+    """
+
+    def __init__(self, downloader=None):
+        super().__init__(downloader)
+        self._reset()
+
+    def _reset(self):
+        self._steps, self._files_to_delete, self._temp_files, self._final = [], [], [], False
+
+    @property
+    def pending(self):
+        return bool(self._steps)
+
+    def add(self, args, *, inputs=(), files_to_delete=(), temp_files=(), merge=False, final=False):
+        """
+        Queue a stream copy step
+
+        @param args             Output args, or a function returning them given the input index of inputs[0]
+        @param inputs           Additional input files of the step
+        @param files_to_delete  Files to delete (or keep with -k) once the pass has run
+        @param temp_files       Files to always delete once the pass has run
+        @param merge            The inputs are merged to create the file, instead of copying it
+        @param final            Other steps can not be added to the pass after this one
+        @returns                Whether the step was queued
+        """
+        if self._final or (merge and self._steps):
+            return False
+        self._steps.append((list(inputs), args, merge))
+        self._files_to_delete.extend(files_to_delete)
+        self._temp_files.extend(temp_files)
+        self._final = final
+        return True
+
+    def _make_args(self, filename, steps):
+        input_files, opts = [filename], list(self.stream_copy_opts())
+        for inputs, args, merge in steps:
+            if merge:
+                input_files, opts = [], []
+            if callable(args):
+                args = args(len(input_files))
+            input_files.extend(inputs)
+            opts.extend(args)
+        return input_files, opts
+
+    def _run_steps(self, filename, steps):
+        temp_filename = prepend_extension(filename, 'temp')
+        input_files, opts = self._make_args(filename, steps)
+        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
+        os.replace(temp_filename, filename)
+
+    def run(self, info):
+        filename, steps, files_to_delete, temp_files = (
+            info['filepath'], self._steps, self._files_to_delete, self._temp_files)
+        self._reset()
+        if not steps:
+            return [], info
+
+        if len(steps) == 1:
+            self._run_steps(filename, steps)
+        else:
+            self.to_screen(f'Running {len(steps)} postprocessing steps in a single pass on "{filename}"')
+            try:
+                self._run_steps(filename, steps)
+            except FFmpegPostProcessorError as e:
+                self.report_warning(f'Unable to run the steps in a single pass: {e.msg}; running them one by one')
+                for step in steps:
+                    self._run_steps(filename, [step])
+            else:
+                size = os.path.getsize(filename)
+                self.to_screen(
+                    f'Wrote {format_bytes(size)} to disk; running the steps '
+                    f'separately would have written about {format_bytes(size * len(steps))}')
+        self._delete_downloaded_files(*temp_files)
+        return files_to_delete, info
+
+
 class FFmpegMergerPP(FFmpegPostProcessor):
     SUPPORTED_EXTS = MEDIA_EXTENSIONS.common_video
+    _FUSABLE = True
 
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
         args = ['-c', 'copy']
         audio_streams = 0
         for (i, fmt) in enumerate(info['requested_formats']):
@@ -837,6 +1147,11 @@ def run(self, info):
             if fmt.get('vcodec') != 'none':
                 args.extend(['-map', f'{i}:v:0'])
         self.to_screen(f'Merging formats into "{filename}"')
+        if self._queue_fused(info, args, inputs=info['__files_to_merge'],
+                             files_to_delete=info['__files_to_merge'], merge=True):
+            return [], info
+
+        temp_filename = prepend_extension(filename, 'temp')
         self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, args)
         os.rename(encodeFilename(temp_filename), encodeFilename(filename))
         return info['__files_to_merge'], info
@@ -866,29 +1181,42 @@ def _fixup(self, msg, filename, options):
 
         os.replace(temp_filename, filename)
 
+    def _fixup_stream_copy(self, msg, info, args=()):
+        """Stream copy info['filepath'] with additional output args, in the fused pass if possible"""
+        if self._queue_fused(info, args):
+            self.to_screen(f'{msg} of "{info["filepath"]}"')
+        else:
+            self._fixup(msg, info['filepath'], [*self.stream_copy_opts(), *args])
+
 
 class FFmpegFixupStretchedPP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
     @PostProcessor._restrict_to(images=False, audio=False)
     def run(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio not in (None, 1):
-            self._fixup('Fixing aspect ratio', info['filepath'], [
-                *self.stream_copy_opts(), '-aspect', f'{stretched_ratio:f}'])
+            self._fixup_stream_copy('Fixing aspect ratio', info, ['-aspect', f'{stretched_ratio:f}'])
         return [], info
 
 
 class FFmpegFixupM4aPP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
     @PostProcessor._restrict_to(images=False, video=False)
     def run(self, info):
         if info.get('container') == 'm4a_dash':
-            self._fixup('Correcting container', info['filepath'], [*self.stream_copy_opts(), '-f', 'mp4'])
+            self._fixup_stream_copy('Correcting container', info, ['-f', 'mp4'])
         return [], info
 
 
 class FFmpegFixupM3u8PP(FFmpegFixupPostProcessor):
+    _FUSABLE = True
+
     def _needs_fixup(self, info):
         yield info['ext'] in ('mp4', 'm4a')
         yield info['protocol'].startswith('m3u8')
+        self._flush_fused_pass(info)
         try:
             metadata = self.get_metadata_object(info['filepath'])
         except PostProcessingError as e:
@@ -903,8 +1231,7 @@ def run(self, info):
             args = ['-f', 'mp4']
             if self.get_audio_codec(info['filepath']) == 'aac':
                 args.extend(['-bsf:a', 'aac_adtstoasc'])
-            self._fixup('Fixing MPEG-TS in MP4 container', info['filepath'], [
-                *self.stream_copy_opts(), *args])
+            self._fixup_stream_copy('Fixing MPEG-TS in MP4 container', info, args)
         return [], info
 
 
@@ -931,10 +1258,11 @@ def run(self, info):
 
 class FFmpegCopyStreamPP(FFmpegFixupPostProcessor):
     MESSAGE = 'Copying stream'
+    _FUSABLE = True
 
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
-        self._fixup(self.MESSAGE, info['filepath'], self.stream_copy_opts())
+        self._fixup_stream_copy(self.MESSAGE, info)
         return [], info
 
 
@@ -981,33 +1309,34 @@ def run(self, info):
             sub_filenames.append(old_file)
             new_file = replace_extension(old_file, new_ext)
 
-            if ext in ('dfxp', 'ttml', 'tt'):
-                self.report_warning(
-                    'You have requested to convert dfxp (TTML) subtitles into another format, '
-                    'which results in style information loss')
+            if not self._convert_natively(old_file, new_file, ext, new_ext):
+                if ext in ('dfxp', 'ttml', 'tt'):
+                    self.report_warning(
+                        'You have requested to convert dfxp (TTML) subtitles into another format, '
+                        'which results in style information loss')
 
-                dfxp_file = old_file
-                srt_file = replace_extension(old_file, 'srt')
+                    dfxp_file = old_file
+                    srt_file = replace_extension(old_file, 'srt')
 
-                with open(dfxp_file, 'rb') as f:
-                    srt_data = dfxp2srt(f.read())
+                    with open(dfxp_file, 'rb') as f:
+                        srt_data = dfxp2srt(f.read())
 
-                with open(srt_file, 'w', encoding='utf-8') as f:
-                    f.write(srt_data)
-                old_file = srt_file
+                    with open(srt_file, 'w', encoding='utf-8') as f:
+                        f.write(srt_data)
+                    old_file = srt_file
 
-                subs[lang] = {
-                    'ext': 'srt',
-                    'data': srt_data,
-                    'filepath': srt_file,
-                }
+                    subs[lang] = {
+                        'ext': 'srt',
+                        'data': srt_data,
+                        'filepath': srt_file,
+                    }
 
-                if new_ext == 'srt':
-                    continue
-                else:
-                    sub_filenames.append(srt_file)
+                    if new_ext == 'srt':
+                        continue
+                    else:
+                        sub_filenames.append(srt_file)
 
-            self.run_ffmpeg(old_file, new_file, ['-f', new_format])
+                self.run_ffmpeg(old_file, new_file, ['-f', new_format])
 
             with open(new_file, encoding='utf-8') as f:
                 subs[lang] = {
@@ -1021,6 +1350,19 @@ def run(self, info):
 
         return sub_filenames, info
 
+    def _convert_natively(self, old_file, new_file, ext, new_ext):
+        if not subtitles.can_convert(ext, new_ext):
+            return False
+        with open(old_file, 'rb') as f:
+            data = f.read()
+        try:
+            with open(new_file, 'w', encoding='utf-8') as f:
+                f.writelines(subtitles.convert(data, ext, new_ext))
+        except ValueError as e:
+            self.report_warning(f'Unable to convert {ext} subtitles to {new_ext} without ffmpeg: {e}')
+            return False
+        return True
+
 
 class FFmpegSplitChaptersPP(FFmpegPostProcessor):
     def __init__(self, downloader, force_keyframes=False):
@@ -1061,13 +1403,43 @@ def run(self, info):
         if self._force_keyframes and len(chapters) > 1:
             in_file = self.force_keyframes(in_file, (c['start_time'] for c in chapters))
         self.to_screen(f'Splitting video by chapters; {len(chapters)} chapters found')
-        for idx, chapter in enumerate(chapters):
-            destination, opts = self._ffmpeg_args_for_chapter(idx + 1, chapter, info)
-            self.real_run_ffmpeg([(in_file, opts)], [(destination, self.stream_copy_opts())])
+        jobs = [self._ffmpeg_args_for_chapter(idx + 1, chapter, info) for idx, chapter in enumerate(chapters)]
+        # With keyframes at the chapter starts, the segment muxer cuts at the same points as seeking does
+        if in_file != info['filepath'] and self._chapters_are_contiguous(chapters, info.get('duration')):
+            self._split_with_segment_muxer(in_file, chapters, [destination for destination, _ in jobs])
+        else:
+            with concurrent.futures.ThreadPoolExecutor(min(len(jobs), os.cpu_count() or 1)) as executor:
+                # Consume the results to raise the first error
+                collections.deque(executor.map(
+                    lambda job: self.real_run_ffmpeg([(in_file, job[1])], [(job[0], self.stream_copy_opts())]),
+                    jobs), maxlen=0)
         if in_file != info['filepath']:
             self._delete_downloaded_files(in_file, msg=None)
         return [], info
 
+    @staticmethod
+    def _chapters_are_contiguous(chapters, duration):
+        # The segment muxer writes everything from the first to the last cut into the last chapter
+        return (
+            chapters[0]['start_time'] == 0 and duration is not None
+            and abs(chapters[-1]['end_time'] - duration) < 0.001
+            and all(abs(prev['end_time'] - chapter['start_time']) < 0.001
+                    for prev, chapter in zip(chapters, chapters[1:])))
+
+    def _split_with_segment_muxer(self, in_file, chapters, destinations):
+        ext = determine_ext(in_file)
+        # The output is a pattern for the segment muxer
+        pattern = prepend_extension(in_file.replace('%', '%%'), 'chapter%03d.temp', ext)
+        self.real_run_ffmpeg([(in_file, [])], [(pattern, [
+            *self.stream_copy_opts(), '-f', 'segment', '-reset_timestamps', '1',
+            '-segment_format', EXT_TO_OUT_FORMATS.get(ext, ext),
+            '-segment_times', ','.join(f'{c["start_time"]:.6f}' for c in chapters[1:]),
+        ])])
+        mtime = os.stat(encodeFilename(in_file)).st_mtime
+        for idx, destination in enumerate(destinations):
+            os.replace(prepend_extension(in_file, f'chapter{idx:03d}.temp', ext), destination)
+            self.try_utime(destination, mtime, mtime)
+
 
 class FFmpegThumbnailsConvertorPP(FFmpegPostProcessor):
     SUPPORTED_EXTS = MEDIA_EXTENSIONS.thumbnails
@@ -1100,19 +1472,50 @@ def _options(target_ext):
         if target_ext == 'jpg':
             yield from ('-bsf:v', 'mjpeg2jpeg')
 
+    @staticmethod
+    def _input_options(thumbnail_filename):
+        _, source_ext = os.path.splitext(thumbnail_filename)
+        return [] if source_ext == '.gif' else ['-f', 'image2', '-pattern_type', 'none']
+
     def convert_thumbnail(self, thumbnail_filename, target_ext):
         thumbnail_conv_filename = replace_extension(thumbnail_filename, target_ext)
 
         self.to_screen(f'Converting thumbnail "{thumbnail_filename}" to {target_ext}')
-        _, source_ext = os.path.splitext(thumbnail_filename)
         self.real_run_ffmpeg(
-            [(thumbnail_filename, [] if source_ext == '.gif' else ['-f', 'image2', '-pattern_type', 'none'])],
+            [(thumbnail_filename, self._input_options(thumbnail_filename))],
             [(thumbnail_conv_filename, self._options(target_ext))])
         return thumbnail_conv_filename
 
+    def convert_thumbnails(self, conversions):
+        """
+        Convert several thumbnails with a single ffmpeg invocation
+        @param conversions  list of (thumbnail_filename, target_ext)
+        @returns            list of the converted filenames, in the same order
+        """
+        if len(conversions) < 2:
+            return [self.convert_thumbnail(*conversion) for conversion in conversions]
+        self.check_version()
+        # Per-file arguments given with --ppa cannot be mapped onto a combined command line
+        if self._configuration_args(self.basename, ['_i1', '_i', '_o1', '_o', '']):
+            return [self.convert_thumbnail(*conversion) for conversion in conversions]
+
+        outputs = [replace_extension(filename, target_ext) for filename, target_ext in conversions]
+        self.to_screen(f'Converting {len(conversions)} thumbnails to '
+                       f'{", ".join(orderedSet(target_ext for _, target_ext in conversions))}')
+        try:
+            self.real_run_ffmpeg(
+                [(filename, self._input_options(filename)) for filename, _ in conversions],
+                [(out, ['-map', f'{i}:v', *self._options(target_ext)])
+                 for i, (out, (_, target_ext)) in enumerate(zip(outputs, conversions))])
+        except FFmpegPostProcessorError as err:
+            self.write_debug(f'Combined thumbnail conversion failed ({err}); converting one at a time')
+            return [self.convert_thumbnail(*conversion) for conversion in conversions]
+        return outputs
+
     def run(self, info):
         files_to_delete = []
         has_thumbnail = False
+        conversions = []
 
         for idx, thumbnail_dict in enumerate(info.get('thumbnails') or []):
             original_thumbnail = thumbnail_dict.get('filepath')
@@ -1128,9 +1531,14 @@ def run(self, info):
             if _skip_msg:
                 self.to_screen(f'Not converting thumbnail "{original_thumbnail}"; {_skip_msg}')
                 continue
-            thumbnail_dict['filepath'] = self.convert_thumbnail(original_thumbnail, target_ext)
+            conversions.append((thumbnail_dict, target_ext))
+
+        converted = self.convert_thumbnails([(t['filepath'], target_ext) for t, target_ext in conversions])
+        for (thumbnail_dict, target_ext), thumbnail_conv_filename in zip(conversions, converted):
+            original_thumbnail = thumbnail_dict['filepath']
+            thumbnail_dict['filepath'] = thumbnail_conv_filename
             files_to_delete.append(original_thumbnail)
-            info['__files_to_move'][thumbnail_dict['filepath']] = replace_extension(
+            info['__files_to_move'][thumbnail_conv_filename] = replace_extension(
                 info['__files_to_move'][original_thumbnail], target_ext)
 
         if not has_thumbnail:
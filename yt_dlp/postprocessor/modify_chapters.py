@@ -5,21 +5,32 @@
 from .common import PostProcessor
 from .ffmpeg import FFmpegPostProcessor, FFmpegSubtitlesConvertorPP
 from .sponsorblock import SponsorBlockPP
-from ..utils import PostProcessingError, orderedSet, prepend_extension
+from ..utils import (
+    PostProcessingError,
+    determine_ext,
+    float_or_none,
+    orderedSet,
+    prepend_extension,
+    traverse_obj,
+)
 
 _TINY_CHAPTER_DURATION = 1
+# How far after a cut to look for the next keyframe when smart cutting
+_KEYFRAME_SEARCH_WINDOW = 60
 DEFAULT_SPONSORBLOCK_CHAPTER_TITLE = '[SponsorBlock]: %(category_names)l'
 
 
 class ModifyChaptersPP(FFmpegPostProcessor):
     def __init__(self, downloader, remove_chapters_patterns=None, remove_sponsor_segments=None, remove_ranges=None,
-                 *, sponsorblock_chapter_title=DEFAULT_SPONSORBLOCK_CHAPTER_TITLE, force_keyframes=False):
+                 *, sponsorblock_chapter_title=DEFAULT_SPONSORBLOCK_CHAPTER_TITLE, force_keyframes=False,
+                 smart_cut=False):
         FFmpegPostProcessor.__init__(self, downloader)
         self._remove_chapters_patterns = set(remove_chapters_patterns or [])
         self._remove_sponsor_segments = set(remove_sponsor_segments or []) - set(SponsorBlockPP.NON_SKIPPABLE_CATEGORIES.keys())
         self._ranges_to_remove = set(remove_ranges or [])
         self._sponsorblock_chapter_title = sponsorblock_chapter_title
         self._force_keyframes = force_keyframes
+        self._smart_cut = smart_cut
 
     @PostProcessor._restrict_to(images=False)
     def run(self, info):
@@ -57,7 +68,8 @@ def run(self, info):
         self.write_debug('Concat spec = {}'.format(', '.join(f'{c.get("inpoint", 0.0)}-{c.get("outpoint", "inf")}' for c in concat_opts)))
 
         def remove_chapters(file, is_sub):
-            return file, self.remove_chapters(file, cuts, concat_opts, self._force_keyframes and not is_sub)
+            return file, self.remove_chapters(
+                file, cuts, concat_opts, self._force_keyframes and not is_sub, smart_cut=self._smart_cut and not is_sub)
 
         in_out_files = [remove_chapters(info['filepath'], False)]
         in_out_files.extend(remove_chapters(in_file, True) for in_file in self._get_supported_subs(info))
@@ -310,17 +322,167 @@ def _remove_tiny_rename_sponsors(self, chapters):
             new_chapters.append(c)
         return new_chapters
 
-    def remove_chapters(self, filename, ranges_to_cut, concat_opts, force_keyframes=False):
+    def remove_chapters(self, filename, ranges_to_cut, concat_opts, force_keyframes=False, *, smart_cut=False):
         in_file = filename
         out_file = prepend_extension(in_file, 'temp')
+        in_files, temp_files = [in_file] * len(concat_opts), []
+        # Forcing keyframes re-encodes the whole video anyway
+        if smart_cut and not force_keyframes:
+            try:
+                in_files, concat_opts, temp_files = self._smart_cut_files(in_file, concat_opts)
+            except PostProcessingError as e:
+                self.report_warning(f'Unable to smart cut "{filename}"; re-encoding the whole video instead: {e}')
+                force_keyframes = True
         if force_keyframes:
             in_file = self.force_keyframes(in_file, (t for c in ranges_to_cut for t in (c['start_time'], c['end_time'])))
+            in_files, temp_files = [in_file] * len(concat_opts), [in_file]
         self.to_screen(f'Removing chapters from {filename}')
-        self.concat_files([in_file] * len(concat_opts), out_file, concat_opts)
-        if in_file != filename:
-            self._delete_downloaded_files(in_file, msg=None)
+        try:
+            self.concat_files(in_files, out_file, concat_opts)
+        finally:
+            if temp_files:
+                self._delete_downloaded_files(*temp_files, msg=None)
         return out_file
 
+    # Encoders for the start of the kept sections when smart cutting, and their options, by codec.
+    # The parts are short, so they are encoded at a high quality rather than at the bitrate of the source
+    _SMART_CUT_ENCODERS = {
+        'h264': ('libx264', {'crf': '18'}),
+        # The parameter sets of the parts differ from the ones in the file header
+        'hevc': ('libx265', {'crf': '20', 'x265-params': 'repeat-headers=1:log-level=error'}),
+        'vp9': ('libvpx-vp9', {'crf': '24', 'b': '0'}),
+        'av1': ('libaom-av1', {'crf': '24', 'b': '0', 'cpu-used': '6', 'row-mt': '1'}),
+    }
+    _SMART_CUT_PROFILES = {
+        'h264': {
+            'Baseline': 'baseline',
+            'Constrained Baseline': 'baseline',
+            'Main': 'main',
+            'High': 'high',
+            'High 10': 'high10',
+            'High 4:2:2': 'high422',
+            'High 4:4:4 Predictive': 'high444',
+        },
+        'hevc': {
+            'Main': 'main',
+            'Main 10': 'main10',
+        },
+    }
+
+    def _smart_cut_encode_opts(self, video):
+        """The options to re-encode a video stream with the parameters of the source"""
+        codec, index = video.get('codec_name'), video['index']
+        if codec not in self._SMART_CUT_ENCODERS:
+            raise PostProcessingError(f'{codec} video is not supported')
+        encoder, encoder_opts = self._SMART_CUT_ENCODERS[codec]
+        encoder_opts = {
+            **encoder_opts,
+            'profile': traverse_obj(self._SMART_CUT_PROFILES, (codec, video.get('profile'))),
+            'pix_fmt': video.get('pix_fmt'),
+            'color_range': video.get('color_range'),
+            'colorspace': video.get('color_space'),
+            'color_primaries': video.get('color_primaries'),
+            'color_trc': video.get('color_transfer'),
+        }
+        level = video.get('level')
+        if level and level > 0:
+            if codec == 'h264':
+                encoder_opts['level'] = f'{level / 10:.1f}'
+            elif codec == 'hevc':
+                encoder_opts['x265-params'] += f':level-idc={level / 30:.1f}'
+
+        opts = [f'-c:{index}', encoder]
+        for option, value in encoder_opts.items():
+            if value not in (None, 'unknown'):
+                opts += [f'-{option}:{index}', value]
+        return opts
+
+    def _smart_cut_files(self, filename, concat_opts):
+        """
+        Re-encode only the start of each kept section, up to its first keyframe, and stream copy the rest
+
+        @returns    (in_files, concat_opts, temp_files) for concat_files
+        """
+        metadata = self.get_metadata_object(filename)
+        videos = traverse_obj(metadata, (
+            'streams', lambda _, v: v['codec_type'] == 'video' and not traverse_obj(v, ('disposition', 'attached_pic'))))
+        if not videos:
+            # Every audio frame can be cut at
+            return [filename] * len(concat_opts), concat_opts, []
+        elif len(videos) > 1:
+            raise PostProcessingError('files with several video streams are not supported')
+        video = videos[0]
+        encode_opts = self._smart_cut_encode_opts(video)
+
+        starts = [float(opts['inpoint']) for opts in concat_opts if 'inpoint' in opts]
+        keyframes = self.get_keyframes(filename, video['index'], ','.join(
+            f'{start:.6f}%+{_KEYFRAME_SEARCH_WINDOW}' for start in starts)) if starts else []
+        parts = list(self._split_at_keyframes(concat_opts, keyframes))
+        if not any(encode for _, encode in parts):
+            return [filename] * len(concat_opts), concat_opts, []
+
+        def start_time(metadata):
+            return float_or_none(traverse_obj(metadata, ('format', 'start_time'))) or 0
+
+        ext = determine_ext(filename)
+        copy_file, shift, temp_files = filename, 0, []
+        try:
+            if video['codec_name'] == 'hevc':
+                # Unlike for h264, the concat demuxer does not put the parameter sets of each file
+                # in the stream. So they are repeated in every keyframe of the copied sections
+                copy_file = prepend_extension(filename, 'smartcut.temp')
+                temp_files.append(copy_file)
+                self.real_run_ffmpeg([(filename, [])], [(copy_file, [
+                    *self.stream_copy_opts(ext=ext), f'-bsf:{video["index"]}', 'hevc_mp4toannexb',
+                    *([f'-tag:{video["index"]}', 'hev1'] if ext in ('mp4', 'mov', 'm4v') else [])])])
+                # The muxer may have shifted the timestamps to make them positive
+                shift = start_time(self.get_metadata_object(copy_file)) - start_time(metadata)
+
+            in_files, new_concat_opts = [], []
+            for i, (opts, encode) in enumerate(parts):
+                if not encode:
+                    in_files.append(copy_file)
+                    new_concat_opts.append({key: f'{float(value) + shift:.6f}' for key, value in opts.items()})
+                    continue
+                start, end = float(opts['inpoint']), float_or_none(opts.get('outpoint'))
+                part_file = prepend_extension(filename, f'smartcut{i}.temp')
+                temp_files.append(part_file)
+                # Like the concat demuxer, seek to the timestamp rather than to the time from the start of the file.
+                # Streams that are copied would otherwise start at the keyframe the input was seeked to
+                self.real_run_ffmpeg([(filename, ['-seek_timestamp', '1', '-ss', opts['inpoint']])], [(part_file, [
+                    *(['-t', f'{end - start:.6f}'] if end is not None else []),
+                    *self.stream_copy_opts(ext=ext), '-copypriorss', '0', *encode_opts])])
+                in_files.append(part_file)
+                # The following sections must start exactly where the cut ranges say
+                new_concat_opts.append({'duration': f'{end - start:.6f}'} if end is not None else {})
+        except PostProcessingError:
+            self._delete_downloaded_files(*filter(os.path.exists, temp_files), msg=None)
+            raise
+        self.write_debug(f'Re-encoded {sum(encode for _, encode in parts)} of {len(parts)} parts for smart cutting')
+        return in_files, new_concat_opts, temp_files
+
+    @staticmethod
+    def _split_at_keyframes(concat_opts, keyframes, tolerance=0.001):
+        """
+        Split the sections that do not start at a keyframe into the part before
+        their first keyframe, which must be re-encoded, and the rest
+
+        @returns    An iterator of (concat_opts, needs_encoding)
+        """
+        for opts in concat_opts:
+            if 'inpoint' not in opts:
+                yield opts, False
+                continue
+            start, end = float(opts['inpoint']), float_or_none(opts.get('outpoint'))
+            keyframe = next((k for k in keyframes if k > start - tolerance), None)
+            if keyframe is not None and keyframe < start + tolerance:
+                yield opts, False
+            elif keyframe is None or (end is not None and keyframe >= end - tolerance):
+                yield opts, True
+            else:
+                yield {**opts, 'outpoint': f'{keyframe:.6f}'}, True
+                yield {**opts, 'inpoint': f'{keyframe:.6f}'}, False
+
     @staticmethod
     def _make_concat_opts(chapters_to_remove, duration):
         opts = [{}]
@@ -1,6 +1,10 @@
+import concurrent.futures
+import copy
 import hashlib
 import json
 import re
+import threading
+import time
 import urllib.parse
 
 from .ffmpeg import FFmpegPostProcessor
@@ -30,10 +34,22 @@ class SponsorBlockPP(FFmpegPostProcessor):
         **NON_SKIPPABLE_CATEGORIES,
     }
 
+    # Seconds for which the response for a hash prefix is reused
+    CACHE_TTL = 3600
+    # Number of upcoming playlist entries whose segments are fetched in advance
+    PREFETCH_COUNT = 20
+    # Maximum size in bytes of the responses kept in the filesystem cache
+    CACHE_MAX_SIZE = 16 * 1024 * 1024
+
+    # Responses by url, shared by all instances in the process
+    _buckets, _buckets_lock = {}, threading.Lock()
+
     def __init__(self, downloader, categories=None, api='https://sponsor.ajay.app'):
         FFmpegPostProcessor.__init__(self, downloader)
         self._categories = tuple(categories or self.CATEGORIES.keys())
         self._API_URL = api if re.match('https?://', api) else 'https://' + api
+        self._upcoming, self._upcoming_index = [], {}
+        self._executor, self._futures = None, set()
 
     def run(self, info):
         extractor = info['extractor_key']
@@ -43,8 +59,22 @@ def run(self, info):
 
         self.to_screen('Fetching SponsorBlock segments')
         info['sponsorblock_chapters'] = self._get_sponsor_chapters(info, info.get('duration'))
+        self._prefetch_after(info['id'])
         return [], info
 
+    def prefetch(self, entries):
+        self._upcoming = [
+            (entry['id'], self.EXTRACTORS[entry.get('extractor_key') or entry.get('ie_key')])
+            for entry in entries
+            if entry.get('id') and (entry.get('extractor_key') or entry.get('ie_key')) in self.EXTRACTORS]
+        self._upcoming_index = {video_id: i for i, (video_id, _) in enumerate(self._upcoming)}
+        self._prefetch_after(None)
+
+    def _prefetch_after(self, video_id):
+        start = self._upcoming_index[video_id] + 1 if video_id in self._upcoming_index else 0
+        for upcoming_id, service in self._upcoming[start:start + self.PREFETCH_COUNT]:
+            self._get_bucket(self._bucket_url(upcoming_id, service), wait=False)
+
     def _get_sponsor_chapters(self, info, duration):
         segments = self._get_sponsor_segments(info['id'], self.EXTRACTORS[info['extractor_key']])
 
@@ -90,15 +120,56 @@ def to_chapter(s):
             self.to_screen(f'Found {len(sponsor_chapters)} segments in the SponsorBlock database')
         return sponsor_chapters
 
-    def _get_sponsor_segments(self, video_id, service):
+    def _bucket_url(self, video_id, service):
         video_hash = hashlib.sha256(video_id.encode('ascii')).hexdigest()
         # SponsorBlock API recommends using first 4 hash characters.
-        url = f'{self._API_URL}/api/skipSegments/{video_hash[:4]}?' + urllib.parse.urlencode({
+        return f'{self._API_URL}/api/skipSegments/{video_hash[:4]}?' + urllib.parse.urlencode({
             'service': service,
             'categories': json.dumps(self._categories),
             'actionTypes': json.dumps(['skip', 'poi', 'chapter']),
         })
-        for d in self._download_json(url) or []:
+
+    def _get_bucket(self, url, wait=True):
+        """Get the response for a hash prefix, fetching it in the background unless `wait`"""
+        with self._buckets_lock:
+            now = time.time()
+            for expired_url, (fetched, future) in list(self._buckets.items()):
+                if now - fetched >= self.CACHE_TTL and future.done():
+                    del self._buckets[expired_url]
+            fetched, future = self._buckets.get(url, (None, None))
+            if (not future or now - fetched >= self.CACHE_TTL
+                    or (wait and future.done() and future.exception())):
+                if not self._executor:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(4, thread_name_prefix='sponsorblock')
+                future = self._executor.submit(self._fetch_bucket, url)
+                self._futures.add(future)
+                future.add_done_callback(self._futures.discard)
+                self._buckets[url] = now, future
+        return future.result() if wait else None
+
+    def close(self):
+        if not self._executor:
+            return
+        # Drop the prefetches that have not started, instead of making the downloader wait on them
+        with self._buckets_lock:
+            for url, (_, future) in list(self._buckets.items()):
+                if future in self._futures and future.cancel():
+                    del self._buckets[url]
+        self._executor.shutdown()
+        self._executor = None
+
+    def _fetch_bucket(self, url):
+        cache_key = hashlib.sha256(url.encode()).hexdigest()
+        cached = self._downloader.cache.load('sponsorblock', cache_key)
+        if cached and time.time() - cached['time'] < self.CACHE_TTL:
+            return cached['data']
+        data = self._download_json(url) or []
+        self._downloader.cache.store('sponsorblock', cache_key, {'time': time.time(), 'data': data})
+        self._downloader.cache.prune('sponsorblock', self.CACHE_MAX_SIZE)
+        return data
+
+    def _get_sponsor_segments(self, video_id, service):
+        for d in self._get_bucket(self._bucket_url(video_id, service)):
             if d['videoID'] == video_id:
-                return d['segments']
+                return copy.deepcopy(d['segments'])
         return []
@@ -0,0 +1,270 @@
+"""
+Conversion between subtitle formats without ffmpeg
+
+Cues are read from WebVTT, SubRip, TTML (DFXP) or YouTube json3 subtitles and
+written one by one as WebVTT, SubRip, ASS or LRC. Italic, bold, underlined and
+coloured text is kept as far as the output format can represent it.
+"""
+
+import collections
+import html
+import json
+import re
+import xml.etree.ElementTree
+
+from . import webvtt
+from .utils import dfxp2srt, timetuple_from_msec
+
+INPUT_FORMATS = ('vtt', 'srt', 'ttml', 'dfxp', 'tt', 'json3')
+OUTPUT_FORMATS = ('vtt', 'srt', 'ass', 'lrc')
+
+Style = collections.namedtuple('Style', ('italic', 'bold', 'underline', 'color'), defaults=(False, False, False, None))
+# start and end are in milliseconds. runs is a list of (text, Style)
+Cue = collections.namedtuple('Cue', ('start', 'end', 'runs'))
+
+_DEFAULT_STYLE = Style()
+# The colour classes that are predefined by WebVTT
+_COLORS = {
+    'white': '#ffffff',
+    'lime': '#00ff00',
+    'cyan': '#00ffff',
+    'red': '#ff0000',
+    'yellow': '#ffff00',
+    'magenta': '#ff00ff',
+    'blue': '#0000ff',
+    'black': '#000000',
+}
+_COLOR_CLASSES = {v: k for k, v in _COLORS.items()}
+_COLORS.update({'green': '#008000', 'fuchsia': '#ff00ff', 'aqua': '#00ffff'})
+
+
+def _parse_color(color):
+    color = (color or '').strip().lower()
+    if color in _COLORS:
+        return _COLORS[color]
+    mobj = re.fullmatch(r'#?([0-9a-f]{3}|[0-9a-f]{6})(?:[0-9a-f]{2})?', color)
+    if not mobj:
+        return None
+    color = mobj.group(1)
+    return '#' + (color if len(color) == 6 else ''.join(c * 2 for c in color))
+
+
+_TAG_STYLES = {'i': 'italic', 'b': 'bold', 'u': 'underline'}
+_MARKUP_RE = re.compile(r'<(?P<closing>/)?(?P<name>[a-zA-Z]+)(?P<attrs>[.\s][^>]*)?>|<[\d:.]+>|\{\\[^}]*\}')
+
+
+def _parse_markup(text, unescape=False):
+    """Split text with HTML-like (SubRip or WebVTT) markup into runs"""
+    runs, stack, pos = [], [('', _DEFAULT_STYLE)], 0
+
+    def add(string):
+        if unescape and '&' in string:
+            string = html.unescape(string)
+        if not string:
+            return
+        style = stack[-1][1]
+        if runs and runs[-1][1] == style:
+            runs[-1] = (runs[-1][0] + string, style)
+        else:
+            runs.append((string, style))
+
+    for mobj in _MARKUP_RE.finditer(text):
+        add(text[pos:mobj.start()])
+        pos = mobj.end()
+        name = (mobj.group('name') or '').lower()
+        if not name:  # WebVTT timestamps and SubRip ASS-style overrides
+            continue
+        elif mobj.group('closing'):
+            if any(tag == name for tag, _ in stack[1:]):
+                while stack.pop()[0] != name:
+                    pass
+            continue
+
+        style, attrs = stack[-1][1], mobj.group('attrs') or ''
+        if name in _TAG_STYLES:
+            style = style._replace(**{_TAG_STYLES[name]: True})
+        elif name == 'font':
+            color = re.search(r'''color\s*=\s*["']?([^"'\s>]+)''', attrs)
+            style = style._replace(color=_parse_color(color and color.group(1)) or style.color)
+        elif name == 'c':
+            color = next(filter(None, map(_parse_color, re.findall(r'\.([\w-]+)', attrs))), None)
+            style = style._replace(color=color or style.color)
+        stack.append((name, style))
+    add(text[pos:])
+    return runs
+
+
+def _parse_srt_time(ts):
+    hours, minutes, seconds = ts.replace(',', '.').split(':')
+    return round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000)
+
+
+_SRT_CUE_RE = re.compile(r'''(?mx)
+    ^[ \t]*(?P<start>\d+:\d{1,2}:\d{1,2}(?:[,.]\d+)?)[ \t]*-->[ \t]*(?P<end>\d+:\d{1,2}:\d{1,2}(?:[,.]\d+)?)[^\n]*\n
+    (?P<text>(?:[^\n]*\S[^\n]*(?:\n|\Z))*)''')
+
+
+def _read_srt(data):
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    for mobj in _SRT_CUE_RE.finditer(text.replace('\r\n', '\n').replace('\r', '\n')):
+        yield Cue(_parse_srt_time(mobj.group('start')), _parse_srt_time(mobj.group('end')),
+                  _parse_markup(mobj.group('text').strip('\n')))
+
+
+def _read_vtt(data):
+    try:
+        for block in webvtt.parse_fragment(data.lstrip(b'\xef\xbb\xbf')):
+            if isinstance(block, webvtt.CueBlock):
+                yield Cue(round(block.start / 90), round(block.end / 90),
+                          _parse_markup(block.text.strip('\r\n'), unescape=True))
+    except webvtt.ParseError as e:
+        raise ValueError(f'Invalid WebVTT subtitles: {e}')
+
+
+def _read_ttml(data):
+    try:
+        srt_data = dfxp2srt(data)
+    except xml.etree.ElementTree.ParseError as e:
+        raise ValueError(f'Invalid TTML subtitles: {e}')
+    yield from _read_srt(srt_data)
+
+
+def _read_json3(data):
+    data = json.loads(data)
+    pens = [Style(
+        italic=pen.get('iAttr') == 1, bold=pen.get('bAttr') == 1, underline=pen.get('uAttr') == 1,
+        color='#{:06x}'.format(pen['fcForeColor']) if isinstance(pen.get('fcForeColor'), int) else None,
+    ) for pen in data.get('pens') or []]
+
+    for event in data.get('events') or []:
+        if not event.get('segs') or 'tStartMs' not in event:
+            continue
+        runs = []
+        for seg in event['segs']:
+            pen_id = seg.get('pPenId', event.get('pPenId'))
+            style = pens[pen_id] if isinstance(pen_id, int) and pen_id < len(pens) else _DEFAULT_STYLE
+            if runs and runs[-1][1] == style:
+                runs[-1] = (runs[-1][0] + seg.get('utf8', ''), style)
+            else:
+                runs.append((seg.get('utf8', ''), style))
+        if ''.join(text for text, _ in runs).strip():
+            runs[0] = (runs[0][0].lstrip('\n'), runs[0][1])
+            runs[-1] = (runs[-1][0].rstrip('\n'), runs[-1][1])
+            yield Cue(event['tStartMs'], event['tStartMs'] + event.get('dDurationMs', 0), runs)
+
+
+_READERS = {
+    'vtt': _read_vtt,
+    'srt': _read_srt,
+    'ttml': _read_ttml,
+    'dfxp': _read_ttml,
+    'tt': _read_ttml,
+    'json3': _read_json3,
+}
+
+
+def _without_blank_lines(text):
+    # A blank line ends the cue in SubRip and WebVTT
+    return re.sub(r'\n\s*\n', '\n', text.strip('\n'))
+
+
+def _write_srt(cues):
+    def timecode(msec):
+        return '{:02d}:{:02d}:{:02d},{:03d}'.format(*timetuple_from_msec(msec))
+
+    for number, cue in enumerate(cues, 1):
+        text = ''
+        for run, style in cue.runs:
+            for enabled, tag in ((style.underline, 'u'), (style.bold, 'b'), (style.italic, 'i')):
+                if enabled:
+                    run = f'<{tag}>{run}</{tag}>'
+            if style.color:
+                run = f'<font color="{style.color}">{run}</font>'
+            text += run
+        yield f'{number}\n{timecode(cue.start)} --> {timecode(cue.end)}\n{_without_blank_lines(text)}\n\n'
+
+
+def _write_vtt(cues):
+    def timecode(msec):
+        return '{:02d}:{:02d}:{:02d}.{:03d}'.format(*timetuple_from_msec(msec))
+
+    yield 'WEBVTT\n\n'
+    for cue in cues:
+        text = ''
+        for run, style in cue.runs:
+            run = run.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            for enabled, tag in ((style.underline, 'u'), (style.bold, 'b'), (style.italic, 'i')):
+                if enabled:
+                    run = f'<{tag}>{run}</{tag}>'
+            if style.color in _COLOR_CLASSES:
+                run = f'<c.{_COLOR_CLASSES[style.color]}>{run}</c>'
+            text += run
+        yield f'{timecode(cue.start)} --> {timecode(cue.end)}\n{_without_blank_lines(text)}\n\n'
+
+
+def _write_ass(cues):
+    def timecode(msec):
+        hours, minutes, seconds, msec = timetuple_from_msec(msec)
+        return f'{hours:d}:{minutes:02d}:{seconds:02d}.{msec // 10:02d}'
+
+    yield '\n'.join((
+        '[Script Info]',
+        '; Script generated by yt-dlp',
+        'ScriptType: v4.00+',
+        'PlayResX: 384',
+        'PlayResY: 288',
+        'ScaledBorderAndShadow: yes',
+        '',
+        '[V4+ Styles]',
+        ('Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, '
+         'Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, '
+         'MarginL, MarginR, MarginV, Encoding'),
+        'Style: Default,Arial,16,&Hffffff,&Hffffff,&H0,&H0,0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1',
+        '',
+        '[Events]',
+        'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+        ''))
+    for cue in cues:
+        text = ''
+        for run, style in cue.runs:
+            run = re.sub(r'([{}])', r'\\\1', run).replace('\n', r'\N')
+            overrides = ''.join(tag for enabled, tag in (
+                (style.italic, r'\i1'), (style.bold, r'\b1'), (style.underline, r'\u1')) if enabled)
+            if style.color:
+                red, green, blue = style.color[1:3], style.color[3:5], style.color[5:7]
+                overrides += rf'\c&H{(blue + green + red).upper()}&'
+            text += f'{{{overrides}}}{run}{{\\r}}' if overrides else run
+        yield f'Dialogue: 0,{timecode(cue.start)},{timecode(cue.end)},Default,,0,0,0,,{text}\n'
+
+
+def _write_lrc(cues):
+    for cue in cues:
+        minutes, centiseconds = divmod(round(cue.start / 10), 6000)
+        for line in ''.join(text for text, _ in cue.runs).split('\n'):
+            if line.strip():
+                yield f'[{minutes:02d}:{centiseconds // 100:02d}.{centiseconds % 100:02d}]{line}\n'
+
+
+_WRITERS = {
+    'vtt': _write_vtt,
+    'srt': _write_srt,
+    'ass': _write_ass,
+    'lrc': _write_lrc,
+}
+
+
+def can_convert(from_ext, to_ext):
+    return from_ext in _READERS and to_ext in _WRITERS
+
+
+def convert(data, from_ext, to_ext):
+    """
+    Convert subtitles between formats
+
+    @param data     The subtitles as bytes
+    @returns        An iterator over the chunks of the converted subtitles.
+                    ValueError is raised while iterating if the subtitles can not be parsed
+    """
+    if not can_convert(from_ext, to_ext):
+        raise ValueError(f'Converting {from_ext} subtitles to {to_ext} is not supported')
+    return _WRITERS[to_ext](_READERS[from_ext](data))
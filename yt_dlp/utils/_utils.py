@@ -1,5 +1,6 @@
 import base64
 import binascii
+import bisect
 import calendar
 import codecs
 import collections
@@ -2247,6 +2248,69 @@ def __str__(self):
         return repr(self.exhaust())
 
 
+class LazySequence(collections.abc.Sequence):
+    """Immutable sequence of known length, whose items are computed by `getter(index)` on access
+    Unlike LazyList, items are not cached. Slices of a LazySequence are lists"""
+
+    def __init__(self, length, getter):
+        self._length = length
+        self._getter = getter
+        self._parts = None
+
+    @classmethod
+    def concat(cls, *sequences):
+        """Concatenate sequences without evaluating them"""
+        parts = []
+        for seq in sequences:
+            parts.extend(seq._parts if isinstance(seq, LazySequence) and seq._parts else [seq])
+        offsets = list(itertools.accumulate(len(part) for part in parts))
+        self = cls(offsets[-1] if offsets else 0, functools.partial(cls._concat_getitem, parts, offsets))
+        self._parts = parts
+        return self
+
+    @staticmethod
+    def _concat_getitem(parts, offsets, idx):
+        part = bisect.bisect_right(offsets, idx)
+        return parts[part][idx - (offsets[part - 1] if part else 0)]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._getter(i) for i in range(*idx.indices(self._length))]
+        elif not isinstance(idx, int):
+            raise TypeError('indices must be integers or slices')
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError('LazySequence index out of range')
+        return self._getter(idx)
+
+    def __iter__(self):
+        return map(self._getter, range(self._length))
+
+    def __add__(self, other):
+        if not isinstance(other, collections.abc.Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return self.concat(self, other)
+
+    def __radd__(self, other):
+        if not isinstance(other, collections.abc.Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return self.concat(other, self)
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.abc.Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'<{type(self).__name__} of {self._length} items>'
+
+
 class PagedList:
 
     class IndexError(IndexError):  # noqa: A001
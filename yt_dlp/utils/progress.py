@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import bisect
+import contextlib
 import threading
 import time
+import weakref
 
 
 class ProgressCalculator:
@@ -93,6 +95,91 @@ def _update(self, size: int):
             self.eta.reset()
 
 
+class BandwidthLimiter:
+    """
+    A download rate limit shared by all downloads of the process
+
+    Every download draws from its own token bucket, a BandwidthShare.
+    The rate is divided between the shares that are active, in proportion
+    to their priority, so that the aggregate rate keeps to the limit
+    however many downloads and fragment threads run at the same time.
+    """
+    # Number of seconds worth of bandwidth a share can save up for bursts
+    BURST = 0.5
+    # Time after which a share that has not downloaded anything no longer counts as active (seconds)
+    IDLE_TIMEOUT = 1
+
+    _instances: dict[float, BandwidthLimiter] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, rate: float) -> BandwidthLimiter:
+        """Return the limiter for the given rate, which is shared process-wide"""
+        with cls._instances_lock:
+            if rate not in cls._instances:
+                cls._instances[rate] = cls(rate)
+            return cls._instances[rate]
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._shares = weakref.WeakSet()
+
+    def share(self, priority: float = 1) -> BandwidthShare:
+        share = BandwidthShare(self, priority)
+        with self._lock:
+            self._shares.add(share)
+        return share
+
+    def _share_rate(self, share: BandwidthShare, now: float) -> float:
+        active_priority = sum(
+            other.priority for other in self._shares if other is share or other._is_active(now))
+        return self.rate * share.priority / active_priority
+
+
+class BandwidthShare:
+    def __init__(self, limiter: BandwidthLimiter, priority: float):
+        self.limiter = limiter
+        self.priority = priority
+        self._tokens = 0
+        self._last_refill = time.monotonic()
+        self._active_until = float('-inf')
+        self._holds = 0
+
+    def _is_active(self, now: float) -> bool:
+        return bool(self._holds) or now < self._active_until + self.limiter.IDLE_TIMEOUT
+
+    @property
+    def rate(self) -> float:
+        """The current fair share of the total rate, in bytes/sec"""
+        with self.limiter._lock:
+            return self.limiter._share_rate(self, time.monotonic())
+
+    def consume(self, size: int):
+        """Account for `size` downloaded bytes, sleeping for as long as needed to keep to the rate"""
+        limiter = self.limiter
+        with limiter._lock:
+            now = time.monotonic()
+            rate = limiter._share_rate(self, now)
+            self._tokens = min(self._tokens + (now - self._last_refill) * rate, rate * limiter.BURST) - size
+            self._last_refill = now
+            delay = max(-self._tokens / rate, 0)
+            self._active_until = now + delay
+        if delay:
+            time.sleep(delay)
+
+    @contextlib.contextmanager
+    def hold(self):
+        """Keep the share active while bandwidth is used without consume(), e.g. by an external downloader"""
+        with self.limiter._lock:
+            self._holds += 1
+        try:
+            yield self
+        finally:
+            with self.limiter._lock:
+                self._holds -= 1
+
+
 class SmoothValue:
     def __init__(self, initial: float | None, smoothing: float):
         self.value = self.smooth = self._initial = initial
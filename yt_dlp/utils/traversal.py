@@ -1,5 +1,6 @@
 import collections.abc
 import contextlib
+import functools
 import http.cookies
 import inspect
 import itertools
@@ -117,7 +118,7 @@ def apply_key(key, obj, is_last):
         elif isinstance(key, (list, tuple)):
             branching = True
             result = itertools.chain.from_iterable(
-                apply_path(obj, branch, is_last)[0] for branch in key)
+                apply_path(obj, _compile_path(branch, casesense).keys, is_last)[0] for branch in key)
 
         elif key is ...:
             branching = True
@@ -217,27 +218,13 @@ def apply_specials(element):
 
         return branching, result if branching else (result,)
 
-    def lazy_last(iterable):
-        iterator = iter(iterable)
-        prev = next(iterator, NO_DEFAULT)
-        if prev is NO_DEFAULT:
-            return
-
-        for item in iterator:
-            yield False, prev
-            prev = item
-
-        yield True, prev
-
-    def apply_path(start_obj, path, test_type):
+    def apply_path(start_obj, keys, test_type):
         objs = (start_obj,)
         has_branched = False
 
         key = None
-        for last, key in lazy_last(variadic(path, (str, bytes, dict, set))):
-            if not casesense and isinstance(key, str):
-                key = key.casefold()
-
+        for index, key in enumerate(keys, 1):
+            last = index == len(keys)
             if key in (any, all):
                 has_branched = False
                 filtered_objs = (obj for obj in objs if obj not in (None, {}))
@@ -247,10 +234,6 @@ def apply_path(start_obj, path, test_type):
                     objs = (list(filtered_objs),)
                 continue
 
-            if __debug__ and callable(key):
-                # Verify function signature
-                inspect.signature(key).bind(None, None)
-
             new_objs = []
             for obj in objs:
                 branching, results = apply_key(key, obj, last)
@@ -264,8 +247,32 @@ def apply_path(start_obj, path, test_type):
 
         return objs, has_branched, isinstance(key, dict)
 
+    def apply_simple_path(obj, keys):
+        for key in keys:
+            # Only plain containers are handled inline; anything else takes the generic route
+            obj_type = type(obj)
+            if obj_type is dict:
+                obj = obj.get(key)
+            elif obj_type in (list, tuple) and type(key) is int:
+                try:
+                    obj = obj[key]
+                except IndexError:
+                    obj = None
+            elif obj is None:
+                return None
+            else:
+                obj = apply_key(key, obj, False)[1][0]
+        return obj
+
     def _traverse_obj(obj, path, allow_empty, test_type):
-        results, has_branched, is_dict = apply_path(obj, path, test_type)
+        compiled = _compile_path(path, casesense)
+        if compiled.is_simple and not traverse_string:
+            result = apply_simple_path(obj, compiled.keys)
+            if test_type:
+                result = type_test(result)
+            return result if result not in (None, {}) else None
+
+        results, has_branched, is_dict = apply_path(obj, compiled.keys, test_type)
         results = LazyList(item for item in results if item not in (None, {}))
         if get_all and has_branched:
             if results:
@@ -284,6 +291,33 @@ def _traverse_obj(obj, path, allow_empty, test_type):
     return None if default is NO_DEFAULT else default
 
 
+_CompiledPath = collections.namedtuple('_CompiledPath', ('keys', 'is_simple'))
+
+
+def _compile_path(path, casesense):
+    # Paths made only of str/int keys are by far the most common, and are hashable.
+    # Paths containing functions are not cached, so that closures are not kept alive
+    if type(path) in (str, int) or (type(path) is tuple and all(
+            type(key) in (str, int) or key is None or key is ... for key in path)):
+        return _compile_hashable_path(path, casesense)
+    return _compile_path_uncached(path, casesense)
+
+
+def _compile_path_uncached(path, casesense):
+    keys = tuple(variadic(path, (str, bytes, dict, set)))
+    if not casesense:
+        keys = tuple(key.casefold() if isinstance(key, str) else key for key in keys)
+    if __debug__:
+        for key in keys:
+            if callable(key) and key not in (any, all):
+                # Verify function signature
+                inspect.signature(key).bind(None, None)
+    return _CompiledPath(keys, casesense and all(type(key) in (str, int) for key in keys))
+
+
+_compile_hashable_path = functools.lru_cache(maxsize=1024)(_compile_path_uncached)
+
+
 def get_first(obj, *paths, **kwargs):
     return traverse_obj(obj, *((..., *variadic(keys)) for keys in paths), **kwargs, get_all=False)
 